@@ -0,0 +1,93 @@
+# -*- coding: UTF-8 -*-
+"""
+Measures how long it takes to configure a new one-node vOneFS cluster when the
+wizard's answers are paced one at a time, and when they're typed ahead.
+
+This runs against a real vCenter, using the same environment variables as the
+worker (see ``vlab_onefs_api/lib/constants.py``). A fresh node is deployed for
+every config, and deleted once it's been timed.
+
+Usage::
+
+    python benchmarks/config_pacing.py --user alice --image 8.2.0.0 \\
+        --frontend alice_frontend --backend alice_backend \\
+        --ext-ip-low 192.168.1.20 --ext-ip-high 192.168.1.25 \\
+        --gateway 192.168.1.1 --dns 192.168.1.1 --runs 3
+"""
+import time
+import logging
+import argparse
+import contextlib
+import statistics
+
+from vlab_onefs_api.lib.worker import vmware, setup_onefs
+
+
+MODES = {'paced': False, 'type-ahead': True}
+
+
+def main(user, image, front_end, back_end, network, runs, modes):
+    """Deploy, configure and delete a node ``runs`` times with each input mode
+
+    :Returns: Dictionary - maps the input mode to a list of config times, in seconds
+    """
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger('benchmark')
+    results = {}
+    for mode in modes:
+        results[mode] = []
+        setup_onefs.TYPE_AHEAD = MODES[mode]
+        for run in range(runs):
+            name = 'bench-{}-{}'.format(mode, run)
+            vmware.create_onefs(user, name, image, front_end, back_end, ram=4, cpu_count=2, logger=logger)
+            try:
+                # Like the config task, only the scancodes backend keeps the vCenter session open
+                with contextlib.ExitStack() as session:
+                    node = session.enter_context(vmware.OneFSNode(user, name))
+                    vmware.wait_until_ready(node.vm)
+                    console = setup_onefs.console_for(node)
+                    if isinstance(console, str):
+                        session.close()
+                    start = time.time()
+                    setup_onefs.configure_new_cluster(version=image, logger=logger, compliance=False,
+                                                      console=console, cluster_name=name, **network)
+                    results[mode].append(time.time() - start)
+            finally:
+                vmware.delete_onefs(user, name, logger)
+    return results
+
+
+def report(results):
+    """Print a table of the median config time of each mode, and how the consoles spent it"""
+    print('{:<12}{:>10}{:>10}'.format('mode', 'seconds', 'runs'))
+    for mode, samples in results.items():
+        print('{:<12}{:>10.1f}{:>10}'.format(mode, statistics.median(samples), len(samples)))
+    print('Console pacing: {}'.format(setup_onefs.pacing_report()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--user', required=True, help='The user folder to deploy the nodes into')
+    parser.add_argument('--image', required=True, help='The version of OneFS to deploy')
+    parser.add_argument('--frontend', required=True, help='The full name of the front end network')
+    parser.add_argument('--backend', required=True, help='The full name of the back end network')
+    parser.add_argument('--ext-netmask', default='255.255.255.0')
+    parser.add_argument('--ext-ip-low', required=True)
+    parser.add_argument('--ext-ip-high', required=True)
+    parser.add_argument('--gateway', required=True)
+    parser.add_argument('--dns', required=True, help='A comma separated list of DNS servers')
+    parser.add_argument('--runs', type=int, default=3, help='How many times to configure a node with each mode')
+    parser.add_argument('--modes', nargs='+', default=sorted(MODES.keys()), choices=sorted(MODES.keys()))
+    args = parser.parse_args()
+    network = {'int_netmask': '255.255.255.0',
+               'int_ip_low': '100.0.0.1',
+               'int_ip_high': '100.0.0.20',
+               'ext_netmask': args.ext_netmask,
+               'ext_ip_low': args.ext_ip_low,
+               'ext_ip_high': args.ext_ip_high,
+               'gateway': args.gateway,
+               'dns_servers': args.dns,
+               'encoding': 'utf-8',
+               'sc_zonename': None,
+               'smartconnect_ip': None}
+    report(main(args.user, args.image, args.frontend, args.backend, network, args.runs, args.modes))
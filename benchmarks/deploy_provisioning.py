@@ -0,0 +1,74 @@
+# -*- coding: UTF-8 -*-
+"""
+Measures how long it takes to deploy a vOneFS node with each type of disk
+provisioning, and the rate the datastore is written to while deploying.
+
+This runs against a real vCenter, using the same environment variables as the
+worker (see ``vlab_onefs_api/lib/constants.py``). Every node it makes is deleted
+when it's done being timed.
+
+Usage::
+
+    python benchmarks/deploy_provisioning.py --user alice --image 8.0.0.4 \\
+        --frontend alice_frontend --backend alice_backend --runs 3
+"""
+import time
+import logging
+import argparse
+import statistics
+
+from vlab_onefs_api.lib.worker import vmware, capacity
+
+
+def main(user, image, front_end, back_end, runs, modes):
+    """Deploy and delete a node ``runs`` times with each type of disk provisioning
+
+    :Returns: Dictionary - maps the provisioning type to a list of (seconds, GB written)
+    """
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger('benchmark')
+    results = {}
+    for mode in modes:
+        results[mode] = []
+        for run in range(runs):
+            name = 'bench-{}-{}'.format(mode, run)
+            start = time.time()
+            vmware.create_onefs(user, name, image, front_end, back_end, ram=4, cpu_count=2,
+                                logger=logger, disk_provisioning=mode)
+            elapsed = time.time() - start
+            try:
+                written_gb = _written_gb(user, name)
+            finally:
+                vmware.delete_onefs(user, name, logger)
+            results[mode].append((elapsed, written_gb))
+    return results
+
+
+def _written_gb(username, machine_name):
+    """How much of the datastore the new node's disks take up"""
+    with vmware.OneFSNode(username, machine_name) as node:
+        committed = sum(x.committed for x in node.vm.storage.perDatastoreUsage)
+    return committed / capacity.GB
+
+
+def report(results):
+    """Print a table of the median deploy time, and datastore throughput of each mode"""
+    print('{:<14}{:>10}{:>14}{:>12}'.format('provisioning', 'seconds', 'GB written', 'MB/s'))
+    for mode, samples in results.items():
+        seconds = statistics.median([x[0] for x in samples])
+        written_gb = statistics.median([x[1] for x in samples])
+        throughput = written_gb * 1024 / seconds
+        print('{:<14}{:>10.1f}{:>14.1f}{:>12.1f}'.format(mode, seconds, written_gb, throughput))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--user', required=True, help='The user folder to deploy the nodes into')
+    parser.add_argument('--image', required=True, help='The version of OneFS to deploy')
+    parser.add_argument('--frontend', required=True, help='The full name of the front end network')
+    parser.add_argument('--backend', required=True, help='The full name of the back end network')
+    parser.add_argument('--runs', type=int, default=3, help='How many times to deploy each mode')
+    parser.add_argument('--modes', nargs='+', default=sorted(vmware.DISK_PROVISIONING.keys()),
+                        choices=sorted(vmware.DISK_PROVISIONING.keys()))
+    args = parser.parse_args()
+    report(main(args.user, args.image, args.frontend, args.backend, args.runs, args.modes))
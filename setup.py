@@ -16,5 +16,5 @@ setup(name="vlab-onefs-api",
       description="Deploy vOneFS nodes in your vLab",
       install_requires=['flask', 'ldap3', 'pyjwt', 'uwsgi', 'vlab-api-common',
                         'ujson', 'cryptography', 'vlab-inf-common', 'celery',
-                        'selenium']
+                        'selenium', 'websocket-client', 'requests']
       )
@@ -51,6 +51,76 @@ class TestOneFSViewSchema(unittest.TestCase):
 
         self.assertTrue(schema_valid)
 
+    def test_reset_schema(self):
+        """The schema defined for POST on /reset is valid"""
+        try:
+            Draft4Validator.check_schema(onefs.OneFSView.RESET_SCHEMA)
+            schema_valid = True
+        except RuntimeError:
+            schema_valid = False
+
+        self.assertTrue(schema_valid)
+
+    def test_clone_schema(self):
+        """The schema defined for POST on /clone is valid"""
+        try:
+            Draft4Validator.check_schema(onefs.OneFSView.CLONE_SCHEMA)
+            schema_valid = True
+        except RuntimeError:
+            schema_valid = False
+
+        self.assertTrue(schema_valid)
+
+    def test_cluster_network_schema(self):
+        """The schema defined for PUT on /cluster/network is valid"""
+        try:
+            Draft4Validator.check_schema(onefs.OneFSView.CLUSTER_NETWORK_SCHEMA)
+            schema_valid = True
+        except RuntimeError:
+            schema_valid = False
+
+        self.assertTrue(schema_valid)
+
+    def test_lease_schema(self):
+        """The schema defined for PUT on /lease is valid"""
+        try:
+            Draft4Validator.check_schema(onefs.OneFSView.LEASE_SCHEMA)
+            schema_valid = True
+        except RuntimeError:
+            schema_valid = False
+
+        self.assertTrue(schema_valid)
+
+    def test_power_schema(self):
+        """The schema defined for POST on /power is valid"""
+        try:
+            Draft4Validator.check_schema(onefs.OneFSView.POWER_SCHEMA)
+            schema_valid = True
+        except RuntimeError:
+            schema_valid = False
+
+        self.assertTrue(schema_valid)
+
+    def test_stats_schema(self):
+        """The schema defined for GET on /stats is valid"""
+        try:
+            Draft4Validator.check_schema(onefs.OneFSView.STATS_SCHEMA)
+            schema_valid = True
+        except RuntimeError:
+            schema_valid = False
+
+        self.assertTrue(schema_valid)
+
+    def test_inventory_schema(self):
+        """The schema defined for GET on /inventory is valid"""
+        try:
+            Draft4Validator.check_schema(onefs.OneFSView.INVENTORY_SCHEMA)
+            schema_valid = True
+        except RuntimeError:
+            schema_valid = False
+
+        self.assertTrue(schema_valid)
+
     def test_config_schema(self):
         """The schema defined for POST on /config is valid"""
         try:
@@ -0,0 +1,217 @@
+# -*- coding: UTF-8 -*-
+"""
+A suite of tests for the functions in capacity.py
+"""
+import unittest
+from unittest.mock import patch, MagicMock
+
+from vlab_onefs_api.lib.worker import capacity
+
+
+def _make_model(datastore_gb=100, host_ram_gb=64, host_cpus=16, pool_ram_gb=128):
+    """Build a capacity model with one datastore and one host"""
+    return {'datastores': {'ds1': datastore_gb},
+            'hosts': {'esxi1': {'ram_gb': host_ram_gb, 'cpus': host_cpus}},
+            'pool_ram_gb': pool_ram_gb,
+            'taken': 0}
+
+
+class TestPreflight(unittest.TestCase):
+    """A set of test cases for the ``preflight`` function"""
+
+    @patch.object(capacity.os.path, 'getsize')
+    @patch.object(capacity, 'get_model')
+    def test_preflight(self, fake_get_model, fake_getsize):
+        """``preflight`` returns the headroom left after the new node"""
+        fake_get_model.return_value = _make_model()
+        fake_getsize.return_value = 10 * capacity.GB
+
+        output = capacity.preflight(MagicMock(), 'vcenter1', '/images/8.0.0.4.ova', ram=4, cpu_count=2)
+        expected = {'datastore': 'ds1', 'host': 'esxi1',
+                    'headroom': {'datastore_gb': 90, 'host_ram_gb': 60, 'host_cpus': 16, 'pool_ram_gb': 124}}
+
+        self.assertEqual(output, expected)
+
+    @patch.object(capacity.os.path, 'getsize')
+    @patch.object(capacity, 'get_model')
+    def test_preflight_placement(self, fake_get_model, fake_getsize):
+        """``preflight`` returns the datastore and host it reserved capacity on"""
+        model = _make_model()
+        model['datastores']['ds2'] = 500
+        model['hosts']['esxi2'] = {'ram_gb': 256, 'cpus': 1}
+        model['hosts']['esxi3'] = {'ram_gb': 128, 'cpus': 16}
+        fake_get_model.return_value = model
+        fake_getsize.return_value = 10 * capacity.GB
+
+        output = capacity.preflight(MagicMock(), 'vcenter1', '/images/8.0.0.4.ova', ram=4, cpu_count=2)
+
+        self.assertEqual((output['datastore'], output['host']), ('ds2', 'esxi3'))
+        self.assertEqual(model['hosts']['esxi3']['ram_gb'], 124)
+
+    @patch.object(capacity.os.path, 'getsize')
+    @patch.object(capacity, 'get_model')
+    def test_preflight_no_storage(self, fake_get_model, fake_getsize):
+        """``preflight`` raises ValueError when no datastore has room for the node"""
+        fake_get_model.return_value = _make_model(datastore_gb=5)
+        fake_getsize.return_value = 10 * capacity.GB
+
+        with self.assertRaises(ValueError):
+            capacity.preflight(MagicMock(), 'vcenter1', '/images/8.0.0.4.ova', ram=4, cpu_count=2)
+
+    @patch.object(capacity.os.path, 'getsize')
+    @patch.object(capacity, 'get_model')
+    def test_preflight_no_host(self, fake_get_model, fake_getsize):
+        """``preflight`` raises ValueError when no host has enough CPUs for the node"""
+        fake_get_model.return_value = _make_model(host_cpus=2)
+        fake_getsize.return_value = 10 * capacity.GB
+
+        with self.assertRaises(ValueError):
+            capacity.preflight(MagicMock(), 'vcenter1', '/images/8.0.0.4.ova', ram=4, cpu_count=4)
+
+    @patch.object(capacity.os.path, 'getsize')
+    @patch.object(capacity, 'get_model')
+    def test_preflight_no_pool_ram(self, fake_get_model, fake_getsize):
+        """``preflight`` raises ValueError when the resource pool can't fit the node's RAM"""
+        fake_get_model.return_value = _make_model(pool_ram_gb=2)
+        fake_getsize.return_value = 10 * capacity.GB
+
+        with self.assertRaises(ValueError):
+            capacity.preflight(MagicMock(), 'vcenter1', '/images/8.0.0.4.ova', ram=4, cpu_count=2)
+
+    @patch.object(capacity.os.path, 'getsize')
+    @patch.object(capacity, 'get_model')
+    def test_preflight_headroom_in_error(self, fake_get_model, fake_getsize):
+        """``preflight`` includes the headroom in the error message"""
+        fake_get_model.return_value = _make_model(pool_ram_gb=2)
+        fake_getsize.return_value = 10 * capacity.GB
+
+        try:
+            capacity.preflight(MagicMock(), 'vcenter1', '/images/8.0.0.4.ova', ram=4, cpu_count=2)
+        except ValueError as doh:
+            error = '{}'.format(doh)
+        else:
+            error = ''
+
+        self.assertTrue('pool_ram_gb=2' in error)
+
+    @patch.object(capacity.os.path, 'getsize')
+    @patch.object(capacity, 'get_model')
+    def test_preflight_reserves(self, fake_get_model, fake_getsize):
+        """``preflight`` subtracts each node that passes from the cached model"""
+        fake_get_model.return_value = _make_model(host_ram_gb=6)
+        fake_getsize.return_value = 10 * capacity.GB
+
+        capacity.preflight(MagicMock(), 'vcenter1', '/images/8.0.0.4.ova', ram=4, cpu_count=2)
+        with self.assertRaises(ValueError):
+            capacity.preflight(MagicMock(), 'vcenter1', '/images/8.0.0.4.ova', ram=4, cpu_count=2)
+
+
+class TestModel(unittest.TestCase):
+    """A set of test cases for building and caching the capacity model"""
+
+    def setUp(self):
+        capacity._MODELS.clear()
+
+    @patch.object(capacity, '_build_model')
+    def test_get_model_cached(self, fake_build_model):
+        """``get_model`` only pulls the capacity from vCenter once per TTL"""
+        fake_build_model.return_value = {}
+
+        capacity.get_model(MagicMock(), 'vcenter1', ttl=60)
+        capacity.get_model(MagicMock(), 'vcenter1', ttl=60)
+
+        self.assertEqual(fake_build_model.call_count, 1)
+
+    @patch.object(capacity, '_build_model')
+    def test_get_model_expires(self, fake_build_model):
+        """``get_model`` refreshes the model once it's older than the TTL"""
+        fake_build_model.side_effect = lambda x: {}
+
+        capacity.get_model(MagicMock(), 'vcenter1', ttl=60)
+        capacity._MODELS['vcenter1']['taken'] -= 61
+        capacity.get_model(MagicMock(), 'vcenter1', ttl=60)
+
+        self.assertEqual(fake_build_model.call_count, 2)
+
+    @patch.object(capacity, 'const')
+    def test_build_model(self, fake_const):
+        """``_build_model`` skips hosts in maintenance mode and datastores that are not accessible"""
+        fake_const.INF_VCENTER_DATASTORE = 'pod1'
+        fake_const.INF_VCENTER_RESORUCE_POOL = 'pool1'
+        fake_vcenter = MagicMock()
+        ds_ok = MagicMock()
+        ds_ok.name = 'ds1'
+        ds_ok.summary.accessible = True
+        ds_ok.summary.freeSpace = 50 * capacity.GB
+        ds_bad = MagicMock()
+        ds_bad.name = 'ds2'
+        ds_bad.summary.accessible = False
+        pod = MagicMock(spec=capacity.vim.StoragePod)
+        pod.childEntity = [ds_ok, ds_bad]
+        fake_vcenter.datastores = {'pod1': pod}
+        host_ok = MagicMock()
+        host_ok.runtime.inMaintenanceMode = False
+        host_ok.hardware.memorySize = 64 * capacity.GB
+        host_ok.summary.quickStats.overallMemoryUsage = 16 * 1024
+        host_ok.hardware.cpuInfo.numCpuThreads = 32
+        host_down = MagicMock()
+        host_down.runtime.inMaintenanceMode = True
+        fake_vcenter.host_systems = {'esxi1': host_ok, 'esxi2': host_down}
+        pool_memory = fake_vcenter.resource_pools['pool1'].runtime.memory
+        pool_memory.maxUsage = 256 * capacity.GB
+        pool_memory.overallUsage = 56 * capacity.GB
+        fake_vcenter.resource_pools = {'pool1': fake_vcenter.resource_pools['pool1']}
+
+        output = capacity._build_model(fake_vcenter)
+        expected = {'datastores': {'ds1': 50.0},
+                    'hosts': {'esxi1': {'ram_gb': 48.0, 'cpus': 32}},
+                    'pool_ram_gb': 200.0}
+
+        self.assertEqual(output, expected)
+
+    @patch.object(capacity, 'const')
+    def test_find_datastore(self, fake_const):
+        """``find_datastore`` looks up a member of a datastore cluster by name"""
+        fake_const.INF_VCENTER_DATASTORE = 'pod1'
+        ds1 = MagicMock()
+        ds1.name = 'ds1'
+        pod = MagicMock(spec=capacity.vim.StoragePod)
+        pod.childEntity = [ds1]
+        fake_vcenter = MagicMock()
+        fake_vcenter.datastores = {'pod1': pod}
+
+        output = capacity.find_datastore(fake_vcenter, 'ds1')
+
+        self.assertTrue(output is ds1)
+
+    @patch.object(capacity, 'const')
+    def test_find_datastore_missing(self, fake_const):
+        """``find_datastore`` raises RuntimeError if the datastore is gone"""
+        fake_const.INF_VCENTER_DATASTORE = 'pod1'
+        fake_vcenter = MagicMock()
+        fake_vcenter.datastores = {}
+
+        with self.assertRaises(RuntimeError):
+            capacity.find_datastore(fake_vcenter, 'ds1')
+
+
+class TestProvisionedGB(unittest.TestCase):
+    """A set of test cases for the ``provisioned_gb`` function"""
+
+    def test_provisioned_gb(self):
+        """``provisioned_gb`` adds up the capacity of every disk in the OVF"""
+        ovf = """<?xml version="1.0"?>
+        <Envelope xmlns="http://schemas.dmtf.org/ovf/envelope/1" xmlns:ovf="http://schemas.dmtf.org/ovf/envelope/1">
+          <DiskSection>
+            <Disk ovf:capacity="2" ovf:capacityAllocationUnits="byte * 2^30" ovf:diskId="vmdisk1"/>
+            <Disk ovf:capacity="1073741824" ovf:diskId="vmdisk2"/>
+          </DiskSection>
+        </Envelope>"""
+
+        output = capacity.provisioned_gb(ovf)
+
+        self.assertEqual(output, 3.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
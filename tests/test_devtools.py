@@ -0,0 +1,147 @@
+# -*- coding: UTF-8 -*-
+"""
+A suite of tests for the functions in devtools.py
+"""
+import unittest
+from unittest.mock import patch, MagicMock
+
+from vlab_onefs_api.lib.worker import devtools
+
+
+def _created(request_id, url):
+    return {'method': 'Network.webSocketCreated', 'params': {'requestId': request_id, 'url': url}}
+
+
+def _frame(request_id):
+    return {'method': 'Network.webSocketFrameReceived',
+            'params': {'requestId': request_id, 'response': {'payloadData': 'AAAA'}}}
+
+
+@patch.object(devtools.websocket, 'create_connection')
+class TestFrameMonitor(unittest.TestCase):
+    """A set of test cases for the FrameMonitor object"""
+
+    def _make_monitor(self, fake_create_connection):
+        fake_create_connection.return_value.recv.side_effect = devtools.websocket.WebSocketConnectionClosedException()
+        monitor = devtools.FrameMonitor('ws://localhost:9222/devtools/page/1')
+        monitor._thread.join()
+        return monitor
+
+    def test_init(self, fake_create_connection):
+        """``FrameMonitor`` subscribes to network events"""
+        self._make_monitor(fake_create_connection)
+
+        sent = fake_create_connection.return_value.send.call_args[0][0]
+
+        self.assertTrue('Network.enable' in sent)
+
+    def test_alive(self, fake_create_connection):
+        """``FrameMonitor.alive`` is False once the DevTools session ends"""
+        monitor = self._make_monitor(fake_create_connection)
+
+        self.assertFalse(monitor.alive)
+
+    def test_frame(self, fake_create_connection):
+        """``FrameMonitor.handle`` records frames received on the console socket"""
+        monitor = self._make_monitor(fake_create_connection)
+        monitor.last_frame = 0
+        monitor.handle(_created('1', 'wss://esxi01:443/ticket/asdf'))
+
+        monitor.handle(_frame('1'))
+
+        self.assertEqual(monitor.frames, 1)
+        self.assertTrue(monitor.last_frame > 0)
+
+    def test_other_socket(self, fake_create_connection):
+        """``FrameMonitor.handle`` ignores frames from sockets other than the console"""
+        monitor = self._make_monitor(fake_create_connection)
+        monitor.handle(_created('1', 'wss://esxi01:443/ticket/asdf'))
+        monitor.handle(_created('2', 'wss://vcenter/ui/notifications'))
+
+        monitor.handle(_frame('2'))
+
+        self.assertEqual(monitor.frames, 0)
+
+    def test_before_console(self, fake_create_connection):
+        """``FrameMonitor.handle`` counts every frame until the console socket is opened"""
+        monitor = self._make_monitor(fake_create_connection)
+
+        monitor.handle(_frame('2'))
+
+        self.assertEqual(monitor.frames, 1)
+
+    @patch.object(devtools.time, 'sleep')
+    @patch.object(devtools.time, 'time')
+    def test_wait_for_quiet(self, fake_time, fake_sleep, fake_create_connection):
+        """``FrameMonitor.wait_for_quiet`` sleeps until the window after the last frame"""
+        monitor = self._make_monitor(fake_create_connection)
+        monitor.last_frame = 95
+        fake_time.side_effect = [90, 91, 106]
+
+        monitor.wait_for_quiet(10)
+
+        slept = fake_sleep.call_args[0][0]
+        expected = 14 # the last frame was at 95, and it's now 91
+
+        self.assertEqual(slept, expected)
+
+    @patch.object(devtools.time, 'sleep')
+    @patch.object(devtools.time, 'time')
+    def test_wait_for_quiet_minimum(self, fake_time, fake_sleep, fake_create_connection):
+        """``FrameMonitor.wait_for_quiet`` always waits the full window"""
+        monitor = self._make_monitor(fake_create_connection)
+        monitor.last_frame = 0
+        fake_time.side_effect = [100, 100, 110]
+
+        monitor.wait_for_quiet(10)
+
+        slept = fake_sleep.call_args[0][0]
+
+        self.assertEqual(slept, 10)
+
+    def test_wait_for_frame(self, fake_create_connection):
+        """``FrameMonitor.wait_for_frame`` returns True once a frame arrived after the input"""
+        monitor = self._make_monitor(fake_create_connection)
+        monitor.handle(_frame('1'))
+        sent_at = monitor.last_frame - 1
+
+        self.assertTrue(monitor.wait_for_frame(sent_at, timeout=1))
+
+    def test_wait_for_frame_timeout(self, fake_create_connection):
+        """``FrameMonitor.wait_for_frame`` returns False when the console never echoes"""
+        monitor = self._make_monitor(fake_create_connection)
+
+        self.assertFalse(monitor.wait_for_frame(monitor.last_frame, timeout=0.01))
+
+    @patch.object(devtools.requests, 'get')
+    def test_attach(self, fake_get, fake_create_connection):
+        """``FrameMonitor.attach`` connects to the page the webdriver is on"""
+        fake_create_connection.return_value.recv.side_effect = devtools.websocket.WebSocketConnectionClosedException()
+        fake_get.return_value.json.return_value = [{'type': 'service_worker', 'webSocketDebuggerUrl': 'ws://nope'},
+                                                   {'type': 'page', 'webSocketDebuggerUrl': 'ws://page'}]
+        fake_driver = MagicMock()
+        fake_driver.capabilities = {'goog:chromeOptions': {'debuggerAddress': 'localhost:9222'}}
+
+        devtools.FrameMonitor.attach(fake_driver)
+
+        self.assertEqual(fake_create_connection.call_args[0][0], 'ws://page')
+
+    def test_attach_no_devtools(self, fake_create_connection):
+        """``FrameMonitor.attach`` returns None when Chrome has no DevTools address"""
+        fake_driver = MagicMock()
+        fake_driver.capabilities = {}
+
+        self.assertTrue(devtools.FrameMonitor.attach(fake_driver) is None)
+
+    @patch.object(devtools.requests, 'get')
+    def test_attach_error(self, fake_get, fake_create_connection):
+        """``FrameMonitor.attach`` returns None when DevTools can't be reached"""
+        fake_get.side_effect = devtools.requests.ConnectionError('testing')
+        fake_driver = MagicMock()
+        fake_driver.capabilities = {'goog:chromeOptions': {'debuggerAddress': 'localhost:9222'}}
+
+        self.assertTrue(devtools.FrameMonitor.attach(fake_driver) is None)
+
+
+if __name__ == '__main__':
+    unittest.main()
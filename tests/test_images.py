@@ -0,0 +1,122 @@
+# -*- coding: UTF-8 -*-
+"""
+A suite of tests for the functions in images.py
+"""
+import os
+import unittest
+import tempfile
+from unittest.mock import patch
+
+from vlab_onefs_api.lib.worker import images
+
+
+class TestImageVersion(unittest.TestCase):
+    """A set of test cases for the ImageVersion object"""
+
+    def test_compare(self):
+        """``ImageVersion`` compares by number, not as a string"""
+        self.assertTrue(images.ImageVersion('8.10.0.0') > images.ImageVersion('8.9.0.0'))
+
+    def test_trailing_zeros(self):
+        """``ImageVersion`` ignores trailing zeros"""
+        self.assertEqual(images.ImageVersion('8.1'), images.ImageVersion('8.1.0.0'))
+        self.assertEqual(hash(images.ImageVersion('8.1')), hash(images.ImageVersion('8.1.0.0')))
+
+    def test_invalid(self):
+        """``ImageVersion`` raises ValueError for a version that isn't a dotted series of numbers"""
+        with self.assertRaises(ValueError):
+            images.ImageVersion('8.1.beta')
+
+    def test_str(self):
+        """``ImageVersion`` keeps the version exactly as supplied"""
+        self.assertEqual(str(images.ImageVersion('8.1.0.0')), '8.1.0.0')
+
+
+class TestImageRegistry(unittest.TestCase):
+    """A set of test cases for the ImageRegistry object"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for name in ['8.10.0.0.ova', '8.2.0.0.ova', '7.2.1.0.ova', 'README.txt', 'beta.ova']:
+            with open(os.path.join(self.tmp.name, name), 'w'):
+                pass
+        self.registry = images.ImageRegistry(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_versions(self):
+        """``ImageRegistry.versions`` lists the versions of the OVAs, oldest first"""
+        self.assertEqual(self.registry.versions(), ['7.2.1.0', '8.2.0.0', '8.10.0.0'])
+
+    def test_get(self):
+        """``ImageRegistry.get`` returns the path to the OVA of a version"""
+        image = self.registry.get('8.2.0.0')
+
+        self.assertEqual(image.path, os.path.join(self.tmp.name, '8.2.0.0.ova'))
+
+    def test_get_missing(self):
+        """``ImageRegistry.get`` returns None when there's no image of the version"""
+        self.assertTrue(self.registry.get('9.0.0.0') is None)
+
+    @patch.object(images.os, 'listdir')
+    def test_scanned_once(self, fake_listdir):
+        """``ImageRegistry`` only reads the directory once, until it changes"""
+        fake_listdir.return_value = ['8.2.0.0.ova']
+        self.registry.versions()
+        self.registry.get('8.2.0.0')
+
+        self.assertEqual(fake_listdir.call_count, 1)
+
+    def test_new_image(self):
+        """``ImageRegistry`` picks up images copied into the directory"""
+        self.registry.versions()
+        with open(os.path.join(self.tmp.name, '9.0.0.0.ova'), 'w'):
+            pass
+        os.utime(self.tmp.name, (0, 0))
+
+        self.assertEqual(self.registry.versions()[-1], '9.0.0.0')
+
+    def test_missing_dir(self):
+        """``ImageRegistry`` has no images when the directory doesn't exist"""
+        registry = images.ImageRegistry('/no/such/dir')
+
+        self.assertEqual(registry.versions(), [])
+
+    def test_profile(self):
+        """``ImageRegistry.profile`` picks the plan of the newest release that's not newer than the version"""
+        self.assertEqual(self.registry.profile('8.1.1.1'), '8.1.0.0')
+
+    def test_profile_exact(self):
+        """``ImageRegistry.profile`` picks the plan of the same release"""
+        self.assertEqual(self.registry.profile('8.1.3.0'), '8.1.3.0')
+
+    def test_profile_newer(self):
+        """``ImageRegistry.profile`` uses the newest plan for releases newer than every plan"""
+        self.assertEqual(self.registry.profile('8.10.0.0'), '8.2.0.0')
+
+    def test_profile_older(self):
+        """``ImageRegistry.profile`` uses the oldest plan for releases older than every plan"""
+        self.assertEqual(self.registry.profile('7.1.1.0'), '7.2.0.0')
+
+    def test_profile_invalid(self):
+        """``ImageRegistry.profile`` raises ValueError for an invalid version"""
+        with self.assertRaises(ValueError):
+            self.registry.profile('latest')
+
+    def test_capabilities(self):
+        """``ImageRegistry.capabilities`` lists the sections of the wizard of a version"""
+        self.assertTrue('esrs' in self.registry.capabilities('8.0.0.4'))
+        self.assertFalse('esrs' in self.registry.capabilities('8.2.0.0'))
+
+
+class TestRegistry(unittest.TestCase):
+    """A set of test cases for the ``registry`` function"""
+
+    def test_registry(self):
+        """``registry`` returns the same ImageRegistry every time"""
+        self.assertTrue(images.registry() is images.registry())
+
+
+if __name__ == '__main__':
+    unittest.main()
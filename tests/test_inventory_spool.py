@@ -0,0 +1,75 @@
+# -*- coding: UTF-8 -*-
+"""
+A suite of tests for the InventorySpool object
+"""
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+from vlab_onefs_api.lib import inventory_spool
+
+
+class TestInventorySpool(unittest.TestCase):
+    """A set of test cases for the InventorySpool object"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.spool = inventory_spool.InventorySpool(directory=self.directory, ttl=60)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_write(self):
+        """``write`` returns the number of pages saved"""
+        output = self.spool.write('asdf', iter(['{"a":1}\n', '{"b":2}\n']))
+
+        self.assertEqual(output, 2)
+
+    def test_read(self):
+        """``read`` streams every page that was written"""
+        self.spool.write('asdf', iter(['{"a":1}\n', '{"b":2}\n']))
+
+        output = ''.join(self.spool.read('asdf', chunk_size=3))
+
+        self.assertEqual(output, '{"a":1}\n{"b":2}\n')
+
+    def test_read_deletes(self):
+        """``read`` deletes the inventory once it's been streamed"""
+        self.spool.write('asdf', iter(['{"a":1}\n']))
+        ''.join(self.spool.read('asdf'))
+
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_read_missing(self):
+        """``read`` returns None when there's no inventory for the task"""
+        self.assertTrue(self.spool.read('asdf') is None)
+
+    def test_read_unsafe(self):
+        """``read`` returns None for a task ID that would escape the directory"""
+        self.assertTrue(self.spool.read('../etc/passwd') is None)
+
+    def test_write_partial(self):
+        """``write`` does not expose an inventory until every page is written"""
+        def pages():
+            yield '{"a":1}\n'
+            self.assertTrue(self.spool.read('asdf') is None)
+            yield '{"b":2}\n'
+
+        self.spool.write('asdf', pages())
+
+    def test_prune(self):
+        """``prune`` deletes the inventories that expired"""
+        self.spool.write('old', iter(['{"a":1}\n']))
+        self.spool.write('new', iter(['{"a":1}\n']))
+        expired = time.time() - 120
+        os.utime(os.path.join(self.directory, 'old.ndjson'), (expired, expired))
+
+        self.spool.prune()
+
+        self.assertEqual(os.listdir(self.directory), ['new.ndjson'])
+
+
+if __name__ == '__main__':
+    unittest.main()
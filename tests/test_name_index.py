@@ -0,0 +1,133 @@
+# -*- coding: UTF-8 -*-
+"""
+A suite of tests for the NameIndex object
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from vlab_onefs_api.lib import name_index
+
+
+class TestNameIndex(unittest.TestCase):
+    """A set of test cases for the NameIndex object"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.index = name_index.NameIndex(directory=self.directory, ttl=60)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_reserve(self):
+        """``reserve`` returns True for a name that's not in use"""
+        self.assertTrue(self.index.reserve('alice', 'isi01'))
+
+    def test_reserve_twice(self):
+        """``reserve`` returns False for a name that's already reserved"""
+        self.index.reserve('alice', 'isi01')
+
+        self.assertFalse(self.index.reserve('alice', 'isi01'))
+
+    def test_reserve_taken(self):
+        """``reserve`` returns False for a name the user already has a node by"""
+        self.index.add('alice', 'isi01')
+
+        self.assertFalse(self.index.reserve('alice', 'isi01'))
+
+    def test_reserve_per_user(self):
+        """``reserve`` only checks the names of the same user"""
+        self.index.add('bob', 'isi01')
+
+        self.assertTrue(self.index.reserve('alice', 'isi01'))
+
+    def test_reserve_expired(self):
+        """``reserve`` replaces a reservation that's older than the TTL"""
+        self.index.reserve('alice', 'isi01')
+        path = os.path.join(self.directory, 'alice', 'reserved', 'isi01')
+        os.utime(path, (0, 0))
+
+        self.assertTrue(self.index.reserve('alice', 'isi01'))
+
+    def test_release(self):
+        """``release`` lets the name be reserved again"""
+        self.index.reserve('alice', 'isi01')
+        self.index.release('alice', 'isi01')
+
+        self.assertTrue(self.index.reserve('alice', 'isi01'))
+
+    def test_add_releases(self):
+        """``add`` drops the reservation of the name"""
+        self.index.reserve('alice', 'isi01')
+        self.index.add('alice', 'isi01')
+        path = os.path.join(self.directory, 'alice', 'reserved', 'isi01')
+
+        self.assertFalse(os.path.exists(path))
+
+    def test_remove(self):
+        """``remove`` frees up the name"""
+        self.index.add('alice', 'isi01')
+        self.index.remove('alice', 'isi01')
+
+        self.assertFalse(self.index.taken('alice', 'isi01'))
+
+    def test_sync(self):
+        """``sync`` makes the index match the supplied names"""
+        self.index.add('alice', 'isi01')
+        self.index.add('alice', 'isi02')
+
+        self.index.sync('alice', ['isi02', 'isi03'])
+        taken = [self.index.taken('alice', x) for x in ['isi01', 'isi02', 'isi03']]
+
+        self.assertEqual(taken, [False, True, True])
+
+    def test_disabled(self):
+        """NameIndex never rejects a name when no directory is configured"""
+        index = name_index.NameIndex(directory='', ttl=60)
+        index.add('alice', 'isi01')
+
+        self.assertTrue(index.reserve('alice', 'isi01'))
+
+    def test_unsafe_name(self):
+        """NameIndex does not index names that would escape the directory"""
+        self.index.reserve('alice', '../isi01')
+
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_placement(self):
+        """``placement`` returns the vCenter server a user was placed on"""
+        self.index.place('alice', 'vcenter2')
+
+        self.assertEqual(self.index.placement('alice'), 'vcenter2')
+
+    def test_placement_none(self):
+        """``placement`` returns None for a user that was never placed"""
+        self.assertTrue(self.index.placement('alice') is None)
+
+    def test_place_first_wins(self):
+        """``place`` keeps the server that was recorded first"""
+        self.index.place('alice', 'vcenter2')
+
+        output = self.index.place('alice', 'vcenter1')
+
+        self.assertEqual(output, 'vcenter2')
+
+    def test_unplace(self):
+        """``unplace`` lets the user be placed on a different server"""
+        self.index.place('alice', 'vcenter2')
+        self.index.unplace('alice')
+
+        output = self.index.place('alice', 'vcenter1')
+
+        self.assertEqual(output, 'vcenter1')
+
+    def test_place_disabled(self):
+        """``place`` returns the supplied server when the index is disabled"""
+        index = name_index.NameIndex(directory='')
+
+        self.assertEqual(index.place('alice', 'vcenter1'), 'vcenter1')
+
+
+if __name__ == '__main__':
+    unittest.main()
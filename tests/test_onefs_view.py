@@ -237,6 +237,273 @@ class TestOneFSView(unittest.TestCase):
 
         self.assertTrue(compliance is True) # test for type, there is only one "True" object ever
 
+    def test_get_stats_task(self):
+        """OneFSView - GET on /api/2/inf/onefs/stats returns a task-id"""
+        resp = self.app.get('/api/2/inf/onefs/stats',
+                            headers={'X-Auth': self.token})
+
+        task_id = resp.json['content']['task-id']
+        expected = 'asdf-asdf-asdf'
+
+        self.assertEqual(task_id, expected)
+
+    def test_get_stats_task_link(self):
+        """OneFSView - GET on /api/2/inf/onefs/stats sets the Link header"""
+        resp = self.app.get('/api/2/inf/onefs/stats',
+                            headers={'X-Auth': self.token})
+
+        task_id = resp.headers['Link']
+        expected = '<https://localhost/api/2/inf/onefs/task/asdf-asdf-asdf>; rel=status'
+
+        self.assertEqual(task_id, expected)
+
+    def test_post_reset_task(self):
+        """OneFSView - POST on /api/2/inf/onefs/reset returns a task-id"""
+        resp = self.app.post('/api/2/inf/onefs/reset',
+                             headers={'X-Auth': self.token},
+                             json={'name': "isi01"})
+
+        task_id = resp.json['content']['task-id']
+        expected = 'asdf-asdf-asdf'
+
+        self.assertEqual(task_id, expected)
+
+    def test_post_reset_bad_input(self):
+        """OneFSView - POST on /api/2/inf/onefs/reset returns 400 when the node name is missing"""
+        resp = self.app.post('/api/2/inf/onefs/reset',
+                             headers={'X-Auth': self.token},
+                             json={})
+
+        self.assertEqual(resp.status_code, 400)
+
+    def test_post_clone_task(self):
+        """OneFSView - POST on /api/2/inf/onefs/clone returns a task-id"""
+        resp = self.app.post('/api/2/inf/onefs/clone',
+                             headers={'X-Auth': self.token},
+                             json={'nodes': ['isi01', 'isi02'], 'suffix': '-copy',
+                                   'frontend': 'front', 'backend': 'back2'})
+
+        task_id = resp.json['content']['task-id']
+        expected = 'asdf-asdf-asdf'
+
+        self.assertEqual(task_id, expected)
+
+    @patch.object(onefs, 'name_index')
+    def test_post_clone_duplicate_name(self, fake_name_index):
+        """OneFSView - POST on /api/2/inf/onefs/clone returns 409 and releases its reservations when a clone name is taken"""
+        fake_name_index.reserve.side_effect = [True, False]
+        resp = self.app.post('/api/2/inf/onefs/clone',
+                             headers={'X-Auth': self.token},
+                             json={'nodes': ['isi01', 'isi02'], 'suffix': '-copy',
+                                   'frontend': 'front', 'backend': 'back2'})
+
+        self.assertEqual(resp.status_code, 409)
+        fake_name_index.release.assert_called_with('bob', 'isi01-copy')
+
+    @patch.object(onefs, 'name_index')
+    def test_post_clone_queue_error(self, fake_name_index):
+        """OneFSView - POST on /api/2/inf/onefs/clone releases the clone names when the task can't be queued"""
+        self.celery_app.send_task.side_effect = RuntimeError('broker is down')
+
+        with self.assertRaises(RuntimeError):
+            self.app.post('/api/2/inf/onefs/clone',
+                          headers={'X-Auth': self.token},
+                          json={'nodes': ['isi01', 'isi02'], 'suffix': '-copy',
+                                'frontend': 'front', 'backend': 'back2'})
+        released = [x[0] for x in fake_name_index.release.call_args_list]
+
+        self.assertEqual(released, [('bob', 'isi01-copy'), ('bob', 'isi02-copy')])
+
+    def test_post_clone_bad_input(self):
+        """OneFSView - POST on /api/2/inf/onefs/clone returns 400 when no nodes are supplied"""
+        resp = self.app.post('/api/2/inf/onefs/clone',
+                             headers={'X-Auth': self.token},
+                             json={'nodes': [], 'suffix': '-copy',
+                                   'frontend': 'front', 'backend': 'back2'})
+
+        self.assertEqual(resp.status_code, 400)
+
+    def test_get_inventory_task(self):
+        """OneFSView - GET on /api/2/inf/onefs/inventory returns a task-id for admins"""
+        token = generate_v2_test_token(username=onefs.const.VLAB_ONEFS_ADMINS[0])
+        resp = self.app.get('/api/2/inf/onefs/inventory',
+                            headers={'X-Auth': token})
+
+        task_id = resp.json['content']['task-id']
+        expected = 'asdf-asdf-asdf'
+
+        self.assertEqual(task_id, expected)
+
+    def test_get_inventory_not_admin(self):
+        """OneFSView - GET on /api/2/inf/onefs/inventory returns 403 for non-admins"""
+        resp = self.app.get('/api/2/inf/onefs/inventory',
+                            headers={'X-Auth': self.token})
+
+        self.assertEqual(resp.status_code, 403)
+
+    @patch.object(onefs, 'inventory_spool')
+    def test_get_inventory_result(self, fake_inventory_spool):
+        """OneFSView - GET on /api/2/inf/onefs/inventory/<task-id> streams NDJSON when the task is done"""
+        token = generate_v2_test_token(username=onefs.const.VLAB_ONEFS_ADMINS[0])
+        self.celery_app.AsyncResult.return_value.status = 'SUCCESS'
+        fake_inventory_spool.read.return_value = iter(['{"a":1}\n', '{"b":2}\n'])
+        resp = self.app.get('/api/2/inf/onefs/inventory/asdf-asdf-asdf',
+                            headers={'X-Auth': token})
+
+        self.assertEqual(resp.data, b'{"a":1}\n{"b":2}\n')
+        self.assertEqual(resp.mimetype, 'application/x-ndjson')
+        fake_inventory_spool.read.assert_called_with('asdf-asdf-asdf')
+
+    @patch.object(onefs, 'inventory_spool')
+    def test_get_inventory_result_gone(self, fake_inventory_spool):
+        """OneFSView - GET on /api/2/inf/onefs/inventory/<task-id> returns 404 if the inventory was already fetched"""
+        token = generate_v2_test_token(username=onefs.const.VLAB_ONEFS_ADMINS[0])
+        self.celery_app.AsyncResult.return_value.status = 'SUCCESS'
+        fake_inventory_spool.read.return_value = None
+        resp = self.app.get('/api/2/inf/onefs/inventory/asdf-asdf-asdf',
+                            headers={'X-Auth': token})
+
+        self.assertEqual(resp.status_code, 404)
+
+    def test_get_inventory_result_pending(self):
+        """OneFSView - GET on /api/2/inf/onefs/inventory/<task-id> returns 202 while the task runs"""
+        token = generate_v2_test_token(username=onefs.const.VLAB_ONEFS_ADMINS[0])
+        self.celery_app.AsyncResult.return_value.status = 'PENDING'
+        resp = self.app.get('/api/2/inf/onefs/inventory/asdf-asdf-asdf',
+                            headers={'X-Auth': token})
+
+        self.assertEqual(resp.status_code, 202)
+
+    def test_put_cluster_network_task(self):
+        """OneFSView - PUT on /api/2/inf/onefs/cluster/network returns a task-id"""
+        resp = self.app.put('/api/2/inf/onefs/cluster/network',
+                            headers={'X-Auth': self.token},
+                            json={'nodes': ['isi01', 'isi02'], 'new_network': 'front2'})
+
+        task_id = resp.json['content']['task-id']
+        expected = 'asdf-asdf-asdf'
+
+        self.assertEqual(task_id, expected)
+
+    def test_put_cluster_network_prefix(self):
+        """OneFSView - PUT on /api/2/inf/onefs/cluster/network prefixes the network with the username"""
+        self.app.put('/api/2/inf/onefs/cluster/network',
+                     headers={'X-Auth': self.token},
+                     json={'nodes': ['isi01', 'isi02'], 'new_network': 'front2'})
+
+        the_args, _ = self.celery_app.send_task.call_args
+        new_network = the_args[1][2]
+
+        self.assertEqual(new_network, 'bob_front2')
+
+    @patch.object(onefs, 'name_index')
+    def test_post_duplicate_name(self, fake_name_index):
+        """OneFSView - POST on /api/2/inf/onefs returns 409 when the name is already used"""
+        fake_name_index.reserve.return_value = False
+        resp = self.app.post('/api/2/inf/onefs',
+                             headers={'X-Auth': self.token},
+                             json={'name': "isi01",
+                                   'image': "8.0.0.4",
+                                   'frontend': "externalNetwork",
+                                   'backend': "internalNetwork"})
+
+        self.assertEqual(resp.status_code, 409)
+        self.assertFalse(self.celery_app.send_task.called)
+
+    @patch.object(onefs, 'name_index')
+    def test_post_queue_error(self, fake_name_index):
+        """OneFSView - POST on /api/2/inf/onefs releases the name when the task can't be queued"""
+        self.celery_app.send_task.side_effect = RuntimeError('broker is down')
+
+        with self.assertRaises(RuntimeError):
+            self.app.post('/api/2/inf/onefs',
+                          headers={'X-Auth': self.token},
+                          json={'name': "isi01",
+                                'image': "8.0.0.4",
+                                'frontend': "externalNetwork",
+                                'backend': "internalNetwork"})
+
+        fake_name_index.release.assert_called_with('bob', 'isi01')
+
+    def test_post_disk_provisioning(self):
+        """OneFSView - POST on /api/2/inf/onefs defaults to thin provisioned disks"""
+        self.app.post('/api/2/inf/onefs',
+                      headers={'X-Auth': self.token},
+                      json={'name': "isi01",
+                            'image': "8.0.0.4",
+                            'frontend': "externalNetwork",
+                            'backend': "internalNetwork"})
+
+        the_args, _ = self.celery_app.send_task.call_args
+        disk_provisioning = the_args[1][8]
+
+        self.assertEqual(disk_provisioning, 'thin')
+
+    def test_post_bad_disk_provisioning(self):
+        """OneFSView - POST on /api/2/inf/onefs returns 400 for an unknown disk provisioning"""
+        resp = self.app.post('/api/2/inf/onefs',
+                             headers={'X-Auth': self.token},
+                             json={'name': "isi01",
+                                   'image': "8.0.0.4",
+                                   'frontend': "externalNetwork",
+                                   'backend': "internalNetwork",
+                                   'disk-provisioning': "sparse"})
+
+        self.assertEqual(resp.status_code, 400)
+
+    def test_post_lease(self):
+        """OneFSView - POST on /api/2/inf/onefs passes the lease to the create task"""
+        self.app.post('/api/2/inf/onefs',
+                      headers={'X-Auth': self.token},
+                      json={'name': "isi01",
+                            'image': "8.0.0.4",
+                            'frontend': "externalNetwork",
+                            'backend': "internalNetwork",
+                            'lease': 24})
+
+        the_args, _ = self.celery_app.send_task.call_args
+        lease = the_args[1][9]
+
+        self.assertEqual(lease, 24)
+
+    def test_put_lease_task(self):
+        """OneFSView - PUT on /api/2/inf/onefs/lease returns a task-id"""
+        resp = self.app.put('/api/2/inf/onefs/lease',
+                            headers={'X-Auth': self.token},
+                            json={'name': "isi01", 'hours': 24})
+
+        task_id = resp.json['content']['task-id']
+        expected = 'asdf-asdf-asdf'
+
+        self.assertEqual(task_id, expected)
+
+    def test_put_lease_too_long(self):
+        """OneFSView - PUT on /api/2/inf/onefs/lease returns 400 when the lease is longer than allowed"""
+        resp = self.app.put('/api/2/inf/onefs/lease',
+                            headers={'X-Auth': self.token},
+                            json={'name': "isi01", 'hours': onefs.const.VLAB_ONEFS_MAX_LEASE + 1})
+
+        self.assertEqual(resp.status_code, 400)
+
+    def test_post_power_task(self):
+        """OneFSView - POST on /api/2/inf/onefs/power returns a task-id"""
+        resp = self.app.post('/api/2/inf/onefs/power',
+                             headers={'X-Auth': self.token},
+                             json={'nodes': ['isi01', 'isi02']})
+
+        task_id = resp.json['content']['task-id']
+        expected = 'asdf-asdf-asdf'
+
+        self.assertEqual(task_id, expected)
+
+    def test_post_power_bad_input(self):
+        """OneFSView - POST on /api/2/inf/onefs/power returns 400 when no nodes are supplied"""
+        resp = self.app.post('/api/2/inf/onefs/power',
+                             headers={'X-Auth': self.token},
+                             json={'nodes': []})
+
+        self.assertEqual(resp.status_code, 400)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,185 @@
+# -*- coding: UTF-8 -*-
+"""
+A suite of tests for the functions in prompts.py
+"""
+import os
+import zlib
+import struct
+import unittest
+import tempfile
+from unittest.mock import MagicMock
+
+from vlab_onefs_api.lib.worker import prompts
+
+
+class TestPromptRecognizer(unittest.TestCase):
+    """A set of test cases for the PromptRecognizer object"""
+
+    def setUp(self):
+        self.recognizer = prompts.PromptRecognizer({'wizard': [0b1111], 'login': [0b11110000]}, max_distance=2)
+
+    def test_identify(self):
+        """``PromptRecognizer.identify`` matches a fingerprint to the closest screen"""
+        self.assertEqual(self.recognizer.identify(0b1101), 'wizard')
+
+    def test_identify_unknown(self):
+        """``PromptRecognizer.identify`` returns None when no screen is close enough"""
+        self.assertTrue(self.recognizer.identify(0b1010101010) is None)
+
+    def test_identify_blank(self):
+        """``PromptRecognizer.identify`` returns None when the console hasn't drawn anything"""
+        self.assertTrue(self.recognizer.identify(None) is None)
+
+    def test_knows(self):
+        """``PromptRecognizer.knows`` is False for screens without a fingerprint"""
+        self.assertTrue(self.recognizer.knows('wizard'))
+        self.assertFalse(self.recognizer.knows('format_disks'))
+
+    def test_learn(self):
+        """``PromptRecognizer.learn`` remembers a new screen"""
+        self.recognizer.learn('format_disks', 0b1010101010)
+
+        self.assertEqual(self.recognizer.identify(0b1010101010), 'format_disks')
+
+    def test_learn_known(self):
+        """``PromptRecognizer.learn`` doesn't add fingerprints it already recognizes"""
+        self.recognizer.learn('wizard', 0b1110)
+
+        self.assertEqual(self.recognizer.fingerprints['wizard'], [0b1111])
+
+    def test_fingerprint(self):
+        """``PromptRecognizer.fingerprint`` converts the bits from the browser to an integer"""
+        fake_driver = MagicMock()
+        fake_driver.execute_script.return_value = '0101'
+
+        self.assertEqual(prompts.PromptRecognizer.fingerprint(fake_driver), 5)
+
+    def test_fingerprint_blank(self):
+        """``PromptRecognizer.fingerprint`` returns None when there's no canvas"""
+        fake_driver = MagicMock()
+        fake_driver.execute_script.return_value = None
+
+        self.assertTrue(prompts.PromptRecognizer.fingerprint(fake_driver) is None)
+
+    def test_save_load(self):
+        """A saved PromptRecognizer can be loaded again"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'fingerprints.json')
+            self.recognizer.save(path)
+
+            loaded = prompts.PromptRecognizer.load(path)
+
+        self.assertEqual(loaded.fingerprints, self.recognizer.fingerprints)
+
+    def test_load_missing(self):
+        """Loading a PromptRecognizer without a file knows no screens"""
+        recognizer = prompts.PromptRecognizer.load('/no/such/file.json')
+
+        self.assertEqual(recognizer.fingerprints, {})
+
+
+class TestFingerprintFrame(unittest.TestCase):
+    """A set of test cases for the ``fingerprint_frame`` function"""
+
+    def test_blank(self):
+        """``fingerprint_frame`` hashes a blank screen to zero"""
+        self.assertEqual(prompts.fingerprint_frame(bytearray(64 * 32 * 4), 64, 32), 0)
+
+    def test_no_frame(self):
+        """``fingerprint_frame`` returns None before the screen has a size"""
+        self.assertTrue(prompts.fingerprint_frame(bytearray(), 0, 0) is None)
+
+    def test_gradient(self):
+        """``fingerprint_frame`` sets a bit for every cell brighter than the next one"""
+        width, height = 68, 32
+        frame = bytearray()
+        for _ in range(height):
+            for x in range(width):
+                frame.extend([255 - x, 255 - x, 255 - x, 0])
+
+        output = prompts.fingerprint_frame(frame, width, height)
+        expected = (1 << (prompts.HASH_WIDTH * prompts.HASH_HEIGHT)) - 1
+
+        self.assertEqual(output, expected)
+
+
+def make_png(pixels, width, height, filter_type=0, bpp=3):
+    """Encode RGB(A) pixels as a PNG, with every scanline filtered the same way"""
+    stride = width * bpp
+    raw = bytearray()
+    previous = bytearray(stride)
+    for y in range(height):
+        row = pixels[y * stride:(y + 1) * stride]
+        raw.append(filter_type)
+        for i in range(stride):
+            left = row[i - bpp] if i >= bpp else 0
+            up_left = previous[i - bpp] if i >= bpp else 0
+            if filter_type == 0:
+                predictor = 0
+            elif filter_type == 1:
+                predictor = left
+            elif filter_type == 2:
+                predictor = previous[i]
+            elif filter_type == 3:
+                predictor = (left + previous[i]) >> 1
+            else:
+                estimate = left + previous[i] - up_left
+                choices = [left, previous[i], up_left]
+                predictor = min(choices, key=lambda x: abs(estimate - x))
+            raw.append((row[i] - predictor) & 0xff)
+        previous = row
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, {3: 2, 4: 6}[bpp], 0, 0, 0)
+    return prompts.PNG_SIGNATURE + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(bytes(raw))) + chunk(b'IEND', b'')
+
+
+class TestDecodePng(unittest.TestCase):
+    """A set of test cases for the ``decode_png`` function"""
+
+    def setUp(self):
+        self.width, self.height = 7, 5
+        self.pixels = bytearray((x * 37 + y * 11) % 256 for y in range(self.height) for x in range(self.width * 3))
+
+    def test_filters(self):
+        """``decode_png`` undoes every filter type of PNG"""
+        expected = bytearray()
+        for pixel in range(self.width * self.height):
+            red, green, blue = self.pixels[pixel * 3:pixel * 3 + 3]
+            expected.extend([blue, green, red, 0])
+        for filter_type in range(5):
+            frame, width, height = prompts.decode_png(make_png(self.pixels, self.width, self.height, filter_type))
+
+            self.assertEqual((width, height), (self.width, self.height))
+            self.assertEqual(frame, expected, 'Filter type {} decoded wrong'.format(filter_type))
+
+    def test_rgba(self):
+        """``decode_png`` drops the alpha channel"""
+        pixels = bytearray([10, 20, 30, 255] * 4)
+        frame, _, _ = prompts.decode_png(make_png(pixels, 2, 2, filter_type=4, bpp=4))
+
+        self.assertEqual(frame, bytearray([30, 20, 10, 0] * 4))
+
+    def test_not_png(self):
+        """``decode_png`` raises ValueError for data that isn't a PNG"""
+        with self.assertRaises(ValueError):
+            prompts.decode_png(b'<html>Unauthorized</html>')
+
+    def test_truncated(self):
+        """``decode_png`` raises ValueError for a PNG that's cut short"""
+        data = make_png(self.pixels, self.width, self.height)
+
+        with self.assertRaises(ValueError):
+            prompts.decode_png(data[:-30])
+
+    def test_fingerprint(self):
+        """``decode_png`` makes a framebuffer that ``fingerprint_frame`` can hash"""
+        frame, width, height = prompts.decode_png(make_png(self.pixels, self.width, self.height, 1))
+
+        self.assertTrue(isinstance(prompts.fingerprint_frame(frame, width, height), int))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# -*- coding: UTF-8 -*-
+"""
+A suite of tests for the scancodes.py module
+"""
+import unittest
+
+from selenium.webdriver.common.keys import Keys
+
+from vlab_onefs_api.lib.worker import scancodes
+
+
+class TestHidEvents(unittest.TestCase):
+    """A set of test cases for the ``hid_events`` function"""
+
+    def test_letters(self):
+        """``hid_events`` maps letters and digits to their HID usage IDs"""
+        events = scancodes.hid_events('az', '10')
+        expected = [(0x04, frozenset()), (0x1d, frozenset()), (0x1e, frozenset()), (0x27, frozenset())]
+
+        self.assertEqual(events, expected)
+
+    def test_shifted(self):
+        """``hid_events`` holds SHIFT for upper case letters and symbols"""
+        events = scancodes.hid_events('A@_')
+        expected = [(0x04, frozenset(['leftShift'])), (0x1f, frozenset(['leftShift'])), (0x2d, frozenset(['leftShift']))]
+
+        self.assertEqual(events, expected)
+
+    def test_special_keys(self):
+        """``hid_events`` supports the special keys of Selenium"""
+        events = scancodes.hid_events(Keys.ENTER, Keys.BACKSPACE, Keys.DOWN, '\n')
+        codes = [x[0] for x in events]
+
+        self.assertEqual(codes, [0x28, 0x2a, 0x51, 0x28])
+
+    def test_modifier(self):
+        """``hid_events`` applies a modifier to every key after it, until Keys.NULL"""
+        events = scancodes.hid_events(Keys.CONTROL, 'c', Keys.NULL, 'c')
+        expected = [(0x06, frozenset(['leftControl'])), (0x06, frozenset())]
+
+        self.assertEqual(events, expected)
+
+    def test_modifier_ends(self):
+        """``hid_events`` releases modifiers at the end of the input"""
+        scancodes.hid_events(Keys.SHIFT, 'a')
+        events = scancodes.hid_events('a')
+
+        self.assertEqual(events, [(0x04, frozenset())])
+
+    def test_untypeable(self):
+        """``hid_events`` raises ValueError for keys that can't be typed"""
+        with self.assertRaises(ValueError):
+            scancodes.hid_events('café')
+
+
+class TestScanCodeSpec(unittest.TestCase):
+    """A set of test cases for the ``scan_code_spec`` function"""
+
+    def test_usb_hid_code(self):
+        """``scan_code_spec`` puts the usage ID in the upper 16 bits, and the keyboard usage page in the lower"""
+        spec = scancodes.scan_code_spec([(0x04, frozenset())])
+
+        self.assertEqual(spec.keyEvents[0].usbHidCode, 0x00040007)
+
+    def test_modifiers(self):
+        """``scan_code_spec`` sets the modifiers of each key press"""
+        spec = scancodes.scan_code_spec([(0x04, frozenset(['leftShift'])), (0x04, frozenset())])
+
+        self.assertTrue(spec.keyEvents[0].modifiers.leftShift)
+        self.assertFalse(spec.keyEvents[1].modifiers.leftShift)
+
+
+if __name__ == '__main__':
+    unittest.main()
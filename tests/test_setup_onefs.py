@@ -3,10 +3,13 @@
 A suite of tests for the functions in setup_onefs.py
 """
 import unittest
-from unittest.mock import patch, MagicMock
+from urllib.parse import unquote
+from unittest.mock import patch, MagicMock, PropertyMock
 
 from vlab_onefs_api.lib.worker import setup_onefs
 
+from webmks_standin import StandInConsole
+
 
 class TestvSphereConsole(unittest.TestCase):
     """A suite of test cases for vSphereConsole object"""
@@ -34,6 +37,19 @@ class TestvSphereConsole(unittest.TestCase):
 
         self.assertEqual(fake_get_console.call_count, 1)
 
+    @patch.object(setup_onefs.vSphereConsole, '_get_console')
+    @patch.object(setup_onefs.vSphereConsole, '_login')
+    @patch.object(setup_onefs, 'webdriver')
+    def test_login_page(self, fake_webdriver, fake_login, fake_get_console):
+        """vSphereConsole logs into the vCenter server that serves the HTML console"""
+        setup_onefs.vSphereConsole(url='https://vcenter2.vlab.local/ui/webconsole.html?id=vm-1')
+        fake_driver = fake_webdriver.Chrome.return_value
+
+        login_page = fake_driver.get.call_args_list[0][0][0]
+        expected = 'https://vcenter2.vlab.local/ui'
+
+        self.assertEqual(login_page, expected)
+
     @patch.object(setup_onefs, 'webdriver')
     def test_with(self, fake_webdriver):
         """vSphereConsole auto-closes the session upon exiting ``with`` statement"""
@@ -87,6 +103,495 @@ class TestvSphereConsole(unittest.TestCase):
         self.assertEqual(the_args, expected)
 
 
+    @patch.object(setup_onefs.vSphereConsole, '_get_console')
+    @patch.object(setup_onefs.vSphereConsole, '_login')
+    @patch.object(setup_onefs, 'webdriver')
+    def test_pool(self, fake_webdriver, fake_login, fake_get_console):
+        """vSphereConsole uses a browser from the pool, and hands it back instead of quitting it"""
+        fake_pool = MagicMock()
+        with setup_onefs.vSphereConsole(url='https://someHTMLconsole.com', pool=fake_pool):
+            pass
+
+        self.assertFalse(fake_webdriver.Chrome.called)
+        self.assertEqual(fake_pool.release.call_args[0][0], fake_pool.acquire.return_value)
+        self.assertFalse(fake_pool.acquire.return_value.driver.quit.called)
+
+    @patch.object(setup_onefs.vSphereConsole, '_get_console')
+    @patch.object(setup_onefs.vSphereConsole, '_login')
+    @patch.object(setup_onefs, 'webdriver')
+    def test_ticket(self, fake_webdriver, fake_login, fake_get_console):
+        """vSphereConsole skips the vSphere UI login when given a WebMKS ticket"""
+        setup_onefs.vSphereConsole(url='wss://esxi01.vlab.local:443/ticket/asdf')
+
+        page = fake_get_console.call_args[0][0]
+
+        self.assertFalse(fake_login.called)
+        self.assertTrue(page.startswith('data:text/html'))
+        self.assertTrue(setup_onefs.quote('wss://esxi01.vlab.local:443/ticket/asdf') in page)
+
+    def test_webmks_page(self):
+        """``webmks_page`` loads the WebMKS SDK from the supplied location"""
+        page = unquote(setup_onefs.webmks_page('wss://esxi01:443/ticket/asdf', sdk_url='https://sdk.vlab.local'))
+
+        self.assertTrue('<script src="https://sdk.vlab.local/wmks.min.js"></script>' in page)
+        self.assertTrue('wmks.connect("wss://esxi01:443/ticket/asdf");' in page)
+
+    @patch.object(setup_onefs, 'FrameMonitor')
+    @patch.object(setup_onefs.vSphereConsole, '_get_console')
+    @patch.object(setup_onefs.vSphereConsole, '_login')
+    @patch.object(setup_onefs, 'webdriver')
+    def test_wait_for_prompt(self, fake_webdriver, fake_login, fake_get_console, fake_FrameMonitor):
+        """``wait_for_prompt`` waits on the DevTools frame monitor"""
+        fake_monitor = fake_FrameMonitor.attach.return_value
+        fake_monitor.alive = True
+        with setup_onefs.vSphereConsole(url='https://someHTMLconsole.com') as console:
+            console.wait_for_prompt(timeout=5)
+
+        self.assertEqual(fake_monitor.wait_for_quiet.call_args[0][0], 5)
+        self.assertFalse(fake_webdriver.Chrome.return_value.get_log.called)
+        self.assertTrue(fake_monitor.close.called)
+
+    @patch.object(setup_onefs.time, 'time')
+    @patch.object(setup_onefs.time, 'sleep')
+    @patch.object(setup_onefs, 'FrameMonitor')
+    @patch.object(setup_onefs.vSphereConsole, '_get_console')
+    @patch.object(setup_onefs.vSphereConsole, '_login')
+    @patch.object(setup_onefs, 'webdriver')
+    def test_wait_for_prompt_fallback(self, fake_webdriver, fake_login, fake_get_console, fake_FrameMonitor,
+                                      fake_sleep, fake_time):
+        """``wait_for_prompt`` polls the performance log when DevTools aren't available"""
+        fake_FrameMonitor.attach.return_value = None
+        fake_time.side_effect = [0, 1, 2, 40]
+        with setup_onefs.vSphereConsole(url='https://someHTMLconsole.com') as console:
+            console.wait_for_prompt(timeout=30)
+
+        self.assertTrue(fake_webdriver.Chrome.return_value.get_log.called)
+        self.assertEqual(fake_sleep.call_args[0][0], setup_onefs.WAIT_POLL_INTERVAL)
+
+    @patch.object(setup_onefs.time, 'sleep')
+    @patch.object(setup_onefs, 'FrameMonitor')
+    @patch.object(setup_onefs.vSphereConsole, '_get_console')
+    @patch.object(setup_onefs.vSphereConsole, '_login')
+    @patch.object(setup_onefs, 'webdriver')
+    def test_send_keys_echo(self, fake_webdriver, fake_login, fake_get_console, fake_FrameMonitor, fake_sleep):
+        """``send_keys`` sends the next input once the console echoes the last one"""
+        fake_monitor = fake_FrameMonitor.attach.return_value
+        fake_monitor.alive = True
+        fake_monitor.wait_for_frame.return_value = True
+        with setup_onefs.vSphereConsole(url='https://someHTMLconsole.com', echo_timeout=0.5) as console:
+            console.send_keys('woot')
+
+        self.assertEqual(fake_monitor.wait_for_frame.call_count, 2)
+        self.assertEqual(fake_monitor.wait_for_frame.call_args[0][1], 0.5)
+        self.assertFalse(fake_sleep.called)
+        self.assertEqual(console.pacing['echoed'], 2)
+
+    @patch.object(setup_onefs.time, 'sleep')
+    @patch.object(setup_onefs, 'FrameMonitor')
+    @patch.object(setup_onefs.vSphereConsole, '_get_console')
+    @patch.object(setup_onefs.vSphereConsole, '_login')
+    @patch.object(setup_onefs, 'webdriver')
+    def test_send_keys_fixed(self, fake_webdriver, fake_login, fake_get_console, fake_FrameMonitor, fake_sleep):
+        """``send_keys`` uses a fixed pause when echo pacing is disabled"""
+        fake_monitor = fake_FrameMonitor.attach.return_value
+        fake_monitor.alive = True
+        with setup_onefs.vSphereConsole(url='https://someHTMLconsole.com', echo_timeout=0) as console:
+            console.send_keys('woot', auto_enter=False)
+
+        self.assertFalse(fake_monitor.wait_for_frame.called)
+        self.assertEqual(fake_sleep.call_args[0][0], setup_onefs.KEY_PAUSE)
+
+    @patch.object(setup_onefs.time, 'sleep')
+    @patch.object(setup_onefs.vSphereConsole, '_get_console')
+    @patch.object(setup_onefs.vSphereConsole, '_login')
+    @patch.object(setup_onefs, 'webdriver')
+    def test_send_keys_js(self, fake_webdriver, fake_login, fake_get_console, fake_sleep):
+        """``send_keys`` pushes the input and the ENTER with one call to the console's JavaScript API"""
+        fake_driver = fake_webdriver.Chrome.return_value
+        fake_driver.execute_script.return_value = True
+        with setup_onefs.vSphereConsole(url='https://someHTMLconsole.com') as console:
+            fake_driver.execute_script.reset_mock()
+            console.send_keys('woot')
+
+        the_args, _ = fake_driver.execute_script.call_args
+        expected = (setup_onefs.SEND_INPUT, [['text', 'woot'], ['keys', [13]]])
+
+        self.assertEqual(fake_driver.execute_script.call_count, 1)
+        self.assertEqual(the_args, expected)
+        self.assertFalse(fake_get_console.return_value.send_keys.called)
+
+    @patch.object(setup_onefs.time, 'sleep')
+    @patch.object(setup_onefs.vSphereConsole, '_get_console')
+    @patch.object(setup_onefs.vSphereConsole, '_login')
+    @patch.object(setup_onefs, 'webdriver')
+    def test_send_keys_no_js(self, fake_webdriver, fake_login, fake_get_console, fake_sleep):
+        """``send_keys`` falls back to Selenium when the console has no JavaScript input API"""
+        fake_webdriver.Chrome.return_value.execute_script.return_value = False
+        with setup_onefs.vSphereConsole(url='https://someHTMLconsole.com') as console:
+            console.send_keys('woot', auto_enter=False)
+
+        self.assertEqual(fake_get_console.return_value.send_keys.call_args[0], ('woot',))
+
+    @patch.object(setup_onefs.vSphereConsole, '_wait_for_quiet')
+    @patch.object(setup_onefs.time, 'sleep')
+    @patch.object(setup_onefs.vSphereConsole, '_get_console')
+    @patch.object(setup_onefs.vSphereConsole, '_login')
+    @patch.object(setup_onefs, 'webdriver')
+    def test_type_ahead(self, fake_webdriver, fake_login, fake_get_console, fake_sleep, fake_wait_for_quiet):
+        """With type-ahead, ``send_keys`` holds the input until the wizard has to be waited on"""
+        fake_canvas = fake_get_console.return_value
+        console = setup_onefs.vSphereConsole(url='https://someHTMLconsole.com', type_ahead=True)
+        console.send_keys('yes')
+        console.send_keys('a')
+
+        self.assertFalse(fake_canvas.send_keys.called)
+
+        console.wait_for_prompt(timeout=0)
+        Keys = setup_onefs.Keys
+        expected = ('yes' + Keys.ENTER + Keys.NULL + 'a' + Keys.ENTER + Keys.NULL,)
+
+        self.assertEqual(fake_canvas.send_keys.call_count, 1)
+        self.assertEqual(fake_canvas.send_keys.call_args[0], expected)
+
+    @patch.object(setup_onefs.vSphereConsole, '_wait_for_quiet')
+    @patch.object(setup_onefs.time, 'sleep')
+    @patch.object(setup_onefs.vSphereConsole, '_get_console')
+    @patch.object(setup_onefs.vSphereConsole, '_login')
+    @patch.object(setup_onefs, 'webdriver')
+    def test_type_ahead_chunks(self, fake_webdriver, fake_login, fake_get_console, fake_sleep, fake_wait_for_quiet):
+        """With type-ahead, the input is sent once a chunk's worth is buffered"""
+        fake_canvas = fake_get_console.return_value
+        console = setup_onefs.vSphereConsole(url='https://someHTMLconsole.com', type_ahead=True)
+
+        console.send_keys('a' * setup_onefs.const.VLAB_ONEFS_TYPE_AHEAD_CHUNK)
+
+        self.assertEqual(fake_canvas.send_keys.call_count, 1)
+
+    @patch.object(setup_onefs.vSphereConsole, '_wait_for_quiet')
+    @patch.object(setup_onefs.time, 'sleep')
+    @patch.object(setup_onefs.vSphereConsole, '_get_console')
+    @patch.object(setup_onefs.vSphereConsole, '_login')
+    @patch.object(setup_onefs, 'webdriver')
+    def test_type_ahead_secret(self, fake_webdriver, fake_login, fake_get_console, fake_sleep, fake_wait_for_quiet):
+        """With type-ahead, a password is only sent once the buffered input has settled, and settles before more input"""
+        events = []
+        fake_canvas = fake_get_console.return_value
+        fake_canvas.send_keys.side_effect = lambda *args: events.append(args)
+        fake_wait_for_quiet.side_effect = lambda timeout: events.append('wait')
+        console = setup_onefs.vSphereConsole(url='https://someHTMLconsole.com', type_ahead=True)
+        events.clear()
+        console.send_keys('yes')
+        console.send_keys('a', secret=True)
+        console.send_keys('mycluster')
+        Keys = setup_onefs.Keys
+        expected = [('yes' + Keys.ENTER + Keys.NULL,), 'wait', 'wait', ('a',), (Keys.ENTER,), 'wait']
+
+        self.assertEqual(events, expected)
+
+    @patch.object(setup_onefs.vSphereConsole, '_wait_for_quiet')
+    @patch.object(setup_onefs.time, 'sleep')
+    @patch.object(setup_onefs.vSphereConsole, '_get_console')
+    @patch.object(setup_onefs.vSphereConsole, '_login')
+    @patch.object(setup_onefs, 'webdriver')
+    def test_type_ahead_exit(self, fake_webdriver, fake_login, fake_get_console, fake_sleep, fake_wait_for_quiet):
+        """With type-ahead, the rest of the input is sent when the console is closed"""
+        fake_canvas = fake_get_console.return_value
+        with setup_onefs.vSphereConsole(url='https://someHTMLconsole.com', type_ahead=True) as console:
+            console.send_keys('exit')
+
+        self.assertEqual(fake_canvas.send_keys.call_count, 1)
+
+    @patch.object(setup_onefs.time, 'sleep')
+    @patch.object(setup_onefs.vSphereConsole, '_get_console')
+    @patch.object(setup_onefs.vSphereConsole, '_login')
+    @patch.object(setup_onefs, 'webdriver')
+    def test_type_ahead_error(self, fake_webdriver, fake_login, fake_get_console, fake_sleep):
+        """With type-ahead, buffered input is dropped if the wizard fails"""
+        fake_canvas = fake_get_console.return_value
+        try:
+            with setup_onefs.vSphereConsole(url='https://someHTMLconsole.com', type_ahead=True) as console:
+                console.send_keys('exit')
+                raise RuntimeError('testing')
+        except RuntimeError:
+            pass
+
+        self.assertFalse(fake_canvas.send_keys.called)
+        self.assertEqual(fake_webdriver.Chrome.return_value.quit.call_count, 1)
+
+    @patch.object(setup_onefs.time, 'sleep')
+    @patch.object(setup_onefs.vSphereConsole, '_get_console')
+    @patch.object(setup_onefs.vSphereConsole, '_login')
+    @patch.object(setup_onefs, 'webdriver')
+    def test_pause(self, fake_webdriver, fake_login, fake_get_console, fake_sleep):
+        """``pause`` is skipped with type-ahead"""
+        console = setup_onefs.vSphereConsole(url='https://someHTMLconsole.com', type_ahead=True)
+
+        console.pause(2)
+
+        self.assertFalse(fake_sleep.called)
+
+    @patch.object(setup_onefs.time, 'sleep')
+    @patch.object(setup_onefs, 'FrameMonitor')
+    @patch.object(setup_onefs.vSphereConsole, '_get_console')
+    @patch.object(setup_onefs.vSphereConsole, '_login')
+    @patch.object(setup_onefs, 'webdriver')
+    def test_wait_for_screen(self, fake_webdriver, fake_login, fake_get_console, fake_FrameMonitor, fake_sleep):
+        """``wait_for_prompt`` returns as soon as the expected screen is drawn"""
+        fake_monitor = fake_FrameMonitor.attach.return_value
+        fake_monitor.alive = True
+        fake_monitor.last_frame = setup_onefs.time.time()
+        fake_monitor.wait_for_frame.return_value = True
+        fake_recognizer = MagicMock()
+        fake_recognizer.identify.side_effect = [None, None, 'wizard']
+        console = setup_onefs.vSphereConsole(url='https://someHTMLconsole.com', recognizer=fake_recognizer)
+
+        console.wait_for_prompt(timeout=90, screen='wizard')
+
+        self.assertEqual(fake_recognizer.identify.call_count, 3)
+        self.assertFalse(fake_monitor.wait_for_quiet.called)
+
+    @patch.object(setup_onefs.time, 'sleep')
+    @patch.object(setup_onefs, 'FrameMonitor')
+    @patch.object(setup_onefs.vSphereConsole, '_get_console')
+    @patch.object(setup_onefs.vSphereConsole, '_login')
+    @patch.object(setup_onefs, 'webdriver')
+    def test_wait_for_screen_wrong(self, fake_webdriver, fake_login, fake_get_console, fake_FrameMonitor, fake_sleep):
+        """``wait_for_prompt`` raises RuntimeError when the console goes quiet on another screen"""
+        fake_monitor = fake_FrameMonitor.attach.return_value
+        fake_monitor.alive = True
+        fake_monitor.last_frame = 0
+        fake_recognizer = MagicMock()
+        fake_recognizer.identify.return_value = 'login'
+        console = setup_onefs.vSphereConsole(url='https://someHTMLconsole.com', recognizer=fake_recognizer)
+
+        with self.assertRaises(RuntimeError):
+            console.wait_for_prompt(timeout=0, screen='wizard')
+
+    @patch.object(setup_onefs, 'FrameMonitor')
+    @patch.object(setup_onefs.vSphereConsole, '_get_console')
+    @patch.object(setup_onefs.vSphereConsole, '_login')
+    @patch.object(setup_onefs, 'webdriver')
+    def test_wait_for_screen_unknown(self, fake_webdriver, fake_login, fake_get_console, fake_FrameMonitor):
+        """``wait_for_prompt`` just waits for quiet when the screen has no fingerprint"""
+        fake_monitor = fake_FrameMonitor.attach.return_value
+        fake_monitor.alive = True
+        fake_recognizer = MagicMock()
+        fake_recognizer.knows.return_value = False
+        console = setup_onefs.vSphereConsole(url='https://someHTMLconsole.com', recognizer=fake_recognizer)
+
+        console.wait_for_prompt(timeout=30, screen='wizard')
+
+        self.assertEqual(fake_monitor.wait_for_quiet.call_args[0][0], 30)
+        self.assertFalse(fake_recognizer.identify.called)
+
+    @patch.object(setup_onefs.vSphereConsole, '_login')
+    @patch.object(setup_onefs, 'webdriver')
+    def test_login_failure(self, fake_webdriver, fake_login):
+        """vSphereConsole quits the browser if it's unable to login"""
+        fake_login.side_effect = RuntimeError('testing')
+
+        with self.assertRaises(RuntimeError):
+            setup_onefs.vSphereConsole(url='https://someHTMLconsole.com')
+
+        self.assertEqual(fake_webdriver.Chrome.return_value.quit.call_count, 1)
+
+
+class TestJsInputOps(unittest.TestCase):
+    """A suite of test cases for the ``js_input_ops`` function"""
+
+    def test_text(self):
+        """``js_input_ops`` sends plain input as one string"""
+        ops = setup_onefs.js_input_ops('8.6.7', '.5')
+        expected = [['text', '8.6.7.5']]
+
+        self.assertEqual(ops, expected)
+
+    def test_keys(self):
+        """``js_input_ops`` sends special keys as key codes"""
+        ops = setup_onefs.js_input_ops(setup_onefs.Keys.BACKSPACE * 2, '1.1')
+        expected = [['keys', [8]], ['keys', [8]], ['text', '1.1']]
+
+        self.assertEqual(ops, expected)
+
+    def test_modifier(self):
+        """``js_input_ops`` holds a modifier key for the rest of the input"""
+        ops = setup_onefs.js_input_ops(setup_onefs.Keys.SHIFT, 'g')
+        expected = [['keys', [16, 71]]]
+
+        self.assertEqual(ops, expected)
+
+    def test_release(self):
+        """``js_input_ops`` releases held modifier keys on NULL"""
+        Keys = setup_onefs.Keys
+        ops = setup_onefs.js_input_ops(Keys.SHIFT + 'g' + Keys.NULL + 'yes')
+        expected = [['keys', [16, 71]], ['text', 'yes']]
+
+        self.assertEqual(ops, expected)
+
+    def test_unsupported(self):
+        """``js_input_ops`` returns None for keys the JavaScript API can't send"""
+        ops = setup_onefs.js_input_ops(setup_onefs.Keys.F1)
+
+        self.assertTrue(ops is None)
+
+
+class TestPacingReport(unittest.TestCase):
+    """A suite of test cases for the ``pacing_report`` function"""
+    def setUp(self):
+        setup_onefs._PACING_STATS.clear()
+
+    def tearDown(self):
+        setup_onefs._PACING_STATS.clear()
+
+    def test_pacing_report(self):
+        """``pacing_report`` compares the time spent on input to fixed pauses, per version"""
+        setup_onefs._record_pacing('8.2.0.0', {'inputs': 10, 'echoed': 9, 'seconds': 2.0})
+        setup_onefs._record_pacing('8.2.0.0', {'inputs': 10, 'echoed': 10, 'seconds': 1.0})
+
+        report = setup_onefs.pacing_report()
+        expected = {'8.2.0.0': {'consoles': 2, 'inputs': 20, 'echoed': 19, 'seconds': 3.0,
+                                'fixed_seconds': 20, 'saved_seconds': 17.0}}
+
+        self.assertEqual(report, expected)
+
+    def test_pacing_report_unknown(self):
+        """``pacing_report`` groups consoles without a version as 'unknown'"""
+        setup_onefs._record_pacing(None, {'inputs': 1, 'echoed': 0, 'seconds': 1.0})
+
+        self.assertEqual(list(setup_onefs.pacing_report().keys()), ['unknown'])
+
+
+@patch.object(setup_onefs, '_memory_mb')
+@patch.object(setup_onefs, 'webdriver')
+class TestBrowserPool(unittest.TestCase):
+    """A suite of test cases for the BrowserPool object"""
+
+    def test_acquire(self, fake_webdriver, fake_memory_mb):
+        """``BrowserPool.acquire`` launches Chrome when no browsers are idle"""
+        pool = setup_onefs.BrowserPool(size=1, max_uses=5, max_mb=1000)
+
+        browser = pool.acquire()
+
+        self.assertEqual(browser.driver, fake_webdriver.Chrome.return_value)
+
+    def test_reuse(self, fake_webdriver, fake_memory_mb):
+        """``BrowserPool`` reuses a released browser"""
+        fake_memory_mb.return_value = 100
+        pool = setup_onefs.BrowserPool(size=1, max_uses=5, max_mb=1000)
+
+        pool.release(pool.acquire())
+        pool.acquire()
+
+        self.assertEqual(fake_webdriver.Chrome.call_count, 1)
+
+    def test_release_wipes(self, fake_webdriver, fake_memory_mb):
+        """``BrowserPool.release`` clears the cookies of a browser before it's reused"""
+        fake_memory_mb.return_value = 100
+        pool = setup_onefs.BrowserPool(size=1, max_uses=5, max_mb=1000)
+
+        pool.release(pool.acquire())
+
+        self.assertTrue(fake_webdriver.Chrome.return_value.delete_all_cookies.called)
+
+    def test_max_uses(self, fake_webdriver, fake_memory_mb):
+        """``BrowserPool`` replaces a browser once it's been used too many times"""
+        fake_memory_mb.return_value = 100
+        pool = setup_onefs.BrowserPool(size=1, max_uses=1, max_mb=1000)
+
+        pool.release(pool.acquire())
+        pool.acquire()
+
+        self.assertEqual(fake_webdriver.Chrome.call_count, 2)
+        self.assertEqual(fake_webdriver.Chrome.return_value.quit.call_count, 1)
+
+    def test_max_mb(self, fake_webdriver, fake_memory_mb):
+        """``BrowserPool`` replaces a browser that uses too much memory"""
+        fake_memory_mb.return_value = 2000
+        pool = setup_onefs.BrowserPool(size=1, max_uses=5, max_mb=1000)
+
+        pool.release(pool.acquire())
+        pool.acquire()
+
+        self.assertEqual(fake_webdriver.Chrome.call_count, 2)
+
+    def test_unhealthy(self, fake_webdriver, fake_memory_mb):
+        """``BrowserPool.acquire`` replaces an idle browser that no longer responds"""
+        fake_memory_mb.return_value = 100
+        pool = setup_onefs.BrowserPool(size=1, max_uses=5, max_mb=1000)
+        browser = pool.acquire()
+        pool.release(browser)
+        type(browser.driver).current_url = PropertyMock(side_effect=setup_onefs.WebDriverException('testing'))
+
+        pool.acquire()
+
+        self.assertEqual(fake_webdriver.Chrome.call_count, 2)
+
+    def test_size(self, fake_webdriver, fake_memory_mb):
+        """``BrowserPool`` only keeps as many idle browsers as its size"""
+        fake_memory_mb.return_value = 100
+        pool = setup_onefs.BrowserPool(size=1, max_uses=5, max_mb=1000)
+        browsers = [pool.acquire(), pool.acquire()]
+
+        for browser in browsers:
+            pool.release(browser)
+
+        self.assertEqual(pool.stats()['idle'], 1)
+
+    def test_stats(self, fake_webdriver, fake_memory_mb):
+        """``BrowserPool.stats`` reports how the pool is being used"""
+        fake_memory_mb.return_value = 100
+        pool = setup_onefs.BrowserPool(size=1, max_uses=5, max_mb=1000)
+        pool.release(pool.acquire())
+        pool.acquire()
+
+        stats = pool.stats()
+        expected = {'acquired': 2, 'busy': 1, 'created': 1, 'recycled': 0, 'idle': 0, 'size': 1, 'reused': 1}
+
+        self.assertEqual(stats, expected)
+
+    def test_close(self, fake_webdriver, fake_memory_mb):
+        """``BrowserPool.close`` quits every idle browser"""
+        fake_memory_mb.return_value = 100
+        pool = setup_onefs.BrowserPool(size=1, max_uses=5, max_mb=1000)
+        pool.release(pool.acquire())
+
+        pool.close()
+
+        self.assertEqual(fake_webdriver.Chrome.return_value.quit.call_count, 1)
+
+
+class TestBrowserPoolFactory(unittest.TestCase):
+    """A suite of test cases for the ``browser_pool`` function"""
+    def tearDown(self):
+        setup_onefs._POOLS.clear()
+
+    def test_per_process(self):
+        """``browser_pool`` returns the same pool within a process"""
+        self.assertTrue(setup_onefs.browser_pool() is setup_onefs.browser_pool())
+
+    @patch.object(setup_onefs.os, 'getpid')
+    def test_forked(self, fake_getpid):
+        """``browser_pool`` makes a new pool in a forked process"""
+        fake_getpid.return_value = 1
+        parent = setup_onefs.browser_pool()
+        fake_getpid.return_value = 2
+
+        self.assertFalse(parent is setup_onefs.browser_pool())
+
+    @patch.object(setup_onefs, 'const')
+    def test_disabled(self, fake_const):
+        """``browser_pool`` returns None when the pool size is zero"""
+        fake_const.VLAB_ONEFS_BROWSER_POOL_SIZE = 0
+
+        self.assertTrue(setup_onefs.browser_pool() is None)
+
+    def test_memory_mb(self):
+        """``_memory_mb`` adds up the resident memory of a process"""
+        used = setup_onefs._memory_mb(setup_onefs.os.getpid())
+
+        self.assertTrue(used > 0)
+
+
 @patch.object(setup_onefs.time, 'sleep')
 @patch.object(setup_onefs, 'vSphereConsole')
 class TestSetupFunctions(unittest.TestCase):
@@ -142,7 +647,7 @@ class TestSetupFunctions(unittest.TestCase):
         fake_logger = MagicMock()
         output = setup_onefs.configure_new_cluster(version='8.1.1.1',
                                                    logger=fake_logger,
-                                                   console_url='https://someHTMLconsole.com',
+                                                   console='https://someHTMLconsole.com',
                                                    cluster_name='mycluster',
                                                    int_netmask='255.255.255.0',
                                                    int_ip_low='8.6.7.5',
@@ -164,7 +669,7 @@ class TestSetupFunctions(unittest.TestCase):
         fake_logger = MagicMock()
         output = setup_onefs.configure_new_cluster(version='8.1.1.1',
                                                    logger=fake_logger,
-                                                   console_url='https://someHTMLconsole.com',
+                                                   console='https://someHTMLconsole.com',
                                                    cluster_name='mycluster',
                                                    int_netmask='255.255.255.0',
                                                    int_ip_low='8.6.7.5',
@@ -182,476 +687,124 @@ class TestSetupFunctions(unittest.TestCase):
 
         self.assertEqual(output, expected)
 
-    @patch.object(setup_onefs, 'configure_new_7_2_cluster')
-    def test_configure_new_cluster_7_2(self, fake_configure_new_7_2_cluster, fake_vSphereConsole, fake_sleep):
-        """``configure_new_cluster`` executes the correct function for OneFS 7.2.x"""
-        fake_logger = MagicMock()
-        setup_onefs.configure_new_cluster(version='7.2.1.6', compliance=False, logger=fake_logger)
-
-        called = fake_configure_new_7_2_cluster.call_count
-        expected = 1
-
-        self.assertEqual(called, expected)
-
-    @patch.object(setup_onefs, 'configure_new_8_0_cluster')
-    def test_configure_new_cluster_8_0(self, fake_configure_new_8_0_cluster, fake_vSphereConsole, fake_sleep):
-        """``configure_new_cluster`` executes the correct function for OneFS 8.0.0.x"""
-        fake_logger = MagicMock()
-        setup_onefs.configure_new_cluster(version='8.0.0.1', compliance=False, logger=fake_logger)
-
-        called = fake_configure_new_8_0_cluster.call_count
-        expected = 1
-
-        self.assertEqual(called, expected)
-
-    @patch.object(setup_onefs, 'configure_new_8_1_cluster')
-    def test_configure_new_cluster_8_1_0(self, fake_configure_new_8_1_cluster, fake_vSphereConsole, fake_sleep):
-        """``configure_new_cluster`` executes the correct function for OneFS 8.1.0.x"""
-        fake_logger = MagicMock()
-        setup_onefs.configure_new_cluster(version='8.1.0.3', compliance=False, logger=fake_logger)
-
-        called = fake_configure_new_8_1_cluster.call_count
-        expected = 1
-
-        self.assertEqual(called, expected)
-
-    @patch.object(setup_onefs, 'configure_new_8_1_cluster')
-    def test_configure_new_cluster_8_1_1(self, fake_configure_new_8_1_cluster, fake_vSphereConsole, fake_sleep):
-        """``configure_new_cluster`` executes the correct function for OneFS 8.1.1.x"""
-        fake_logger = MagicMock()
-        setup_onefs.configure_new_cluster(version='8.1.1.2', compliance=False, logger=fake_logger)
-
-        called = fake_configure_new_8_1_cluster.call_count
-        expected = 1
-
-        self.assertEqual(called, expected)
-
-    @patch.object(setup_onefs, 'configure_new_8_1_2_cluster')
-    def test_configure_new_cluster_8_1_2(self, fake_configure_new_8_1_2_cluster, fake_vSphereConsole, fake_sleep):
-        """``configure_new_cluster`` executes the correct function for OneFS 8.1.2.x"""
-        fake_logger = MagicMock()
-        setup_onefs.configure_new_cluster(version='8.1.2.0', compliance=False, logger=fake_logger)
-
-        called = fake_configure_new_8_1_2_cluster.call_count
-        expected = 1
-
-        self.assertEqual(called, expected)
-
-    @patch.object(setup_onefs, 'configure_new_8_2_0_cluster')
-    def test_configure_new_cluster_8_2_0(self, fake_configure_new_8_2_0_cluster, fake_vSphereConsole, fake_sleep):
-        """``configure_new_cluster`` executes the correct function for OneFS 8.2.0.x"""
-        fake_logger = MagicMock()
-        setup_onefs.configure_new_cluster(version='8.2.0.0', compliance=False, logger=fake_logger)
-
-        called = fake_configure_new_8_2_0_cluster.call_count
-        expected = 1
-
-        self.assertEqual(called, expected)
-
-    @patch.object(setup_onefs, 'enable_compliance_mode')
-    def test_configure_new_8_0_cluster_compliance(self, fake_enable_compliance_mode, fake_vSphereConsole, fake_sleep):
-        """``configure_new_8_0_cluster`` can configure a compliance mode cluster"""
+    def _configure(self, version, compliance_license=None):
+        """Run ``configure_new_cluster`` with a complete set of answers for the wizard"""
+        with patch.object(setup_onefs, 'get_compliance_license', return_value=compliance_license):
+            return setup_onefs.configure_new_cluster(version=version,
+                                                     logger=MagicMock(),
+                                                     console='https://someHTMLconsole.com',
+                                                     cluster_name='mycluster',
+                                                     int_netmask='255.255.255.0',
+                                                     int_ip_low='8.6.7.5',
+                                                     int_ip_high='8.6.7.50',
+                                                     ext_netmask='255.255.255.0',
+                                                     ext_ip_low='3.0.9.2',
+                                                     ext_ip_high='3.0.9.20',
+                                                     gateway='3.0.9.1',
+                                                     dns_servers='1.1.1.1',
+                                                     encoding='utf-8',
+                                                     sc_zonename='myzone.foo.org',
+                                                     compliance=bool(compliance_license),
+                                                     smartconnect_ip='3.0.9.21')
+
+    @patch.object(setup_onefs, 'run_wizard')
+    def test_configure_new_cluster_8_10(self, fake_run_wizard, fake_vSphereConsole, fake_sleep):
+        """``configure_new_cluster`` compares versions by number, not as strings"""
         fake_logger = MagicMock()
-        output = setup_onefs.configure_new_8_0_cluster(logger=fake_logger,
-                                                       console_url='https://someHTMLconsole.com',
-                                                       cluster_name='mycluster',
-                                                       int_netmask='255.255.255.0',
-                                                       int_ip_low='8.6.7.5',
-                                                       int_ip_high='8.6.7.50',
-                                                       ext_netmask='255.255.255.0',
-                                                       ext_ip_low='3.0.9.2',
-                                                       ext_ip_high='3.0.9.20',
-                                                       gateway='3.0.9.1',
-                                                       dns_servers='1.1.1.1',
-                                                       encoding='utf-8',
-                                                       sc_zonename='myzone.foo.org',
-                                                       compliance_license='some-internal-license',
-                                                       smartconnect_ip='3.0.9.21')
+        setup_onefs.configure_new_cluster(version='8.10.0.0', logger=fake_logger, compliance=False)
+        message = fake_logger.info.call_args[0][0]
 
-        self.assertTrue(fake_enable_compliance_mode.called)
+        self.assertTrue(message.endswith('plan for 8.2.0.0'))
 
-    @patch.object(setup_onefs, 'make_new_and_accept_eual')
-    def test_configure_new_8_0_cluster_compliance_license(self, fake_make_new_and_accept_eual, fake_vSphereConsole, fake_sleep):
-        """``configure_new_8_0_cluster`` passes the license as needed to configure a compliance mode cluster"""
-        fake_logger = MagicMock()
-        output = setup_onefs.configure_new_8_0_cluster(logger=fake_logger,
-                                                       console_url='https://someHTMLconsole.com',
-                                                       cluster_name='mycluster',
-                                                       int_netmask='255.255.255.0',
-                                                       int_ip_low='8.6.7.5',
-                                                       int_ip_high='8.6.7.50',
-                                                       ext_netmask='255.255.255.0',
-                                                       ext_ip_low='3.0.9.2',
-                                                       ext_ip_high='3.0.9.20',
-                                                       gateway='3.0.9.1',
-                                                       dns_servers='1.1.1.1',
-                                                       encoding='utf-8',
-                                                       sc_zonename='myzone.foo.org',
-                                                       compliance_license='some-internal-license',
-                                                       smartconnect_ip='3.0.9.21')
+    @patch.object(setup_onefs, 'run_wizard')
+    @patch.object(setup_onefs.images, 'registry')
+    def test_configure_new_cluster_new_plan(self, fake_registry, fake_run_wizard, fake_vSphereConsole, fake_sleep):
+        """``configure_new_cluster`` runs plans that were added without code changes"""
+        fake_registry.return_value.profile.return_value = '9.0.0.0'
+        setup_onefs.configure_new_cluster(version='9.0.1.0', logger=MagicMock(), compliance=False)
+        the_args, _ = fake_run_wizard.call_args
 
-        the_args, _ = fake_make_new_and_accept_eual.call_args
-        license = the_args[1]
-        expected = 'some-internal-license'
-
-        self.assertEqual(license, expected)
+        self.assertEqual(the_args[0], '9.0.1.0')
 
-    def test_configure_new_8_0_cluster(self, fake_vSphereConsole, fake_sleep):
-        """``configure_new_8_0_cluster`` returns None"""
+    def test_configure_new_cluster_bad_version(self, fake_vSphereConsole, fake_sleep):
+        """``configure_new_cluster`` raises ValueError for an invalid version of OneFS"""
         fake_logger = MagicMock()
-        output = setup_onefs.configure_new_8_0_cluster(logger=fake_logger,
-                                                       console_url='https://someHTMLconsole.com',
-                                                       cluster_name='mycluster',
-                                                       int_netmask='255.255.255.0',
-                                                       int_ip_low='8.6.7.5',
-                                                       int_ip_high='8.6.7.50',
-                                                       ext_netmask='255.255.255.0',
-                                                       ext_ip_low='3.0.9.2',
-                                                       ext_ip_high='3.0.9.20',
-                                                       gateway='3.0.9.1',
-                                                       dns_servers='1.1.1.1',
-                                                       encoding='utf-8',
-                                                       sc_zonename='myzone.foo.org',
-                                                       compliance_license=None,
-                                                       smartconnect_ip='3.0.9.21')
-        expected = None
 
-        self.assertEqual(output, expected)
+        with self.assertRaises(ValueError):
+            setup_onefs.configure_new_cluster(version='latest', logger=fake_logger, compliance=False)
 
-    @patch.object(setup_onefs, 'enable_compliance_mode')
-    def test_configure_new_7_2_cluster_compliance(self, fake_enable_compliance_mode, fake_vSphereConsole, fake_sleep):
-        """``configure_new_7_2_cluster`` can configure a compliance mode cluster"""
-        fake_logger = MagicMock()
-        output = setup_onefs.configure_new_7_2_cluster(logger=fake_logger,
-                                                       console_url='https://someHTMLconsole.com',
-                                                       cluster_name='mycluster',
-                                                       int_netmask='255.255.255.0',
-                                                       int_ip_low='8.6.7.5',
-                                                       int_ip_high='8.6.7.50',
-                                                       ext_netmask='255.255.255.0',
-                                                       ext_ip_low='3.0.9.2',
-                                                       ext_ip_high='3.0.9.20',
-                                                       gateway='3.0.9.1',
-                                                       dns_servers='1.1.1.1',
-                                                       encoding='utf-8',
-                                                       sc_zonename='myzone.foo.org',
-                                                       compliance_license='some-internal-license',
-                                                       smartconnect_ip='3.0.9.21')
+    @patch.object(setup_onefs, 'run_wizard')
+    def test_configure_new_cluster_run_wizard(self, fake_run_wizard, fake_vSphereConsole, fake_sleep):
+        """``configure_new_cluster`` hands the version, license and answers straight to ``run_wizard``"""
+        self._configure('8.0.0.1', compliance_license='some-internal-license')
+        the_args, the_kwargs = fake_run_wizard.call_args
 
-        self.assertTrue(fake_enable_compliance_mode.called)
+        self.assertEqual(the_args[0], '8.0.0.1')
+        self.assertEqual(the_kwargs['compliance_license'], 'some-internal-license')
+        self.assertEqual(the_kwargs['cluster_name'], 'mycluster')
 
-    def test_configure_new_7_2_cluster(self, fake_vSphereConsole, fake_sleep):
-        """``configure_new_7_2_cluster`` returns None"""
-        fake_logger = MagicMock()
-        output = setup_onefs.configure_new_7_2_cluster(logger=fake_logger,
-                                                       console_url='https://someHTMLconsole.com',
-                                                       cluster_name='mycluster',
-                                                       int_netmask='255.255.255.0',
-                                                       int_ip_low='8.6.7.5',
-                                                       int_ip_high='8.6.7.50',
-                                                       ext_netmask='255.255.255.0',
-                                                       ext_ip_low='3.0.9.2',
-                                                       ext_ip_high='3.0.9.20',
-                                                       gateway='3.0.9.1',
-                                                       dns_servers='1.1.1.1',
-                                                       encoding='utf-8',
-                                                       sc_zonename='myzone.foo.org',
-                                                       compliance_license=None,
-                                                       smartconnect_ip='3.0.9.21')
-        expected = None
+    def test_configure_new_cluster_plans(self, fake_vSphereConsole, fake_sleep):
+        """``configure_new_cluster`` returns None for every release of OneFS"""
+        for version in ('7.2.1.6', '8.0.0.1', '8.1.0.3', '8.1.1.2', '8.1.2.0', '8.1.3.0', '8.2.0.0'):
+            output = self._configure(version)
 
-        self.assertEqual(output, expected)
+            self.assertTrue(output is None)
 
     @patch.object(setup_onefs, 'enable_compliance_mode')
-    def test_configure_new_8_1_cluster_compliance(self, fake_enable_compliance_mode, fake_vSphereConsole, fake_sleep):
-        """``configure_new_8_1_cluster`` can configure a compliance mode cluster"""
-        fake_logger = MagicMock()
-        output = setup_onefs.configure_new_8_1_cluster(logger=fake_logger,
-                                                       console_url='https://someHTMLconsole.com',
-                                                       cluster_name='mycluster',
-                                                       int_netmask='255.255.255.0',
-                                                       int_ip_low='8.6.7.5',
-                                                       int_ip_high='8.6.7.50',
-                                                       ext_netmask='255.255.255.0',
-                                                       ext_ip_low='3.0.9.2',
-                                                       ext_ip_high='3.0.9.20',
-                                                       gateway='3.0.9.1',
-                                                       dns_servers='1.1.1.1',
-                                                       encoding='utf-8',
-                                                       sc_zonename='myzone.foo.org',
-                                                       compliance_license='some-internal-license',
-                                                       smartconnect_ip='3.0.9.21')
+    def test_configure_new_cluster_compliance_mode(self, fake_enable_compliance_mode, fake_vSphereConsole, fake_sleep):
+        """``configure_new_cluster`` can configure a compliance mode cluster of every release of OneFS"""
+        for version in ('7.2.1.6', '8.0.0.1', '8.1.0.3', '8.1.2.0', '8.1.3.0', '8.2.0.0'):
+            self._configure(version, compliance_license='some-internal-license')
 
-        self.assertTrue(fake_enable_compliance_mode.called)
+        self.assertEqual(fake_enable_compliance_mode.call_count, 6)
 
     @patch.object(setup_onefs, 'make_new_and_accept_eual')
-    def test_configure_new_8_1_cluster_compliance_license(self, fake_make_new_and_accept_eual, fake_vSphereConsole, fake_sleep):
-        """``configure_new_8_1_cluster`` passes the license as needed to configure a compliance mode cluster"""
-        fake_logger = MagicMock()
-        output = setup_onefs.configure_new_8_1_cluster(logger=fake_logger,
-                                                       console_url='https://someHTMLconsole.com',
-                                                       cluster_name='mycluster',
-                                                       int_netmask='255.255.255.0',
-                                                       int_ip_low='8.6.7.5',
-                                                       int_ip_high='8.6.7.50',
-                                                       ext_netmask='255.255.255.0',
-                                                       ext_ip_low='3.0.9.2',
-                                                       ext_ip_high='3.0.9.20',
-                                                       gateway='3.0.9.1',
-                                                       dns_servers='1.1.1.1',
-                                                       encoding='utf-8',
-                                                       sc_zonename='myzone.foo.org',
-                                                       compliance_license='some-internal-license',
-                                                       smartconnect_ip='3.0.9.21')
+    def test_configure_new_cluster_compliance_license(self, fake_make_new_and_accept_eual, fake_vSphereConsole, fake_sleep):
+        """``configure_new_cluster`` passes the license to the EULA of the releases that need one"""
+        for version in ('8.0.0.1', '8.1.0.3', '8.1.2.0'):
+            self._configure(version, compliance_license='some-internal-license')
+            the_args, _ = fake_make_new_and_accept_eual.call_args
 
-        the_args, _ = fake_make_new_and_accept_eual.call_args
-        license = the_args[1]
-        expected = 'some-internal-license'
-
-        self.assertEqual(license, expected)
-
-    @patch.object(setup_onefs, 'enable_compliance_mode')
-    def test_configure_new_8_1_2_cluster_compliance(self, fake_enable_compliance_mode, fake_vSphereConsole, fake_sleep):
-        """``configure_new_8_1_2_cluster`` can configure a compliance mode cluster"""
-        fake_logger = MagicMock()
-        output = setup_onefs.configure_new_8_1_2_cluster(logger=fake_logger,
-                                                       console_url='https://someHTMLconsole.com',
-                                                       cluster_name='mycluster',
-                                                       int_netmask='255.255.255.0',
-                                                       int_ip_low='8.6.7.5',
-                                                       int_ip_high='8.6.7.50',
-                                                       ext_netmask='255.255.255.0',
-                                                       ext_ip_low='3.0.9.2',
-                                                       ext_ip_high='3.0.9.20',
-                                                       gateway='3.0.9.1',
-                                                       dns_servers='1.1.1.1',
-                                                       encoding='utf-8',
-                                                       version='8.1.2.0',
-                                                       sc_zonename='myzone.foo.org',
-                                                       compliance_license='some-internal-license',
-                                                       smartconnect_ip='3.0.9.21')
-
-        self.assertTrue(fake_enable_compliance_mode.called)
+            self.assertEqual(the_args[1], 'some-internal-license')
 
     @patch.object(setup_onefs, 'make_new_and_accept_eual')
-    def test_configure_new_8_1_2_cluster_compliance_license(self, fake_make_new_and_accept_eual, fake_vSphereConsole, fake_sleep):
-        """``configure_new_8_1_2_cluster`` passes the license as needed to configure a compliance mode cluster"""
-        fake_logger = MagicMock()
-        output = setup_onefs.configure_new_8_1_2_cluster(logger=fake_logger,
-                                                       console_url='https://someHTMLconsole.com',
-                                                       cluster_name='mycluster',
-                                                       int_netmask='255.255.255.0',
-                                                       int_ip_low='8.6.7.5',
-                                                       int_ip_high='8.6.7.50',
-                                                       ext_netmask='255.255.255.0',
-                                                       ext_ip_low='3.0.9.2',
-                                                       ext_ip_high='3.0.9.20',
-                                                       gateway='3.0.9.1',
-                                                       dns_servers='1.1.1.1',
-                                                       encoding='utf-8',
-                                                       version='8.1.2.0',
-                                                       sc_zonename='myzone.foo.org',
-                                                       compliance_license='some-internal-license',
-                                                       smartconnect_ip='3.0.9.21')
-
-        the_args, _ = fake_make_new_and_accept_eual.call_args
-        license = the_args[1]
-        expected = 'some-internal-license'
-
-        self.assertEqual(license, expected)
-
-    def test_configure_new_8_1_cluster(self, fake_vSphereConsole, fake_sleep):
-        """``configure_new_8_1_cluster`` returns None"""
-        fake_logger = MagicMock()
-        output = setup_onefs.configure_new_8_1_cluster(logger=fake_logger,
-                                                       console_url='https://someHTMLconsole.com',
-                                                       cluster_name='mycluster',
-                                                       int_netmask='255.255.255.0',
-                                                       int_ip_low='8.6.7.5',
-                                                       int_ip_high='8.6.7.50',
-                                                       ext_netmask='255.255.255.0',
-                                                       ext_ip_low='3.0.9.2',
-                                                       ext_ip_high='3.0.9.20',
-                                                       gateway='3.0.9.1',
-                                                       dns_servers='1.1.1.1',
-                                                       encoding='utf-8',
-                                                       sc_zonename='myzone.foo.org',
-                                                       compliance_license=None,
-                                                       smartconnect_ip='3.0.9.21')
-        expected = None
-
-        self.assertEqual(output, expected)
-
-
-    @patch.object(setup_onefs, 'enable_compliance_mode')
-    def test_configure_new_8_2_0_cluster_compliance(self, fake_enable_compliance_mode, fake_vSphereConsole, fake_sleep):
-        """``configure_new_8_2_0_cluster`` can configure a compliance mode cluster"""
-        fake_logger = MagicMock()
-        output = setup_onefs.configure_new_8_2_0_cluster(logger=fake_logger,
-                                                       console_url='https://someHTMLconsole.com',
-                                                       cluster_name='mycluster',
-                                                       int_netmask='255.255.255.0',
-                                                       int_ip_low='8.6.7.5',
-                                                       int_ip_high='8.6.7.50',
-                                                       ext_netmask='255.255.255.0',
-                                                       ext_ip_low='3.0.9.2',
-                                                       ext_ip_high='3.0.9.20',
-                                                       gateway='3.0.9.1',
-                                                       dns_servers='1.1.1.1',
-                                                       encoding='utf-8',
-                                                       sc_zonename='myzone.foo.org',
-                                                       compliance_license='some-internal-license',
-                                                       smartconnect_ip='3.0.9.21')
-
-        self.assertTrue(fake_enable_compliance_mode.called)
-
-    @patch.object(setup_onefs, 'make_new_and_accept_eual')
-    def test_configure_new_8_2_0_cluster_compliance_license(self, fake_make_new_and_accept_eual, fake_vSphereConsole, fake_sleep):
-        """``configure_new_8_2_0_cluster`` Needs no compliance mode license"""
-        fake_logger = MagicMock()
-        output = setup_onefs.configure_new_8_2_0_cluster(logger=fake_logger,
-                                                       console_url='https://someHTMLconsole.com',
-                                                       cluster_name='mycluster',
-                                                       int_netmask='255.255.255.0',
-                                                       int_ip_low='8.6.7.5',
-                                                       int_ip_high='8.6.7.50',
-                                                       ext_netmask='255.255.255.0',
-                                                       ext_ip_low='3.0.9.2',
-                                                       ext_ip_high='3.0.9.20',
-                                                       gateway='3.0.9.1',
-                                                       dns_servers='1.1.1.1',
-                                                       encoding='utf-8',
-                                                       sc_zonename='myzone.foo.org',
-                                                       compliance_license='some-internal-license',
-                                                       smartconnect_ip='3.0.9.21')
-
+    def test_configure_new_cluster_8_2_0_license(self, fake_make_new_and_accept_eual, fake_vSphereConsole, fake_sleep):
+        """``configure_new_cluster`` needs no compliance mode license for OneFS 8.2.0"""
+        self._configure('8.2.0.0', compliance_license='some-internal-license')
         _, the_kwargs = fake_make_new_and_accept_eual.call_args
-        license = the_kwargs['compliance_license']
-        expected = False
-
-        self.assertEqual(license, expected)
-
-    def test_configure_new_8_2_0_cluster(self, fake_vSphereConsole, fake_sleep):
-        """``configure_new_8_2_0_cluster`` returns None"""
-        fake_logger = MagicMock()
-        output = setup_onefs.configure_new_8_2_0_cluster(logger=fake_logger,
-                                                       console_url='https://someHTMLconsole.com',
-                                                       cluster_name='mycluster',
-                                                       int_netmask='255.255.255.0',
-                                                       int_ip_low='8.6.7.5',
-                                                       int_ip_high='8.6.7.50',
-                                                       ext_netmask='255.255.255.0',
-                                                       ext_ip_low='3.0.9.2',
-                                                       ext_ip_high='3.0.9.20',
-                                                       gateway='3.0.9.1',
-                                                       dns_servers='1.1.1.1',
-                                                       encoding='utf-8',
-                                                       sc_zonename='myzone.foo.org',
-                                                       compliance_license=None,
-                                                       smartconnect_ip='3.0.9.21')
-        expected = None
 
-        self.assertEqual(output, expected)
+        self.assertEqual(the_kwargs['compliance_license'], False)
 
     @patch.object(setup_onefs, 'make_new_and_accept_eual')
-    def test_configure_new_8_2_0_cluster_eula(self, fake_make_new_and_accept_eual, fake_vSphereConsole, fake_sleep):
-        """``configure_new_8_2_0_cluster`` presses enter before trying to accept the EULA"""
-        fake_logger = MagicMock()
-        setup_onefs.configure_new_8_2_0_cluster(logger=fake_logger,
-                                                console_url='https://someHTMLconsole.com',
-                                                cluster_name='mycluster',
-                                                int_netmask='255.255.255.0',
-                                                int_ip_low='8.6.7.5',
-                                                int_ip_high='8.6.7.50',
-                                                ext_netmask='255.255.255.0',
-                                                ext_ip_low='3.0.9.2',
-                                                ext_ip_high='3.0.9.20',
-                                                gateway='3.0.9.1',
-                                                dns_servers='1.1.1.1',
-                                                encoding='utf-8',
-                                                sc_zonename='myzone.foo.org',
-                                                compliance_license=None,
-                                                smartconnect_ip='3.0.9.21')
-
+    def test_configure_new_cluster_8_2_0_eula(self, fake_make_new_and_accept_eual, fake_vSphereConsole, fake_sleep):
+        """``configure_new_cluster`` presses enter before trying to accept the EULA of OneFS 8.2.0"""
+        self._configure('8.2.0.0')
         _, the_kwargs = fake_make_new_and_accept_eual.call_args
-        pressed_enter = the_kwargs['auto_enter']
 
-        self.assertTrue(pressed_enter)
-
-    def test_configure_new_8_1_2_cluster(self, fake_vSphereConsole, fake_sleep):
-        """``configure_new_8_1_2_cluster`` returns None"""
-        fake_logger = MagicMock()
-        output = setup_onefs.configure_new_8_1_2_cluster(logger=fake_logger,
-                                                       console_url='https://someHTMLconsole.com',
-                                                       cluster_name='mycluster',
-                                                       int_netmask='255.255.255.0',
-                                                       int_ip_low='8.6.7.5',
-                                                       int_ip_high='8.6.7.50',
-                                                       ext_netmask='255.255.255.0',
-                                                       ext_ip_low='3.0.9.2',
-                                                       ext_ip_high='3.0.9.20',
-                                                       gateway='3.0.9.1',
-                                                       dns_servers='1.1.1.1',
-                                                       encoding='utf-8',
-                                                       version='8.1.2.0',
-                                                       sc_zonename='myzone.foo.org',
-                                                       compliance_license=None,
-                                                       smartconnect_ip='3.0.9.21')
-        expected = None
-
-        self.assertEqual(output, expected)
+        self.assertTrue(the_kwargs['auto_enter'])
 
     @patch.object(setup_onefs, 'set_esrs')
-    def test_configure_new_8_1_2_cluster_esrs(self, fake_set_esrs, fake_vSphereConsole, fake_sleep):
-        """``configure_new_8_1_2_cluster`` does not config ESRS"""
-        fake_logger = MagicMock()
-        setup_onefs.configure_new_8_1_2_cluster(logger=fake_logger,
-                                                console_url='https://someHTMLconsole.com',
-                                                cluster_name='mycluster',
-                                                int_netmask='255.255.255.0',
-                                                int_ip_low='8.6.7.5',
-                                                int_ip_high='8.6.7.50',
-                                                ext_netmask='255.255.255.0',
-                                                ext_ip_low='3.0.9.2',
-                                                ext_ip_high='3.0.9.20',
-                                                gateway='3.0.9.1',
-                                                dns_servers='1.1.1.1',
-                                                encoding='utf-8',
-                                                version='8.1.2.0',
-                                                sc_zonename='myzone.foo.org',
-                                                compliance_license=None,
-                                                smartconnect_ip='3.0.9.21')
-        called = fake_set_esrs.call_count
-        expected = 0
-
-        self.assertEqual(called, expected)
+    def test_configure_new_cluster_8_1_2_esrs(self, fake_set_esrs, fake_vSphereConsole, fake_sleep):
+        """``configure_new_cluster`` does not config ESRS on OneFS 8.1.2"""
+        self._configure('8.1.2.0')
+
+        self.assertEqual(fake_set_esrs.call_count, 0)
 
     @patch.object(setup_onefs, 'make_new_and_accept_eual')
     def test_compliance_8_1_3(self, fake_make_new_and_accept_eual, fake_vSphereConsole, fake_sleep):
-        """``configure_new_8_1_2_cluster`` Does not supply a license for 8.1.3 clusters"""
-        fake_logger = MagicMock()
-        setup_onefs.configure_new_8_1_2_cluster(logger=fake_logger,
-                                                console_url='https://someHTMLconsole.com',
-                                                cluster_name='mycluster',
-                                                int_netmask='255.255.255.0',
-                                                int_ip_low='8.6.7.5',
-                                                int_ip_high='8.6.7.50',
-                                                ext_netmask='255.255.255.0',
-                                                ext_ip_low='3.0.9.2',
-                                                ext_ip_high='3.0.9.20',
-                                                gateway='3.0.9.1',
-                                                dns_servers='1.1.1.1',
-                                                encoding='utf-8',
-                                                version='8.1.3.0',
-                                                sc_zonename='myzone.foo.org',
-                                                compliance_license='some-license',
-                                                smartconnect_ip='3.0.9.21')
-
+        """``configure_new_cluster`` Does not supply a license for 8.1.3 clusters"""
+        self._configure('8.1.3.0', compliance_license='some-license')
         the_args, _ = fake_make_new_and_accept_eual.call_args
-        comp_license = the_args[1]
-        expected = None
 
-        self.assertTrue(comp_license is expected)
+        self.assertTrue(the_args[1] is None)
+
+    @patch.object(setup_onefs, 'set_sysctls')
+    def test_compliance_8_1_3_sysctls(self, fake_set_sysctls, fake_vSphereConsole, fake_sleep):
+        """``configure_new_cluster`` sets the sysctls of an 8.1.3 compliance cluster as compadmin, like every other release"""
+        self._configure('8.1.3.0', compliance_license='some-license')
+        _, the_kwargs = fake_set_sysctls.call_args
+
+        self.assertTrue(the_kwargs['compliance_mode'])
 
 
 class TestWizardRoutines(unittest.TestCase):
@@ -728,6 +881,19 @@ class TestWizardRoutines(unittest.TestCase):
 
         self.assertEqual(output, expected)
 
+    @patch.object(setup_onefs.time, 'sleep')
+    def test_config_network_backspace(self, fake_sleep):
+        """``config_network`` clears the low IP with a single input"""
+        self.fake_console.keys = setup_onefs.Keys
+        setup_onefs.config_network(self.fake_console,
+                                   netmask='255.255.255.0',
+                                   ip_low='2.2.2.2',
+                                   ip_high='2.2.2.20')
+
+        backspaces = [x for x in self.fake_console.send_keys.call_args_list if x[0][0] == setup_onefs.Keys.BACKSPACE * 7]
+
+        self.assertEqual(len(backspaces), 1)
+
     def test_set_default_gateway(self):
         """``set_default_gateway`` returns None"""
         output = setup_onefs.set_default_gateway(self.fake_console, '2.2.2.1')
@@ -870,5 +1036,336 @@ class TestWizardRoutines(unittest.TestCase):
         self.assertEqual(sorted(sysctls), sorted(expected))
 
 
+class TestRunWizard(unittest.TestCase):
+    """A set of test cases for running the wizard plans"""
+
+    def setUp(self):
+        self.answers = {'cluster_name': 'mycluster',
+                        'int_netmask': '255.255.255.0',
+                        'int_ip_low': '8.6.7.5',
+                        'int_ip_high': '8.6.7.50',
+                        'ext_netmask': '255.255.255.0',
+                        'ext_ip_low': '3.0.9.2',
+                        'ext_ip_high': '3.0.9.20',
+                        'gateway': '3.0.9.1',
+                        'dns_servers': '1.1.1.1',
+                        'encoding': 'utf-8',
+                        'sc_zonename': None,
+                        'smartconnect_ip': '3.0.9.21'}
+
+    def test_record_wizard(self):
+        """``record_wizard`` sends the new high IP along with clearing out the low IP"""
+        actions = setup_onefs.record_wizard('8.2.0.0', None, **self.answers)
+        ip_high = [x for x in actions if x[0] == 'keys' and '8.6.7.50' in x[1]][0]
+        expected = ('keys', (setup_onefs.Keys.BACKSPACE * 7, '8.6.7.50', setup_onefs.Keys.ENTER), False)
+
+        self.assertEqual(ip_high, expected)
+
+    def test_record_wizard_waits(self):
+        """``record_wizard`` waits on the screens of the wizard"""
+        actions = setup_onefs.record_wizard('8.2.0.0', None, **self.answers)
+        screens = [x[2] for x in actions if x[0] == 'wait']
+        expected = ['format_disks', 'wizard', 'login']
+
+        self.assertEqual(screens, expected)
+
+    def test_record_wizard_compliance(self):
+        """``record_wizard`` logs in as compadmin on compliance clusters, even if the EULA needs no license"""
+        actions = setup_onefs.record_wizard('8.1.3.0', 'some-license', **self.answers)
+        inputs = [x[1] for x in actions if x[0] == 'keys']
+
+        self.assertTrue(('compadmin',) in inputs)
+        self.assertFalse(('root',) in inputs)
+        self.assertTrue(('sudo isi_sysctl_cluster kern.cam.da.default_timeout=180',) in inputs)
+        self.assertFalse(('some-license',) in inputs)
+
+    def test_record_wizard_secret(self):
+        """``record_wizard`` records the passwords on their own, so they're never typed ahead"""
+        actions = setup_onefs.record_wizard('8.2.0.0', None, **self.answers)
+        secrets = [x for x in actions if x[0] == 'secret']
+
+        self.assertEqual(len(secrets), 5)
+        self.assertTrue(all(x[1] == (setup_onefs.DEFAULT_ROOT_PW,) for x in secrets))
+
+    def test_record_wizard_missing_answer(self):
+        """``record_wizard`` raises ValueError when an answer is missing"""
+        del self.answers['gateway']
+
+        with self.assertRaises(ValueError):
+            setup_onefs.record_wizard('8.2.0.0', None, **self.answers)
+
+    @patch.object(setup_onefs.wizard, 'compile_plan')
+    def test_record_wizard_bad_routine(self, fake_compile_plan):
+        """``record_wizard`` raises ValueError when a step names a routine that doesn't exist"""
+        fake_compile_plan.return_value = ((None, 'no_such_routine', (), (), None, 0),)
+
+        with self.assertRaises(ValueError):
+            setup_onefs.record_wizard('8.2.0.0', None, **self.answers)
+
+    @patch.object(setup_onefs, 'browser_pool')
+    @patch.object(setup_onefs, 'vSphereConsole')
+    def test_run_wizard(self, fake_vSphereConsole, fake_browser_pool):
+        """``run_wizard`` replays the recorded input to the console"""
+        fake_logger = MagicMock()
+        setup_onefs.run_wizard('8.2.0.0', fake_logger, 'https://someHTMLconsole.com', None, **self.answers)
+        fake_console = fake_vSphereConsole.return_value.__enter__.return_value
+
+        the_args, the_kwargs = fake_console.send_keys.call_args_list[0]
+
+        self.assertEqual(the_args, ('yes',))
+        self.assertEqual(fake_console.wait_for_prompt.call_count, 3)
+
+    @patch.object(setup_onefs, 'browser_pool')
+    @patch.object(setup_onefs, 'vSphereConsole')
+    def test_run_wizard_secret(self, fake_vSphereConsole, fake_browser_pool):
+        """``run_wizard`` tells the console which input is a password"""
+        setup_onefs.run_wizard('8.2.0.0', MagicMock(), 'https://someHTMLconsole.com', None, **self.answers)
+        fake_console = fake_vSphereConsole.return_value.__enter__.return_value
+        secrets = [x for x in fake_console.send_keys.call_args_list if x[1].get('secret')]
+
+        self.assertEqual(len(secrets), 5)
+
+    @patch.object(setup_onefs, 'browser_pool')
+    @patch.object(setup_onefs, 'vSphereConsole')
+    def test_run_wizard_fail_fast(self, fake_vSphereConsole, fake_browser_pool):
+        """``run_wizard`` doesn't open the console when the answers are bad"""
+        fake_logger = MagicMock()
+        self.answers['encoding'] = 'no-such-encoding'
+
+        with self.assertRaises(KeyError):
+            setup_onefs.run_wizard('8.2.0.0', fake_logger, 'https://someHTMLconsole.com', None, **self.answers)
+
+        self.assertFalse(fake_vSphereConsole.called)
+
+
+class TestWebMKSConsole(unittest.TestCase):
+    """A set of test cases for the browserless console, against a stand-in console"""
+
+    def setUp(self):
+        self.server = StandInConsole()
+        self.recognizer = setup_onefs.prompts.PromptRecognizer()
+        self.console = setup_onefs.WebMKSConsole(self.server.url, version='8.2.0.0', type_ahead=False,
+                                                 recognizer=self.recognizer, connect_timeout=5)
+
+    def tearDown(self):
+        self.console.close()
+        self.server.close()
+
+    def test_url(self):
+        """``WebMKSConsole`` raises ValueError for the URL of the vSphere UI"""
+        with self.assertRaises(ValueError):
+            setup_onefs.WebMKSConsole('https://vcenter.vlab.local/ui/webconsole.html')
+
+    def test_send_keys(self):
+        """``WebMKSConsole.send_keys`` types the input, then presses ENTER"""
+        self.console.send_keys('yes')
+        expected = [ord('y'), ord('e'), ord('s'), 0xff0d]
+
+        self.assertEqual(self.server.keysyms(), expected)
+
+    def test_send_keys_paced(self):
+        """``WebMKSConsole.send_keys`` is paced by the update the console sends back"""
+        self.console.send_keys('yes')
+
+        self.assertEqual(self.console.pacing['echoed'], 1)
+
+    def test_wait_for_prompt(self):
+        """``WebMKSConsole.wait_for_prompt`` returns once the console goes quiet"""
+        begin = setup_onefs.time.time()
+        self.console.wait_for_prompt(timeout=0.2)
+
+        self.assertTrue(setup_onefs.time.time() - begin < 5)
+
+    def test_wait_for_screen(self):
+        """``WebMKSConsole.wait_for_prompt`` recognizes screens from the framebuffer"""
+        self.server.show(3)
+        self.assertTrue(self.console._monitor.wait_for_frame(0, timeout=2))
+        setup_onefs.time.sleep(0.1)
+        self.recognizer.learn('wizard', self.console._monitor.fingerprint())
+
+        self.console.wait_for_prompt(timeout=1, screen='wizard')
+
+    def test_wait_for_prompt_closed(self):
+        """``WebMKSConsole.wait_for_prompt`` raises RuntimeError once the console is gone"""
+        self.server.close()
+        deadline = setup_onefs.time.time() + 2
+        while self.console._monitor.alive and setup_onefs.time.time() < deadline:
+            setup_onefs.time.sleep(0.01)
+
+        with self.assertRaises(RuntimeError):
+            self.console.wait_for_prompt(timeout=1)
+
+
+class TestOpenConsole(unittest.TestCase):
+    """A set of test cases for the ``open_console`` function"""
+
+    @patch.object(setup_onefs, 'WebMKSConsole')
+    @patch.object(setup_onefs, 'const')
+    def test_webmks(self, fake_const, fake_WebMKSConsole):
+        """``open_console`` skips the browser with the webmks backend"""
+        fake_const.VLAB_ONEFS_CONSOLE_BACKEND = 'webmks'
+        setup_onefs.open_console('wss://esxi01:443/ticket/asdf')
+
+        self.assertTrue(fake_WebMKSConsole.called)
+
+    @patch.object(setup_onefs, 'browser_pool')
+    @patch.object(setup_onefs, 'vSphereConsole')
+    @patch.object(setup_onefs, 'const')
+    def test_webmks_ui_url(self, fake_const, fake_vSphereConsole, fake_browser_pool):
+        """``open_console`` uses the browser for the URL of the vSphere UI"""
+        fake_const.VLAB_ONEFS_CONSOLE_BACKEND = 'webmks'
+        setup_onefs.open_console('https://vcenter.vlab.local/ui/webconsole.html')
+
+        self.assertTrue(fake_vSphereConsole.called)
+
+    @patch.object(setup_onefs, 'browser_pool')
+    @patch.object(setup_onefs, 'vSphereConsole')
+    @patch.object(setup_onefs, 'const')
+    def test_browser(self, fake_const, fake_vSphereConsole, fake_browser_pool):
+        """``open_console`` uses the browser by default"""
+        fake_const.VLAB_ONEFS_CONSOLE_BACKEND = 'browser'
+        setup_onefs.open_console('wss://esxi01:443/ticket/asdf')
+
+        self.assertTrue(fake_vSphereConsole.called)
+
+    @patch.object(setup_onefs, 'ScanCodeConsole')
+    @patch.object(setup_onefs, 'const')
+    def test_scancodes(self, fake_const, fake_ScanCodeConsole):
+        """``open_console`` types via the API when given the VM"""
+        fake_const.VLAB_ONEFS_CONSOLE_BACKEND = 'scancodes'
+        the_vm = MagicMock()
+        setup_onefs.open_console(the_vm, version='8.2.0.0')
+
+        fake_ScanCodeConsole.assert_called_with(the_vm, version='8.2.0.0')
+
+
+class TestConsoleFor(unittest.TestCase):
+    """A set of test cases for the ``console_for`` function"""
+
+    def setUp(self):
+        self.node = MagicMock()
+        self.node.info = {'console': 'https://vcenter.vlab.local/ui/webconsole.html'}
+
+    @patch.object(setup_onefs.vmware, 'get_console_ticket')
+    @patch.object(setup_onefs, 'const')
+    def test_ticket(self, fake_const, fake_get_console_ticket):
+        """``console_for`` returns a WebMKS ticket when the SDK is available"""
+        fake_const.VLAB_ONEFS_CONSOLE_BACKEND = 'browser'
+        fake_const.VLAB_ONEFS_WMKS_SDK_URL = 'https://sdk.vlab.local'
+        fake_get_console_ticket.return_value = 'wss://esxi01:443/ticket/asdf'
+
+        output = setup_onefs.console_for(self.node)
+
+        self.assertEqual(output, 'wss://esxi01:443/ticket/asdf')
+
+    @patch.object(setup_onefs.vmware, 'get_console_ticket')
+    @patch.object(setup_onefs, 'const')
+    def test_webmks(self, fake_const, fake_get_console_ticket):
+        """``console_for`` returns a WebMKS ticket for the browserless console"""
+        fake_const.VLAB_ONEFS_CONSOLE_BACKEND = 'webmks'
+        fake_const.VLAB_ONEFS_WMKS_SDK_URL = ''
+        fake_get_console_ticket.return_value = 'wss://esxi01:443/ticket/asdf'
+
+        output = setup_onefs.console_for(self.node)
+
+        self.assertEqual(output, 'wss://esxi01:443/ticket/asdf')
+
+    @patch.object(setup_onefs.vmware, 'get_console_ticket')
+    @patch.object(setup_onefs, 'const')
+    def test_browser(self, fake_const, fake_get_console_ticket):
+        """``console_for`` returns the URL of the vSphere UI console by default"""
+        fake_const.VLAB_ONEFS_CONSOLE_BACKEND = 'browser'
+        fake_const.VLAB_ONEFS_WMKS_SDK_URL = ''
+
+        output = setup_onefs.console_for(self.node)
+
+        self.assertEqual(output, 'https://vcenter.vlab.local/ui/webconsole.html')
+        self.assertFalse(fake_get_console_ticket.called)
+
+    @patch.object(setup_onefs.vmware, 'get_console_ticket')
+    @patch.object(setup_onefs, 'const')
+    def test_scancodes(self, fake_const, fake_get_console_ticket):
+        """``console_for`` returns the VM itself for the scancodes backend"""
+        fake_const.VLAB_ONEFS_CONSOLE_BACKEND = 'scancodes'
+        fake_const.VLAB_ONEFS_WMKS_SDK_URL = 'https://sdk.vlab.local'
+
+        output = setup_onefs.console_for(self.node)
+
+        self.assertTrue(output is self.node.vm)
+        self.assertFalse(fake_get_console_ticket.called)
+
+
+@patch.object(setup_onefs.time, 'sleep')
+class TestScanCodeConsole(unittest.TestCase):
+    """A set of test cases for the ``ScanCodeConsole`` object"""
+
+    def setUp(self):
+        self.the_vm = MagicMock()
+        self.the_vm.PutUsbScanCodes.side_effect = lambda spec: len(spec.keyEvents)
+        self.console = setup_onefs.ScanCodeConsole(self.the_vm, version='8.2.0.0', type_ahead=False,
+                                                   recognizer=setup_onefs.prompts.PromptRecognizer())
+
+    def test_send_keys(self, fake_sleep):
+        """``ScanCodeConsole.send_keys`` types the whole line, and ENTER, in one API call"""
+        self.console.send_keys('yes')
+        spec = self.the_vm.PutUsbScanCodes.call_args[0][0]
+        codes = [x.usbHidCode >> 16 for x in spec.keyEvents]
+
+        self.assertEqual(self.the_vm.PutUsbScanCodes.call_count, 1)
+        self.assertEqual(codes, [0x1c, 0x08, 0x16, 0x28])
+
+    def test_send_keys_paced(self, fake_sleep):
+        """``ScanCodeConsole.send_keys`` waits a fixed KEY_PAUSE after each input"""
+        self.console.send_keys('yes')
+
+        fake_sleep.assert_called_with(setup_onefs.KEY_PAUSE)
+        self.assertEqual(self.console.pacing['inputs'], 1)
+
+    def test_send_keys_dropped(self, fake_sleep):
+        """``ScanCodeConsole.send_keys`` raises RuntimeError if vSphere doesn't type every key"""
+        self.the_vm.PutUsbScanCodes.side_effect = None
+        self.the_vm.PutUsbScanCodes.return_value = 2
+
+        with self.assertRaises(RuntimeError):
+            self.console.send_keys('yes')
+
+    def test_type_ahead(self, fake_sleep):
+        """``ScanCodeConsole`` sends the buffered input in one API call"""
+        console = setup_onefs.ScanCodeConsole(self.the_vm, type_ahead=True,
+                                              recognizer=setup_onefs.prompts.PromptRecognizer())
+        console.send_keys('yes')
+        console.send_keys('no')
+        console.flush()
+
+        self.assertEqual(self.the_vm.PutUsbScanCodes.call_count, 1)
+
+    @patch.object(setup_onefs.vmware, 'wait_until_ready')
+    def test_wait_for_prompt(self, fake_wait_until_ready, fake_sleep):
+        """``ScanCodeConsole.wait_for_prompt`` watches screenshots of the console"""
+        fake_wait_until_ready.return_value = True
+        self.console.wait_for_prompt(timeout=20, screen='login')
+        _, the_kwargs = fake_wait_until_ready.call_args
+
+        self.assertEqual(the_kwargs['quiet'], 20)
+        self.assertEqual(the_kwargs['screen'], 'login')
+        self.assertFalse(fake_sleep.called)
+
+    @patch.object(setup_onefs.vmware, 'wait_until_ready')
+    def test_wait_for_prompt_blind(self, fake_wait_until_ready, fake_sleep):
+        """``ScanCodeConsole.wait_for_prompt`` waits the whole timeout without screenshots"""
+        fake_wait_until_ready.return_value = False
+        self.console.wait_for_prompt(timeout=20, screen='login')
+
+        fake_sleep.assert_called_with(20)
+
+    @patch.object(setup_onefs, '_record_pacing')
+    def test_close(self, fake_record_pacing, fake_sleep):
+        """``ScanCodeConsole.close`` leaves the vCenter session to the caller"""
+        self.console.close()
+
+        self.assertTrue(fake_record_pacing.called)
+        self.assertEqual(self.the_vm.method_calls, [])
+
+
 if __name__ == '__main__':
     unittest.main()
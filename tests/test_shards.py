@@ -0,0 +1,130 @@
+# -*- coding: UTF-8 -*-
+"""
+A suite of tests for the functions in shards.py
+"""
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+from vlab_onefs_api.lib.name_index import NameIndex
+from vlab_onefs_api.lib.worker import shards
+
+
+def _make_vcenter(username, user_vms, other_vms):
+    """Build a fake vCenter where ``username`` and one other user own some VMs"""
+    fake_vcenter = MagicMock()
+    user_folder = MagicMock(spec=shards.vim.Folder)
+    user_folder.name = username
+    user_folder.childEntity = [MagicMock(spec=shards.vim.VirtualMachine) for _ in range(user_vms)]
+    other_folder = MagicMock(spec=shards.vim.Folder)
+    other_folder.name = 'someOtherUser'
+    other_folder.childEntity = [MagicMock(spec=shards.vim.VirtualMachine) for _ in range(other_vms)]
+    fake_vcenter.get_vm_folder.return_value.childEntity = [user_folder, other_folder]
+    return fake_vcenter
+
+
+class TestShards(unittest.TestCase):
+    """A set of test cases for routing users to vCenter servers"""
+
+    def setUp(self):
+        shards._PLACEMENT.clear()
+        self.directory = tempfile.mkdtemp()
+        self.index_patcher = patch.object(shards, '_INDEX', NameIndex(directory=self.directory))
+        self.index_patcher.start()
+
+    def tearDown(self):
+        self.index_patcher.stop()
+        shutil.rmtree(self.directory)
+
+    @patch.object(shards, '_connect')
+    @patch.object(shards, 'const')
+    def test_locate_one_server(self, fake_const, fake_connect):
+        """``locate`` does not probe anything when there's only one vCenter server"""
+        fake_const.INF_VCENTER_SERVERS = ['vcenter1']
+
+        output = shards.locate('alice')
+
+        self.assertEqual(output, 'vcenter1')
+        self.assertFalse(fake_connect.called)
+
+    @patch.object(shards, '_connect')
+    @patch.object(shards, 'const')
+    def test_locate_sticky(self, fake_const, fake_connect):
+        """``locate`` returns the vCenter where the user already has VMs"""
+        fake_const.INF_VCENTER_SERVERS = ['vcenter1', 'vcenter2']
+        fake_connect.return_value.__enter__.side_effect = [_make_vcenter('alice', 0, 1),
+                                                           _make_vcenter('alice', 2, 9)]
+
+        output = shards.locate('alice')
+
+        self.assertEqual(output, 'vcenter2')
+
+    @patch.object(shards, '_connect')
+    @patch.object(shards, 'const')
+    def test_locate_cached(self, fake_const, fake_connect):
+        """``locate`` only probes the vCenter servers the first time a user is seen"""
+        fake_const.INF_VCENTER_SERVERS = ['vcenter1', 'vcenter2']
+        fake_connect.return_value.__enter__.side_effect = [_make_vcenter('alice', 2, 0)]
+
+        shards.locate('alice')
+        output = shards.locate('alice')
+
+        self.assertEqual(output, 'vcenter1')
+        self.assertEqual(fake_connect.call_count, 1)
+
+    @patch.object(shards, '_connect')
+    @patch.object(shards, 'const')
+    def test_locate_least_loaded(self, fake_const, fake_connect):
+        """``locate`` places a new user on the vCenter running the fewest VMs"""
+        fake_const.INF_VCENTER_SERVERS = ['vcenter1', 'vcenter2']
+        fake_connect.return_value.__enter__.side_effect = [_make_vcenter('alice', 0, 5),
+                                                           _make_vcenter('alice', 0, 3)]
+
+        output = shards.locate('alice')
+
+        self.assertEqual(output, 'vcenter2')
+
+    @patch.object(shards, '_connect')
+    @patch.object(shards, 'const')
+    def test_locate_new_user_cached(self, fake_const, fake_connect):
+        """``locate`` pins a new user to the vCenter they were placed on"""
+        fake_const.INF_VCENTER_SERVERS = ['vcenter1', 'vcenter2']
+        fake_connect.return_value.__enter__.side_effect = [_make_vcenter('alice', 0, 5),
+                                                           _make_vcenter('alice', 0, 3)]
+
+        shards.locate('alice')
+        output = shards.locate('alice')
+
+        self.assertEqual(output, 'vcenter2')
+        self.assertEqual(fake_connect.call_count, 2)
+
+    @patch.object(shards, '_connect')
+    @patch.object(shards, 'const')
+    def test_locate_shared(self, fake_const, fake_connect):
+        """``locate`` uses the placement another worker recorded in the name index"""
+        fake_const.INF_VCENTER_SERVERS = ['vcenter1', 'vcenter2']
+        shards._INDEX.place('alice', 'vcenter2')
+
+        output = shards.locate('alice')
+
+        self.assertEqual(output, 'vcenter2')
+        self.assertFalse(fake_connect.called)
+
+    @patch.object(shards, '_connect')
+    @patch.object(shards, 'const')
+    def test_locate_removed_server(self, fake_const, fake_connect):
+        """``locate`` places the user again if their vCenter is no longer configured"""
+        fake_const.INF_VCENTER_SERVERS = ['vcenter1']
+        shards._INDEX.place('alice', 'vcenter9')
+        fake_const.INF_VCENTER_SERVERS = ['vcenter1', 'vcenter2']
+        fake_connect.return_value.__enter__.side_effect = [_make_vcenter('alice', 0, 5),
+                                                           _make_vcenter('alice', 0, 3)]
+
+        output = shards.locate('alice')
+
+        self.assertEqual(output, 'vcenter2')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -98,8 +98,8 @@ class TestTasks(unittest.TestCase):
     @patch.object(tasks, 'setup_onefs')
     def test_config(self, fake_setup_onefs, fake_vmware):
         """``config`` returns a dictionary upon success"""
-        fake_vmware.show_onefs.return_value = {'mycluster-1' : {'console': 'https://htmlconsole.com',
-                                                                'meta': {'configured': False}}}
+        fake_node = fake_vmware.OneFSNode.return_value.__enter__.return_value
+        fake_node.info = {'console': 'https://htmlconsole.com', 'meta': {'configured': False}}
 
         output = tasks.config(cluster_name='mycluster',
                               name='mycluster-1',
@@ -123,12 +123,72 @@ class TestTasks(unittest.TestCase):
 
         self.assertEqual(output, expected)
 
+    @patch.object(tasks, 'vmware')
+    @patch.object(tasks, 'setup_onefs')
+    def test_config_console(self, fake_setup_onefs, fake_vmware):
+        """``config`` opens the console the configured backend needs"""
+        fake_node = fake_vmware.OneFSNode.return_value.__enter__.return_value
+        fake_node.info = {'console': 'https://htmlconsole.com', 'meta': {'configured': False}}
+
+        tasks.config(cluster_name='mycluster',
+                     name='mycluster-1',
+                     username='bob',
+                     version='8.1.1.0',
+                     int_netmask='255.255.255.0',
+                     int_ip_low='5.5.5.1',
+                     int_ip_high='5.5.5.10',
+                     ext_netmask='255.255.255.0',
+                     ext_ip_low='10.1.1.2',
+                     ext_ip_high='10.1.1.20',
+                     gateway='10.1.1.1',
+                     dns_servers='1.1.1.1,8.8.8.8',
+                     encoding='utf-8',
+                     sc_zonename='myzone.foo.com',
+                     smartconnect_ip='10.1.1.21',
+                     join_cluster=False,
+                     compliance=False,
+                     txn_id='myId')
+        _, the_kwargs = fake_setup_onefs.configure_new_cluster.call_args
+
+        fake_setup_onefs.console_for.assert_called_with(fake_node)
+        self.assertTrue(the_kwargs['console'] is fake_setup_onefs.console_for.return_value)
+
+    @patch.object(tasks, 'vmware')
+    @patch.object(tasks, 'setup_onefs')
+    def test_config_ready(self, fake_setup_onefs, fake_vmware):
+        """``config`` waits for the node to be ready before getting the console"""
+        fake_node = fake_vmware.OneFSNode.return_value.__enter__.return_value
+        fake_node.info = {'console': 'https://htmlconsole.com', 'meta': {'configured': False}}
+        ready = []
+        fake_setup_onefs.console_for.side_effect = lambda node: ready.append(fake_vmware.wait_until_ready.called)
+
+        tasks.config(cluster_name='mycluster',
+                     name='mycluster-1',
+                     username='bob',
+                     version='8.1.1.0',
+                     int_netmask='255.255.255.0',
+                     int_ip_low='5.5.5.1',
+                     int_ip_high='5.5.5.10',
+                     ext_netmask='255.255.255.0',
+                     ext_ip_low='10.1.1.2',
+                     ext_ip_high='10.1.1.20',
+                     gateway='10.1.1.1',
+                     dns_servers='1.1.1.1,8.8.8.8',
+                     encoding='utf-8',
+                     sc_zonename='myzone.foo.com',
+                     smartconnect_ip='10.1.1.21',
+                     join_cluster=False,
+                     compliance=False,
+                     txn_id='myId')
+
+        self.assertEqual(ready, [True])
+
     @patch.object(tasks, 'vmware')
     @patch.object(tasks, 'setup_onefs')
     def test_config_join(self, fake_setup_onefs, fake_vmware):
         """``config`` returns a dictionary upon joining a node to an existing cluster"""
-        fake_vmware.show_onefs.return_value = {'mycluster-1' : {'console': 'https://htmlconsole.com',
-                                                                'meta': {'configured': False}}}
+        fake_node = fake_vmware.OneFSNode.return_value.__enter__.return_value
+        fake_node.info = {'console': 'https://htmlconsole.com', 'meta': {'configured': False}}
 
         output = tasks.config(cluster_name='mycluster',
                               name='mycluster-1',
@@ -156,7 +216,7 @@ class TestTasks(unittest.TestCase):
     @patch.object(tasks, 'setup_onefs')
     def test_config_no_node(self, fake_setup_onefs, fake_vmware):
         """``config`` returns an error if unable to find the node to configure"""
-        fake_vmware.show_onefs.return_value = {}
+        fake_vmware.OneFSNode.return_value.__enter__.side_effect = ValueError('No node named mycluster-1 found')
 
         output = tasks.config(cluster_name='mycluster',
                               name='mycluster-1',
@@ -180,13 +240,42 @@ class TestTasks(unittest.TestCase):
 
         self.assertEqual(output, expected)
 
+    @patch.object(tasks, 'vmware')
+    @patch.object(tasks, 'setup_onefs')
+    def test_config_wrong_screen(self, fake_setup_onefs, fake_vmware):
+        """``config`` returns an error when the wizard isn't on the expected screen"""
+        fake_node = fake_vmware.OneFSNode.return_value.__enter__.return_value
+        fake_node.info = {'console': 'https://htmlconsole.com', 'meta': {'configured': False}}
+        fake_setup_onefs.configure_new_cluster.side_effect = RuntimeError('Expected the wizard screen')
+
+        output = tasks.config(cluster_name='mycluster',
+                              name='mycluster-1',
+                              username='bob',
+                              version='8.1.1.0',
+                              int_netmask='255.255.255.0',
+                              int_ip_low='5.5.5.1',
+                              int_ip_high='5.5.5.10',
+                              ext_netmask='255.255.255.0',
+                              ext_ip_low='10.1.1.2',
+                              ext_ip_high='10.1.1.20',
+                              gateway='10.1.1.1',
+                              dns_servers='1.1.1.1,8.8.8.8',
+                              encoding='utf-8',
+                              sc_zonename='myzone.foo.com',
+                              smartconnect_ip='10.1.1.21',
+                              join_cluster=False,
+                              compliance=False,
+                              txn_id='myId')
+
+        self.assertEqual(output['error'], 'Expected the wizard screen')
+        self.assertFalse(fake_node.update_meta.called)
+
     @patch.object(tasks, 'vmware')
     @patch.object(tasks, 'setup_onefs')
     def test_config_already_configed(self, fake_setup_onefs, fake_vmware):
         """``config`` returns an error if the node is already configured"""
-        fake_vmware.show_onefs.return_value = {'mycluster-1' : {'console': 'https://htmlconsole.com',
-                                                                'meta': {'configured': True}}}
-
+        fake_node = fake_vmware.OneFSNode.return_value.__enter__.return_value
+        fake_node.info = {'console': 'https://htmlconsole.com', 'meta': {'configured': True}}
 
         output = tasks.config(cluster_name='mycluster',
                               name='mycluster-1',
@@ -210,6 +299,98 @@ class TestTasks(unittest.TestCase):
 
         self.assertEqual(output, expected)
 
+    @patch.object(tasks, 'vmware')
+    @patch.object(tasks, 'setup_onefs')
+    def test_config_meta(self, fake_setup_onefs, fake_vmware):
+        """``config`` marks the node as configured, without inspecting every node the user owns"""
+        fake_node = fake_vmware.OneFSNode.return_value.__enter__.return_value
+        fake_node.info = {'console': 'https://htmlconsole.com', 'meta': {'configured': False}}
+
+        tasks.config(cluster_name='mycluster',
+                     name='mycluster-1',
+                     username='bob',
+                     version='8.1.1.0',
+                     int_netmask='255.255.255.0',
+                     int_ip_low='5.5.5.1',
+                     int_ip_high='5.5.5.10',
+                     ext_netmask='255.255.255.0',
+                     ext_ip_low='10.1.1.2',
+                     ext_ip_high='10.1.1.20',
+                     gateway='10.1.1.1',
+                     dns_servers='1.1.1.1,8.8.8.8',
+                     encoding='utf-8',
+                     sc_zonename='myzone.foo.com',
+                     smartconnect_ip='10.1.1.21',
+                     join_cluster=False,
+                     compliance=False,
+                     txn_id='myId')
+
+        self.assertFalse(fake_vmware.show_onefs.called)
+        fake_node.update_meta.assert_called_once_with({'configured': True})
+
+    @patch.object(tasks, 'vmware')
+    @patch.object(tasks, 'setup_onefs')
+    def test_config_closes_session(self, fake_setup_onefs, fake_vmware):
+        """``config`` closes the vCenter session once it has the URL of the console"""
+        fake_node = fake_vmware.OneFSNode.return_value.__enter__.return_value
+        fake_node.info = {'console': 'https://htmlconsole.com', 'meta': {'configured': False}}
+        fake_setup_onefs.console_for.return_value = 'wss://esxi01:443/ticket/asdf'
+        closed = []
+        fake_setup_onefs.configure_new_cluster.side_effect = \
+            lambda **kwargs: closed.append(fake_vmware.OneFSNode.return_value.__exit__.called)
+
+        tasks.config(cluster_name='mycluster',
+                     name='mycluster-1',
+                     username='bob',
+                     version='8.1.1.0',
+                     int_netmask='255.255.255.0',
+                     int_ip_low='5.5.5.1',
+                     int_ip_high='5.5.5.10',
+                     ext_netmask='255.255.255.0',
+                     ext_ip_low='10.1.1.2',
+                     ext_ip_high='10.1.1.20',
+                     gateway='10.1.1.1',
+                     dns_servers='1.1.1.1,8.8.8.8',
+                     encoding='utf-8',
+                     sc_zonename='myzone.foo.com',
+                     smartconnect_ip='10.1.1.21',
+                     join_cluster=False,
+                     compliance=False,
+                     txn_id='myId')
+
+        self.assertEqual(closed, [True])
+
+    @patch.object(tasks, 'vmware')
+    @patch.object(tasks, 'setup_onefs')
+    def test_config_scancodes_session(self, fake_setup_onefs, fake_vmware):
+        """``config`` keeps the vCenter session open while the scancodes backend types with it"""
+        fake_node = fake_vmware.OneFSNode.return_value.__enter__.return_value
+        fake_node.info = {'console': 'https://htmlconsole.com', 'meta': {'configured': False}}
+        fake_setup_onefs.console_for.return_value = fake_node.vm
+        closed = []
+        fake_setup_onefs.configure_new_cluster.side_effect = \
+            lambda **kwargs: closed.append(fake_vmware.OneFSNode.return_value.__exit__.called)
+
+        tasks.config(cluster_name='mycluster',
+                     name='mycluster-1',
+                     username='bob',
+                     version='8.1.1.0',
+                     int_netmask='255.255.255.0',
+                     int_ip_low='5.5.5.1',
+                     int_ip_high='5.5.5.10',
+                     ext_netmask='255.255.255.0',
+                     ext_ip_low='10.1.1.2',
+                     ext_ip_high='10.1.1.20',
+                     gateway='10.1.1.1',
+                     dns_servers='1.1.1.1,8.8.8.8',
+                     encoding='utf-8',
+                     sc_zonename='myzone.foo.com',
+                     smartconnect_ip='10.1.1.21',
+                     join_cluster=False,
+                     compliance=False,
+                     txn_id='myId')
+
+        self.assertEqual(closed, [False])
 
     @patch.object(tasks, 'vmware')
     def test_modify_network(self, fake_vmware):
@@ -236,6 +417,299 @@ class TestTasks(unittest.TestCase):
 
         self.assertEqual(output, expected)
 
+    @patch.object(tasks, 'vmware')
+    def test_gc(self, fake_vmware):
+        """``gc`` returns the report of what was reclaimed"""
+        fake_vmware.collect_garbage.return_value = {'reclaimed': 2}
+
+        output = tasks.gc(dry_run=False, txn_id='someTransactionID')
+        expected = {'content': {'reclaimed': 2}, 'error': None, 'params': {}}
+
+        self.assertEqual(output, expected)
+
+    @patch.object(tasks, 'vmware')
+    def test_gc_error(self, fake_vmware):
+        """``gc`` Catches ValueError, and sets the response accordingly"""
+        fake_vmware.collect_garbage.side_effect = ValueError('doh')
+
+        output = tasks.gc(dry_run=True, txn_id='someTransactionID')
+        expected = {'content': {}, 'error': 'doh', 'params': {}}
+
+        self.assertEqual(output, expected)
+
+    @patch.object(tasks, 'vmware')
+    def test_stats(self, fake_vmware):
+        """``stats`` returns the performance stats of the user's nodes"""
+        fake_vmware.get_stats.return_value = {'node': ['isi01'], 'cpu_pct': [1.5]}
+
+        output = tasks.stats(username='pat', txn_id='someTransactionID')
+        expected = {'content': {'node': ['isi01'], 'cpu_pct': [1.5]}, 'error': None, 'params': {}}
+
+        self.assertEqual(output, expected)
+
+    @patch.object(tasks, 'vmware')
+    def test_stats_error(self, fake_vmware):
+        """``stats`` Catches ValueError, and sets the response accordingly"""
+        fake_vmware.get_stats.side_effect = ValueError('doh')
+
+        output = tasks.stats(username='pat', txn_id='someTransactionID')
+        expected = {'content': {}, 'error': 'doh', 'params': {}}
+
+        self.assertEqual(output, expected)
+
+    @patch.object(tasks, 'vmware')
+    def test_reset(self, fake_vmware):
+        """``reset`` returns the info of the node that was reset"""
+        fake_vmware.reset_onefs.return_value = {'isi01': {}}
+
+        output = tasks.reset(username='pat', machine_name='isi01', txn_id='someTransactionID')
+        expected = {'content': {'isi01': {}}, 'error': None, 'params': {}}
+
+        self.assertEqual(output, expected)
+
+    @patch.object(tasks, 'vmware')
+    def test_reset_error(self, fake_vmware):
+        """``reset`` Catches ValueError, and sets the response accordingly"""
+        fake_vmware.reset_onefs.side_effect = ValueError('doh')
+
+        output = tasks.reset(username='pat', machine_name='isi01', txn_id='someTransactionID')
+        expected = {'content': {}, 'error': 'doh', 'params': {}}
+
+        self.assertEqual(output, expected)
+
+    @patch.object(tasks, 'vmware')
+    def test_clone(self, fake_vmware):
+        """``clone`` returns the info of the new clones"""
+        fake_vmware.clone_cluster.return_value = {'isi01-copy': {}}
+
+        output = tasks.clone(username='pat', machine_names=['isi01'], suffix='-copy',
+                             front_end='pat_front', back_end='pat_back', txn_id='someTransactionID')
+        expected = {'content': {'isi01-copy': {}}, 'error': None, 'params': {}}
+
+        self.assertEqual(output, expected)
+
+    @patch.object(tasks, 'vmware')
+    def test_clone_error(self, fake_vmware):
+        """``clone`` Catches ValueError, and sets the response accordingly"""
+        fake_vmware.clone_cluster.side_effect = ValueError('doh')
+
+        output = tasks.clone(username='pat', machine_names=['isi01'], suffix='-copy',
+                             front_end='pat_front', back_end='pat_back', txn_id='someTransactionID')
+        expected = {'content': {}, 'error': 'doh', 'params': {}}
+
+        self.assertEqual(output, expected)
+
+    @patch.object(tasks, 'name_index')
+    @patch.object(tasks, 'vmware')
+    def test_clone_error_releases_names(self, fake_vmware, fake_name_index):
+        """``clone`` releases the names reserved for the clones when cloning fails"""
+        fake_vmware.clone_cluster.side_effect = RuntimeError('doh')
+
+        tasks.clone(username='pat', machine_names=['isi01', 'isi02'], suffix='-copy',
+                    front_end='pat_front', back_end='pat_back', txn_id='someTransactionID')
+        released = [x[0] for x in fake_name_index.release.call_args_list]
+
+        self.assertEqual(released, [('pat', 'isi01-copy'), ('pat', 'isi02-copy')])
+        self.assertFalse(fake_name_index.add.called)
+
+    @patch.object(tasks, 'name_index')
+    @patch.object(tasks, 'vmware')
+    def test_clone_unexpected_error_releases_names(self, fake_vmware, fake_name_index):
+        """``clone`` releases the names reserved for the clones for any failure"""
+        fake_vmware.clone_cluster.side_effect = KeyError('doh')
+
+        with self.assertRaises(KeyError):
+            tasks.clone(username='pat', machine_names=['isi01'], suffix='-copy',
+                        front_end='pat_front', back_end='pat_back', txn_id='someTransactionID')
+
+        fake_name_index.release.assert_called_with('pat', 'isi01-copy')
+
+    @patch.object(tasks, 'inventory_spool')
+    @patch.object(tasks, 'vmware')
+    def test_inventory(self, fake_vmware, fake_inventory_spool):
+        """``inventory`` saves the pages of NDJSON to the spool, and returns how many there are"""
+        fake_inventory_spool.write.return_value = 1
+
+        output = tasks.inventory(txn_id='someTransactionID')
+        the_args, _ = fake_inventory_spool.write.call_args
+        expected = {'content': {'pages': 1}, 'error': None, 'params': {}}
+
+        self.assertEqual(output, expected)
+        self.assertTrue(the_args[1] is fake_vmware.inventory_pages.return_value)
+
+    @patch.object(tasks, 'vmware')
+    def test_modify_cluster_network(self, fake_vmware):
+        """``modify_cluster_network`` returns the result of every node"""
+        fake_vmware.update_cluster_network.return_value = {'isi01': None, 'isi02': None}
+
+        output = tasks.modify_cluster_network(username='pat', machine_names=['isi01', 'isi02'],
+                                              new_network='pat_front2', txn_id='someTransactionID')
+        expected = {'content': {'isi01': None, 'isi02': None}, 'error': None, 'params': {}}
+
+        self.assertEqual(output, expected)
+
+    @patch.object(tasks, 'vmware')
+    def test_modify_cluster_network_partial(self, fake_vmware):
+        """``modify_cluster_network`` sets the error when some nodes were not moved"""
+        fake_vmware.update_cluster_network.return_value = {'isi01': None, 'isi02': 'doh'}
+
+        output = tasks.modify_cluster_network(username='pat', machine_names=['isi01', 'isi02'],
+                                              new_network='pat_front2', txn_id='someTransactionID')
+        expected = {'content': {'isi01': None, 'isi02': 'doh'},
+                    'error': 'Unable to move node(s): isi02',
+                    'params': {}}
+
+        self.assertEqual(output, expected)
+
+    @patch.object(tasks, 'vmware')
+    def test_modify_cluster_network_error(self, fake_vmware):
+        """``modify_cluster_network`` Catches ValueError, and sets the response accordingly"""
+        fake_vmware.update_cluster_network.side_effect = ValueError('doh')
+
+        output = tasks.modify_cluster_network(username='pat', machine_names=['isi01'],
+                                              new_network='pat_front2', txn_id='someTransactionID')
+        expected = {'content': {}, 'error': 'doh', 'params': {}}
+
+        self.assertEqual(output, expected)
+
+    @patch.object(tasks, 'name_index')
+    @patch.object(tasks, 'vmware')
+    def test_create_indexes_name(self, fake_vmware, fake_name_index):
+        """``create`` adds the name of the new node to the name index"""
+        fake_vmware.create_onefs.return_value = {'isi01': {}}
+
+        tasks.create(username='pat', machine_name='isi01', image='8.0.0.4', front_end='externalNetwork',
+                     back_end='internalNetwork', ram=4, cpu_count=2, txn_id='someTransactionID')
+
+        fake_name_index.add.assert_called_with('pat', 'isi01')
+
+    @patch.object(tasks, 'name_index')
+    @patch.object(tasks, 'vmware')
+    def test_create_error_releases_name(self, fake_vmware, fake_name_index):
+        """``create`` releases the reservation of the name when the node isn't created"""
+        fake_vmware.create_onefs.side_effect = ValueError('doh')
+
+        tasks.create(username='pat', machine_name='isi01', image='8.0.0.4', front_end='externalNetwork',
+                     back_end='internalNetwork', ram=4, cpu_count=2, txn_id='someTransactionID')
+
+        fake_name_index.release.assert_called_with('pat', 'isi01')
+        self.assertFalse(fake_name_index.add.called)
+
+    @patch.object(tasks, 'name_index')
+    @patch.object(tasks, 'vmware')
+    def test_create_unexpected_error_releases_name(self, fake_vmware, fake_name_index):
+        """``create`` releases the reservation of the name for any failure, not just bad input"""
+        fake_vmware.create_onefs.side_effect = RuntimeError('doh')
+
+        with self.assertRaises(RuntimeError):
+            tasks.create(username='pat', machine_name='isi01', image='8.0.0.4', front_end='externalNetwork',
+                         back_end='internalNetwork', ram=4, cpu_count=2, txn_id='someTransactionID')
+
+        fake_name_index.release.assert_called_with('pat', 'isi01')
+        self.assertFalse(fake_name_index.add.called)
+
+    @patch.object(tasks, 'name_index')
+    @patch.object(tasks, 'vmware')
+    def test_delete_unindexes_name(self, fake_vmware, fake_name_index):
+        """``delete`` removes the name of the node from the name index"""
+        tasks.delete(username='pat', machine_name='isi01', txn_id='someTransactionID')
+
+        fake_name_index.remove.assert_called_with('pat', 'isi01')
+
+    @patch.object(tasks, 'name_index')
+    @patch.object(tasks, 'vmware')
+    def test_show_syncs_names(self, fake_vmware, fake_name_index):
+        """``show`` makes the name index match the nodes the user owns"""
+        fake_vmware.show_onefs.return_value = {'isi01': {}, 'isi02': {}}
+
+        tasks.show(username='pat', txn_id='someTransactionID')
+        the_args, _ = fake_name_index.sync.call_args
+
+        self.assertEqual(set(the_args[1]), {'isi01', 'isi02'})
+
+    @patch.object(tasks, 'vmware')
+    def test_create_disk_provisioning(self, fake_vmware):
+        """``create`` passes the disk provisioning to ``create_onefs``"""
+        fake_vmware.create_onefs.return_value = {'isi01': {}}
+
+        tasks.create(username='pat', machine_name='isi01', image='8.0.0.4', front_end='externalNetwork',
+                     back_end='internalNetwork', ram=4, cpu_count=2, txn_id='someTransactionID',
+                     disk_provisioning='eager-zeroed')
+        _, the_kwargs = fake_vmware.create_onefs.call_args
+
+        self.assertEqual(the_kwargs['disk_provisioning'], 'eager-zeroed')
+
+    @patch.object(tasks, 'name_index')
+    @patch.object(tasks, 'vmware')
+    def test_reap(self, fake_vmware, fake_name_index):
+        """``reap`` returns the nodes it deleted, and drops them from the name index"""
+        fake_vmware.reap_expired.return_value = [{'user': 'pat', 'name': 'isi01'}]
+
+        output = tasks.reap(txn_id='someTransactionID')
+        expected = {'content': {'reaped': [{'user': 'pat', 'name': 'isi01'}]}, 'error': None, 'params': {}}
+
+        self.assertEqual(output, expected)
+        fake_name_index.remove.assert_called_with('pat', 'isi01')
+
+    @patch.object(tasks, 'vmware')
+    def test_extend_lease(self, fake_vmware):
+        """``extend_lease`` returns the info of the node"""
+        fake_vmware.extend_lease.return_value = {'isi01': {}}
+
+        output = tasks.extend_lease(username='pat', machine_name='isi01', hours=24, txn_id='someTransactionID')
+        expected = {'content': {'isi01': {}}, 'error': None, 'params': {}}
+
+        self.assertEqual(output, expected)
+
+    @patch.object(tasks, 'vmware')
+    def test_extend_lease_error(self, fake_vmware):
+        """``extend_lease`` Catches ValueError, and sets the response accordingly"""
+        fake_vmware.extend_lease.side_effect = ValueError('doh')
+
+        output = tasks.extend_lease(username='pat', machine_name='isi01', hours=24, txn_id='someTransactionID')
+        expected = {'content': {}, 'error': 'doh', 'params': {}}
+
+        self.assertEqual(output, expected)
+
+    @patch.object(tasks, 'vmware')
+    def test_idle(self, fake_vmware):
+        """``idle`` returns the report of idle nodes"""
+        fake_vmware.power_off_idle.return_value = {'idle': [], 'powered_off': []}
+
+        output = tasks.idle(txn_id='someTransactionID')
+        expected = {'content': {'idle': [], 'powered_off': []}, 'error': None, 'params': {}}
+
+        self.assertEqual(output, expected)
+
+    @patch.object(tasks, 'vmware')
+    def test_power_on(self, fake_vmware):
+        """``power_on`` returns the result of every node"""
+        fake_vmware.power_on_cluster.return_value = {'isi01': None, 'isi02': None}
+
+        output = tasks.power_on(username='pat', machine_names=['isi01', 'isi02'], txn_id='someTransactionID')
+        expected = {'content': {'isi01': None, 'isi02': None}, 'error': None, 'params': {}}
+
+        self.assertEqual(output, expected)
+
+    @patch.object(tasks, 'vmware')
+    def test_power_on_partial(self, fake_vmware):
+        """``power_on`` sets the error when some nodes did not power on"""
+        fake_vmware.power_on_cluster.return_value = {'isi01': None, 'isi02': 'doh'}
+
+        output = tasks.power_on(username='pat', machine_names=['isi01', 'isi02'], txn_id='someTransactionID')
+
+        self.assertEqual(output['error'], 'Unable to power on node(s): isi02')
+
+    @patch.object(tasks, 'vmware')
+    def test_power_on_error(self, fake_vmware):
+        """``power_on`` Catches RuntimeError, and sets the response accordingly"""
+        fake_vmware.power_on_cluster.side_effect = RuntimeError('doh')
+
+        output = tasks.power_on(username='pat', machine_names=['isi01'], txn_id='someTransactionID')
+        expected = {'content': {}, 'error': 'doh', 'params': {}}
+
+        self.assertEqual(output, expected)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -3,6 +3,7 @@
 A suite of tests for the functions in vmware.py
 """
 import unittest
+from datetime import datetime, timedelta, timezone
 from unittest.mock import patch, MagicMock
 
 from vlab_onefs_api.lib.worker import vmware
@@ -58,6 +59,8 @@ class TestVMware(unittest.TestCase):
 
         self.assertEqual(output, expected)
 
+    @patch.object(vmware.images, 'registry')
+    @patch.object(vmware, 'capacity')
     @patch.object(vmware.virtual_machine, 'adjust_cpu')
     @patch.object(vmware.virtual_machine, 'adjust_ram')
     @patch.object(vmware.virtual_machine, 'set_meta')
@@ -65,16 +68,16 @@ class TestVMware(unittest.TestCase):
     @patch.object(vmware, 'make_network_map')
     @patch.object(vmware, 'Ova')
     @patch.object(vmware.virtual_machine, 'get_info')
-    @patch.object(vmware.virtual_machine, 'deploy_from_ova')
+    @patch.object(vmware, 'deploy_node')
     @patch.object(vmware, 'vCenter')
-    def test_create_onefs(self, fake_vCenter, fake_deploy_from_ova, fake_get_info,
+    def test_create_onefs(self, fake_vCenter, fake_deploy_node, fake_get_info,
                           fake_Ova, make_network_map, fake_consume_task, fake_set_meta,
-                          fake_adjust_ram, fake_adjust_cpu):
+                          fake_adjust_ram, fake_adjust_cpu, fake_capacity, fake_registry):
         """``create_onefs`` returns the new onefs's info when everything works"""
         fake_logger = MagicMock()
         fake_Ova.return_value.networks = ['vLabNetwork']
         fake_get_info.return_value = {'worked' : True}
-        fake_deploy_from_ova.return_value.name = 'isi01'
+        fake_deploy_node.return_value.name = 'isi01'
 
         output = vmware.create_onefs(username='alice',
                                      machine_name='isi01',
@@ -88,15 +91,17 @@ class TestVMware(unittest.TestCase):
 
         self.assertEqual(output, expected)
 
+    @patch.object(vmware.images, 'registry')
+    @patch.object(vmware, 'capacity')
     @patch.object(vmware.virtual_machine, 'adjust_cpu')
     @patch.object(vmware, 'consume_task')
     @patch.object(vmware, 'Ova')
     @patch.object(vmware.virtual_machine, 'get_info')
-    @patch.object(vmware.virtual_machine, 'deploy_from_ova')
+    @patch.object(vmware, 'deploy_node')
     @patch.object(vmware, 'vCenter')
-    def test_create_onefs_value_error(self, fake_vCenter, fake_deploy_from_ova,
+    def test_create_onefs_value_error(self, fake_vCenter, fake_deploy_node,
                                       fake_get_info, fake_Ova, fake_consume_task,
-                                      fake_adjust_cpu):
+                                      fake_adjust_cpu, fake_capacity, fake_registry):
         """``create_onefs`` raises ValueError if supplied with a non-existing front_end network"""
         fake_logger = MagicMock()
         fake_Ova.return_value.networks = ['vLabNetwork']
@@ -113,12 +118,14 @@ class TestVMware(unittest.TestCase):
                                     cpu_count=2,
                                     logger=fake_logger)
 
+    @patch.object(vmware.images, 'registry')
+    @patch.object(vmware, 'capacity')
     @patch.object(vmware, 'consume_task')
     @patch.object(vmware, 'Ova')
     @patch.object(vmware.virtual_machine, 'get_info')
-    @patch.object(vmware.virtual_machine, 'deploy_from_ova')
+    @patch.object(vmware, 'deploy_node')
     @patch.object(vmware, 'vCenter')
-    def test_create_onefs_value_error_2(self, fake_vCenter, fake_deploy_from_ova, fake_get_info, fake_Ova, fake_consume_task):
+    def test_create_onefs_value_error_2(self, fake_vCenter, fake_deploy_node, fake_get_info, fake_Ova, fake_consume_task, fake_capacity, fake_registry):
         """``create_onefs`` raises ValueError if supplied with a non-existing back_end network"""
         fake_logger = MagicMock()
         fake_Ova.return_value.networks = ['vLabNetwork']
@@ -135,12 +142,35 @@ class TestVMware(unittest.TestCase):
                                     cpu_count=2,
                                     logger=fake_logger)
 
+    @patch.object(vmware.images, 'registry')
+    @patch.object(vmware, 'capacity')
+    @patch.object(vmware, 'Ova')
+    @patch.object(vmware, 'deploy_node')
+    @patch.object(vmware, 'vCenter')
+    def test_create_onefs_no_capacity(self, fake_vCenter, fake_deploy_node, fake_Ova, fake_capacity, fake_registry):
+        """``create_onefs`` does not deploy the OVA when the node won't fit"""
+        fake_capacity.preflight.side_effect = ValueError('Insufficient capacity')
+
+        with self.assertRaises(ValueError):
+            vmware.create_onefs(username='alice',
+                                machine_name='isi01',
+                                image='8.0.0.4',
+                                front_end='externallNetwork',
+                                back_end='internalNetwork',
+                                ram=4,
+                                cpu_count=2,
+                                logger=MagicMock())
+        self.assertFalse(fake_deploy_node.called)
+        self.assertTrue(fake_Ova.return_value.close.called)
+
+    @patch.object(vmware.images, 'registry')
+    @patch.object(vmware, 'capacity')
     @patch.object(vmware, 'consume_task')
     @patch.object(vmware, 'Ova')
     @patch.object(vmware.virtual_machine, 'get_info')
-    @patch.object(vmware.virtual_machine, 'deploy_from_ova')
+    @patch.object(vmware, 'deploy_node')
     @patch.object(vmware, 'vCenter')
-    def test_create_onefs_bad_image(self, fake_vCenter, fake_deploy_from_ova, fake_get_info, fake_Ova, fake_consume_task):
+    def test_create_onefs_bad_image(self, fake_vCenter, fake_deploy_node, fake_get_info, fake_Ova, fake_consume_task, fake_capacity, fake_registry):
         """``create_onefs`` raises ValueError if supplied with a non-existing image of OneFS"""
         fake_logger = MagicMock()
         fake_Ova.side_effect = FileNotFoundError("testing")
@@ -179,6 +209,87 @@ class TestVMware(unittest.TestCase):
         self.assertTrue(fake_power.called)
         self.assertTrue(fake_vm.Destroy_Task.called)
 
+    @patch.object(vmware.virtual_machine, 'get_info')
+    @patch.object(vmware, 'consume_task')
+    @patch.object(vmware.virtual_machine, 'power')
+    @patch.object(vmware, 'vCenter')
+    def test_delete_onefs_has_clones(self, fake_vCenter, fake_power, fake_consume_task, fake_get_info):
+        """``delete_onefs`` refuses to delete a node that linked clones depend on"""
+        fake_vm = MagicMock()
+        fake_vm.name = 'isi01'
+        fake_clone = MagicMock()
+        fake_clone.name = 'isi01-copy'
+        fake_folder = MagicMock()
+        fake_folder.childEntity = [fake_vm, fake_clone]
+        fake_vCenter.return_value.__enter__.return_value.get_by_name.return_value = fake_folder
+        fake_get_info.return_value = {'meta': {'component': 'OneFS', 'clones': ['isi01-copy']}}
+
+        with self.assertRaises(ValueError):
+            vmware.delete_onefs(username='alice', machine_name='isi01', logger=MagicMock())
+        self.assertFalse(fake_vm.Destroy_Task.called)
+
+    @patch.object(vmware.virtual_machine, 'get_info')
+    @patch.object(vmware, 'consume_task')
+    @patch.object(vmware.virtual_machine, 'power')
+    @patch.object(vmware, 'vCenter')
+    def test_delete_onefs_stale_clones(self, fake_vCenter, fake_power, fake_consume_task, fake_get_info):
+        """``delete_onefs`` ignores recorded clones that no longer exist"""
+        fake_vm = MagicMock()
+        fake_vm.name = 'isi01'
+        fake_folder = MagicMock()
+        fake_folder.childEntity = [fake_vm]
+        fake_vCenter.return_value.__enter__.return_value.get_by_name.return_value = fake_folder
+        fake_get_info.return_value = {'meta': {'component': 'OneFS', 'clones': ['isi01-copy']}}
+
+        vmware.delete_onefs(username='alice', machine_name='isi01', logger=MagicMock())
+
+        self.assertTrue(fake_vm.Destroy_Task.called)
+
+    @patch.object(vmware, 'consume_task')
+    @patch.object(vmware, 'virtual_machine')
+    def test_delete_node_clone(self, fake_virtual_machine, fake_consume_task):
+        """Deleting the last clone of a node removes the clone from the node's meta data, and removes the snapshot"""
+        fake_source = MagicMock(spec=vmware.vim.VirtualMachine)
+        fake_source.name = 'isi01'
+        fake_source.config = MagicMock()
+        fake_source.config.annotation = '{"component": "OneFS", "clones": ["isi01-copy"]}'
+        fake_snapshot = MagicMock()
+        fake_source.snapshot.rootSnapshotList = [MagicMock(childSnapshotList=[], snapshot=fake_snapshot)]
+        fake_source.snapshot.rootSnapshotList[0].name = vmware.CLONE_SNAPSHOT
+        fake_clone = MagicMock()
+        fake_clone.name = 'isi01-copy'
+        fake_clone.config.annotation = '{"component": "OneFS", "clone_of": "isi01"}'
+        fake_clone.parent.childEntity = [fake_source]
+
+        vmware._delete_node(fake_clone, MagicMock())
+        meta = fake_virtual_machine.set_meta.call_args[0][1]
+
+        self.assertTrue(fake_clone.Destroy_Task.called)
+        self.assertEqual(meta['clones'], [])
+        self.assertTrue(fake_snapshot.RemoveSnapshot_Task.called)
+
+    @patch.object(vmware, 'consume_task')
+    @patch.object(vmware, 'virtual_machine')
+    def test_delete_node_keeps_snapshot(self, fake_virtual_machine, fake_consume_task):
+        """Deleting a clone keeps the shared snapshot while the node has other clones"""
+        fake_source = MagicMock(spec=vmware.vim.VirtualMachine)
+        fake_source.name = 'isi01'
+        fake_source.config = MagicMock()
+        fake_source.config.annotation = '{"component": "OneFS", "clones": ["isi01-copy", "isi01-b"]}'
+        fake_snapshot = MagicMock()
+        fake_source.snapshot.rootSnapshotList = [MagicMock(childSnapshotList=[], snapshot=fake_snapshot)]
+        fake_source.snapshot.rootSnapshotList[0].name = vmware.CLONE_SNAPSHOT
+        fake_clone = MagicMock()
+        fake_clone.name = 'isi01-copy'
+        fake_clone.config.annotation = '{"component": "OneFS", "clone_of": "isi01"}'
+        fake_clone.parent.childEntity = [fake_source]
+
+        vmware._delete_node(fake_clone, MagicMock())
+        meta = fake_virtual_machine.set_meta.call_args[0][1]
+
+        self.assertEqual(meta['clones'], ['isi01-b'])
+        self.assertFalse(fake_snapshot.RemoveSnapshot_Task.called)
+
     @patch.object(vmware.virtual_machine, 'get_info')
     @patch.object(vmware, 'consume_task')
     @patch.object(vmware.virtual_machine, 'power')
@@ -196,6 +307,8 @@ class TestVMware(unittest.TestCase):
         with self.assertRaises(ValueError):
             vmware.delete_onefs(username='alice', machine_name='not a thing', logger=fake_logger)
 
+    @patch.object(vmware.images, 'registry')
+    @patch.object(vmware, 'capacity')
     @patch.object(vmware.virtual_machine, 'adjust_cpu')
     @patch.object(vmware.virtual_machine, 'adjust_ram')
     @patch.object(vmware.virtual_machine, 'set_meta')
@@ -203,16 +316,16 @@ class TestVMware(unittest.TestCase):
     @patch.object(vmware, 'make_network_map')
     @patch.object(vmware, 'Ova')
     @patch.object(vmware.virtual_machine, 'get_info')
-    @patch.object(vmware.virtual_machine, 'deploy_from_ova')
+    @patch.object(vmware, 'deploy_node')
     @patch.object(vmware, 'vCenter')
-    def test_create_onefs_power(self, fake_vCenter, fake_deploy_from_ova, fake_get_info,
+    def test_create_onefs_power(self, fake_vCenter, fake_deploy_node, fake_get_info,
                                 fake_Ova, make_network_map, fake_consume_task,
-                                fake_set_meta, fake_adjust_ram, fake_adjust_cpu):
+                                fake_set_meta, fake_adjust_ram, fake_adjust_cpu, fake_capacity, fake_registry):
         """``create_onefs`` opts out of the deploy lib powering on the new VM"""
         fake_logger = MagicMock()
         fake_Ova.return_value.networks = ['vLabNetwork']
         fake_get_info.return_value = {'worked' : True}
-        fake_deploy_from_ova.return_value.name = 'isi01'
+        fake_deploy_node.return_value.name = 'isi01'
 
         vmware.create_onefs(username='alice',
                             machine_name='isi01',
@@ -222,12 +335,14 @@ class TestVMware(unittest.TestCase):
                             ram=4,
                             cpu_count=2,
                             logger=fake_logger)
-        _, call_kwargs = fake_deploy_from_ova.call_args
+        _, call_kwargs = fake_deploy_node.call_args
         called_power = call_kwargs['power_on']
         expected_power = False
 
         self.assertEqual(called_power, expected_power)
 
+    @patch.object(vmware.images, 'registry')
+    @patch.object(vmware, 'capacity')
     @patch.object(vmware.virtual_machine, 'adjust_cpu')
     @patch.object(vmware.virtual_machine, 'adjust_ram')
     @patch.object(vmware.virtual_machine, 'power')
@@ -236,17 +351,17 @@ class TestVMware(unittest.TestCase):
     @patch.object(vmware, 'make_network_map')
     @patch.object(vmware, 'Ova')
     @patch.object(vmware.virtual_machine, 'get_info')
-    @patch.object(vmware.virtual_machine, 'deploy_from_ova')
+    @patch.object(vmware, 'deploy_node')
     @patch.object(vmware, 'vCenter')
-    def test_create_onefs_power_false(self, fake_vCenter, fake_deploy_from_ova,
+    def test_create_onefs_power_false(self, fake_vCenter, fake_deploy_node,
                                       fake_get_info, fake_Ova, make_network_map,
                                       fake_consume_task, fake_set_meta, fake_power,
-                                      fake_adjust_ram, fake_adjust_cpu):
+                                      fake_adjust_ram, fake_adjust_cpu, fake_capacity, fake_registry):
         """``create_onefs`` manually powers on the VM"""
         fake_logger = MagicMock()
         fake_Ova.return_value.networks = ['vLabNetwork']
         fake_get_info.return_value = {'worked' : True}
-        fake_deploy_from_ova.return_value.name = 'isi01'
+        fake_deploy_node.return_value.name = 'isi01'
 
         vmware.create_onefs(username='alice',
                             machine_name='isi01',
@@ -262,6 +377,8 @@ class TestVMware(unittest.TestCase):
 
         self.assertEqual(called_power, expected_power)
 
+    @patch.object(vmware.images, 'registry')
+    @patch.object(vmware, 'capacity')
     @patch.object(vmware.virtual_machine, 'adjust_cpu')
     @patch.object(vmware.virtual_machine, 'adjust_ram')
     @patch.object(vmware.virtual_machine, 'set_meta')
@@ -269,16 +386,16 @@ class TestVMware(unittest.TestCase):
     @patch.object(vmware, 'make_network_map')
     @patch.object(vmware, 'Ova')
     @patch.object(vmware.virtual_machine, 'get_info')
-    @patch.object(vmware.virtual_machine, 'deploy_from_ova')
+    @patch.object(vmware, 'deploy_node')
     @patch.object(vmware, 'vCenter')
-    def test_create_onefs_ram(self, fake_vCenter, fake_deploy_from_ova, fake_get_info,
+    def test_create_onefs_ram(self, fake_vCenter, fake_deploy_node, fake_get_info,
                               fake_Ova, make_network_map, fake_consume_task,
-                              fake_set_meta, fake_adjust_ram, fake_adjust_cpu):
+                              fake_set_meta, fake_adjust_ram, fake_adjust_cpu, fake_capacity, fake_registry):
         """``create_onefs`` sets the amount of RAM the VM has"""
         fake_logger = MagicMock()
         fake_Ova.return_value.networks = ['vLabNetwork']
         fake_get_info.return_value = {'worked' : True}
-        fake_deploy_from_ova.return_value.name = 'isi01'
+        fake_deploy_node.return_value.name = 'isi01'
 
         vmware.create_onefs(username='alice',
                             machine_name='isi01',
@@ -294,6 +411,8 @@ class TestVMware(unittest.TestCase):
 
         self.assertEqual(defined_ram, expected_ram)
 
+    @patch.object(vmware.images, 'registry')
+    @patch.object(vmware, 'capacity')
     @patch.object(vmware.virtual_machine, 'adjust_cpu')
     @patch.object(vmware.virtual_machine, 'adjust_ram')
     @patch.object(vmware.virtual_machine, 'set_meta')
@@ -301,16 +420,16 @@ class TestVMware(unittest.TestCase):
     @patch.object(vmware, 'make_network_map')
     @patch.object(vmware, 'Ova')
     @patch.object(vmware.virtual_machine, 'get_info')
-    @patch.object(vmware.virtual_machine, 'deploy_from_ova')
+    @patch.object(vmware, 'deploy_node')
     @patch.object(vmware, 'vCenter')
-    def test_create_onefs_cpu(self, fake_vCenter, fake_deploy_from_ova, fake_get_info,
+    def test_create_onefs_cpu(self, fake_vCenter, fake_deploy_node, fake_get_info,
                               fake_Ova, make_network_map, fake_consume_task,
-                              fake_set_meta, fake_adjust_ram, fake_adjust_cpu):
+                              fake_set_meta, fake_adjust_ram, fake_adjust_cpu, fake_capacity, fake_registry):
         """``create_onefs`` sets the amount of CPU cores the VM has"""
         fake_logger = MagicMock()
         fake_Ova.return_value.networks = ['vLabNetwork']
         fake_get_info.return_value = {'worked' : True}
-        fake_deploy_from_ova.return_value.name = 'isi01'
+        fake_deploy_node.return_value.name = 'isi01'
 
         vmware.create_onefs(username='alice',
                             machine_name='isi01',
@@ -326,29 +445,28 @@ class TestVMware(unittest.TestCase):
 
         self.assertEqual(defined_ram, expected_ram)
 
-    @patch.object(vmware.os, 'listdir')
-    def test_list_images(self, fake_listdir):
+    @patch.object(vmware.images, 'registry')
+    def test_list_images(self, fake_registry):
         """``list_images`` returns a list of images when everything works as expected"""
-        fake_listdir.return_value = ['8.0.0.4.ova']
+        fake_registry.return_value.versions.return_value = ['8.0.0.4']
 
         output = vmware.list_images()
         expected = ['8.0.0.4']
 
         self.assertEqual(output, expected)
 
-    def test_convert_name(self):
-        """``convert_name`` defaults to converting versions to images"""
-        output = vmware.convert_name('8.0.0.4')
-        expected = '8.0.0.4.ova'
+    @patch.object(vmware.images, 'registry')
+    @patch.object(vmware, 'vCenter')
+    def test_create_onefs_unknown_image(self, fake_vCenter, fake_registry):
+        """``create_onefs`` raises ValueError, without connecting to vCenter, for an image that doesn't exist"""
+        fake_registry.return_value.get.return_value = None
 
-        self.assertEqual(output, expected)
+        with self.assertRaises(ValueError):
+            vmware.create_onefs(username='alice', machine_name='isi01', image='4.0.0.0',
+                                front_end='externalNetwork', back_end='internalNetwork',
+                                ram=4, cpu_count=2, logger=MagicMock())
 
-    def test_convert_name_to_version(self):
-        """``convert_name`` can convert from versions to image names"""
-        output = vmware.convert_name('8.0.0.4.ova', to_version=True)
-        expected = '8.0.0.4'
-
-        self.assertEqual(output, expected)
+        self.assertFalse(fake_vCenter.called)
 
     def test_make_network_map(self):
         """``make_network_map`` returns a list when everything works as expected"""
@@ -362,20 +480,6 @@ class TestVMware(unittest.TestCase):
 
         self.assertTrue(isinstance(result, list))
 
-    @patch.object(vmware.virtual_machine, 'set_meta')
-    @patch.object(vmware, 'vCenter')
-    def test_update_meta(self, fake_vCenter, fake_set_meta):
-        """``update_meta`` connets to vSphere and sets the meta data on a supplied VM"""
-        fake_vm = MagicMock()
-        fake_vm.name = 'isi01'
-        fake_folder = MagicMock()
-        fake_folder.childEntity = [fake_vm]
-        fake_vCenter.return_value.__enter__.return_value.get_by_name.return_value = fake_folder
-
-        vmware.update_meta(username='jill', vm_name='isi01', new_meta={'worked': True})
-
-        self.assertTrue(fake_set_meta.called)
-
     @patch.object(vmware.virtual_machine, 'change_network')
     @patch.object(vmware.virtual_machine, 'get_info')
     @patch.object(vmware, 'consume_task')
@@ -437,6 +541,1155 @@ class TestVMware(unittest.TestCase):
                                   machine_name='myOneFS',
                                   new_network='dohNet')
 
+    def _make_gc_vcenter(self, annotation, age):
+        """Build a fake vCenter with a single user folder holding one VM"""
+        fake_vm = MagicMock(spec=vmware.vim.VirtualMachine)
+        fake_vm.name = 'isi01'
+        fake_vm.config.annotation = annotation
+        fake_vm.config.createDate = datetime.now(timezone.utc) - timedelta(seconds=age)
+        fake_folder = MagicMock(spec=vmware.vim.Folder)
+        fake_folder.name = 'alice'
+        fake_folder.childEntity = [fake_vm]
+        fake_vcenter = MagicMock()
+        fake_vcenter.get_vm_folder.return_value.childEntity = [fake_folder]
+        fake_vcenter.content.taskManager.recentTask = []
+        return fake_vcenter, fake_vm
+
+    def test_find_orphans(self):
+        """``find_orphans`` returns old OneFS nodes that only have the meta data written at deploy"""
+        marker = '{"component": "OneFS", "created": 1, "version": "8.0.0.4"}'
+        fake_vcenter, fake_vm = self._make_gc_vcenter(annotation=marker, age=9000)
+
+        output = vmware.find_orphans(fake_vcenter, max_age=3600)
+        expected = [(fake_vm, {'user': 'alice', 'name': 'isi01', 'reason': 'incomplete metadata', 'age': 9000})]
+
+        self.assertEqual(output, expected)
+
+    def test_find_orphans_no_meta(self):
+        """``find_orphans`` ignores VMs without meta data; they might not be OneFS nodes"""
+        fake_vcenter, _ = self._make_gc_vcenter(annotation='', age=9000)
+
+        output = vmware.find_orphans(fake_vcenter, max_age=3600)
+        expected = []
+
+        self.assertEqual(output, expected)
+
+    def test_find_orphans_other_component(self):
+        """``find_orphans`` ignores the VMs of other components"""
+        fake_vcenter, _ = self._make_gc_vcenter(annotation='{"component": "CentOS"}', age=9000)
+
+        output = vmware.find_orphans(fake_vcenter, max_age=3600)
+        expected = []
+
+        self.assertEqual(output, expected)
+
+    def test_find_orphans_incomplete(self):
+        """``find_orphans`` returns old VMs that have incomplete meta data"""
+        fake_vcenter, _ = self._make_gc_vcenter(annotation='{"component": "OneFS"}', age=9000)
+
+        output = vmware.find_orphans(fake_vcenter, max_age=3600)
+        reason = output[0][1]['reason']
+        expected = 'incomplete metadata'
+
+        self.assertEqual(reason, expected)
+
+    def test_find_orphans_young(self):
+        """``find_orphans`` ignores VMs younger than max_age; they might still be deploying"""
+        fake_vcenter, _ = self._make_gc_vcenter(annotation='{"component": "OneFS"}', age=60)
+
+        output = vmware.find_orphans(fake_vcenter, max_age=3600)
+        expected = []
+
+        self.assertEqual(output, expected)
+
+    def test_find_orphans_ok_meta(self):
+        """``find_orphans`` ignores VMs with valid meta data"""
+        meta = '{"component": "OneFS", "created": 1, "version": "8.0.0.4", "generation": 1, "configured": false}'
+        fake_vcenter, _ = self._make_gc_vcenter(annotation=meta, age=9000)
+
+        output = vmware.find_orphans(fake_vcenter, max_age=3600)
+        expected = []
+
+        self.assertEqual(output, expected)
+
+    def _make_deploy_task(self, annotation):
+        """Build a fake OVA deploy task, which locks the VM being imported"""
+        fake_vm = MagicMock(spec=vmware.vim.VirtualMachine)
+        fake_vm.name = 'isi01'
+        fake_vm.config.annotation = annotation
+        fake_task = MagicMock()
+        fake_task.info.descriptionId = 'ResourcePool.ImportVAppLRO'
+        fake_task.info.state = vmware.vim.TaskInfo.State.running
+        fake_task.info.queueTime = datetime.now(timezone.utc) - timedelta(seconds=9000)
+        fake_task.info.entity = MagicMock(spec=vmware.vim.ResourcePool)
+        fake_task.info.locked = [fake_vm]
+        fake_vcenter = MagicMock()
+        fake_vcenter.content.taskManager.recentTask = [fake_task]
+        return fake_vcenter, fake_task
+
+    def test_find_stale_deploys(self):
+        """``find_stale_deploys`` returns OneFS deploys that have been running too long"""
+        fake_vcenter, fake_task = self._make_deploy_task('{"component": "OneFS"}')
+
+        output = vmware.find_stale_deploys(fake_vcenter, max_age=3600)
+        expected = [(fake_task, {'user': fake_task.info.reason.userName, 'name': 'isi01', 'reason': 'stale deploy', 'age': 9000})]
+
+        self.assertEqual(output, expected)
+
+    def test_find_stale_deploys_other(self):
+        """``find_stale_deploys`` ignores the deploys of other components"""
+        fake_vcenter, _ = self._make_deploy_task('{"component": "CentOS"}')
+
+        output = vmware.find_stale_deploys(fake_vcenter, max_age=3600)
+        expected = []
+
+        self.assertEqual(output, expected)
+
+    def test_find_stale_deploys_young(self):
+        """``find_stale_deploys`` ignores OneFS deploys that are still within max_age"""
+        fake_vcenter, _ = self._make_deploy_task('{"component": "OneFS"}')
+
+        output = vmware.find_stale_deploys(fake_vcenter, max_age=99999)
+        expected = []
+
+        self.assertEqual(output, expected)
+
+    @patch.object(vmware, '_destroy_vm')
+    @patch.object(vmware, 'vCenter')
+    def test_collect_garbage_dry_run(self, fake_vCenter, fake_destroy_vm):
+        """``collect_garbage`` only reports what it would reclaim when dry_run is True"""
+        fake_vcenter, _ = self._make_gc_vcenter(annotation='{"component": "OneFS"}', age=9000)
+        fake_vCenter.return_value.__enter__.return_value = fake_vcenter
+
+        output = vmware.collect_garbage(dry_run=True, logger=MagicMock(), max_age=3600)
+
+        self.assertFalse(fake_destroy_vm.called)
+        self.assertEqual(len(output['orphans']), 1)
+
+    @patch.object(vmware.time, 'sleep')
+    @patch.object(vmware, '_destroy_vm')
+    @patch.object(vmware, 'find_orphans')
+    @patch.object(vmware, 'find_stale_deploys')
+    @patch.object(vmware, 'vCenter')
+    def test_collect_garbage_batches(self, fake_vCenter, fake_find_stale_deploys,
+                                     fake_find_orphans, fake_destroy_vm, fake_sleep):
+        """``collect_garbage`` pauses between batches of reclaimed VMs"""
+        record = {'user': 'alice', 'name': 'isi01', 'reason': 'incomplete metadata', 'age': 9000}
+        fake_find_orphans.return_value = [(MagicMock(), record) for _ in range(5)]
+        fake_find_stale_deploys.return_value = []
+
+        output = vmware.collect_garbage(dry_run=False, logger=MagicMock(), batch_size=2, batch_pause=1)
+
+        self.assertEqual(output['reclaimed'], 5)
+        self.assertEqual(fake_sleep.call_count, 2)
+
+    @patch.object(vmware, 'find_orphans')
+    @patch.object(vmware, 'find_stale_deploys')
+    @patch.object(vmware, 'vCenter')
+    @patch.object(vmware, 'const')
+    def test_collect_garbage_shards(self, fake_const, fake_vCenter, fake_find_stale_deploys, fake_find_orphans):
+        """``collect_garbage`` merges the reports of every vCenter server"""
+        fake_const.INF_VCENTER_SERVERS = ['vcenter1', 'vcenter2']
+        record = {'user': 'alice', 'name': 'isi01', 'reason': 'incomplete metadata', 'age': 9000}
+        fake_find_orphans.return_value = [(MagicMock(), record)]
+        fake_find_stale_deploys.return_value = []
+
+        output = vmware.collect_garbage(dry_run=True, logger=MagicMock())
+        servers = [x[1]['host'] for x in fake_vCenter.call_args_list]
+
+        self.assertEqual(len(output['orphans']), 2)
+        self.assertEqual(servers, ['vcenter1', 'vcenter2'])
+
+    @patch.object(vmware.shards, 'locate')
+    @patch.object(vmware, 'vCenter')
+    def test_show_onefs_shard(self, fake_vCenter, fake_locate):
+        """``show_onefs`` connects to the vCenter server that hosts the user"""
+        fake_locate.return_value = 'vcenter2'
+        fake_vCenter.return_value.__enter__.return_value.get_by_name.return_value.childEntity = []
+
+        vmware.show_onefs(username='alice')
+        _, the_kwargs = fake_vCenter.call_args
+
+        self.assertEqual(the_kwargs['host'], 'vcenter2')
+
+    @patch.object(vmware.virtual_machine, 'get_info')
+    @patch.object(vmware, 'vCenter')
+    def test_onefs_node(self, fake_vCenter, fake_get_info):
+        """``OneFSNode`` resolves the node once upon entering the ``with`` statement"""
+        fake_get_info.return_value = {'meta': {'component': 'OneFS'}}
+
+        with vmware.OneFSNode(username='alice', machine_name='isi01') as node:
+            pass
+
+        self.assertEqual(node.info, {'meta': {'component': 'OneFS'}})
+        self.assertEqual(fake_get_info.call_count, 1)
+        self.assertTrue(fake_vCenter.return_value.close.called)
+
+    @patch.object(vmware.virtual_machine, 'get_info')
+    @patch.object(vmware, 'vCenter')
+    def test_onefs_node_not_found(self, fake_vCenter, fake_get_info):
+        """``OneFSNode`` raises ValueError, and closes the session, when there's no such node"""
+        fake_vCenter.return_value.content.searchIndex.FindChild.return_value = None
+
+        with self.assertRaises(ValueError):
+            with vmware.OneFSNode(username='alice', machine_name='isi01'):
+                pass
+
+        self.assertTrue(fake_vCenter.return_value.close.called)
+
+    @patch.object(vmware.virtual_machine, 'get_info')
+    @patch.object(vmware, 'vCenter')
+    def test_onefs_node_not_onefs(self, fake_vCenter, fake_get_info):
+        """``OneFSNode`` raises ValueError when the VM is not a OneFS node"""
+        fake_get_info.return_value = {'meta': {'component': 'CentOS'}}
+
+        with self.assertRaises(ValueError):
+            with vmware.OneFSNode(username='alice', machine_name='isi01'):
+                pass
+
+    @patch.object(vmware.virtual_machine, 'set_meta')
+    @patch.object(vmware.virtual_machine, 'get_info')
+    @patch.object(vmware, 'vCenter')
+    def test_onefs_node_update_meta(self, fake_vCenter, fake_get_info, fake_set_meta):
+        """``OneFSNode.update_meta`` writes the meta data to the node it already found"""
+        fake_get_info.return_value = {'meta': {'component': 'OneFS'}}
+
+        with vmware.OneFSNode(username='alice', machine_name='isi01') as node:
+            node.update_meta({'component': 'OneFS', 'configured': True})
+
+        self.assertEqual(fake_set_meta.call_args[0][0], node.vm)
+        self.assertTrue(node.info['meta']['configured'])
+
+    def _make_perf_vcenter(self):
+        """Build a fake vCenter with a performance manager that knows the counters we need"""
+        fake_vcenter = MagicMock()
+        counters = []
+        for key, (_, name, _) in enumerate(vmware.STATS_COUNTERS):
+            group, metric, rollup = name.split('.')
+            counter = MagicMock()
+            counter.key = key
+            counter.groupInfo.key = group
+            counter.nameInfo.key = metric
+            counter.rollupType = rollup
+            counters.append(counter)
+        fake_vcenter.content.perfManager.perfCounter = counters
+        return fake_vcenter
+
+    @patch.object(vmware.vim.PerformanceManager, 'QuerySpec')
+    def test_query_stats(self, fake_QuerySpec):
+        """``query_stats`` returns averaged stats in columnar form"""
+        vmware._COUNTER_IDS.clear()
+        fake_vcenter = self._make_perf_vcenter()
+        vm_on = MagicMock()
+        vm_on.name = 'isi01'
+        vm_on.runtime.powerState = 'poweredOn'
+        vm_off = MagicMock()
+        vm_off.name = 'isi02'
+        vm_off.runtime.powerState = 'poweredOff'
+        series = MagicMock()
+        series.id.counterId = 0 # cpu.usage.average
+        series.value = [1000, 3000]
+        result = MagicMock()
+        result.entity = vm_on
+        result.value = [series]
+        fake_vcenter.content.perfManager.QueryPerf.return_value = [result]
+
+        output = vmware.query_stats(fake_vcenter, [vm_on, vm_off], samples=2)
+        expected = {'node': ['isi01', 'isi02'],
+                    'cpu_pct': [20.0, None],
+                    'mem_pct': [None, None],
+                    'disk_latency_ms': [None, None],
+                    'disk_kbps': [None, None],
+                    'net_kbps': [None, None]}
+
+        self.assertEqual(output, expected)
+
+    @patch.object(vmware.vim.PerformanceManager, 'QuerySpec')
+    def test_query_stats_one_call(self, fake_QuerySpec):
+        """``query_stats`` pulls the stats of every node in a single QueryPerf call"""
+        vmware._COUNTER_IDS.clear()
+        fake_vcenter = self._make_perf_vcenter()
+        vms = [MagicMock() for _ in range(4)]
+        for vm in vms:
+            vm.runtime.powerState = 'poweredOn'
+        fake_vcenter.content.perfManager.QueryPerf.return_value = []
+
+        vmware.query_stats(fake_vcenter, vms, samples=2)
+
+        _, the_kwargs = fake_vcenter.content.perfManager.QueryPerf.call_args
+        self.assertEqual(fake_vcenter.content.perfManager.QueryPerf.call_count, 1)
+        self.assertEqual(len(the_kwargs['querySpec']), 4)
+
+    def test_get_counter_ids_cached(self):
+        """``_get_counter_ids`` only looks up the performance counters once"""
+        vmware._COUNTER_IDS.clear()
+        fake_vcenter = self._make_perf_vcenter()
+        vmware._get_counter_ids(fake_vcenter)
+        fake_vcenter.content.perfManager.perfCounter = []
+
+        output = vmware._get_counter_ids(fake_vcenter)
+
+        self.assertEqual(len(output), len(vmware.STATS_COUNTERS))
+
+    def test_get_counter_ids_per_server(self):
+        """``_get_counter_ids`` caches the performance counters of each vCenter server separately"""
+        vmware._COUNTER_IDS.clear()
+        fake_vcenter = self._make_perf_vcenter()
+        fake_vcenter.content.about.instanceUuid = 'vcenter1'
+        vmware._get_counter_ids(fake_vcenter)
+        other_vcenter = self._make_perf_vcenter()
+        other_vcenter.content.about.instanceUuid = 'vcenter2'
+        other_vcenter.content.perfManager.perfCounter = []
+
+        output = vmware._get_counter_ids(other_vcenter)
+
+        self.assertEqual(output, {})
+
+    @patch.object(vmware.images, 'registry')
+    @patch.object(vmware, 'capacity')
+    @patch.object(vmware.virtual_machine, 'adjust_cpu')
+    @patch.object(vmware.virtual_machine, 'adjust_ram')
+    @patch.object(vmware.virtual_machine, 'set_meta')
+    @patch.object(vmware, 'consume_task')
+    @patch.object(vmware, 'make_network_map')
+    @patch.object(vmware, 'Ova')
+    @patch.object(vmware.virtual_machine, 'get_info')
+    @patch.object(vmware, 'deploy_node')
+    @patch.object(vmware, 'vCenter')
+    def test_create_onefs_snapshot(self, fake_vCenter, fake_deploy_node, fake_get_info,
+                                   fake_Ova, make_network_map, fake_consume_task,
+                                   fake_set_meta, fake_adjust_ram, fake_adjust_cpu, fake_capacity, fake_registry):
+        """``create_onefs`` takes a factory snapshot of the new node"""
+        fake_deploy_node.return_value.name = 'isi01'
+
+        vmware.create_onefs(username='alice',
+                            machine_name='isi01',
+                            image='8.0.0.4',
+                            front_end='externalNetwork',
+                            back_end='internalNetwork',
+                            ram=4,
+                            cpu_count=2,
+                            logger=MagicMock())
+        _, the_kwargs = fake_deploy_node.return_value.CreateSnapshot_Task.call_args
+
+        self.assertEqual(the_kwargs['name'], vmware.FACTORY_SNAPSHOT)
+
+    def test_find_snapshot(self):
+        """``find_snapshot`` searches the whole snapshot tree"""
+        child = MagicMock()
+        child.name = 'factory'
+        child.childSnapshotList = []
+        root = MagicMock()
+        root.name = 'other'
+        root.childSnapshotList = [child]
+        fake_vm = MagicMock()
+        fake_vm.snapshot.rootSnapshotList = [root]
+
+        output = vmware.find_snapshot(fake_vm, 'factory')
+
+        self.assertTrue(output is child.snapshot)
+
+    def test_find_snapshot_none(self):
+        """``find_snapshot`` returns None when the VM has no snapshots"""
+        fake_vm = MagicMock()
+        fake_vm.snapshot = None
+
+        output = vmware.find_snapshot(fake_vm, 'factory')
+
+        self.assertTrue(output is None)
+
+    @patch.object(vmware, 'find_snapshot')
+    @patch.object(vmware, 'consume_task')
+    @patch.object(vmware.virtual_machine, 'power')
+    @patch.object(vmware, 'OneFSNode')
+    def test_reset_onefs(self, fake_OneFSNode, fake_power, fake_consume_task, fake_find_snapshot):
+        """``reset_onefs`` reverts to the factory snapshot and clears the 'configured' flag"""
+        fake_node = fake_OneFSNode.return_value.__enter__.return_value
+        fake_node.info = {'meta': {'component': 'OneFS', 'configured': True}}
+
+        vmware.reset_onefs(username='alice', machine_name='isi01', logger=MagicMock())
+        new_meta, = fake_node.update_meta.call_args[0]
+
+        self.assertTrue(fake_find_snapshot.return_value.RevertToSnapshot_Task.called)
+        self.assertFalse(new_meta['configured'])
+
+    @patch.object(vmware, 'find_snapshot')
+    @patch.object(vmware, 'OneFSNode')
+    def test_reset_onefs_no_snapshot(self, fake_OneFSNode, fake_find_snapshot):
+        """``reset_onefs`` raises ValueError if the node has no factory snapshot"""
+        fake_find_snapshot.return_value = None
+
+        with self.assertRaises(ValueError):
+            vmware.reset_onefs(username='alice', machine_name='isi01', logger=MagicMock())
+
+    def _make_clone_vcenter(self, existing_clone=None, backend_vms=None):
+        """Build a fake vCenter with one OneFS node named isi01 for the clone tests"""
+        fake_vcenter = MagicMock()
+        fake_source = MagicMock(spec=vmware.vim.VirtualMachine)
+        fake_source.name = 'isi01'
+        fake_source.config = MagicMock()
+        fake_source.config.annotation = '{"component": "OneFS", "created": 1234}'
+        fake_vcenter.content.searchIndex.FindChild.side_effect = [fake_source, existing_clone]
+        fake_vcenter.networks = {'alice_front': MagicMock(), 'alice_back': MagicMock()}
+        fake_vcenter.networks['alice_back'].vm = backend_vms if backend_vms else []
+        return fake_vcenter, fake_source
+
+    @patch.object(vmware, '_clone_spec')
+    @patch.object(vmware, 'consume_task')
+    @patch.object(vmware, 'virtual_machine')
+    @patch.object(vmware, 'vCenter')
+    def test_clone_cluster(self, fake_vCenter, fake_virtual_machine, fake_consume_task, fake_clone_spec):
+        """``clone_cluster`` returns the info of every clone"""
+        fake_vcenter, _ = self._make_clone_vcenter()
+        fake_vCenter.return_value.__enter__.return_value = fake_vcenter
+        fake_clone = MagicMock()
+        fake_clone.name = 'isi01-copy'
+        fake_consume_task.side_effect = [MagicMock(), fake_clone, None]
+        fake_virtual_machine.get_info.return_value = {'worked': True}
+
+        output = vmware.clone_cluster(username='alice', machine_names=['isi01'], suffix='-copy',
+                                      front_end='alice_front', back_end='alice_back', logger=MagicMock())
+        expected = {'isi01-copy': {'worked': True}}
+
+        self.assertEqual(output, expected)
+
+    @patch.object(vmware, '_clone_spec')
+    @patch.object(vmware, 'consume_task')
+    @patch.object(vmware, 'virtual_machine')
+    @patch.object(vmware, 'vCenter')
+    def test_clone_cluster_meta(self, fake_vCenter, fake_virtual_machine, fake_consume_task, fake_clone_spec):
+        """``clone_cluster`` records which node a clone was made from"""
+        fake_vcenter, _ = self._make_clone_vcenter()
+        fake_vCenter.return_value.__enter__.return_value = fake_vcenter
+        fake_consume_task.side_effect = [MagicMock(), MagicMock(), None]
+
+        vmware.clone_cluster(username='alice', machine_names=['isi01'], suffix='-copy',
+                             front_end='alice_front', back_end='alice_back', logger=MagicMock())
+        meta = fake_clone_spec.call_args[0][4]
+
+        self.assertEqual(meta['clone_of'], 'isi01')
+
+    @patch.object(vmware.time, 'time')
+    @patch.object(vmware, '_clone_spec')
+    @patch.object(vmware, 'consume_task')
+    @patch.object(vmware, 'virtual_machine')
+    @patch.object(vmware, 'vCenter')
+    def test_clone_cluster_fresh_meta(self, fake_vCenter, fake_virtual_machine, fake_consume_task, fake_clone_spec,
+                                      fake_time):
+        """``clone_cluster`` doesn't copy the idle state of the source, and gives the clone a whole lease"""
+        fake_vcenter, fake_source = self._make_clone_vcenter()
+        fake_source.config.annotation = ('{"component": "OneFS", "created": 1000, "expires": 4600, '
+                                         '"idle_since": 2000, "idle_off": true, "clones": ["isi01-old"]}')
+        fake_vCenter.return_value.__enter__.return_value = fake_vcenter
+        fake_consume_task.side_effect = [MagicMock(), MagicMock(), None]
+        fake_time.return_value = 5000
+
+        vmware.clone_cluster(username='alice', machine_names=['isi01'], suffix='-copy',
+                             front_end='alice_front', back_end='alice_back', logger=MagicMock())
+        meta = fake_clone_spec.call_args[0][4]
+        expected = {'component': 'OneFS', 'created': 5000, 'expires': 8600, 'clone_of': 'isi01'}
+
+        self.assertEqual(meta, expected)
+
+    @patch.object(vmware, '_clone_spec')
+    @patch.object(vmware, 'consume_task')
+    @patch.object(vmware, 'virtual_machine')
+    @patch.object(vmware, 'vCenter')
+    def test_clone_cluster_links(self, fake_vCenter, fake_virtual_machine, fake_consume_task, fake_clone_spec):
+        """``clone_cluster`` records the clones in the meta data of the source node"""
+        fake_vcenter, fake_source = self._make_clone_vcenter()
+        fake_vCenter.return_value.__enter__.return_value = fake_vcenter
+        fake_consume_task.side_effect = [MagicMock(), MagicMock(), None]
+
+        vmware.clone_cluster(username='alice', machine_names=['isi01'], suffix='-copy',
+                             front_end='alice_front', back_end='alice_back', logger=MagicMock())
+        the_vm, meta = fake_virtual_machine.set_meta.call_args[0]
+
+        self.assertTrue(the_vm is fake_source)
+        self.assertEqual(meta['clones'], ['isi01-copy'])
+
+    @patch.object(vmware, '_clone_spec')
+    @patch.object(vmware, 'consume_task')
+    @patch.object(vmware, 'virtual_machine')
+    @patch.object(vmware, 'vCenter')
+    def test_clone_cluster_reuses_snapshot(self, fake_vCenter, fake_virtual_machine, fake_consume_task, fake_clone_spec):
+        """``clone_cluster`` reuses the clone snapshot of a node that already has clones"""
+        fake_vcenter, fake_source = self._make_clone_vcenter()
+        fake_vCenter.return_value.__enter__.return_value = fake_vcenter
+        fake_snapshot = MagicMock()
+        fake_source.snapshot.rootSnapshotList = [MagicMock(childSnapshotList=[], snapshot=fake_snapshot)]
+        fake_source.snapshot.rootSnapshotList[0].name = vmware.CLONE_SNAPSHOT
+        fake_consume_task.side_effect = [MagicMock(), None]
+
+        vmware.clone_cluster(username='alice', machine_names=['isi01'], suffix='-copy',
+                             front_end='alice_front', back_end='alice_back', logger=MagicMock())
+
+        self.assertFalse(fake_source.CreateSnapshot_Task.called)
+        self.assertTrue(fake_clone_spec.call_args[0][1] is fake_snapshot)
+
+    @patch.object(vmware, '_destroy_vm')
+    @patch.object(vmware, '_clone_spec')
+    @patch.object(vmware, 'consume_task')
+    @patch.object(vmware, 'virtual_machine')
+    @patch.object(vmware, 'vCenter')
+    def test_clone_cluster_rollback(self, fake_vCenter, fake_virtual_machine, fake_consume_task, fake_clone_spec,
+                                    fake_destroy_vm):
+        """``clone_cluster`` removes the clones and snapshots it made when a clone fails"""
+        fake_vcenter, fake_source = self._make_clone_vcenter()
+        fake_other = MagicMock(spec=vmware.vim.VirtualMachine)
+        fake_other.name = 'isi02'
+        fake_other.config = MagicMock()
+        fake_other.config.annotation = '{"component": "OneFS", "created": 1234}'
+        fake_vcenter.content.searchIndex.FindChild.side_effect = [fake_source, None, fake_other, None]
+        fake_vCenter.return_value.__enter__.return_value = fake_vcenter
+        fake_clone = MagicMock(spec=vmware.vim.VirtualMachine)
+        fake_clone.name = 'isi01-copy'
+        fake_folder = fake_vcenter.get_by_name.return_value
+        fake_folder.childEntity = [fake_source, fake_other, fake_clone]
+        snap1, snap2 = MagicMock(), MagicMock()
+        fake_consume_task.side_effect = [snap1, snap2, fake_clone, RuntimeError('doh'), None, None, None, None, None, None]
+
+        with self.assertRaises(RuntimeError):
+            vmware.clone_cluster(username='alice', machine_names=['isi01', 'isi02'], suffix='-copy',
+                                 front_end='alice_front', back_end='alice_back', logger=MagicMock())
+
+        self.assertEqual(fake_destroy_vm.call_args_list[0][0][0], fake_clone)
+        self.assertTrue(snap1.RemoveSnapshot_Task.called)
+        self.assertTrue(snap2.RemoveSnapshot_Task.called)
+        self.assertFalse(fake_virtual_machine.set_meta.called)
+
+    def test_clone_cluster_bad_suffix(self):
+        """``clone_cluster`` raises ValueError if the names of the clones are not valid hostnames"""
+        with self.assertRaises(ValueError):
+            vmware.clone_cluster(username='alice', machine_names=['isi01'], suffix='_copy',
+                                 front_end='alice_front', back_end='alice_back', logger=MagicMock())
+
+    @patch.object(vmware, 'vCenter')
+    def test_clone_cluster_no_node(self, fake_vCenter):
+        """``clone_cluster`` raises ValueError if a source node does not exist"""
+        fake_vcenter, _ = self._make_clone_vcenter()
+        fake_vcenter.content.searchIndex.FindChild.side_effect = [None]
+        fake_vCenter.return_value.__enter__.return_value = fake_vcenter
+
+        with self.assertRaises(ValueError):
+            vmware.clone_cluster(username='alice', machine_names=['isi01'], suffix='-copy',
+                                 front_end='alice_front', back_end='alice_back', logger=MagicMock())
+
+    @patch.object(vmware, 'vCenter')
+    def test_clone_cluster_name_taken(self, fake_vCenter):
+        """``clone_cluster`` raises ValueError if the name of a clone is already used"""
+        fake_vcenter, _ = self._make_clone_vcenter(existing_clone=MagicMock())
+        fake_vCenter.return_value.__enter__.return_value = fake_vcenter
+
+        with self.assertRaises(ValueError):
+            vmware.clone_cluster(username='alice', machine_names=['isi01'], suffix='-copy',
+                                 front_end='alice_front', back_end='alice_back', logger=MagicMock())
+
+    @patch.object(vmware, 'vCenter')
+    def test_clone_cluster_bad_network(self, fake_vCenter):
+        """``clone_cluster`` raises ValueError if a network does not exist"""
+        fake_vcenter, _ = self._make_clone_vcenter()
+        fake_vCenter.return_value.__enter__.return_value = fake_vcenter
+
+        with self.assertRaises(ValueError):
+            vmware.clone_cluster(username='alice', machine_names=['isi01'], suffix='-copy',
+                                 front_end='alice_nope', back_end='alice_back', logger=MagicMock())
+
+    @patch.object(vmware, 'vCenter')
+    def test_clone_cluster_shared_backend(self, fake_vCenter):
+        """``clone_cluster`` raises ValueError if the backend network is already in use"""
+        fake_vcenter, fake_source = self._make_clone_vcenter(backend_vms=[MagicMock()])
+        fake_vCenter.return_value.__enter__.return_value = fake_vcenter
+
+        with self.assertRaises(ValueError):
+            vmware.clone_cluster(username='alice', machine_names=['isi01'], suffix='-copy',
+                                 front_end='alice_front', back_end='alice_back', logger=MagicMock())
+        self.assertFalse(fake_source.CreateSnapshot_Task.called)
+
+    def _make_inventory_vcenter(self, pages):
+        """Build a fake vCenter where the PropertyCollector returns the supplied pages of VMs"""
+        fake_vcenter = MagicMock()
+        results = []
+        for idx, page in enumerate(pages):
+            result = MagicMock()
+            result.token = 'more' if idx < len(pages) - 1 else None
+            result.objects = []
+            for props in page:
+                obj_content = MagicMock()
+                obj_content.obj = props['name']
+                obj_content.propSet = []
+                for name, val in props.items():
+                    prop = MagicMock()
+                    prop.name = name
+                    prop.val = val
+                    obj_content.propSet.append(prop)
+                result.objects.append(obj_content)
+            results.append(result)
+        collector = fake_vcenter.content.propertyCollector
+        collector.RetrieveContentsEx.return_value = results[0]
+        collector.ContinueRetrievePropertiesEx.side_effect = results[1:]
+        return fake_vcenter
+
+    @patch.object(vmware.vim, 'PropertyCollector')
+    def test_retrieve_pages(self, fake_PropertyCollector):
+        """``_retrieve_pages`` follows the token until every page is pulled"""
+        fake_vcenter = self._make_inventory_vcenter([[{'name': 'vm1'}], [{'name': 'vm2'}]])
+
+        output = list(vmware._retrieve_pages(fake_vcenter, MagicMock(), vmware.vim.VirtualMachine, ['name'], 1))
+        expected = [[{'name': 'vm1', 'obj': 'vm1'}], [{'name': 'vm2', 'obj': 'vm2'}]]
+
+        self.assertEqual(output, expected)
+
+    @patch.object(vmware.vim, 'PropertyCollector')
+    def test_retrieve_pages_destroys_view(self, fake_PropertyCollector):
+        """``_retrieve_pages`` destroys the ContainerView it makes"""
+        fake_vcenter = self._make_inventory_vcenter([[{'name': 'vm1'}]])
+
+        list(vmware._retrieve_pages(fake_vcenter, MagicMock(), vmware.vim.VirtualMachine, ['name'], 1))
+        view = fake_vcenter.content.viewManager.CreateContainerView.return_value
+
+        self.assertTrue(view.Destroy.called)
+
+    @patch.object(vmware, '_retrieve_pages')
+    @patch.object(vmware, 'vCenter')
+    def test_inventory_pages(self, fake_vCenter, fake_retrieve_pages):
+        """``inventory_pages`` yields NDJSON of only the OneFS nodes"""
+        folders = [[{'obj': 'folder-1', 'name': 'alice'}]]
+        meta = '{"component": "OneFS", "version": "8.0.0.4", "configured": true}'
+        vms = [[{'name': 'isi01', 'parent': 'folder-1', 'config.annotation': meta, 'runtime.powerState': 'poweredOn'},
+                {'name': 'other', 'parent': 'folder-1', 'config.annotation': '', 'runtime.powerState': 'poweredOn'}]]
+        fake_retrieve_pages.side_effect = [iter(folders), iter(vms)]
+
+        output = list(vmware.inventory_pages(page_size=10))
+        expected = ['{"user":"alice","name":"isi01","version":"8.0.0.4","power":"poweredOn","configured":true}\n']
+
+        self.assertEqual(output, expected)
+
+    @patch.object(vmware, '_retrieve_pages')
+    @patch.object(vmware, 'vCenter')
+    def test_inventory_pages_skips_empty(self, fake_vCenter, fake_retrieve_pages):
+        """``inventory_pages`` does not yield pages that have no OneFS nodes"""
+        vms = [[{'name': 'other', 'parent': 'folder-1', 'config.annotation': '', 'runtime.powerState': 'poweredOn'}]]
+        fake_retrieve_pages.side_effect = [iter([]), iter(vms)]
+
+        output = list(vmware.inventory_pages(page_size=10))
+
+        self.assertEqual(output, [])
+
+    def _make_network_vcenter(self, names):
+        """Build a fake vCenter where the user owns OneFS nodes by the supplied names"""
+        fake_vcenter = MagicMock()
+        fake_vcenter.networks = {'alice_front2': MagicMock()}
+        nodes = {}
+        for name in names:
+            node = MagicMock(spec=vmware.vim.VirtualMachine)
+            node.config = MagicMock()
+            node.config.annotation = '{"component": "OneFS"}'
+            nic = MagicMock()
+            nic.deviceInfo.label = 'Network adapter 2'
+            node.config.hardware.device = [nic]
+            nodes[name] = node
+        fake_vcenter.content.searchIndex.FindChild.side_effect = lambda entity, name: nodes.get(name, None)
+        return fake_vcenter, nodes
+
+    @patch.object(vmware.vim.vm, 'ConfigSpec')
+    @patch.object(vmware, '_nic_spec')
+    @patch.object(vmware, 'consume_task')
+    @patch.object(vmware, 'vCenter')
+    def test_update_cluster_network(self, fake_vCenter, fake_consume_task, fake_nic_spec, fake_ConfigSpec):
+        """``update_cluster_network`` starts reconfiguring every node before waiting on any of them"""
+        fake_vcenter, nodes = self._make_network_vcenter(['isi01', 'isi02'])
+        fake_vCenter.return_value.__enter__.return_value = fake_vcenter
+        started = []
+        fake_consume_task.side_effect = lambda task: started.append(all(x.ReconfigVM_Task.called for x in nodes.values()))
+
+        output = vmware.update_cluster_network(username='alice', machine_names=['isi01', 'isi02'],
+                                               new_network='alice_front2', logger=MagicMock())
+        expected = {'isi01': None, 'isi02': None}
+
+        self.assertEqual(output, expected)
+        self.assertEqual(started, [True, True])
+
+    @patch.object(vmware.vim.vm, 'ConfigSpec')
+    @patch.object(vmware, '_nic_spec')
+    @patch.object(vmware, 'consume_task')
+    @patch.object(vmware, 'vCenter')
+    def test_update_cluster_network_missing_node(self, fake_vCenter, fake_consume_task, fake_nic_spec, fake_ConfigSpec):
+        """``update_cluster_network`` reports the nodes it could not find, and moves the rest"""
+        fake_vcenter, nodes = self._make_network_vcenter(['isi01'])
+        fake_vCenter.return_value.__enter__.return_value = fake_vcenter
+
+        output = vmware.update_cluster_network(username='alice', machine_names=['isi01', 'isi02'],
+                                               new_network='alice_front2', logger=MagicMock())
+
+        self.assertEqual(output['isi01'], None)
+        self.assertEqual(output['isi02'], 'No node named isi02 found')
+
+    @patch.object(vmware.vim.vm, 'ConfigSpec')
+    @patch.object(vmware, '_nic_spec')
+    @patch.object(vmware, 'consume_task')
+    @patch.object(vmware, 'vCenter')
+    def test_update_cluster_network_task_error(self, fake_vCenter, fake_consume_task, fake_nic_spec, fake_ConfigSpec):
+        """``update_cluster_network`` reports the nodes that failed to be reconfigured"""
+        fake_vcenter, nodes = self._make_network_vcenter(['isi01', 'isi02'])
+        fake_vCenter.return_value.__enter__.return_value = fake_vcenter
+        fake_consume_task.side_effect = [None, RuntimeError('doh')]
+
+        output = vmware.update_cluster_network(username='alice', machine_names=['isi01', 'isi02'],
+                                               new_network='alice_front2', logger=MagicMock())
+        expected = {'isi01': None, 'isi02': 'doh'}
+
+        self.assertEqual(output, expected)
+
+    @patch.object(vmware.vim.vm, 'ConfigSpec')
+    @patch.object(vmware, '_nic_spec')
+    @patch.object(vmware, 'consume_task')
+    @patch.object(vmware, 'vCenter')
+    def test_update_cluster_network_no_nic(self, fake_vCenter, fake_consume_task, fake_nic_spec, fake_ConfigSpec):
+        """``update_cluster_network`` reports the nodes without a front-end NIC, and moves the rest"""
+        fake_vcenter, nodes = self._make_network_vcenter(['isi01', 'isi02'])
+        fake_vCenter.return_value.__enter__.return_value = fake_vcenter
+        nodes['isi02'].config.hardware.device = []
+
+        output = vmware.update_cluster_network(username='alice', machine_names=['isi01', 'isi02'],
+                                               new_network='alice_front2', logger=MagicMock())
+        expected = {'isi01': None, 'isi02': 'Node isi02 has no front-end NIC'}
+
+        self.assertEqual(output, expected)
+        self.assertFalse(nodes['isi02'].ReconfigVM_Task.called)
+
+    @patch.object(vmware, 'vCenter')
+    def test_update_cluster_network_no_network(self, fake_vCenter):
+        """``update_cluster_network`` raises ValueError if the new network does not exist"""
+        fake_vcenter, _ = self._make_network_vcenter(['isi01'])
+        fake_vCenter.return_value.__enter__.return_value = fake_vcenter
+
+        with self.assertRaises(ValueError):
+            vmware.update_cluster_network(username='alice', machine_names=['isi01'],
+                                          new_network='alice_nope', logger=MagicMock())
+
+    @staticmethod
+    def _import_spec(target, *args, **kwargs):
+        """Stands in for ``deploy_from_ova``, which builds the import spec through the vCenter it's given"""
+        datastore = target.datastores['anything']
+        host = list(target.host_systems.values())[0]
+        cisp = MagicMock()
+        target.ovf_manager.CreateImportSpec(ovfDescriptor='<ovf/>', resourcePool=target.resource_pools['pool'],
+                                            datastore=datastore, cisp=cisp)
+        return cisp, datastore, host
+
+    @patch.object(vmware.virtual_machine, 'deploy_from_ova')
+    def test_deploy_node(self, fake_deploy_from_ova):
+        """``deploy_node`` passes the requested disk provisioning to the import spec"""
+        fake_deploy_from_ova.side_effect = self._import_spec
+        fake_vcenter = MagicMock()
+        fake_vcenter.host_systems = {'esxi1': MagicMock()}
+        fake_vcenter.host_systems['esxi1'].runtime.inMaintenanceMode = False
+
+        cisp, _, _ = vmware.deploy_node(fake_vcenter, MagicMock(), [], 'alice', 'isi01', MagicMock(),
+                                        power_on=False, disk_provisioning='eager-zeroed')
+
+        self.assertEqual(cisp.diskProvisioning, 'eagerZeroedThick')
+
+    @patch.object(vmware.virtual_machine, 'deploy_from_ova')
+    def test_deploy_node_meta(self, fake_deploy_from_ova):
+        """``deploy_node`` writes the supplied meta data to the notes of the VM as it's created"""
+        fake_deploy_from_ova.side_effect = self._import_spec
+        fake_vcenter = MagicMock()
+        fake_vcenter.host_systems = {'esxi1': MagicMock()}
+        fake_vcenter.host_systems['esxi1'].runtime.inMaintenanceMode = False
+        spec = fake_vcenter.ovf_manager.CreateImportSpec.return_value
+
+        vmware.deploy_node(fake_vcenter, MagicMock(), [], 'alice', 'isi01', MagicMock(),
+                           power_on=False, meta={'component': 'OneFS'})
+
+        self.assertEqual(spec.importSpec.configSpec.annotation, '{"component":"OneFS"}')
+
+    @patch.object(vmware.virtual_machine, 'deploy_from_ova')
+    def test_deploy_node_placement(self, fake_deploy_from_ova):
+        """``deploy_node`` only lets ``deploy_from_ova`` choose the supplied datastore and host"""
+        fake_deploy_from_ova.side_effect = self._import_spec
+        fake_datastore = MagicMock()
+        fake_host = MagicMock()
+        fake_host.name = 'esxi2'
+
+        _, datastore, host = vmware.deploy_node(MagicMock(), MagicMock(), [], 'alice', 'isi01', MagicMock(),
+                                                datastore=fake_datastore, host=fake_host)
+
+        self.assertTrue(datastore is fake_datastore)
+        self.assertTrue(host is fake_host)
+
+    @patch.object(vmware.virtual_machine, 'deploy_from_ova')
+    def test_deploy_node_power(self, fake_deploy_from_ova):
+        """``deploy_node`` passes the power_on param to ``deploy_from_ova``"""
+        vmware.deploy_node(MagicMock(), MagicMock(), [], 'alice', 'isi01', MagicMock(),
+                           power_on=False, datastore=MagicMock(), host=MagicMock())
+        _, the_kwargs = fake_deploy_from_ova.call_args
+
+        self.assertFalse(the_kwargs['power_on'])
+
+    @patch.object(vmware.images, 'registry')
+    @patch.object(vmware, 'capacity')
+    @patch.object(vmware, 'take_snapshot')
+    @patch.object(vmware, 'virtual_machine')
+    @patch.object(vmware, 'make_network_map')
+    @patch.object(vmware, 'Ova')
+    @patch.object(vmware, 'deploy_node')
+    @patch.object(vmware, 'vCenter')
+    def test_create_onefs_marker(self, fake_vCenter, fake_deploy_node, fake_Ova, fake_make_network_map,
+                                 fake_virtual_machine, fake_take_snapshot, fake_capacity, fake_registry):
+        """``create_onefs`` marks the VM as a OneFS node when it's deployed, so the GC can find it if create fails"""
+        vmware.create_onefs(username='alice', machine_name='isi01', image='8.0.0.4',
+                            front_end='externalNetwork', back_end='internalNetwork',
+                            ram=4, cpu_count=2, logger=MagicMock())
+        _, deploy_kwargs = fake_deploy_node.call_args
+
+        self.assertEqual(deploy_kwargs['meta']['component'], 'OneFS')
+
+    @patch.object(vmware.images, 'registry')
+    @patch.object(vmware, 'capacity')
+    @patch.object(vmware, 'take_snapshot')
+    @patch.object(vmware, 'virtual_machine')
+    @patch.object(vmware, 'make_network_map')
+    @patch.object(vmware, 'Ova')
+    @patch.object(vmware, 'deploy_node')
+    @patch.object(vmware, 'vCenter')
+    def test_create_onefs_placement(self, fake_vCenter, fake_deploy_node, fake_Ova, fake_make_network_map,
+                                    fake_virtual_machine, fake_take_snapshot, fake_capacity, fake_registry):
+        """``create_onefs`` deploys to the datastore and host that passed the preflight"""
+        fake_capacity.preflight.return_value = {'datastore': 'ds2', 'host': 'esxi2', 'headroom': {}}
+        fake_host = MagicMock()
+        fake_vCenter.return_value.__enter__.return_value.host_systems = {'esxi1': MagicMock(), 'esxi2': fake_host}
+
+        vmware.create_onefs(username='alice', machine_name='isi01', image='8.0.0.4',
+                            front_end='externalNetwork', back_end='internalNetwork',
+                            ram=4, cpu_count=2, logger=MagicMock())
+        _, deploy_kwargs = fake_deploy_node.call_args
+
+        self.assertEqual(fake_capacity.find_datastore.call_args[0][1], 'ds2')
+        self.assertTrue(deploy_kwargs['datastore'] is fake_capacity.find_datastore.return_value)
+        self.assertTrue(deploy_kwargs['host'] is fake_host)
+
+    def test_deploy_node_bad_provisioning(self):
+        """``deploy_node`` raises ValueError for an unknown type of disk provisioning"""
+        with self.assertRaises(ValueError):
+            vmware.deploy_node(MagicMock(), MagicMock(), [], 'alice', 'isi01', MagicMock(),
+                               disk_provisioning='sparse')
+
+    def test_deploy_node_bad_name(self):
+        """``deploy_node`` raises ValueError when the name is not a valid hostname"""
+        with self.assertRaises(ValueError):
+            vmware.deploy_node(MagicMock(), MagicMock(), [], 'alice', 'isi_01', MagicMock())
+
+    @patch.object(vmware.images, 'registry')
+    @patch.object(vmware, 'capacity')
+    @patch.object(vmware, 'take_snapshot')
+    @patch.object(vmware, 'virtual_machine')
+    @patch.object(vmware, 'make_network_map')
+    @patch.object(vmware, 'Ova')
+    @patch.object(vmware, 'deploy_node')
+    @patch.object(vmware, 'vCenter')
+    def test_create_onefs_thick(self, fake_vCenter, fake_deploy_node, fake_Ova, fake_make_network_map,
+                                fake_virtual_machine, fake_take_snapshot, fake_capacity, fake_registry):
+        """``create_onefs`` checks capacity for the full size of the disks when they're thick provisioned"""
+        fake_capacity.provisioned_gb.return_value = 120
+
+        vmware.create_onefs(username='alice', machine_name='isi01', image='8.0.0.4',
+                            front_end='externalNetwork', back_end='internalNetwork',
+                            ram=4, cpu_count=2, logger=MagicMock(), disk_provisioning='lazy-zeroed')
+        _, preflight_kwargs = fake_capacity.preflight.call_args
+        _, deploy_kwargs = fake_deploy_node.call_args
+
+        self.assertEqual(preflight_kwargs['disk_gb'], 120)
+        self.assertEqual(deploy_kwargs['disk_provisioning'], 'lazy-zeroed')
+
+    @patch.object(vmware.images, 'registry')
+    @patch.object(vmware, 'capacity')
+    @patch.object(vmware, 'take_snapshot')
+    @patch.object(vmware, 'virtual_machine')
+    @patch.object(vmware, 'make_network_map')
+    @patch.object(vmware, 'Ova')
+    @patch.object(vmware, 'deploy_node')
+    @patch.object(vmware, 'vCenter')
+    def test_create_onefs_lease(self, fake_vCenter, fake_deploy_node, fake_Ova, fake_make_network_map,
+                                fake_virtual_machine, fake_take_snapshot, fake_capacity, fake_registry):
+        """``create_onefs`` stores when the lease of the node expires in the meta data"""
+        vmware.create_onefs(username='alice', machine_name='isi01', image='8.0.0.4',
+                            front_end='externalNetwork', back_end='internalNetwork',
+                            ram=4, cpu_count=2, logger=MagicMock(), lease=2)
+        meta = fake_virtual_machine.set_meta.call_args[0][1]
+
+        self.assertEqual(meta['expires'] - meta['created'], 7200)
+
+    @patch.object(vmware, '_delete_node')
+    @patch.object(vmware, '_retrieve_pages')
+    @patch.object(vmware, 'vCenter')
+    def test_reap_expired(self, fake_vCenter, fake_retrieve_pages, fake_delete_node):
+        """``reap_expired`` only deletes the OneFS nodes whose lease has ended"""
+        folders = [[{'obj': 'folder-1', 'name': 'alice'}]]
+        vms = [[{'obj': 'vm-1', 'name': 'isi01', 'parent': 'folder-1',
+                 'config.annotation': '{"component": "OneFS", "expires": 1}'},
+                {'obj': 'vm-2', 'name': 'isi02', 'parent': 'folder-1',
+                 'config.annotation': '{"component": "OneFS", "expires": 99999999999}'},
+                {'obj': 'vm-3', 'name': 'isi03', 'parent': 'folder-1',
+                 'config.annotation': '{"component": "OneFS"}'}]]
+        fake_retrieve_pages.side_effect = [iter(folders), iter(vms)]
+
+        output = vmware.reap_expired(logger=MagicMock())
+        expected = [{'user': 'alice', 'name': 'isi01'}]
+
+        self.assertEqual(output, expected)
+        self.assertEqual(fake_delete_node.call_args[0][0], 'vm-1')
+
+    @patch.object(vmware, '_delete_node')
+    @patch.object(vmware, '_retrieve_pages')
+    @patch.object(vmware, 'vCenter')
+    def test_reap_expired_clones(self, fake_vCenter, fake_retrieve_pages, fake_delete_node):
+        """``reap_expired`` skips nodes that linked clones depend on"""
+        vms = [[{'obj': 'vm-1', 'name': 'isi01', 'parent': 'folder-1',
+                 'config.annotation': '{"component": "OneFS", "expires": 1, "clones": ["isi01-copy"]}'}]]
+        fake_retrieve_pages.side_effect = [iter([]), iter(vms)]
+
+        output = vmware.reap_expired(logger=MagicMock())
+
+        self.assertEqual(output, [])
+        self.assertFalse(fake_delete_node.called)
+
+    @patch.object(vmware.time, 'sleep')
+    @patch.object(vmware, '_delete_node')
+    @patch.object(vmware, '_retrieve_pages')
+    @patch.object(vmware, 'vCenter')
+    def test_reap_expired_batches(self, fake_vCenter, fake_retrieve_pages, fake_delete_node, fake_sleep):
+        """``reap_expired`` pauses between batches of deleted nodes"""
+        vms = [[{'obj': 'vm-{}'.format(x), 'name': 'isi0{}'.format(x), 'parent': 'folder-1',
+                 'config.annotation': '{"component": "OneFS", "expires": 1}'} for x in range(5)]]
+        fake_retrieve_pages.side_effect = [iter([]), iter(vms)]
+
+        vmware.reap_expired(logger=MagicMock(), batch_size=2, batch_pause=1)
+
+        self.assertEqual(fake_sleep.call_count, 2)
+
+    @patch.object(vmware, 'OneFSNode')
+    def test_extend_lease(self, fake_OneFSNode):
+        """``extend_lease`` sets the lease to expire some hours from now"""
+        fake_node = fake_OneFSNode.return_value.__enter__.return_value
+        fake_node.info = {'meta': {'component': 'OneFS', 'expires': 1}}
+
+        vmware.extend_lease(username='alice', machine_name='isi01', hours=1)
+        new_meta, = fake_node.update_meta.call_args[0]
+
+        self.assertTrue(new_meta['expires'] > vmware.time.time() + 3500)
+
+    def _make_idle_pages(self, meta):
+        """Build the pages ``_retrieve_pages`` returns for one powered on OneFS node"""
+        folders = [[{'obj': 'folder-1', 'name': 'alice'}]]
+        vms = [[{'obj': MagicMock(), 'name': 'isi01', 'parent': 'folder-1',
+                 'config.annotation': meta, 'runtime.powerState': 'poweredOn'}]]
+        return [iter(folders), iter(vms)]
+
+    @patch.object(vmware, 'query_stats')
+    @patch.object(vmware, 'virtual_machine')
+    @patch.object(vmware, '_retrieve_pages')
+    @patch.object(vmware, 'vCenter')
+    def test_power_off_idle_marks(self, fake_vCenter, fake_retrieve_pages, fake_virtual_machine, fake_query_stats):
+        """``power_off_idle`` records when a node was first found idle"""
+        fake_retrieve_pages.side_effect = self._make_idle_pages('{"component": "OneFS"}')
+        fake_query_stats.return_value = {'cpu_pct': [1.0], 'disk_kbps': [0.0], 'net_kbps': [1.0]}
+
+        output = vmware.power_off_idle(logger=MagicMock(), window=3600)
+        meta = fake_virtual_machine.set_meta.call_args[0][1]
+
+        self.assertTrue('idle_since' in meta)
+        self.assertFalse(fake_virtual_machine.power.called)
+        self.assertEqual(output['idle'], [{'user': 'alice', 'name': 'isi01'}])
+
+    @patch.object(vmware, 'query_stats')
+    @patch.object(vmware, 'virtual_machine')
+    @patch.object(vmware, '_retrieve_pages')
+    @patch.object(vmware, 'vCenter')
+    def test_power_off_idle(self, fake_vCenter, fake_retrieve_pages, fake_virtual_machine, fake_query_stats):
+        """``power_off_idle`` powers off a node that's been idle for longer than the window"""
+        fake_retrieve_pages.side_effect = self._make_idle_pages('{"component": "OneFS", "idle_since": 1}')
+        fake_query_stats.return_value = {'cpu_pct': [1.0], 'disk_kbps': [0.0], 'net_kbps': [1.0]}
+
+        output = vmware.power_off_idle(logger=MagicMock(), window=3600)
+        meta = fake_virtual_machine.set_meta.call_args[0][1]
+
+        self.assertTrue(fake_virtual_machine.power.called)
+        self.assertTrue('idle_off' in meta)
+        self.assertEqual(output['powered_off'], [{'user': 'alice', 'name': 'isi01'}])
+
+    @patch.object(vmware, 'query_stats')
+    @patch.object(vmware, 'virtual_machine')
+    @patch.object(vmware, '_retrieve_pages')
+    @patch.object(vmware, 'vCenter')
+    def test_power_off_idle_busy(self, fake_vCenter, fake_retrieve_pages, fake_virtual_machine, fake_query_stats):
+        """``power_off_idle`` clears the idle mark once a node is busy again"""
+        fake_retrieve_pages.side_effect = self._make_idle_pages('{"component": "OneFS", "idle_since": 1}')
+        fake_query_stats.return_value = {'cpu_pct': [1.0], 'disk_kbps': [900.0], 'net_kbps': [1.0]}
+
+        vmware.power_off_idle(logger=MagicMock(), window=3600)
+        meta = fake_virtual_machine.set_meta.call_args[0][1]
+
+        self.assertFalse('idle_since' in meta)
+        self.assertFalse(fake_virtual_machine.power.called)
+
+    @patch.object(vmware, 'query_stats')
+    @patch.object(vmware, 'virtual_machine')
+    @patch.object(vmware, '_retrieve_pages')
+    @patch.object(vmware, 'vCenter')
+    def test_power_off_idle_no_stats(self, fake_vCenter, fake_retrieve_pages, fake_virtual_machine, fake_query_stats):
+        """``power_off_idle`` leaves nodes alone when there are no stats for them"""
+        fake_retrieve_pages.side_effect = self._make_idle_pages('{"component": "OneFS", "idle_since": 1}')
+        fake_query_stats.return_value = {'cpu_pct': [None], 'disk_kbps': [None], 'net_kbps': [None]}
+
+        vmware.power_off_idle(logger=MagicMock(), window=3600)
+
+        self.assertFalse(fake_virtual_machine.set_meta.called)
+        self.assertFalse(fake_virtual_machine.power.called)
+
+    @patch.object(vmware, 'virtual_machine')
+    @patch.object(vmware, 'consume_task')
+    @patch.object(vmware, 'vCenter')
+    def test_power_on_cluster(self, fake_vCenter, fake_consume_task, fake_virtual_machine):
+        """``power_on_cluster`` powers on every node with one PowerOnMultiVM_Task, and clears the idle flag"""
+        fake_vcenter, nodes = self._make_network_vcenter(['isi01', 'isi02'])
+        fake_vCenter.return_value.__enter__.return_value = fake_vcenter
+        datacenter = MagicMock(spec=vmware.vim.Datacenter)
+        fake_vcenter.get_by_name.return_value.parent = datacenter
+        attempts = []
+        for name, node in nodes.items():
+            node.name = name
+            node.config.annotation = '{"component": "OneFS", "idle_off": 1}'
+            attempt = MagicMock()
+            attempt.vm = node
+            attempts.append(attempt)
+        outcome = MagicMock()
+        outcome.attempted = attempts
+        outcome.notAttempted = []
+        fake_consume_task.return_value = outcome
+
+        output = vmware.power_on_cluster(username='alice', machine_names=['isi01', 'isi02'], logger=MagicMock())
+        expected = {'isi01': None, 'isi02': None}
+
+        self.assertEqual(output, expected)
+        self.assertEqual(datacenter.PowerOnMultiVM_Task.call_count, 1)
+        self.assertEqual(fake_virtual_machine.set_meta.call_count, 2)
+
+    @patch.object(vmware, 'consume_task')
+    @patch.object(vmware, 'vCenter')
+    def test_power_on_cluster_missing(self, fake_vCenter, fake_consume_task):
+        """``power_on_cluster`` reports nodes that don't exist"""
+        fake_vcenter, _ = self._make_network_vcenter([])
+        fake_vCenter.return_value.__enter__.return_value = fake_vcenter
+
+        output = vmware.power_on_cluster(username='alice', machine_names=['isi01'], logger=MagicMock())
+        expected = {'isi01': 'No node named isi01 found'}
+
+        self.assertEqual(output, expected)
+        self.assertFalse(fake_consume_task.called)
+
+    def test_get_console_ticket(self):
+        """``get_console_ticket`` returns the WebMKS URL of a VM console"""
+        fake_vm = MagicMock()
+        fake_vm.AcquireTicket.return_value.host = 'esxi01.vlab.local'
+        fake_vm.AcquireTicket.return_value.port = 443
+        fake_vm.AcquireTicket.return_value.ticket = 'asdf'
+
+        url = vmware.get_console_ticket(fake_vm)
+        expected = 'wss://esxi01.vlab.local:443/ticket/asdf'
+
+        self.assertEqual(url, expected)
+
+    def test_get_console_ticket_host(self):
+        """``get_console_ticket`` uses the host running the VM when the ticket has no host"""
+        fake_vm = MagicMock()
+        fake_vm.runtime.host.name = 'esxi02.vlab.local'
+        fake_vm.AcquireTicket.return_value.host = None
+        fake_vm.AcquireTicket.return_value.port = None
+        fake_vm.AcquireTicket.return_value.ticket = 'asdf'
+
+        url = vmware.get_console_ticket(fake_vm)
+        expected = 'wss://esxi02.vlab.local:443/ticket/asdf'
+
+        self.assertEqual(url, expected)
+
+    @patch.object(vmware, 'requests')
+    def test_get_screenshot(self, fake_requests):
+        """``get_screenshot`` downloads the screen of the VM with the session that found it"""
+        fake_vm = MagicMock()
+        fake_vm._stub.host = 'vcenter.vlab.local:443'
+        fake_vm._stub.cookie = 'vmware_soap_session="asdf"; Path=/; HttpOnly; Secure;'
+        fake_vm._moId = 'vm-42'
+        fake_requests.get.return_value.content = b'png'
+
+        output = vmware.get_screenshot(fake_vm)
+        the_args, the_kwargs = fake_requests.get.call_args
+
+        self.assertEqual(output, b'png')
+        self.assertEqual(the_args[0], 'https://vcenter.vlab.local:443/screen')
+        self.assertEqual(the_kwargs['params']['id'], 'vm-42')
+        self.assertEqual(the_kwargs['headers'], {'Cookie': 'vmware_soap_session="asdf"'})
+
+
+@patch.object(vmware.time, 'sleep')
+@patch.object(vmware.prompts, 'decode_png')
+@patch.object(vmware.prompts, 'fingerprint_frame')
+@patch.object(vmware, 'get_screenshot')
+class TestWaitUntilReady(unittest.TestCase):
+    """A set of test cases for the ``wait_until_ready`` function"""
+
+    def setUp(self):
+        self.recognizer = vmware.prompts.PromptRecognizer({'format_disks': [0b11110000]}, max_distance=2)
+
+    def test_quiet(self, fake_get_screenshot, fake_fingerprint_frame, fake_decode_png, fake_sleep):
+        """``wait_until_ready`` returns True once the console stops changing"""
+        fake_decode_png.return_value = (bytearray(), 0, 0)
+        fake_fingerprint_frame.side_effect = [0xff00ff00, 0x00ff00ff, 0x00ff00ff]
+
+        output = vmware.wait_until_ready(MagicMock(), quiet=0, interval=0, recognizer=self.recognizer)
+
+        self.assertTrue(output)
+        self.assertEqual(fake_get_screenshot.call_count, 3)
+
+    def test_cursor(self, fake_get_screenshot, fake_fingerprint_frame, fake_decode_png, fake_sleep):
+        """``wait_until_ready`` ignores changes within the distance of the recognizer, like a blinking cursor"""
+        fake_decode_png.return_value = (bytearray(), 0, 0)
+        fake_fingerprint_frame.side_effect = [0xff00ff00, 0xff00ff01]
+
+        output = vmware.wait_until_ready(MagicMock(), quiet=0, interval=0, recognizer=self.recognizer)
+
+        self.assertTrue(output)
+        self.assertEqual(fake_get_screenshot.call_count, 2)
+
+    def test_screen(self, fake_get_screenshot, fake_fingerprint_frame, fake_decode_png, fake_sleep):
+        """``wait_until_ready`` returns True as soon as the console shows the screen"""
+        fake_decode_png.return_value = (bytearray(), 0, 0)
+        fake_fingerprint_frame.return_value = 0b11110001
+
+        output = vmware.wait_until_ready(MagicMock(), quiet=30, interval=0, recognizer=self.recognizer)
+
+        self.assertTrue(output)
+        self.assertEqual(fake_get_screenshot.call_count, 1)
+
+    def test_timeout(self, fake_get_screenshot, fake_fingerprint_frame, fake_decode_png, fake_sleep):
+        """``wait_until_ready`` returns False if the console never stops changing"""
+        fake_decode_png.return_value = (bytearray(), 0, 0)
+        fake_fingerprint_frame.side_effect = lambda *args: fake_get_screenshot.call_count % 2 and 0xff00ff00
+
+        output = vmware.wait_until_ready(MagicMock(), timeout=0.1, quiet=0, interval=0, recognizer=self.recognizer)
+
+        self.assertFalse(output)
+
+    def test_no_screenshots(self, fake_get_screenshot, fake_fingerprint_frame, fake_decode_png, fake_sleep):
+        """``wait_until_ready`` returns False if the screenshots can't be read"""
+        fake_decode_png.side_effect = ValueError('Not a PNG image')
+
+        output = vmware.wait_until_ready(MagicMock(), recognizer=self.recognizer)
+
+        self.assertFalse(output)
+        self.assertFalse(fake_sleep.called)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,144 @@
+# -*- coding: UTF-8 -*-
+"""
+A suite of tests for the functions in webmks.py
+"""
+import time
+import unittest
+
+from vlab_onefs_api.lib.worker import webmks
+
+from webmks_standin import StandInConsole
+
+
+def _wait_until(condition, timeout=2):
+    """Poll the stand-in console, which runs in another thread"""
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class TestKeyEvents(unittest.TestCase):
+    """A set of test cases for the ``key_events`` function"""
+
+    def test_key_events(self):
+        """``key_events`` presses and releases every key"""
+        output = webmks.key_events('no')
+        expected = [(ord('n'), True), (ord('n'), False), (ord('o'), True), (ord('o'), False)]
+
+        self.assertEqual(output, expected)
+
+    def test_key_events_special(self):
+        """``key_events`` converts Selenium keys to X11 keysyms"""
+        output = webmks.key_events(webmks.Keys.ENTER, webmks.Keys.BACKSPACE)
+        expected = [(0xff0d, True), (0xff0d, False), (0xff08, True), (0xff08, False)]
+
+        self.assertEqual(output, expected)
+
+    def test_key_events_modifier(self):
+        """``key_events`` holds a modifier down until the end of the input"""
+        output = webmks.key_events(webmks.Keys.SHIFT, 'g')
+        expected = [(0xffe1, True), (ord('g'), True), (ord('g'), False), (0xffe1, False)]
+
+        self.assertEqual(output, expected)
+
+    def test_key_events_null(self):
+        """``key_events`` releases the modifiers at Keys.NULL"""
+        output = webmks.key_events(webmks.Keys.SHIFT, 'g', webmks.Keys.NULL, 'y')
+        expected = [(0xffe1, True), (ord('g'), True), (ord('g'), False), (0xffe1, False),
+                    (ord('y'), True), (ord('y'), False)]
+
+        self.assertEqual(output, expected)
+
+    def test_key_events_untypeable(self):
+        """``key_events`` raises ValueError for keys that can't be typed"""
+        with self.assertRaises(ValueError):
+            webmks.key_events('café')
+
+
+class TestRFBConnection(unittest.TestCase):
+    """A set of test cases for the RFBConnection object, against a stand-in console"""
+
+    def setUp(self):
+        self.server = StandInConsole()
+        self.connection = webmks.RFBConnection(self.server.url, timeout=5)
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.close()
+
+    def test_handshake(self):
+        """``RFBConnection`` learns the size of the screen, and asks for raw pixels"""
+        self.assertEqual((self.connection.width, self.connection.height), (64, 32))
+        self.assertTrue(_wait_until(lambda: webmks.ENCODING_RAW in self.server.encodings))
+
+    def test_first_frame(self):
+        """``RFBConnection`` receives the whole screen once connected"""
+        self.assertTrue(_wait_until(lambda: self.connection.frames == 1))
+
+    def test_send_key_events(self):
+        """``RFBConnection.send_key_events`` types on the console"""
+        self.connection.send_key_events(webmks.key_events('yes'))
+
+        self.assertTrue(_wait_until(lambda: len(self.server.key_events) == 6))
+        self.assertEqual(self.server.keysyms(), [ord('y'), ord('e'), ord('s')])
+
+    def test_echo(self):
+        """``RFBConnection`` records the update the console sends after a key press"""
+        _wait_until(lambda: self.connection.frames == 1)
+        sent_at = time.time()
+        self.connection.send_key_events(webmks.key_events('y'))
+
+        self.assertTrue(self.connection.wait_for_frame(sent_at, timeout=2))
+
+    def test_fingerprint(self):
+        """``RFBConnection.fingerprint`` changes with the screen"""
+        self.server.show(1)
+        _wait_until(lambda: self.connection.frames >= 1 and self.connection.fingerprint())
+        first = self.connection.fingerprint()
+        frames = self.connection.frames
+        self.server.show(2)
+        _wait_until(lambda: self.connection.frames > frames)
+
+        self.assertNotEqual(first, self.connection.fingerprint())
+
+    def test_close(self):
+        """``RFBConnection.alive`` is False once the console is gone"""
+        self.server.close()
+
+        self.assertTrue(_wait_until(lambda: not self.connection.alive))
+
+
+class TestRFBConnectionErrors(unittest.TestCase):
+    """A set of test cases for consoles that refuse the session"""
+
+    def test_password(self):
+        """``RFBConnection`` raises RuntimeError when the console wants a password"""
+        server = StandInConsole(security_types=(2,))
+        try:
+            with self.assertRaises(RuntimeError):
+                webmks.RFBConnection(server.url, timeout=5)
+        finally:
+            server.close()
+
+    def test_refused(self):
+        """``RFBConnection`` raises RuntimeError when the console refuses the session"""
+        server = StandInConsole(security_types=())
+        try:
+            with self.assertRaises(RuntimeError):
+                webmks.RFBConnection(server.url, timeout=5)
+        finally:
+            server.close()
+
+    def test_unreachable(self):
+        """``RFBConnection`` raises RuntimeError when the console can't be reached"""
+        server = StandInConsole()
+        url = server.url
+        server.close()
+
+        with self.assertRaises(RuntimeError):
+            webmks.RFBConnection(url, timeout=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
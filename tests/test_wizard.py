@@ -0,0 +1,130 @@
+# -*- coding: UTF-8 -*-
+"""
+A suite of tests for the functions in wizard.py
+"""
+import os
+import unittest
+import tempfile
+from unittest.mock import patch
+
+import ujson
+
+from vlab_onefs_api.lib.worker import wizard
+
+
+class TestCompilePlan(unittest.TestCase):
+    """A set of test cases for the ``compile_plan`` function"""
+
+    def test_compile_plan(self):
+        """``compile_plan`` resolves every step of the plan"""
+        steps = wizard.compile_plan('8.2.0.0', True)
+        routines = [x[1] for x in steps]
+
+        self.assertEqual(len(steps), len(wizard.WIZARD_PLANS['8.2.0.0']))
+        self.assertTrue('enable_compliance_mode' in routines)
+
+    def test_compile_plan_compliance(self):
+        """``compile_plan`` drops the compliance mode steps for normal clusters"""
+        routines = [x[1] for x in wizard.compile_plan('8.2.0.0', False)]
+
+        self.assertFalse('enable_compliance_mode' in routines)
+
+    def test_compile_plan_override(self):
+        """``compile_plan`` applies the overrides of a plan to its steps"""
+        steps = wizard.compile_plan('7.2.0.0', False)
+        commit = [x for x in steps if x[1] == 'commit_config'][0]
+
+        self.assertEqual(commit[4], {'timeout': 60, 'screen': 'login'})
+
+    def test_compile_plan_cached(self):
+        """``compile_plan`` only compiles a plan once"""
+        first = wizard.compile_plan('8.0.0.0', False)
+        second = wizard.compile_plan('8.0.0.0', False)
+
+        self.assertTrue(first is second)
+
+    def test_compile_plan_unknown(self):
+        """``compile_plan`` raises ValueError for an undefined plan"""
+        with self.assertRaises(ValueError):
+            wizard.compile_plan('1.0.0.0', False)
+
+    @patch.object(wizard, 'load')
+    def test_compile_plan_bad_step(self, fake_load):
+        """``compile_plan`` raises ValueError when a plan has an undefined step"""
+        fake_load.return_value = ({}, {'9.0.0.0': ['boot']})
+
+        with self.assertRaises(ValueError):
+            wizard.compile_plan.__wrapped__('9.0.0.0', False)
+
+
+class TestLoad(unittest.TestCase):
+    """A set of test cases for the ``load`` function"""
+
+    def test_load(self):
+        """``load`` adds the plans and steps from the file to the defaults"""
+        overrides = {'steps': {'hello': {'log': 'hello'}}, 'plans': {'9.0.0.0': ['hello']}}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'plans.json')
+            with open(path, 'w') as the_file:
+                ujson.dump(overrides, the_file)
+
+            steps, plans = wizard.load.__wrapped__(path)
+
+        self.assertTrue('hello' in steps)
+        self.assertEqual(plans['9.0.0.0'], ['hello'])
+        self.assertEqual(plans['8.2.0.0'], wizard.WIZARD_PLANS['8.2.0.0'])
+
+    def test_load_missing(self):
+        """``load`` uses the default plans when there's no file"""
+        steps, plans = wizard.load.__wrapped__('/no/such/file.json')
+
+        self.assertEqual(plans, wizard.WIZARD_PLANS)
+
+
+class TestOptimize(unittest.TestCase):
+    """A set of test cases for the ``optimize`` function"""
+
+    def test_merge_keys(self):
+        """``optimize`` sends input that doesn't end with ENTER along with the next input"""
+        actions = [('keys', (wizard.Keys.BACKSPACE,), False), ('keys', ('1.2.3.4',), False),
+                   ('keys', (wizard.Keys.ENTER,), False), ('keys', (wizard.Keys.ENTER,), False)]
+
+        output = wizard.optimize(actions)
+        expected = [('keys', (wizard.Keys.BACKSPACE, '1.2.3.4', wizard.Keys.ENTER), False),
+                    ('keys', (wizard.Keys.ENTER,), False)]
+
+        self.assertEqual(output, expected)
+
+    def test_merge_keys_enter(self):
+        """``optimize`` does not merge input that's already answered a prompt"""
+        actions = [('keys', ('yes',), True), ('keys', ('no',), True)]
+
+        self.assertEqual(wizard.optimize(actions), actions)
+
+    def test_merge_keys_modifier(self):
+        """``optimize`` does not merge input that holds down a modifier"""
+        actions = [('keys', (wizard.Keys.SHIFT, 'g'), False), ('keys', ('yes',), True)]
+
+        self.assertEqual(wizard.optimize(actions), actions)
+
+    def test_pauses(self):
+        """``optimize`` collapses back-to-back pauses into the longest one"""
+        actions = [('pause', 2), ('log', 'hi'), ('pause', 5)]
+
+        self.assertEqual(wizard.optimize(actions), [('pause', 5), ('log', 'hi')])
+
+    def test_pause_before_wait(self):
+        """``optimize`` drops a pause before a wait"""
+        actions = [('pause', 2), ('wait', 30, None)]
+
+        self.assertEqual(wizard.optimize(actions), [('wait', 30, None)])
+
+    def test_pause_after_wait(self):
+        """``optimize`` drops a pause after a wait"""
+        actions = [('wait', 30, None), ('log', 'hi'), ('pause', 2)]
+
+        self.assertEqual(wizard.optimize(actions), [('wait', 30, None), ('log', 'hi')])
+
+
+if __name__ == '__main__':
+    unittest.main()
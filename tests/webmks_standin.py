@@ -0,0 +1,216 @@
+# -*- coding: UTF-8 -*-
+"""
+A local stand-in for the WebMKS console of a VM, so the browserless console can
+be tested offline.
+
+It serves one VNC (RFB 3.8) session over a WebSocket on localhost, records the
+key events it receives, and "echoes" every key press by drawing on its
+framebuffer. Like a real VNC server, an incremental update request is only
+answered once the screen changes.
+"""
+import base64
+import socket
+import struct
+import hashlib
+import threading
+
+
+WEBSOCKET_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+class StandInConsole(object):
+    """A one-session WebMKS console on localhost
+
+    :param width: How many pixels wide the screen is
+    :type width: Integer
+
+    :param height: How many pixels tall the screen is
+    :type height: Integer
+
+    :param echo: Set to False to have key presses not change the screen
+    :type echo: Boolean
+
+    :param security_types: The RFB security types to offer the client
+    :type security_types: List
+    """
+    def __init__(self, width=64, height=32, echo=True, security_types=(1,)):
+        self.width = width
+        self.height = height
+        self.echo = echo
+        self.security_types = security_types
+        self.framebuffer = bytearray(width * height * 4)
+        self.key_events = []
+        self.encodings = []
+        self.pixel_format = None
+        self.update_requests = 0
+        self._received = bytearray()
+        self._pending = False
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._conn = None
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.bind(('127.0.0.1', 0))
+        self._listener.listen(1)
+        self.url = 'ws://127.0.0.1:{}/ticket/stand-in'.format(self._listener.getsockname()[1])
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop serving the console"""
+        for sock in (self._conn, self._listener):
+            if sock is not None:
+                try:
+                    # Closing alone doesn't wake a thread blocked in accept(), which
+                    # would go on accepting connections on the "closed" port
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+
+    def keysyms(self):
+        """The keys that were pressed, in order"""
+        return [keysym for keysym, down in list(self.key_events) if down]
+
+    def show(self, shade):
+        """Paint the bottom half of the screen with a pattern, and send it to the client
+
+        :param shade: Picks the pattern; every shade looks different
+        :type shade: Integer
+        """
+        with self._lock:
+            for y in range(self.height // 2, self.height):
+                for x in range(self.width):
+                    value = ((x * (shade + 1) * 37) ^ (y * 11)) % 256
+                    pixel = (y * self.width + x) * 4
+                    self.framebuffer[pixel:pixel + 4] = bytes([value, value, value, 0])
+            self._dirty = True
+        self._push()
+
+    def _serve(self):
+        try:
+            self._conn, _ = self._listener.accept()
+            self._accept_websocket()
+            self._handshake()
+            while True:
+                self._handle(self._read(1)[0])
+        except (OSError, ConnectionError, struct.error):
+            pass
+        finally:
+            self.close()
+
+    def _accept_websocket(self):
+        request = b''
+        while b'\r\n\r\n' not in request:
+            data = self._conn.recv(4096)
+            if not data:
+                raise ConnectionError('Client went away')
+            request += data
+        headers = {}
+        for line in request.decode().split('\r\n')[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        accept = base64.b64encode(hashlib.sha1(headers['sec-websocket-key'].encode() + WEBSOCKET_GUID).digest())
+        response = ['HTTP/1.1 101 Switching Protocols',
+                    'Upgrade: websocket',
+                    'Connection: Upgrade',
+                    'Sec-WebSocket-Accept: {}'.format(accept.decode())]
+        if 'binary' in headers.get('sec-websocket-protocol', ''):
+            response.append('Sec-WebSocket-Protocol: binary')
+        self._conn.sendall('\r\n'.join(response).encode() + b'\r\n\r\n')
+
+    def _recv_exactly(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self._conn.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError('Client went away')
+            data += chunk
+        return data
+
+    def _read(self, size):
+        """Read from the RFB stream, unwrapping the (masked) WebSocket frames of the client"""
+        while len(self._received) < size:
+            first, second = self._recv_exactly(2)
+            length = second & 0x7f
+            if length == 126:
+                length = struct.unpack('>H', self._recv_exactly(2))[0]
+            elif length == 127:
+                length = struct.unpack('>Q', self._recv_exactly(8))[0]
+            mask = self._recv_exactly(4) if second & 0x80 else b'\x00\x00\x00\x00'
+            payload = self._recv_exactly(length)
+            if first & 0x0f == 0x8:
+                raise ConnectionError('Client closed the WebSocket')
+            self._received.extend(x ^ mask[i % 4] for i, x in enumerate(payload))
+        chunk = bytes(self._received[:size])
+        del self._received[:size]
+        return chunk
+
+    def _write(self, data):
+        if len(data) < 126:
+            header = struct.pack('>BB', 0x82, len(data))
+        elif len(data) < 65536:
+            header = struct.pack('>BBH', 0x82, 126, len(data))
+        else:
+            header = struct.pack('>BBQ', 0x82, 127, len(data))
+        with self._send_lock:
+            self._conn.sendall(header + data)
+
+    def _handshake(self):
+        self._write(b'RFB 003.008\n')
+        self._read(12)
+        self._write(bytes([len(self.security_types)] + list(self.security_types)))
+        if not self.security_types:
+            reason = b'no sessions for you'
+            self._write(struct.pack('>I', len(reason)) + reason)
+            return
+        self._read(1)
+        self._write(struct.pack('>I', 0))
+        self._read(1) # shared flag
+        name = b'stand-in'
+        self._write(struct.pack('>HH', self.width, self.height) + bytes(16) + struct.pack('>I', len(name)) + name)
+
+    def _handle(self, message_type):
+        if message_type == 0:
+            self._read(3)
+            self.pixel_format = self._read(16)
+        elif message_type == 2:
+            self._read(1)
+            count = struct.unpack('>H', self._read(2))[0]
+            self.encodings = list(struct.unpack('>{}i'.format(count), self._read(count * 4)))
+        elif message_type == 3:
+            incremental = self._read(1)[0]
+            self._read(8)
+            self.update_requests += 1
+            with self._lock:
+                self._pending = True
+                if not incremental:
+                    self._dirty = True
+            self._push()
+        elif message_type == 4:
+            down = self._read(1)[0]
+            self._read(2)
+            keysym = struct.unpack('>I', self._read(4))[0]
+            self.key_events.append((keysym, bool(down)))
+            if down and self.echo:
+                with self._lock:
+                    # Draw the key in the top half of the screen, like a terminal echoing it
+                    pixel = (len(self.key_events) % (self.width * self.height // 2)) * 4
+                    self.framebuffer[pixel:pixel + 4] = bytes([255, 255, 255, 0])
+                    self._dirty = True
+                self._push()
+
+    def _push(self):
+        """Send the whole screen, if the client asked for it and it changed"""
+        with self._lock:
+            if not (self._pending and self._dirty):
+                return
+            self._pending = False
+            self._dirty = False
+            frame = bytes(self.framebuffer)
+        update = struct.pack('>BxH', 0, 1) + struct.pack('>HHHHi', 0, 0, self.width, self.height, 0)
+        self._write(update + frame)
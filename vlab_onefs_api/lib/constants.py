@@ -13,6 +13,7 @@ from collections import namedtuple, OrderedDict
 DEFINED = OrderedDict([
             ('VLAB_ONEFS_LOG_LEVEL', environ.get('VLAB_ONEFS_LOG_LEVEL', 'INFO')),
             ('INF_VCENTER_SERVER', environ.get('INF_VCENTER_SERVER', 'vlab-vcenter.emc.com')),
+            ('INF_VCENTER_SERVERS', [x.strip() for x in environ.get('INF_VCENTER_SERVERS', environ.get('INF_VCENTER_SERVER', 'vlab-vcenter.emc.com')).split(',')]),
             ('INF_VCENTER_PORT', int(environ.get('INFO_VCENTER_PORT', 443))),
             ('INF_VCENTER_USER', environ.get('INF_VCENTER_USER', 'tester')),
             ('INF_VCENTER_PASSWORD', environ.get('INF_VCENTER_PASSWORD', 'a')),
@@ -26,7 +27,42 @@ DEFINED = OrderedDict([
             ('INF_VCENTER_READONLY_USER', environ.get('INF_VCENTER_READONLY_USER', 'readonly@vlab.local')),
             ('INF_VCENTER_READONLY_PASSWORD', environ.get('INF_VCENTER_READONLY_PASSWORD', 'a')),
             ('VLAB_VERIFY_TOKEN', environ.get('VLAB_VERIFY_TOKEN', False)),
-            ('INTERNAL_LICENSE_SERVER', environ.get('INTERNAL_LICENSE_SERVER', 'http://some.server.org'))
+            ('INTERNAL_LICENSE_SERVER', environ.get('INTERNAL_LICENSE_SERVER', 'http://some.server.org')),
+            ('VLAB_ONEFS_GC_INTERVAL', int(environ.get('VLAB_ONEFS_GC_INTERVAL', 3600))),
+            ('VLAB_ONEFS_GC_MAX_AGE', int(environ.get('VLAB_ONEFS_GC_MAX_AGE', 21600))),
+            ('VLAB_ONEFS_GC_BATCH_SIZE', int(environ.get('VLAB_ONEFS_GC_BATCH_SIZE', 5))),
+            ('VLAB_ONEFS_GC_BATCH_PAUSE', int(environ.get('VLAB_ONEFS_GC_BATCH_PAUSE', 30))),
+            ('VLAB_ONEFS_STATS_SAMPLES', int(environ.get('VLAB_ONEFS_STATS_SAMPLES', 15))),
+            ('VLAB_ONEFS_GC_DRY_RUN', environ.get('VLAB_ONEFS_GC_DRY_RUN', 'true').lower() != 'false'),
+            ('VLAB_ONEFS_ADMINS', [x.strip() for x in environ.get('VLAB_ONEFS_ADMINS', 'administrator').split(',')]),
+            ('VLAB_ONEFS_INVENTORY_PAGE_SIZE', int(environ.get('VLAB_ONEFS_INVENTORY_PAGE_SIZE', 500))),
+            ('VLAB_ONEFS_INVENTORY_DIR', environ.get('VLAB_ONEFS_INVENTORY_DIR', '/var/lib/vlab/onefs-inventory')),
+            ('VLAB_ONEFS_INVENTORY_TTL', int(environ.get('VLAB_ONEFS_INVENTORY_TTL', 3600))),
+            ('VLAB_ONEFS_CAPACITY_TTL', int(environ.get('VLAB_ONEFS_CAPACITY_TTL', 60))),
+            ('VLAB_ONEFS_NAME_INDEX_DIR', environ.get('VLAB_ONEFS_NAME_INDEX_DIR', '')),
+            ('VLAB_ONEFS_NAME_RESERVATION_TTL', int(environ.get('VLAB_ONEFS_NAME_RESERVATION_TTL', 900))),
+            ('VLAB_ONEFS_MAX_LEASE', int(environ.get('VLAB_ONEFS_MAX_LEASE', 720))),
+            ('VLAB_ONEFS_REAPER_INTERVAL', int(environ.get('VLAB_ONEFS_REAPER_INTERVAL', 300))),
+            ('VLAB_ONEFS_IDLE_INTERVAL', int(environ.get('VLAB_ONEFS_IDLE_INTERVAL', 900))),
+            ('VLAB_ONEFS_IDLE_WINDOW', int(environ.get('VLAB_ONEFS_IDLE_WINDOW', 86400))),
+            ('VLAB_ONEFS_IDLE_CPU_PCT', float(environ.get('VLAB_ONEFS_IDLE_CPU_PCT', 5.0))),
+            ('VLAB_ONEFS_IDLE_IO_KBPS', float(environ.get('VLAB_ONEFS_IDLE_IO_KBPS', 50.0))),
+            ('VLAB_ONEFS_BROWSER_POOL_SIZE', int(environ.get('VLAB_ONEFS_BROWSER_POOL_SIZE', 1))),
+            ('VLAB_ONEFS_BROWSER_MAX_USES', int(environ.get('VLAB_ONEFS_BROWSER_MAX_USES', 25))),
+            ('VLAB_ONEFS_BROWSER_MAX_MB', int(environ.get('VLAB_ONEFS_BROWSER_MAX_MB', 1536))),
+            ('VLAB_ONEFS_ECHO_TIMEOUT', float(environ.get('VLAB_ONEFS_ECHO_TIMEOUT', 1.0))),
+            ('VLAB_ONEFS_TYPE_AHEAD', environ.get('VLAB_ONEFS_TYPE_AHEAD', 'false').lower() == 'true'),
+            ('VLAB_ONEFS_TYPE_AHEAD_CHUNK', int(environ.get('VLAB_ONEFS_TYPE_AHEAD_CHUNK', 200))),
+            ('VLAB_ONEFS_TYPE_AHEAD_SETTLE', int(environ.get('VLAB_ONEFS_TYPE_AHEAD_SETTLE', 2))),
+            ('VLAB_ONEFS_PROMPT_FINGERPRINTS', environ.get('VLAB_ONEFS_PROMPT_FINGERPRINTS', '')),
+            ('VLAB_ONEFS_PROMPT_DISTANCE', int(environ.get('VLAB_ONEFS_PROMPT_DISTANCE', 12))),
+            ('VLAB_ONEFS_PROMPT_RECORD', environ.get('VLAB_ONEFS_PROMPT_RECORD', 'false').lower() == 'true'),
+            ('VLAB_ONEFS_WMKS_SDK_URL', environ.get('VLAB_ONEFS_WMKS_SDK_URL', '').rstrip('/')),
+            ('VLAB_ONEFS_CONSOLE_BACKEND', environ.get('VLAB_ONEFS_CONSOLE_BACKEND', 'browser').lower()),
+            ('VLAB_ONEFS_WIZARD_PLANS', environ.get('VLAB_ONEFS_WIZARD_PLANS', '')),
+            ('VLAB_ONEFS_READY_TIMEOUT', int(environ.get('VLAB_ONEFS_READY_TIMEOUT', 1200))),
+            ('VLAB_ONEFS_READY_QUIET', int(environ.get('VLAB_ONEFS_READY_QUIET', 30))),
+            ('VLAB_ONEFS_READY_INTERVAL', float(environ.get('VLAB_ONEFS_READY_INTERVAL', 5.0))),
           ])
 
 Constants = namedtuple('Constants', list(DEFINED.keys()))
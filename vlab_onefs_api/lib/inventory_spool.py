@@ -0,0 +1,101 @@
+# -*- coding: UTF-8 -*-
+"""
+Hands the inventory of every OneFS node from a worker to the API via a
+directory (i.e. a docker volume), instead of through the result of the task.
+
+The worker appends each page of NDJSON to a file as it's pulled from vCenter,
+so neither the worker, the result backend nor the API ever holds the whole
+inventory in memory. The API streams the file to the client, then deletes it.
+"""
+import os
+import time
+
+from vlab_onefs_api.lib import const
+
+
+class InventorySpool(object):
+    """The inventories that are waiting to be fetched by a client
+
+    :param directory: Where the inventories are kept
+    :type directory: String
+
+    :param ttl: How many seconds an inventory is kept for, if it's never fetched
+    :type ttl: Integer
+    """
+    def __init__(self, directory=const.VLAB_ONEFS_INVENTORY_DIR, ttl=const.VLAB_ONEFS_INVENTORY_TTL):
+        self.directory = directory
+        self.ttl = ttl
+
+    def _path(self, task_id):
+        """Build the path to the inventory of a task; returns None if the task ID is unsafe"""
+        if os.sep in task_id or task_id.startswith('.'):
+            return None
+        return os.path.join(self.directory, '{}.ndjson'.format(task_id))
+
+    def write(self, task_id, pages):
+        """Save the pages of an inventory; it's only visible once every page is written
+
+        :Returns: Integer - the number of pages written
+
+        :param task_id: The ID of the task that built the inventory
+        :type task_id: String
+
+        :param pages: The pages of NDJSON
+        :type pages: Generator of String
+        """
+        self.prune()
+        path = self._path(task_id)
+        partial = '{}.part'.format(path)
+        count = 0
+        with open(partial, 'w') as the_file:
+            for page in pages:
+                the_file.write(page)
+                count += 1
+        os.rename(partial, path)
+        return count
+
+    def read(self, task_id, chunk_size=65536):
+        """Stream an inventory, and delete it once it's been read
+
+        :Returns: Generator of String, or None if there's no inventory for the task
+
+        :param task_id: The ID of the task that built the inventory
+        :type task_id: String
+
+        :param chunk_size: How many characters to read at once
+        :type chunk_size: Integer
+        """
+        path = self._path(task_id)
+        try:
+            the_file = open(path)
+        except (OSError, TypeError):
+            return None
+        return self._stream(path, the_file, chunk_size)
+
+    @staticmethod
+    def _stream(path, the_file, chunk_size):
+        """Yield a file in chunks, then delete it"""
+        try:
+            for chunk in iter(lambda: the_file.read(chunk_size), ''):
+                yield chunk
+        finally:
+            the_file.close()
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def prune(self):
+        """Delete the inventories no client fetched before they expired
+
+        :Returns: None
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        expired = time.time() - self.ttl
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < expired:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,228 @@
+# -*- coding: UTF-8 -*-
+"""
+An index of the names of every user's OneFS nodes, shared by the API and the
+workers via a directory (i.e. a docker volume).
+
+The workers keep the index current as nodes are listed, created and deleted.
+The API reads it to reject a duplicate name before queuing a create, and holds a
+short reservation on the name so two concurrent creates can't both pass.
+
+The workers also record which vCenter server each user was placed on, so every
+worker process sends a user's nodes to the same server.
+
+The index is disabled when ``VLAB_ONEFS_NAME_INDEX_DIR`` is not set. It's only
+an early check; vCenter is still the source of truth when a node is deployed.
+"""
+import os
+import time
+
+from vlab_onefs_api.lib import const
+
+
+class NameIndex(object):
+    """The names in use, and reserved, by every user
+
+    :param directory: Where the index is kept
+    :type directory: String
+
+    :param ttl: How many seconds a reservation is held for, if it's not released
+    :type ttl: Integer
+    """
+    def __init__(self, directory=const.VLAB_ONEFS_NAME_INDEX_DIR, ttl=const.VLAB_ONEFS_NAME_RESERVATION_TTL):
+        self.directory = directory
+        self.ttl = ttl
+
+    def _path(self, kind, username, name=''):
+        """Build the path to an entry in the index; returns None if a name can't be indexed"""
+        if not self.directory:
+            return None
+        for part in (username, name):
+            if os.sep in part or part.startswith('.'):
+                return None
+        return os.path.join(self.directory, username, kind, name)
+
+    def taken(self, username, name):
+        """Determine if a user already has a node by the supplied name
+
+        :Returns: Boolean
+
+        :param username: The user who owns the OneFS nodes
+        :type username: String
+
+        :param name: The name of the node
+        :type name: String
+        """
+        path = self._path('nodes', username, name)
+        return path is not None and os.path.exists(path)
+
+    def reserve(self, username, name):
+        """Hold a name for a node that's about to be created
+
+        :Returns: Boolean - False if the name is already used, or reserved
+
+        :param username: The user creating the OneFS node
+        :type username: String
+
+        :param name: The name of the new node
+        :type name: String
+        """
+        path = self._path('reserved', username, name)
+        if path is None:
+            return True
+        elif self.taken(username, name):
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A second attempt is only made when an expired reservation was removed
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._expired(path):
+                    return False
+                self._unlink(path)
+            else:
+                os.close(fd)
+                return True
+        return False
+
+    def _expired(self, path):
+        """Determine if a reservation is older than the TTL"""
+        try:
+            return time.time() - os.path.getmtime(path) > self.ttl
+        except FileNotFoundError:
+            return True
+
+    def release(self, username, name):
+        """Drop the reservation of a name
+
+        :Returns: None
+
+        :param username: The user who reserved the name
+        :type username: String
+
+        :param name: The reserved name
+        :type name: String
+        """
+        path = self._path('reserved', username, name)
+        if path is not None:
+            self._unlink(path)
+
+    def add(self, username, name):
+        """Record that a user has a node by the supplied name; releases any reservation
+
+        :Returns: None
+
+        :param username: The user who owns the OneFS node
+        :type username: String
+
+        :param name: The name of the node
+        :type name: String
+        """
+        path = self._path('nodes', username, name)
+        if path is None:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'w').close()
+        self.release(username, name)
+
+    def remove(self, username, name):
+        """Record that a user no longer has a node by the supplied name
+
+        :Returns: None
+
+        :param username: The user who owned the OneFS node
+        :type username: String
+
+        :param name: The name of the deleted node
+        :type name: String
+        """
+        path = self._path('nodes', username, name)
+        if path is not None:
+            self._unlink(path)
+
+    def sync(self, username, names):
+        """Make the index of a user match every node they own
+
+        :Returns: None
+
+        :param username: The user who owns the OneFS nodes
+        :type username: String
+
+        :param names: The names of every node the user owns
+        :type names: Iterable
+        """
+        directory = self._path('nodes', username)
+        if directory is None:
+            return
+        try:
+            indexed = set(os.listdir(directory))
+        except FileNotFoundError:
+            indexed = set()
+        names = set(names)
+        for name in indexed - names:
+            self.remove(username, name)
+        for name in names - indexed:
+            self.add(username, name)
+
+    def placement(self, username):
+        """Look up the vCenter server a user was placed on
+
+        :Returns: String, or None if the user has not been placed
+
+        :param username: The user who owns the OneFS nodes
+        :type username: String
+        """
+        path = self._path('placement', username, 'server')
+        if path is None:
+            return None
+        try:
+            with open(path) as the_file:
+                return the_file.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def place(self, username, server):
+        """Record the vCenter server a user is placed on; the first server recorded wins
+
+        :Returns: String - the server the user is placed on
+
+        :param username: The user who owns the OneFS nodes
+        :type username: String
+
+        :param server: The IP/FQDN of the vCenter server
+        :type server: String
+        """
+        path = self._path('placement', username, 'server')
+        if path is None:
+            return server
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write it all, then link it into place, so a reader never sees half a name
+        temp = '{}.{}'.format(path, os.getpid())
+        with open(temp, 'w') as the_file:
+            the_file.write(server)
+        try:
+            os.link(temp, path)
+        except FileExistsError:
+            pass
+        finally:
+            self._unlink(temp)
+        return self.placement(username)
+
+    def unplace(self, username):
+        """Forget the vCenter server a user was placed on
+
+        :Returns: None
+
+        :param username: The user who owns the OneFS nodes
+        :type username: String
+        """
+        path = self._path('placement', username, 'server')
+        if path is not None:
+            self._unlink(path)
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
@@ -15,10 +15,14 @@ from vlab_api_common import describe, get_logger, requires, validate_input
 
 
 from vlab_onefs_api.lib import const
+from vlab_onefs_api.lib.name_index import NameIndex
+from vlab_onefs_api.lib.inventory_spool import InventorySpool
 from vlab_onefs_api.lib.validators import supplied_config_values_are_valid
 
 
 logger = get_logger(__name__, loglevel=const.VLAB_ONEFS_LOG_LEVEL)
+name_index = NameIndex()
+inventory_spool = InventorySpool()
 
 
 class OneFSView(MachineView):
@@ -56,6 +60,18 @@ class OneFSView(MachineView):
                             "type": "integer",
                             "default": 2,
                             "enum": [2, 4, 6, 8]
+                        },
+                        "disk-provisioning": {
+                            "description": "How to allocate the disks; thin is fastest to deploy. Thick disks only reserve the space, because the node runs from a snapshot and new writes go to a thin delta disk",
+                            "type": "string",
+                            "default": "thin",
+                            "enum": ["thin", "lazy-zeroed", "eager-zeroed"]
+                        },
+                        "lease": {
+                            "description": "Delete the node after this many hours; omit to keep it until you delete it",
+                            "type": "integer",
+                            "minimum": 1,
+                            "maximum": const.VLAB_ONEFS_MAX_LEASE
                         }
                     },
                     "required": ["name", 'image', 'frontend', 'backend']
@@ -80,6 +96,112 @@ class OneFSView(MachineView):
     IMAGES_SCHEMA = {"$schema": "http://json-schema.org/draft-04/schema#",
                      "description": "View available versions of vOneFS that can be created"
                     }
+    RESET_SCHEMA = {"$schema": "http://json-schema.org/draft-04/schema#",
+                    "description": "Revert a vOneFS node to a factory-fresh, unconfigured state",
+                    "type": "object",
+                    "properties": {
+                        "name": {
+                            "description": "The name of the OneFS node to reset",
+                            "type": "string"
+                        }
+                    },
+                    "required": ["name"]
+                   }
+
+    CLONE_SCHEMA = {"$schema": "http://json-schema.org/draft-04/schema#",
+                    "description": "Make a copy of a (configured) vOneFS cluster",
+                    "type": "object",
+                    "properties": {
+                        "nodes": {
+                            "description": "The names of every node in the cluster to clone",
+                            "type": "array",
+                            "minItems": 1,
+                            "uniqueItems": True,
+                            "items": {
+                                "type": "string"
+                            }
+                        },
+                        "suffix": {
+                            "description": "Appended to the name of a node to name its clone",
+                            "type": "string",
+                            "minLength": 1
+                        },
+                        "frontend": {
+                            "description": "The front end (aka public) network for the clones to use",
+                            "type": "string"
+                        },
+                        "backend": {
+                            "description": "The back end (aka private) network for the clones; no other VMs can be using it",
+                            "type": "string"
+                        }
+                    },
+                    "required": ["nodes", "suffix", "frontend", "backend"]
+                   }
+
+    CLUSTER_NETWORK_SCHEMA = {"$schema": "http://json-schema.org/draft-04/schema#",
+                              "description": "Move the front end network of many vOneFS nodes at once",
+                              "type": "object",
+                              "properties": {
+                                  "nodes": {
+                                      "description": "The names of the nodes to move",
+                                      "type": "array",
+                                      "minItems": 1,
+                                      "uniqueItems": True,
+                                      "items": {
+                                          "type": "string"
+                                      }
+                                  },
+                                  "new_network": {
+                                      "description": "The name of the network to connect the nodes to",
+                                      "type": "string"
+                                  }
+                              },
+                              "required": ["nodes", "new_network"]
+                             }
+
+    LEASE_SCHEMA = {"$schema": "http://json-schema.org/draft-04/schema#",
+                    "description": "Renew the lease of a vOneFS node",
+                    "type": "object",
+                    "properties": {
+                        "name": {
+                            "description": "The name of the vOneFS node",
+                            "type": "string"
+                        },
+                        "hours": {
+                            "description": "Delete the node this many hours from now",
+                            "type": "integer",
+                            "minimum": 1,
+                            "maximum": const.VLAB_ONEFS_MAX_LEASE
+                        }
+                    },
+                    "required": ["name", "hours"]
+                   }
+
+    POWER_SCHEMA = {"$schema": "http://json-schema.org/draft-04/schema#",
+                    "description": "Power on every node of a vOneFS cluster together",
+                    "type": "object",
+                    "properties": {
+                        "nodes": {
+                            "description": "The names of the nodes to power on",
+                            "type": "array",
+                            "minItems": 1,
+                            "uniqueItems": True,
+                            "items": {
+                                "type": "string"
+                            }
+                        }
+                    },
+                    "required": ["nodes"]
+                   }
+
+    STATS_SCHEMA = {"$schema": "http://json-schema.org/draft-04/schema#",
+                    "description": "View CPU, memory, disk and network stats of the vOneFS nodes you own"
+                   }
+
+    INVENTORY_SCHEMA = {"$schema": "http://json-schema.org/draft-04/schema#",
+                        "description": "Admin only; list every vOneFS node owned by every user as NDJSON"
+                       }
+
     CONFIG_SCHEMA = {"$schema": "http://json-schema.org/draft-04/schema#",
                      "description": "Configure a OneFS node",
                      "type": "object",
@@ -208,7 +330,18 @@ class OneFSView(MachineView):
         back_end = '{}_{}'.format(username, body['backend'])
         ram = body.get('ram', 4)
         cpu_count = body.get('cpu-count', 2)
-        task = current_app.celery_app.send_task('onefs.create', [username, machine_name, image, front_end, back_end, ram, cpu_count, txn_id])
+        disk_provisioning = body.get('disk-provisioning', 'thin')
+        lease = body.get('lease', None)
+        if not name_index.reserve(username, machine_name):
+            resp_data['error'] = 'A node named {} already exists'.format(machine_name)
+            return ujson.dumps(resp_data), 409
+        try:
+            task = current_app.celery_app.send_task('onefs.create', [username, machine_name, image, front_end, back_end,
+                                                                     ram, cpu_count, txn_id, disk_provisioning, lease])
+        except Exception:
+            # The task never got queued, so nothing will release the name
+            name_index.release(username, machine_name)
+            raise
         resp_data['content'] = {'task-id': task.id}
         resp = Response(ujson.dumps(resp_data))
         resp.status_code = 202
@@ -246,6 +379,161 @@ class OneFSView(MachineView):
         resp.headers.add('Link', '<{0}{1}/task/{2}>; rel=status'.format(const.VLAB_URL, self.route_base, task.id))
         return resp
 
+    @route('/reset', methods=["POST"])
+    @requires(verify=const.VLAB_VERIFY_TOKEN, version=2)
+    @describe(post=RESET_SCHEMA)
+    @validate_input(schema=RESET_SCHEMA)
+    def reset(self, *args, **kwargs):
+        """Revert a OneFS node to the state it was in right after being created"""
+        username = kwargs['token']['username']
+        txn_id = request.headers.get('X-REQUEST-ID', 'noId')
+        resp_data = {'user' : username}
+        machine_name = kwargs['body']['name']
+        task = current_app.celery_app.send_task('onefs.reset', [username, machine_name, txn_id])
+        resp_data['content'] = {'task-id': task.id}
+        resp = Response(ujson.dumps(resp_data))
+        resp.status_code = 202
+        resp.headers.add('Link', '<{0}{1}/task/{2}>; rel=status'.format(const.VLAB_URL, self.route_base, task.id))
+        resp.headers.add('Link', '<{0}{1}/config>; rel=config'.format(const.VLAB_URL, self.route_base))
+        return resp
+
+    @route('/clone', methods=["POST"])
+    @requires(verify=const.VLAB_VERIFY_TOKEN, version=2)
+    @describe(post=CLONE_SCHEMA)
+    @validate_input(schema=CLONE_SCHEMA)
+    def clone(self, *args, **kwargs):
+        """Make linked clones of every node in a OneFS cluster"""
+        username = kwargs['token']['username']
+        txn_id = request.headers.get('X-REQUEST-ID', 'noId')
+        resp_data = {'user' : username}
+        body = kwargs['body']
+        front_end = '{}_{}'.format(username, body['frontend'])
+        back_end = '{}_{}'.format(username, body['backend'])
+        reserved = []
+        for clone_name in ['{}{}'.format(x, body['suffix']) for x in body['nodes']]:
+            if not name_index.reserve(username, clone_name):
+                for name in reserved:
+                    name_index.release(username, name)
+                resp_data['error'] = 'A node named {} already exists'.format(clone_name)
+                return ujson.dumps(resp_data), 409
+            reserved.append(clone_name)
+        try:
+            task = current_app.celery_app.send_task('onefs.clone', [username, body['nodes'], body['suffix'],
+                                                                    front_end, back_end, txn_id])
+        except Exception:
+            for name in reserved:
+                name_index.release(username, name)
+            raise
+        resp_data['content'] = {'task-id': task.id}
+        resp = Response(ujson.dumps(resp_data))
+        resp.status_code = 202
+        resp.headers.add('Link', '<{0}{1}/task/{2}>; rel=status'.format(const.VLAB_URL, self.route_base, task.id))
+        return resp
+
+    @route('/cluster/network', methods=["PUT"])
+    @requires(verify=const.VLAB_VERIFY_TOKEN, version=2)
+    @describe(put=CLUSTER_NETWORK_SCHEMA)
+    @validate_input(schema=CLUSTER_NETWORK_SCHEMA)
+    def modify_cluster_network(self, *args, **kwargs):
+        """Change the network that many OneFS nodes are connected to"""
+        username = kwargs['token']['username']
+        txn_id = request.headers.get('X-REQUEST-ID', 'noId')
+        resp_data = {'user' : username}
+        machine_names = kwargs['body']['nodes']
+        new_network = '{}_{}'.format(username, kwargs['body']['new_network'])
+        task = current_app.celery_app.send_task('onefs.modify_cluster_network',
+                                                [username, machine_names, new_network, txn_id])
+        resp_data['content'] = {'task-id': task.id}
+        resp = Response(ujson.dumps(resp_data))
+        resp.status_code = 202
+        resp.headers.add('Link', '<{0}{1}/task/{2}>; rel=status'.format(const.VLAB_URL, self.route_base, task.id))
+        return resp
+
+    @route('/lease', methods=["PUT"])
+    @requires(verify=const.VLAB_VERIFY_TOKEN, version=2)
+    @describe(put=LEASE_SCHEMA)
+    @validate_input(schema=LEASE_SCHEMA)
+    def lease(self, *args, **kwargs):
+        """Renew the lease of a OneFS node"""
+        username = kwargs['token']['username']
+        txn_id = request.headers.get('X-REQUEST-ID', 'noId')
+        resp_data = {'user' : username}
+        machine_name = kwargs['body']['name']
+        hours = kwargs['body']['hours']
+        task = current_app.celery_app.send_task('onefs.extend_lease', [username, machine_name, hours, txn_id])
+        resp_data['content'] = {'task-id': task.id}
+        resp = Response(ujson.dumps(resp_data))
+        resp.status_code = 202
+        resp.headers.add('Link', '<{0}{1}/task/{2}>; rel=status'.format(const.VLAB_URL, self.route_base, task.id))
+        return resp
+
+    @route('/power', methods=["POST"])
+    @requires(verify=const.VLAB_VERIFY_TOKEN, version=2)
+    @describe(post=POWER_SCHEMA)
+    @validate_input(schema=POWER_SCHEMA)
+    def power(self, *args, **kwargs):
+        """Power on many OneFS nodes together"""
+        username = kwargs['token']['username']
+        txn_id = request.headers.get('X-REQUEST-ID', 'noId')
+        resp_data = {'user' : username}
+        task = current_app.celery_app.send_task('onefs.power_on', [username, kwargs['body']['nodes'], txn_id])
+        resp_data['content'] = {'task-id': task.id}
+        resp = Response(ujson.dumps(resp_data))
+        resp.status_code = 202
+        resp.headers.add('Link', '<{0}{1}/task/{2}>; rel=status'.format(const.VLAB_URL, self.route_base, task.id))
+        return resp
+
+    @route('/stats', methods=["GET"])
+    @requires(verify=const.VLAB_VERIFY_TOKEN, version=2)
+    @describe(get=STATS_SCHEMA)
+    def stats(self, *args, **kwargs):
+        """Show performance stats for the OneFS nodes you own"""
+        username = kwargs['token']['username']
+        txn_id = request.headers.get('X-REQUEST-ID', 'noId')
+        resp_data = {'user' : username}
+        task = current_app.celery_app.send_task('onefs.stats', [username, txn_id])
+        resp_data['content'] = {'task-id': task.id}
+        resp = Response(ujson.dumps(resp_data))
+        resp.status_code = 202
+        resp.headers.add('Link', '<{0}{1}/task/{2}>; rel=status'.format(const.VLAB_URL, self.route_base, task.id))
+        return resp
+
+    @route('/inventory', methods=["GET"])
+    # Checking the username and version in one ``requires`` would let any v2 token in
+    @requires(verify=const.VLAB_VERIFY_TOKEN, version=2)
+    @requires(username=const.VLAB_ONEFS_ADMINS, verify=const.VLAB_VERIFY_TOKEN, version=None)
+    @describe(get=INVENTORY_SCHEMA)
+    def inventory(self, *args, **kwargs):
+        """Start finding every OneFS node owned by every user"""
+        username = kwargs['token']['username']
+        txn_id = request.headers.get('X-REQUEST-ID', 'noId')
+        resp_data = {'user' : username}
+        task = current_app.celery_app.send_task('onefs.inventory', [txn_id])
+        resp_data['content'] = {'task-id': task.id}
+        resp = Response(ujson.dumps(resp_data))
+        resp.status_code = 202
+        resp.headers.add('Link', '<{0}{1}/inventory/{2}>; rel=status'.format(const.VLAB_URL, self.route_base, task.id))
+        return resp
+
+    @route('/inventory/<tid>', methods=["GET"])
+    @requires(verify=const.VLAB_VERIFY_TOKEN, version=2)
+    @requires(username=const.VLAB_ONEFS_ADMINS, verify=const.VLAB_VERIFY_TOKEN, version=None)
+    def inventory_result(self, *args, **kwargs):
+        """Stream the inventory as NDJSON once the task is done"""
+        resp = {'user': kwargs['token']['username'], 'content' : {}}
+        result = current_app.celery_app.AsyncResult(kwargs['tid'])
+        resp['content']['status'] = result.status
+        if result.status == 'SUCCESS':
+            inventory = inventory_spool.read(kwargs['tid'])
+            if inventory is None:
+                resp['error'] = 'The inventory was already fetched, or has expired'
+                return ujson.dumps(resp), 404
+            return Response(inventory, mimetype='application/x-ndjson')
+        elif result.status == 'FAILURE':
+            return ujson.dumps(resp), 500
+        else:
+            return ujson.dumps(resp), 202
+
     @route('/config', methods=["POST"])
     @requires(verify=const.VLAB_VERIFY_TOKEN, version=2)
     @describe(post=CONFIG_SCHEMA)
@@ -0,0 +1,193 @@
+# -*- coding: UTF-8 -*-
+"""
+A cached model of the free capacity of a vCenter server.
+
+Deploying a OneFS node takes minutes, so it's worth a few milliseconds to check
+that the node will fit before starting. The model is only refreshed from vCenter
+once it's older than ``VLAB_ONEFS_CAPACITY_TTL`` seconds; between refreshes, the
+capacity used by every node that passes the preflight is subtracted from the
+model so back-to-back creates can't all claim the same headroom.
+"""
+import re
+import time
+import os.path
+from xml.etree import ElementTree
+
+from vlab_inf_common.vmware import vim
+
+from vlab_onefs_api.lib import const
+
+
+GB = 1024 ** 3
+_MODELS = {}
+
+
+def preflight(vcenter, server, ova_path, ram, cpu_count, disk_gb=None):
+    """Reject a new OneFS node that can't fit on the vCenter server
+
+    The datastore and host capacity is reserved on are returned, so the node can
+    be deployed to exactly the place that was checked.
+
+    :Returns: Dictionary - the names of the ``datastore`` and ``host`` to deploy
+              to, and the ``headroom`` left once the node is created
+
+    :Raises: ValueError
+
+    :param vcenter: An established connection to vCenter
+    :type vcenter: vlab_inf_common.vmware.vcenter.vCenter
+
+    :param server: The IP/FQDN of the vCenter server; the model is cached per server
+    :type server: String
+
+    :param ova_path: The OVA the node is deployed from; its size is the storage the node needs
+    :type ova_path: String
+
+    :param ram: The number of GB of memory to provision the node with
+    :type ram: Integer
+
+    :param cpu_count: The number of CPU cores to allocate to the node
+    :type cpu_count: Integer
+
+    :param disk_gb: Override the storage the node needs; thick provisioned disks
+                    need their full size, not the size of the OVA.
+    :type disk_gb: Float
+    """
+    if disk_gb is None:
+        disk_gb = os.path.getsize(ova_path) / GB
+    model = get_model(vcenter, server)
+    room = headroom(model)
+    problems = []
+    if room['datastore_gb'] < disk_gb:
+        problems.append('needs {:.1f}GB of storage'.format(disk_gb))
+    if room['pool_ram_gb'] < ram:
+        problems.append('needs {}GB of RAM from the resource pool'.format(ram))
+    hosts = [k for k, v in model['hosts'].items() if v['ram_gb'] >= ram and v['cpus'] >= cpu_count]
+    if not hosts:
+        problems.append('needs a host with {}GB of free RAM and {} CPUs'.format(ram, cpu_count))
+    if problems:
+        headroom_msg = ', '.join('{}={}'.format(k, v) for k, v in sorted(room.items()))
+        error = 'Insufficient capacity; node {}. Headroom: {}'.format(' and '.join(problems), headroom_msg)
+        raise ValueError(error)
+    datastore = max(model['datastores'], key=lambda x: model['datastores'][x])
+    model['datastores'][datastore] -= disk_gb
+    host = max(hosts, key=lambda x: model['hosts'][x]['ram_gb'])
+    model['hosts'][host]['ram_gb'] -= ram
+    model['pool_ram_gb'] -= ram
+    return {'datastore': datastore, 'host': host, 'headroom': headroom(model)}
+
+
+def find_datastore(vcenter, name):
+    """Look up one of the datastores in the capacity model by name
+
+    :Returns: vim.Datastore
+
+    :Raises: RuntimeError - if no usable datastore has that name
+
+    :param vcenter: An established connection to vCenter
+    :type vcenter: vlab_inf_common.vmware.vcenter.vCenter
+
+    :param name: The name of the datastore
+    :type name: String
+    """
+    for datastore in _datastores(vcenter):
+        if datastore.name == name:
+            return datastore
+    error = 'Unable to find datastore {}'.format(name)
+    raise RuntimeError(error)
+
+
+def provisioned_gb(ovf):
+    """Add up the full size of every disk defined in an OVF
+
+    :Returns: Float
+
+    :param ovf: The XML that describes an OVA
+    :type ovf: String
+    """
+    total = 0
+    for element in ElementTree.fromstring(ovf).iter():
+        if not element.tag.endswith('}Disk'):
+            continue
+        attrs = {key.split('}')[-1]: value for key, value in element.attrib.items()}
+        units = re.search(r'2\^(\d+)', attrs.get('capacityAllocationUnits', ''))
+        multiplier = 2 ** int(units.group(1)) if units else 1
+        total += int(attrs.get('capacity', 0)) * multiplier
+    return total / GB
+
+
+def headroom(model):
+    """Summarize the largest chunk of each resource that a new node can use
+
+    :Returns: Dictionary
+
+    :param model: The capacity of a vCenter server
+    :type model: Dictionary
+    """
+    return {'datastore_gb': round(max(model['datastores'].values(), default=0), 1),
+            'host_ram_gb': round(max([x['ram_gb'] for x in model['hosts'].values()], default=0), 1),
+            'host_cpus': max([x['cpus'] for x in model['hosts'].values()], default=0),
+            'pool_ram_gb': round(model['pool_ram_gb'], 1)}
+
+
+def get_model(vcenter, server, ttl=const.VLAB_ONEFS_CAPACITY_TTL):
+    """Obtain the cached capacity model of a vCenter server, refreshing it if it's too old
+
+    :Returns: Dictionary
+
+    :param vcenter: An established connection to vCenter
+    :type vcenter: vlab_inf_common.vmware.vcenter.vCenter
+
+    :param server: The IP/FQDN of the vCenter server
+    :type server: String
+
+    :param ttl: How many seconds a model is good for
+    :type ttl: Integer
+    """
+    now = time.time()
+    model = _MODELS.get(server, None)
+    if model is None or now - model['taken'] > ttl:
+        model = _build_model(vcenter)
+        model['taken'] = now
+        _MODELS[server] = model
+    return model
+
+
+def _build_model(vcenter):
+    """Pull the free capacity of the datastores, hosts and resource pool used for new nodes
+
+    :Returns: Dictionary
+
+    :param vcenter: An established connection to vCenter
+    :type vcenter: vlab_inf_common.vmware.vcenter.vCenter
+    """
+    datastores = {x.name: x.summary.freeSpace / GB for x in _datastores(vcenter)}
+    hosts = {}
+    for name, host in vcenter.host_systems.items():
+        if host.runtime.inMaintenanceMode:
+            continue
+        # overallMemoryUsage is in MB
+        used_gb = host.summary.quickStats.overallMemoryUsage / 1024
+        hosts[name] = {'ram_gb': host.hardware.memorySize / GB - used_gb,
+                       'cpus': host.hardware.cpuInfo.numCpuThreads}
+    pool_memory = vcenter.resource_pools[const.INF_VCENTER_RESORUCE_POOL].runtime.memory
+    pool_ram_gb = (pool_memory.maxUsage - pool_memory.overallUsage) / GB
+    return {'datastores': datastores, 'hosts': hosts, 'pool_ram_gb': pool_ram_gb}
+
+
+def _datastores(vcenter):
+    """Expand the datastore clusters new nodes can use into their accessible datastores
+
+    :Returns: Generator of vim.Datastore
+
+    :param vcenter: An established connection to vCenter
+    :type vcenter: vlab_inf_common.vmware.vcenter.vCenter
+    """
+    pods = vcenter.datastores
+    for pod_name in const.INF_VCENTER_DATASTORE.split(','):
+        pod = pods.get(pod_name.strip(), None)
+        if pod is None:
+            continue
+        members = pod.childEntity if isinstance(pod, vim.StoragePod) else [pod]
+        for datastore in members:
+            if datastore.summary.accessible:
+                yield datastore
@@ -0,0 +1,156 @@
+# -*- coding: UTF-8 -*-
+"""
+Watches the WebSocket traffic of the HTML console through the Chrome DevTools
+protocol.
+
+While OneFS is *doing something*, the console server pushes frames to the
+browser to be rendered in the canvas. At a prompt, it sends nothing. Instead of
+polling the chromedriver performance log, a FrameMonitor subscribes to the
+frame-received events of the console's socket and records when the last one
+arrived; waiting for a prompt is then just sleeping until the console has been
+quiet long enough.
+"""
+import time
+import threading
+
+import ujson
+import requests
+import websocket
+
+
+# The console sockets of both the vSphere UI and the WebMKS SDK are opened with a ticket
+CONSOLE_SOCKET = '/ticket/'
+
+
+class FrameTracker(object):
+    """Records when the console last received an update, and lets callers wait on it"""
+    def __init__(self):
+        self.last_frame = time.time()
+        self.frames = 0
+        self._lock = threading.Lock()
+        self._frame_arrived = threading.Condition(self._lock)
+
+    def _frame_received(self):
+        """Record an update of the console; the caller must hold ``_lock``"""
+        self.last_frame = time.time()
+        self.frames += 1
+        self._frame_arrived.notify_all()
+
+    def wait_for_frame(self, since, timeout):
+        """Block until the console receives a frame after the supplied time
+
+        :Returns: Boolean - False if no frame arrived before the timeout
+
+        :param since: The frame must arrive after this time (i.e. when the input was sent)
+        :type since: Float
+
+        :param timeout: The most seconds to wait
+        :type timeout: Float
+        """
+        deadline = time.time() + timeout
+        with self._frame_arrived:
+            while self.last_frame <= since:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._frame_arrived.wait(remaining)
+        return True
+
+    def wait_for_quiet(self, window):
+        """Block until the console hasn't received a frame for ``window`` seconds
+
+        :Returns: None
+
+        :param window: How many seconds without any frames means the console is at a prompt
+        :type window: Integer
+        """
+        begin_wait = time.time()
+        while True:
+            with self._lock:
+                remaining = max(begin_wait, self.last_frame) + window - time.time()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+
+class FrameMonitor(FrameTracker):
+    """Records when the console last received a WebSocket frame
+
+    :param debugger_url: The DevTools WebSocket URL of the page with the console
+    :type debugger_url: String
+
+    :param socket_filter: Only frames on a socket whose URL contains this are tracked
+    :type socket_filter: String
+    """
+    def __init__(self, debugger_url, socket_filter=CONSOLE_SOCKET):
+        super().__init__()
+        self._socket_filter = socket_filter
+        self._sockets = set()
+        # Chrome rejects DevTools connections that send an Origin header it doesn't know
+        self._ws = websocket.create_connection(debugger_url, suppress_origin=True)
+        self._ws.send(ujson.dumps({'id': 1, 'method': 'Network.enable'}))
+        self._thread = threading.Thread(target=self._listen, daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def attach(cls, driver):
+        """Subscribe to the console traffic of the page a webdriver is on
+
+        :Returns: FrameMonitor, or None if Chrome's DevTools can't be reached
+
+        :param driver: A session with Chrome
+        :type driver: selenium.webdriver.Chrome
+        """
+        address = driver.capabilities.get('goog:chromeOptions', {}).get('debuggerAddress')
+        if not isinstance(address, str):
+            return None
+        try:
+            targets = requests.get('http://{}/json'.format(address), timeout=5).json()
+            page = [x for x in targets if x['type'] == 'page'][0]
+            return cls(page['webSocketDebuggerUrl'])
+        except (requests.RequestException, websocket.WebSocketException, OSError, IndexError, KeyError, ValueError):
+            return None
+
+    @property
+    def alive(self):
+        """Determine if the monitor is still receiving events from Chrome"""
+        return self._thread.is_alive()
+
+    def _listen(self):
+        while True:
+            try:
+                message = ujson.loads(self._ws.recv())
+            except (websocket.WebSocketException, OSError, ValueError):
+                break
+            self.handle(message)
+
+    def handle(self, message):
+        """Process a single DevTools event
+
+        :Returns: None
+
+        :param message: The decoded DevTools event
+        :type message: Dictionary
+        """
+        method = message.get('method', None)
+        params = message.get('params', {})
+        if method == 'Network.webSocketCreated':
+            if self._socket_filter in params.get('url', ''):
+                with self._lock:
+                    self._sockets.add(params['requestId'])
+        elif method == 'Network.webSocketFrameReceived':
+            with self._lock:
+                # Until the console socket shows up, every socket counts
+                if self._sockets and params.get('requestId') not in self._sockets:
+                    return
+                self._frame_received()
+
+    def close(self):
+        """End the DevTools session
+
+        :Returns: None
+        """
+        try:
+            self._ws.close()
+        except (websocket.WebSocketException, OSError):
+            pass
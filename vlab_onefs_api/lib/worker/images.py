@@ -0,0 +1,169 @@
+# -*- coding: UTF-8 -*-
+"""
+Keeps track of the images of OneFS that can be deployed, and what each version
+of OneFS needs from the config wizard.
+
+Every OVA in ``VLAB_ONEFS_IMAGES_DIR`` is parsed once into an ImageVersion, so
+versions compare by number (``8.10`` is newer than ``8.9``) instead of by
+string. The directory is only scanned again once it changes (i.e. a new image is
+copied in), and the wizard plan of a version is looked up just once.
+"""
+import os
+import re
+import threading
+from functools import total_ordering
+from collections import namedtuple
+
+from vlab_onefs_api.lib import const
+from vlab_onefs_api.lib.worker import wizard
+
+
+OVA_SUFFIX = '.ova'
+VERSION_FORMAT = re.compile(r'^\d+(\.\d+)*$')
+
+Image = namedtuple('Image', 'version path')
+
+
+@total_ordering
+class ImageVersion(object):
+    """A version of OneFS, that compares by number
+
+    Trailing zeros don't matter; ``8.1`` is the same version as ``8.1.0.0``.
+
+    :Raises: ValueError - if the version isn't a dotted series of numbers
+
+    :param version: The version of OneFS (i.e. ``8.2.0.0``)
+    :type version: String
+    """
+    def __init__(self, version):
+        if not isinstance(version, str) or not VERSION_FORMAT.match(version):
+            raise ValueError('Invalid version of OneFS: {}'.format(version))
+        self.name = version
+        parts = [int(x) for x in version.split('.')]
+        while len(parts) > 1 and parts[-1] == 0:
+            parts.pop()
+        self.parts = tuple(parts)
+
+    def __eq__(self, other):
+        if not isinstance(other, ImageVersion):
+            return NotImplemented
+        return self.parts == other.parts
+
+    def __lt__(self, other):
+        if not isinstance(other, ImageVersion):
+            return NotImplemented
+        return self.parts < other.parts
+
+    def __hash__(self):
+        return hash(self.parts)
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return 'ImageVersion({!r})'.format(self.name)
+
+
+class ImageRegistry(object):
+    """The images of OneFS that can be deployed, and the wizard plan of every version
+
+    :param images_dir: The directory with the OVAs of OneFS
+    :type images_dir: String
+    """
+    def __init__(self, images_dir=const.VLAB_ONEFS_IMAGES_DIR):
+        self.images_dir = images_dir
+        self._lock = threading.Lock()
+        self._scanned_at = None
+        self._images = {}
+        self._sorted = []
+        self._profiles = {}
+        self._plans = None
+
+    def _refresh(self):
+        """Parse the images again, if the directory changed since it was last scanned"""
+        try:
+            modified = os.stat(self.images_dir).st_mtime
+        except OSError:
+            modified = None
+        with self._lock:
+            if self._scanned_at is not None and self._scanned_at == modified:
+                return
+            images = {}
+            for file_name in os.listdir(self.images_dir) if modified is not None else []:
+                if not file_name.endswith(OVA_SUFFIX):
+                    continue
+                try:
+                    version = ImageVersion(file_name[:-len(OVA_SUFFIX)])
+                except ValueError:
+                    continue
+                images[version.name] = Image(version, os.path.join(self.images_dir, file_name))
+            self._images = images
+            self._sorted = [x.version.name for x in sorted(images.values(), key=lambda x: x.version)]
+            self._scanned_at = modified
+
+    def versions(self):
+        """Obtain the versions of OneFS that can be deployed, oldest first
+
+        :Returns: List
+        """
+        self._refresh()
+        return list(self._sorted)
+
+    def get(self, version):
+        """Look up the image of a version of OneFS
+
+        :Returns: Image, or None if there's no image of that version
+
+        :param version: The version of OneFS, exactly as named by its OVA (i.e. ``8.2.0.0``)
+        :type version: String
+        """
+        self._refresh()
+        return self._images.get(version, None)
+
+    def profile(self, version):
+        """Pick the wizard plan for a version of OneFS; the one for the newest
+        release that's not newer than ``version``
+
+        :Returns: String
+
+        :Raises: ValueError - if the version is invalid
+
+        :param version: The version of OneFS being configured
+        :type version: String
+        """
+        try:
+            return self._profiles[version]
+        except KeyError:
+            pass
+        the_version = ImageVersion(version)
+        if self._plans is None:
+            _, plans = wizard.load()
+            self._plans = sorted((ImageVersion(x), x) for x in plans.keys())
+        older = [name for release, name in self._plans if release <= the_version]
+        plan = older[-1] if older else self._plans[0][1]
+        self._profiles[version] = plan
+        return plan
+
+    def capabilities(self, version):
+        """Obtain the sections of the config wizard of a version of OneFS (i.e. ``esrs``)
+
+        :Returns: Set
+
+        :param version: The version of OneFS being configured
+        :type version: String
+        """
+        _, plans = wizard.load()
+        return frozenset(x['step'] if isinstance(x, dict) else x for x in plans[self.profile(version)])
+
+
+_REGISTRY = []
+
+
+def registry():
+    """Obtain the ImageRegistry shared by every task of this worker process
+
+    :Returns: ImageRegistry
+    """
+    if not _REGISTRY:
+        _REGISTRY.append(ImageRegistry())
+    return _REGISTRY[0]
@@ -0,0 +1,308 @@
+# -*- coding: UTF-8 -*-
+"""
+Recognizes the screen the OneFS wizard is showing in the HTML console.
+
+The bottom of the console canvas (where the wizard prints its prompt) is shrunk
+to a small grayscale grid inside the browser, and turned into a difference hash
+(dHash); every bit is whether a cell is brighter than the cell to its right.
+Screens that look alike have hashes that differ by only a few bits, so a screen
+is recognized by the closest known fingerprint within ``VLAB_ONEFS_PROMPT_DISTANCE``
+bits.
+
+Fingerprints are kept in a JSON file (``VLAB_ONEFS_PROMPT_FINGERPRINTS``) that
+maps a screen name to a list of hex hashes. Run a worker with
+``VLAB_ONEFS_PROMPT_RECORD=true`` to add the screens it waits on to the file.
+
+Screenshots of the console from vCenter are PNGs; ``decode_png`` turns them into
+a framebuffer, so they're hashed just like the console.
+"""
+import os
+import zlib
+import struct
+import threading
+
+import ujson
+
+from vlab_onefs_api.lib import const
+
+
+HASH_WIDTH = 16
+HASH_HEIGHT = 16
+PROMPT_AREA = 0.25 # the fraction of the bottom of the screen that's hashed
+
+# Scales the prompt area of the canvas down to (width + 1) x height, then compares
+# the brightness of every cell to the one on its right.
+FINGERPRINT_SCRIPT = """
+var canvas = document.getElementById('mainCanvas');
+var area = arguments[0], width = arguments[1], height = arguments[2];
+if (!canvas || !canvas.width || !canvas.height) {
+    return null;
+}
+var top = Math.floor(canvas.height * (1 - area));
+var grid = document.createElement('canvas');
+grid.width = width + 1;
+grid.height = height;
+var context = grid.getContext('2d');
+context.drawImage(canvas, 0, top, canvas.width, canvas.height - top, 0, 0, width + 1, height);
+var pixels = context.getImageData(0, 0, width + 1, height).data;
+var bits = '';
+for (var y = 0; y < height; y++) {
+    for (var x = 0; x < width; x++) {
+        var left = (y * (width + 1) + x) * 4;
+        var right = left + 4;
+        var left_luma = pixels[left] * 299 + pixels[left + 1] * 587 + pixels[left + 2] * 114;
+        var right_luma = pixels[right] * 299 + pixels[right + 1] * 587 + pixels[right + 2] * 114;
+        bits += left_luma > right_luma ? '1' : '0';
+    }
+}
+return bits;
+"""
+
+
+def fingerprint_frame(frame, width, height):
+    """Hash the prompt area of a framebuffer, like ``FINGERPRINT_SCRIPT`` does in the browser
+
+    Each cell of the grid is the average of a sample of its pixels, so hashing a
+    whole screen stays cheap in Python.
+
+    :Returns: Integer, or None if there's no framebuffer yet
+
+    :param frame: The pixels of the console; 4 bytes each, in blue, green, red, padding order
+    :type frame: bytearray
+
+    :param width: How many pixels wide the framebuffer is
+    :type width: Integer
+
+    :param height: How many pixels tall the framebuffer is
+    :type height: Integer
+    """
+    if not width or not height or len(frame) < width * height * 4:
+        return None
+    top = int(height * (1 - PROMPT_AREA))
+    columns = HASH_WIDTH + 1
+    grid = []
+    for row in range(HASH_HEIGHT):
+        y_start = top + (row * (height - top)) // HASH_HEIGHT
+        y_end = max(y_start + 1, top + ((row + 1) * (height - top)) // HASH_HEIGHT)
+        lumas = []
+        for column in range(columns):
+            x_start = (column * width) // columns
+            x_end = max(x_start + 1, ((column + 1) * width) // columns)
+            total, count = 0, 0
+            for y in range(y_start, y_end, max(1, (y_end - y_start) // 4)):
+                for x in range(x_start, x_end, max(1, (x_end - x_start) // 4)):
+                    pixel = (y * width + x) * 4
+                    total += frame[pixel + 2] * 299 + frame[pixel + 1] * 587 + frame[pixel] * 114
+                    count += 1
+            lumas.append(total / count)
+        grid.append(lumas)
+    bits = 0
+    for lumas in grid:
+        for column in range(HASH_WIDTH):
+            bits = (bits << 1) | (lumas[column] > lumas[column + 1])
+    return bits
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_CHANNELS = {2: 3, 6: 4} # the bytes per pixel of 8 bit RGB, and RGBA
+
+
+def decode_png(data):
+    """Turn a screenshot into a framebuffer that ``fingerprint_frame`` can hash
+
+    Only 8 bit, non-interlaced RGB and RGBA images are supported; that's what
+    vCenter makes.
+
+    :Returns: Tuple - (frame, width, height), where a pixel of the frame is blue, green, red, padding
+
+    :Raises: ValueError - if the data isn't a supported PNG
+
+    :param data: The PNG image
+    :type data: bytes
+    """
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError('Not a PNG image')
+    header = None
+    compressed = []
+    offset = len(PNG_SIGNATURE)
+    while offset + 8 <= len(data):
+        length, kind = struct.unpack('>I4s', data[offset:offset + 8])
+        chunk = data[offset + 8:offset + 8 + length]
+        offset += length + 12 # the length, type and CRC
+        if kind == b'IHDR':
+            header = struct.unpack('>IIBBBBB', chunk)
+        elif kind == b'IDAT':
+            compressed.append(chunk)
+        elif kind == b'IEND':
+            break
+    if header is None:
+        raise ValueError('PNG image has no header')
+    width, height, depth, color_type, _, _, interlace = header
+    if depth != 8 or color_type not in PNG_CHANNELS or interlace:
+        raise ValueError('Unsupported PNG image; depth {}, color type {}, interlace {}'.format(depth, color_type, interlace))
+    try:
+        raw = zlib.decompress(b''.join(compressed))
+    except zlib.error as doh:
+        raise ValueError('Corrupt PNG image: {}'.format(doh))
+    bpp = PNG_CHANNELS[color_type]
+    stride = width * bpp
+    if len(raw) < (stride + 1) * height:
+        raise ValueError('Truncated PNG image')
+    frame = bytearray(width * height * 4)
+    previous = bytearray(stride)
+    for y in range(height):
+        start = y * (stride + 1)
+        row = bytearray(raw[start + 1:start + 1 + stride])
+        _unfilter(raw[start], row, previous, bpp)
+        pixel = y * width * 4
+        frame[pixel:pixel + width * 4:4] = row[2::bpp]
+        frame[pixel + 1:pixel + width * 4:4] = row[1::bpp]
+        frame[pixel + 2:pixel + width * 4:4] = row[0::bpp]
+        previous = row
+    return frame, width, height
+
+
+def _unfilter(filter_type, row, previous, bpp):
+    """Undo the filter of a scanline of a PNG, in place"""
+    if filter_type == 0:
+        return
+    elif filter_type == 1:
+        for i in range(bpp, len(row)):
+            row[i] = (row[i] + row[i - bpp]) & 0xff
+    elif filter_type == 2:
+        for i in range(len(row)):
+            row[i] = (row[i] + previous[i]) & 0xff
+    elif filter_type == 3:
+        for i in range(len(row)):
+            left = row[i - bpp] if i >= bpp else 0
+            row[i] = (row[i] + ((left + previous[i]) >> 1)) & 0xff
+    elif filter_type == 4:
+        for i in range(len(row)):
+            left = row[i - bpp] if i >= bpp else 0
+            up_left = previous[i - bpp] if i >= bpp else 0
+            estimate = left + previous[i] - up_left
+            distances = (abs(estimate - left), abs(estimate - previous[i]), abs(estimate - up_left))
+            if distances[0] <= distances[1] and distances[0] <= distances[2]:
+                predictor = left
+            elif distances[1] <= distances[2]:
+                predictor = previous[i]
+            else:
+                predictor = up_left
+            row[i] = (row[i] + predictor) & 0xff
+    else:
+        raise ValueError('Unknown PNG filter type: {}'.format(filter_type))
+
+
+class PromptRecognizer(object):
+    """Matches fingerprints of the console to the known screens of the wizard
+
+    :param fingerprints: Maps a screen name to a list of its fingerprints
+    :type fingerprints: Dictionary
+
+    :param max_distance: The most bits a fingerprint can differ by and still match
+    :type max_distance: Integer
+    """
+    def __init__(self, fingerprints=None, max_distance=const.VLAB_ONEFS_PROMPT_DISTANCE):
+        self.fingerprints = fingerprints if fingerprints is not None else {}
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=const.VLAB_ONEFS_PROMPT_FINGERPRINTS):
+        """Read the known fingerprints from a file; a missing file knows no screens
+
+        :Returns: PromptRecognizer
+
+        :param path: The JSON file of fingerprints
+        :type path: String
+        """
+        fingerprints = {}
+        if path and os.path.exists(path):
+            with open(path) as the_file:
+                for screen, hashes in ujson.load(the_file).items():
+                    fingerprints[screen] = [int(x, 16) for x in hashes]
+        return cls(fingerprints)
+
+    def save(self, path=const.VLAB_ONEFS_PROMPT_FINGERPRINTS):
+        """Write the known fingerprints to a file
+
+        :Returns: None
+
+        :param path: The JSON file of fingerprints
+        :type path: String
+        """
+        with self._lock:
+            data = {screen: ['{:x}'.format(x) for x in hashes] for screen, hashes in self.fingerprints.items()}
+        tmp = '{}.{}'.format(path, os.getpid())
+        with open(tmp, 'w') as the_file:
+            ujson.dump(data, the_file, indent=2)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def fingerprint(driver):
+        """Hash the prompt area of the console
+
+        :Returns: Integer, or None if the console hasn't drawn anything
+
+        :param driver: A session with the browser showing the console
+        :type driver: selenium.webdriver.Chrome
+        """
+        bits = driver.execute_script(FINGERPRINT_SCRIPT, PROMPT_AREA, HASH_WIDTH, HASH_HEIGHT)
+        if not bits:
+            return None
+        return int(bits, 2)
+
+    def knows(self, screen):
+        """Determine if there's a fingerprint for a screen
+
+        :Returns: Boolean
+        """
+        return bool(self.fingerprints.get(screen, None))
+
+    def identify(self, fingerprint):
+        """Find the known screen that's closest to a fingerprint
+
+        :Returns: String, or None if no screen is close enough
+
+        :param fingerprint: The hash of the console
+        :type fingerprint: Integer
+        """
+        if fingerprint is None:
+            return None
+        best_screen, best_distance = None, self.max_distance + 1
+        with self._lock:
+            for screen, hashes in self.fingerprints.items():
+                for known in hashes:
+                    distance = bin(fingerprint ^ known).count('1')
+                    if distance < best_distance:
+                        best_screen, best_distance = screen, distance
+        return best_screen
+
+    def learn(self, screen, fingerprint):
+        """Remember what a screen looks like, unless it's already recognized
+
+        :Returns: None
+
+        :param screen: The name of the screen
+        :type screen: String
+
+        :param fingerprint: The hash of the console while showing the screen
+        :type fingerprint: Integer
+        """
+        if fingerprint is None or self.identify(fingerprint) == screen:
+            return
+        with self._lock:
+            self.fingerprints.setdefault(screen, []).append(fingerprint)
+
+
+_RECOGNIZER = []
+
+
+def recognizer():
+    """Obtain the PromptRecognizer shared by every console of this worker process
+
+    :Returns: PromptRecognizer
+    """
+    if not _RECOGNIZER:
+        _RECOGNIZER.append(PromptRecognizer.load())
+    return _RECOGNIZER[0]
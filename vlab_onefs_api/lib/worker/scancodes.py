@@ -0,0 +1,81 @@
+# -*- coding: UTF-8 -*-
+"""
+Types on the console of a VM with the vSphere ``PutUsbScanCodes`` API.
+
+vSphere injects USB HID key presses straight into the VM's virtual keyboard, so
+no console session (or browser) is needed; just a vCenter session with the
+``VirtualMachine.Interact.PutUsbScanCodes`` privilege. A whole answer of the
+wizard is sent in a single API call.
+"""
+from vlab_inf_common.vmware import vim
+from selenium.webdriver.common.keys import Keys
+
+
+# USB HID usage IDs of the US keyboard layout; the second value is True if SHIFT must be held
+HID_CODES = {'\n': (0x28, False), ' ': (0x2c, False), '-': (0x2d, False), '_': (0x2d, True),
+             '=': (0x2e, False), '+': (0x2e, True), '[': (0x2f, False), '{': (0x2f, True),
+             ']': (0x30, False), '}': (0x30, True), '\\': (0x31, False), '|': (0x31, True),
+             ';': (0x33, False), ':': (0x33, True), "'": (0x34, False), '"': (0x34, True),
+             '`': (0x35, False), '~': (0x35, True), ',': (0x36, False), '<': (0x36, True),
+             '.': (0x37, False), '>': (0x37, True), '/': (0x38, False), '?': (0x38, True),
+             Keys.ENTER: (0x28, False), Keys.RETURN: (0x28, False), Keys.ESCAPE: (0x29, False),
+             Keys.BACKSPACE: (0x2a, False), Keys.TAB: (0x2b, False), Keys.SPACE: (0x2c, False),
+             Keys.HOME: (0x4a, False), Keys.PAGE_UP: (0x4b, False), Keys.DELETE: (0x4c, False),
+             Keys.END: (0x4d, False), Keys.PAGE_DOWN: (0x4e, False), Keys.RIGHT: (0x4f, False),
+             Keys.LEFT: (0x50, False), Keys.DOWN: (0x51, False), Keys.UP: (0x52, False)}
+for _offset, _letter in enumerate('abcdefghijklmnopqrstuvwxyz'):
+    HID_CODES[_letter] = (0x04 + _offset, False)
+    HID_CODES[_letter.upper()] = (0x04 + _offset, True)
+for _offset, (_digit, _shifted) in enumerate(zip('1234567890', '!@#$%^&*()')):
+    HID_CODES[_digit] = (0x1e + _offset, False)
+    HID_CODES[_shifted] = (0x1e + _offset, True)
+
+MODIFIERS = {Keys.SHIFT: 'leftShift', Keys.CONTROL: 'leftControl', Keys.ALT: 'leftAlt'}
+
+
+def hid_events(*args):
+    """Convert the input of ``send_keys`` into USB HID key presses
+
+    Like Selenium, a modifier (i.e. SHIFT) applies to every key after it, until
+    ``Keys.NULL`` or the end of the input.
+
+    :Returns: List - of (HID usage ID, modifiers) pairs, where modifiers is a set
+              of ``UsbScanCodeSpecModifierType`` attribute names
+
+    :Raises: ValueError - if the input has a key that can't be typed
+
+    :param args: The series of keys to type
+    :type args: List
+    """
+    events = []
+    held = set()
+    for key in ''.join(args):
+        if key == Keys.NULL:
+            held = set()
+        elif key in MODIFIERS:
+            held.add(MODIFIERS[key])
+        elif key in HID_CODES:
+            code, shift = HID_CODES[key]
+            modifiers = set(held)
+            if shift:
+                modifiers.add('leftShift')
+            events.append((code, frozenset(modifiers)))
+        else:
+            raise ValueError('Unable to type {!r} on the console'.format(key))
+    return events
+
+
+def scan_code_spec(events):
+    """Build the argument of ``PutUsbScanCodes`` for a series of key presses
+
+    :Returns: vim.UsbScanCodeSpec
+
+    :param events: The key presses; see ``hid_events``
+    :type events: List
+    """
+    key_events = []
+    for code, modifiers in events:
+        modifier_type = vim.UsbScanCodeSpecModifierType(**{x: True for x in modifiers})
+        # The HID usage ID goes in the upper 16 bits; 7 is the usage page of keyboards
+        key_events.append(vim.UsbScanCodeSpecKeyEvent(usbHidCode=(code << 16) | 0x07, modifiers=modifier_type))
+    return vim.UsbScanCodeSpec(keyEvents=key_events)
@@ -1,6 +1,10 @@
 # -*- coding: UTF-8 -*-
 """This module encapsulates configuring a OneFS node"""
+import os
 import time
+import atexit
+import threading
+from urllib.parse import urlparse, quote
 
 import requests
 from selenium import webdriver
@@ -9,33 +13,427 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import WebDriverException
 
 from vlab_onefs_api.lib import const
+from vlab_onefs_api.lib.worker import prompts, wizard, images, webmks, scancodes, vmware
+from vlab_onefs_api.lib.worker.devtools import FrameMonitor
 
 
 DEFAULT_ROOT_PW = 'a'
 SECTION_PROCESS_PAUSE = 2 # allow the wizard to process a section, before moving onto the next one
+WAIT_POLL_INTERVAL = 0.25 # how often to check the performance log when DevTools aren't available
+KEY_PAUSE = 1 # without echo pacing, how long to give the HTML console to react to input
+TYPE_AHEAD = const.VLAB_ONEFS_TYPE_AHEAD # the default input mode of every console
+SCREEN_POLL_INTERVAL = 0.5 # let the console finish drawing before checking which screen it's on
+
+# The WebMKS widget that draws the console has an API for input. The ticket page
+# makes it a global; the vSphere UI keeps it as a jQuery widget on the canvas' parent.
+FIND_INPUT_API = """
+var candidates = [window.wmks];
+if (window.jQuery) {
+    var holder = window.jQuery('#mainCanvas').parent();
+    candidates.push(holder.data('wmks'), holder.data('ui-wmks'), holder.data('vmware-wmks'));
+}
+for (var i = 0; i < candidates.length; i++) {
+    var api = candidates[i];
+    if (api && typeof api.sendInputString === 'function' && typeof api.sendKeyCodes === 'function') {
+        window.vlabInputApi = api;
+        return true;
+    }
+}
+return false;
+"""
+SEND_INPUT = """
+var api = window.vlabInputApi;
+var ops = arguments[0];
+for (var i = 0; i < ops.length; i++) {
+    if (ops[i][0] === 'text') {
+        api.sendInputString(ops[i][1]);
+    } else {
+        api.sendKeyCodes(ops[i][1]);
+    }
+}
+"""
+JS_KEY_CODES = {Keys.ENTER: 13, Keys.RETURN: 13, Keys.BACKSPACE: 8, Keys.TAB: 9, Keys.ESCAPE: 27,
+                Keys.SPACE: 32, Keys.LEFT: 37, Keys.UP: 38, Keys.RIGHT: 39, Keys.DOWN: 40,
+                Keys.DELETE: 46}
+JS_MODIFIERS = {Keys.SHIFT: 16, Keys.CONTROL: 17, Keys.ALT: 18}
+
+
+def js_input_ops(*args):
+    """Translate the input for ``vSphereConsole.send_keys`` into the operations the
+    console widget's JavaScript API takes.
+
+    Like Selenium, a modifier key (i.e. SHIFT) is held for the rest of the input.
+
+    :Returns: List of ['text', String] and ['keys', List of key codes], or None if
+              the input has a key that can't be sent via the JavaScript API
+
+    :param *args: The series of keys to input
+    :type *args: List
+    """
+    ops = []
+    modifiers = []
+    for char in ''.join(args):
+        if char == Keys.NULL:
+            modifiers = []
+        elif char in JS_MODIFIERS:
+            modifiers.append(JS_MODIFIERS[char])
+        elif char in JS_KEY_CODES:
+            ops.append(['keys', modifiers + [JS_KEY_CODES[char]]])
+        elif '\ue000' <= char <= '\uf8ff':
+            # Some other special key of Selenium
+            return None
+        elif modifiers:
+            if not (char.isascii() and char.isalnum()):
+                return None
+            ops.append(['keys', modifiers + [ord(char.upper())]])
+        elif ops and ops[-1][0] == 'text':
+            ops[-1][1] += char
+        else:
+            ops.append(['text', char])
+    return ops
+
+
+def new_driver():
+    """Launch a headless Chrome that records its network traffic
+
+    :Returns: selenium.webdriver.Chrome
+    """
+    options = Options()
+    options.add_experimental_option('w3c', False)
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    if not const.INF_VCENTER_VERIFY_CERT:
+        # WebMKS tickets connect straight to the ESXi host
+        options.add_argument("--ignore-certificate-errors")
+    return webdriver.Chrome(chrome_options=options,
+                            service_log_path='/var/log/webdriver.log',
+                            desired_capabilities={'loggingPrefs': {'performance': 'ALL'}})
+
+
+def webmks_page(ticket_url, sdk_url=const.VLAB_ONEFS_WMKS_SDK_URL):
+    """Build a page that opens the console of a VM with the WebMKS SDK
+
+    :Returns: String - a ``data:`` URL
+
+    :param ticket_url: The WebMKS ticket URL of the VM console
+    :type ticket_url: String
+
+    :param sdk_url: Where the WebMKS SDK, and the jQuery it needs, are served from
+    :type sdk_url: String
+    """
+    page = """<html><head>
+<script src="{0}/jquery.min.js"></script>
+<script src="{0}/jquery-ui.min.js"></script>
+<script src="{0}/wmks.min.js"></script>
+</head><body>
+<div id="wmksContainer" style="position:absolute;width:100%;height:100%"></div>
+<script>
+var wmks = WMKS.createWMKS("wmksContainer", {{}});
+wmks.connect("{1}");
+</script>
+</body></html>""".format(sdk_url, ticket_url)
+    return 'data:text/html;charset=utf-8,{}'.format(quote(page))
+
+
+class Browser(object):
+    """A Chrome instance owned by a BrowserPool
+
+    :param driver: The session with Chrome
+    :type driver: selenium.webdriver.Chrome
+    """
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+
+
+class BrowserPool(object):
+    """Keeps Chrome running between configs, so each console doesn't pay to launch it
+
+    Browsers are only launched when a console needs one. Once a console is done,
+    the browser is wiped (cookies, page and logs) and kept for the next console,
+    unless it's been used ``max_uses`` times or has grown past ``max_mb`` of memory.
+
+    :param size: The most idle browsers to keep running
+    :type size: Integer
+
+    :param max_uses: How many consoles a browser serves before it's replaced
+    :type max_uses: Integer
+
+    :param max_mb: Replace a browser once it (and its child processes) use this much memory
+    :type max_mb: Integer
+    """
+    def __init__(self, size=const.VLAB_ONEFS_BROWSER_POOL_SIZE, max_uses=const.VLAB_ONEFS_BROWSER_MAX_USES,
+                 max_mb=const.VLAB_ONEFS_BROWSER_MAX_MB):
+        self.size = size
+        self.max_uses = max_uses
+        self.max_mb = max_mb
+        self._idle = []
+        self._lock = threading.Lock()
+        self._counts = {'acquired': 0, 'busy': 0, 'created': 0, 'recycled': 0}
+
+    def acquire(self):
+        """Obtain a warm browser, or launch a new one if none are idle
+
+        :Returns: Browser
+        """
+        with self._lock:
+            self._counts['acquired'] += 1
+            self._counts['busy'] += 1
+            idle = self._idle
+            self._idle = []
+        browser = None
+        for candidate in idle:
+            if browser is None and self._healthy(candidate):
+                browser = candidate
+            else:
+                self._quit(candidate)
+        if browser is None:
+            try:
+                browser = Browser(new_driver())
+            except Exception:
+                with self._lock:
+                    self._counts['busy'] -= 1
+                raise
+            with self._lock:
+                self._counts['created'] += 1
+        return browser
+
+    def release(self, browser):
+        """Hand back a browser; it's kept for the next console if it's still fit for use
+
+        :Returns: None
+
+        :param browser: The browser obtained via ``acquire``
+        :type browser: Browser
+        """
+        browser.uses += 1
+        with self._lock:
+            self._counts['busy'] -= 1
+        keep = browser.uses < self.max_uses and self._reset(browser) and self._memory_ok(browser)
+        with self._lock:
+            if keep and len(self._idle) < self.size:
+                self._idle.append(browser)
+                return
+        self._quit(browser)
+
+    def stats(self):
+        """Report how the pool is being used
+
+        :Returns: Dictionary
+        """
+        with self._lock:
+            stats = dict(self._counts)
+            stats['idle'] = len(self._idle)
+        stats['size'] = self.size
+        stats['reused'] = stats['acquired'] - stats['created']
+        return stats
+
+    def close(self):
+        """Quit every idle browser
+
+        :Returns: None
+        """
+        with self._lock:
+            idle = self._idle
+            self._idle = []
+        for browser in idle:
+            self._quit(browser)
+
+    def _quit(self, browser):
+        with self._lock:
+            self._counts['recycled'] += 1
+        try:
+            browser.driver.quit()
+        except WebDriverException:
+            pass
+
+    @staticmethod
+    def _healthy(browser):
+        """Determine if Chrome still responds"""
+        try:
+            browser.driver.current_url
+        except WebDriverException:
+            return False
+        return True
+
+    @staticmethod
+    def _reset(browser):
+        """Wipe everything the last console left behind; returns False if Chrome didn't respond"""
+        try:
+            browser.driver.delete_all_cookies()
+            browser.driver.get('about:blank')
+            # Reading the log empties it
+            browser.driver.get_log('performance')
+        except WebDriverException:
+            return False
+        return True
+
+    def _memory_ok(self, browser):
+        try:
+            pid = browser.driver.service.process.pid
+        except AttributeError:
+            return True
+        return _memory_mb(pid) < self.max_mb
+
+
+def _memory_mb(pid):
+    """Add up the resident memory of a process and all of its children
+
+    :Returns: Float
+
+    :param pid: The process ID of the parent process
+    :type pid: Integer
+    """
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open('/proc/{}/stat'.format(entry)) as the_file:
+                stat = the_file.read()
+        except OSError:
+            continue
+        # The command name is in parentheses, and can contain spaces
+        ppid = int(stat.rsplit(')', 1)[1].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+    total_kb = 0
+    todo = [pid]
+    while todo:
+        current = todo.pop()
+        todo.extend(children.get(current, []))
+        try:
+            with open('/proc/{}/status'.format(current)) as the_file:
+                for line in the_file:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            continue
+    return total_kb / 1024
+
+
+_PACING_STATS = {}
+_PACING_LOCK = threading.Lock()
+
+
+def _record_pacing(version, pacing):
+    """Add the input timing of one console to the totals of its OneFS version"""
+    with _PACING_LOCK:
+        totals = _PACING_STATS.setdefault(version or 'unknown', {'consoles': 0, 'inputs': 0, 'echoed': 0, 'seconds': 0.0})
+        totals['consoles'] += 1
+        for key, value in pacing.items():
+            totals[key] += value
+
+
+def pacing_report():
+    """Summarize how long the consoles of each OneFS version spent waiting on input
+
+    ``fixed_seconds`` is how long the same input would have taken with a fixed
+    ``KEY_PAUSE`` after every key press.
+
+    :Returns: Dictionary
+    """
+    report = {}
+    with _PACING_LOCK:
+        for version, totals in _PACING_STATS.items():
+            fixed_seconds = totals['inputs'] * KEY_PAUSE
+            report[version] = dict(totals,
+                                   seconds=round(totals['seconds'], 1),
+                                   fixed_seconds=fixed_seconds,
+                                   saved_seconds=round(fixed_seconds - totals['seconds'], 1))
+    return report
+
+
+_POOLS = {}
+
+
+def browser_pool():
+    """Obtain the BrowserPool of this worker process
+
+    :Returns: BrowserPool, or None when pooling is disabled
+    """
+    if not const.VLAB_ONEFS_BROWSER_POOL_SIZE:
+        return None
+    pid = os.getpid()
+    if pid not in _POOLS:
+        # A forked worker must not share the browsers of its parent
+        _POOLS.clear()
+        _POOLS[pid] = BrowserPool()
+        atexit.register(_POOLS[pid].close)
+    return _POOLS[pid]
 
 
 class vSphereConsole(object):
-    """Login and return an interactive session with the HTML console for a VM"""
+    """Login and return an interactive session with the HTML console for a VM
+
+    The ``url`` is either the vSphere UI console of the VM, or a WebMKS ticket
+    URL (``wss://``) from ``vmware.get_console_ticket``. A ticket skips logging
+    into the vSphere UI.
+
+    Input is paced by the console's echo; the next input is sent as soon as the
+    console draws the last one, waiting no longer than ``echo_timeout`` seconds.
+    Without DevTools, or with an ``echo_timeout`` of zero, every input waits a
+    fixed ``KEY_PAUSE``. The timing is reported per ``version`` by ``pacing_report``.
+
+    When ``js_input`` is True and the console widget has an input API, each call
+    to ``send_keys`` is a single ``execute_script``; otherwise the keys are sent
+    to the canvas via Selenium.
+
+    With ``type_ahead``, input is buffered and sent in chunks of about
+    ``VLAB_ONEFS_TYPE_AHEAD_CHUNK`` characters; the terminal of the wizard holds
+    it until each prompt reads its answer. The buffer is sent whenever the
+    wizard has to be waited on (``wait_for_prompt``), and when the console is
+    closed. ``pause`` is skipped, because the buffered input already waits on
+    the wizard. Defaults to ``TYPE_AHEAD``. Passwords (``secret`` input) are
+    never typed ahead; see ``send_keys``.
+
+    ``wait_for_prompt`` can name the screen the wizard should be on next; the
+    ``recognizer`` (by default, the one shared by the worker process) is used to
+    stop waiting as soon as that screen is drawn.
+    """
     def __init__(self, url, username=const.INF_VCENTER_READONLY_USER, headless=True,
-                 password=const.INF_VCENTER_READONLY_PASSWORD):
-        options = Options()
-        options.add_experimental_option('w3c', False)
-        options.add_argument("--headless")
-        options.add_argument("--no-sandbox")
-        self._driver = webdriver.Chrome(chrome_options=options,
-                                        service_log_path='/var/log/webdriver.log',
-                                        desired_capabilities={'loggingPrefs': {'performance': 'ALL'}})
-        login_page = 'https://{}/ui'.format(const.INF_VCENTER_SERVER)
+                 password=const.INF_VCENTER_READONLY_PASSWORD, pool=None, version=None,
+                 echo_timeout=const.VLAB_ONEFS_ECHO_TIMEOUT, js_input=True, type_ahead=None,
+                 recognizer=None):
+        self._pool = pool
+        self._init_input(version, echo_timeout, type_ahead, recognizer)
+        if pool is None:
+            self._browser = None
+            self._driver = new_driver()
+        else:
+            self._browser = pool.acquire()
+            self._driver = self._browser.driver
         self._username = username
         self._password = password
-        self._driver.get(login_page)
-        self._login()
-        self._console = self._get_console(url)
+        # Must be listening before the console opens its socket
+        self._monitor = FrameMonitor.attach(self._driver)
+        try:
+            if urlparse(url).scheme == 'wss':
+                # A WebMKS ticket grants access to the console; no need to login to vCenter
+                self._console = self._get_console(webmks_page(url))
+            else:
+                # The console is served by the vCenter that owns the VM; login there
+                login_page = 'https://{}/ui'.format(urlparse(url).netloc)
+                self._driver.get(login_page)
+                self._login()
+                self._console = self._get_console(url)
+        except Exception:
+            self.close()
+            raise
+        self._js_input = js_input and self._find_input_api()
         self.keys = Keys
 
+    def _init_input(self, version, echo_timeout, type_ahead, recognizer):
+        """Set up the pacing, type-ahead and screen recognition of the input"""
+        self._recognizer = recognizer if recognizer is not None else prompts.recognizer()
+        self._type_ahead = TYPE_AHEAD if type_ahead is None else type_ahead
+        self._buffer = []
+        self.version = version
+        self._echo_timeout = echo_timeout
+        self.pacing = {'inputs': 0, 'echoed': 0, 'seconds': 0.0}
+
     def _login(self):
         # Waits upwards of 30 seconds for the page to load
         username_field = WebDriverWait(self._driver, 30).until(
@@ -58,14 +456,35 @@ class vSphereConsole(object):
             EC.presence_of_element_located((By.ID, "mainCanvas")))
         return console
 
+    def _find_input_api(self):
+        """Determine if the console widget's JavaScript input API can be used"""
+        try:
+            return self._driver.execute_script(FIND_INPUT_API) is True
+        except WebDriverException:
+            return False
+
     def __enter__(self):
         """Enables use of the ``with`` statement"""
         return self
 
     def __exit__(self, exc_type, exc_value, the_traceback):
-        self._driver.quit()
-
-    def send_keys(self, *args, auto_enter=True):
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self.close()
+
+    def close(self):
+        """Quit the browser, or hand it back to the pool it came from"""
+        if self._monitor is not None:
+            self._monitor.close()
+        _record_pacing(self.version, self.pacing)
+        if self._pool is None:
+            self._driver.quit()
+        else:
+            self._pool.release(self._browser)
+
+    def send_keys(self, *args, auto_enter=True, secret=False):
         """Like, if you were to type with your keyboard.
 
         For non-standard keys (like ENTER, SHIFT, etc), look at the
@@ -78,21 +497,134 @@ class vSphereConsole(object):
 
         :param auto_enter: Presses the ENTER key for you when set to True.
         :type auto_enter: Boolean
+
+        :param secret: Set to True when answering a password prompt. Default False
+        :type secret: Boolean
         """
+        if self._type_ahead and secret:
+            # A password prompt flushes the terminal as it turns echo off (and
+            # back on), dropping anything typed ahead of it. So wait for the
+            # prompt to be drawn, and for it to read the password, on its own.
+            self.flush()
+            self._wait_for_quiet(const.VLAB_ONEFS_TYPE_AHEAD_SETTLE)
+            self._send(args, auto_enter)
+            self._wait_for_quiet(const.VLAB_ONEFS_TYPE_AHEAD_SETTLE)
+            return
+        if self._type_ahead:
+            self._buffer.extend(args)
+            if auto_enter:
+                self._buffer.append(Keys.ENTER)
+            # Release any modifier (i.e. SHIFT), like the end of a send_keys call does
+            self._buffer.append(Keys.NULL)
+            if sum(len(x) for x in self._buffer) >= const.VLAB_ONEFS_TYPE_AHEAD_CHUNK:
+                self.flush()
+            return
+        self._send(args, auto_enter)
+
+    def _send(self, args, auto_enter):
+        """Send input to the console, and give the console time to react"""
+        ops = js_input_ops(*args) if self._js_input else None
+        if ops is not None:
+            if auto_enter:
+                ops.append(['keys', [JS_KEY_CODES[Keys.ENTER]]])
+            sent_at = time.time()
+            self._driver.execute_script(SEND_INPUT, ops)
+            self._pace(sent_at)
+            return
+        sent_at = time.time()
         self._console.send_keys(*args)
-        time.sleep(1) # Give the HTML console time to react to input
+        self._pace(sent_at)
         if auto_enter:
+            sent_at = time.time()
             self._console.send_keys(Keys.ENTER)
-            time.sleep(1)
+            self._pace(sent_at)
+
+    def flush(self):
+        """Send all the type-ahead input, and let the console catch up with it
+
+        :Returns: None
+        """
+        if not self._buffer:
+            return
+        keys = ''.join(self._buffer)
+        self._buffer = []
+        self._send((keys,), auto_enter=False)
+        self._wait_for_quiet(const.VLAB_ONEFS_TYPE_AHEAD_SETTLE)
+
+    def pause(self, seconds):
+        """Give the wizard time to process a section; skipped with type-ahead
+
+        :Returns: None
 
-    def wait_for_prompt(self, timeout=30):
+        :param seconds: How long to pause
+        :type seconds: Integer
+        """
+        if not self._type_ahead:
+            time.sleep(seconds)
+
+    def _pace(self, sent_at):
+        """Give the HTML console time to react to input"""
+        self.pacing['inputs'] += 1
+        if self._echo_timeout and self._monitor is not None and self._monitor.alive:
+            if self._monitor.wait_for_frame(sent_at, self._echo_timeout):
+                self.pacing['echoed'] += 1
+        else:
+            time.sleep(KEY_PAUSE)
+        self.pacing['seconds'] += time.time() - sent_at
+
+    def wait_for_prompt(self, timeout=30, screen=None):
         """Wait for vCenter to stop sending data to be rendered in the HTML console.
 
         :Returns: None
 
+        :Raises: RuntimeError - if the console goes quiet on a screen other than ``screen``
+
         :param timeout: How long to wait for data to show up in the HTML console
         :type timeout: Integer
+
+        :param screen: The wizard screen to wait for. The wait ends the moment it's
+                       recognized. Without a fingerprint of the screen, this is
+                       the same as just waiting for the console to go quiet.
+        :type screen: String
         """
+        self.flush()
+        if screen is None or const.VLAB_ONEFS_PROMPT_RECORD or not self._recognizer.knows(screen):
+            self._wait_for_quiet(timeout)
+            if screen is not None and const.VLAB_ONEFS_PROMPT_RECORD:
+                self._recognizer.learn(screen, self._fingerprint())
+                self._recognizer.save()
+        else:
+            self._wait_for_screen(screen, timeout)
+
+    def _fingerprint(self):
+        """Hash the prompt area of the console"""
+        return self._recognizer.fingerprint(self._driver)
+
+    def _wait_for_screen(self, screen, timeout):
+        """Return once the screen is drawn; fail fast if the console goes quiet on any other screen"""
+        begin_wait = time.time()
+        seen = self._recognizer.identify(self._fingerprint())
+        if self._monitor is None or not self._monitor.alive:
+            if seen != screen:
+                self._wait_for_quiet(timeout)
+                seen = self._recognizer.identify(self._fingerprint())
+        while seen != screen and self._monitor is not None and self._monitor.alive:
+            quiet_for = time.time() - max(begin_wait, self._monitor.last_frame)
+            if quiet_for >= timeout:
+                break
+            # Nothing changes on screen until the console receives another frame
+            if self._monitor.wait_for_frame(time.time(), timeout - quiet_for):
+                time.sleep(SCREEN_POLL_INTERVAL)
+                seen = self._recognizer.identify(self._fingerprint())
+        if seen != screen:
+            error = 'Expected the {} screen of the wizard, but the console is showing {}'.format(screen, seen or 'an unknown screen')
+            raise RuntimeError(error)
+
+    def _wait_for_quiet(self, timeout):
+        if self._monitor is not None and self._monitor.alive:
+            self._monitor.wait_for_quiet(timeout)
+            return
+        # Chrome's DevTools aren't reachable; fall back to polling the performance log
         begin_wait = time.time()
         while time.time() - begin_wait < timeout:
             # The HTML console in vSphere uses websockets to render an HTML canvas.
@@ -107,521 +639,300 @@ class vSphereConsole(object):
                 # Every call of the log empties it. When there's no new performance
                 # logging messages, we get an empty list.
                 begin_wait = time.time()
+            time.sleep(WAIT_POLL_INTERVAL)
 
 
-def join_existing_cluster(console_url, cluster_name, compliance, logger):
-    """Adds a new node to an existing cluster"""
-    logger.info('Setting up Selenium')
-    with vSphereConsole(console_url) as console:
-        logger.info('Waiting for node to fully boot')
-        console.wait_for_prompt() # Wait for the node to finish booting
-        logger.info('Formatting disks')
-        format_disks(console)
-        if compliance:
-            logger.info('Rebooting node into compliance mode')
-            enable_compliance_mode(console)
-        logger.info('Joining cluster {}'.format(cluster_name))
-        console.send_keys('2')
-        console.send_keys(cluster_name)
-        logger.info('Waiting for the node to join')
-        console.wait_for_prompt(timeout=20)
-        logger.info("proactive retry of node add")
-        console.send_keys(cluster_name)
-        console.wait_for_prompt(timeout=20)
-
-
-def configure_new_cluster(version, logger, compliance, **kwargs):
-    """Because for some reason, the order of the Wizard changes with OneFS releases...
+class WebMKSConsole(vSphereConsole):
+    """An interactive session with the console of a VM, without a browser
 
-    :param version: The version of OneFS to configure
-    :type version: String
+    Speaks the WebMKS protocol directly (see ``webmks.RFBConnection``), so the
+    ``url`` must be a WebMKS ticket URL from ``vmware.get_console_ticket``. Input
+    is paced by the framebuffer updates the console sends back, and screens are
+    recognized from the framebuffer; otherwise this is just like a vSphereConsole.
     """
-    if compliance:
-        compliance_license = get_compliance_license()
-    else:
-        compliance_license = None
-    if version >= '8.2.0.0':
-        logger.info("Config OneFS 8.2.0 and newer")
-        return configure_new_8_2_0_cluster(logger=logger, compliance_license=compliance_license, **kwargs)
-    elif version >= '8.1.2.0':
-        logger.info('Config OneFS 8.1.2 -> 8.1.3')
-        kwargs['version'] = version
-        return configure_new_8_1_2_cluster(logger=logger, compliance_license=compliance_license, **kwargs)
-    elif version >= '8.1.0.0':
-        logger.info('Config OneFS 8.1.0 -> 8.1.1')
-        return configure_new_8_1_cluster(logger=logger, compliance_license=compliance_license, **kwargs)
-    elif version >= '8.0.0.0':
-        logger.info('Config OneFS 8.0.0 -> 8.0.1')
-        return configure_new_8_0_cluster(logger=logger, compliance_license=compliance_license, **kwargs)
-    else:
-        logger.info("Config OneFS 7.2.1 or older")
-        return configure_new_7_2_cluster(logger=logger, compliance_license=compliance_license, **kwargs)
-
-
-def configure_new_7_2_cluster(console_url, cluster_name, int_netmask, int_ip_low, int_ip_high,
-                              ext_netmask, ext_ip_low, ext_ip_high, gateway, dns_servers,
-                              encoding, sc_zonename, smartconnect_ip, compliance_license, logger):
-    """Walk through the config Wizard to create a functional one-node cluster
-
-    :Returns: None
+    def __init__(self, url, version=None, echo_timeout=const.VLAB_ONEFS_ECHO_TIMEOUT, type_ahead=None,
+                 recognizer=None, connect_timeout=30):
+        if urlparse(url).scheme not in ('ws', 'wss'):
+            raise ValueError('A browserless console needs a WebMKS ticket URL, not {}'.format(url))
+        self._pool = None
+        self._browser = None
+        self._driver = None
+        self._console = None
+        self._js_input = False
+        self.keys = Keys
+        self._init_input(version, echo_timeout, type_ahead, recognizer)
+        self._monitor = webmks.RFBConnection(url, timeout=connect_timeout)
 
-    :param console_url: The URL to the vSphere HTML console for the OneFS node
-    :type console_url: String
+    def close(self):
+        """End the session with the console"""
+        self._monitor.close()
+        _record_pacing(self.version, self.pacing)
 
-    :param cluster_name: The name to give the new cluster
-    :type cluster_name: String
+    def _send(self, args, auto_enter):
+        """Send input to the console, and give the console time to react"""
+        if auto_enter:
+            args = args + (Keys.ENTER,)
+        events = webmks.key_events(*args)
+        sent_at = time.time()
+        self._monitor.send_key_events(events)
+        self._pace(sent_at)
 
-    :param int_netmask: The subnet mask for the internal OneFS network
-    :type int_netmask: String
+    def _fingerprint(self):
+        """Hash the prompt area of the console"""
+        return self._monitor.fingerprint()
 
-    :param int_ip_low: The smallest IP to assign to an internal NIC
-    :type int_ip_low: String (IPv4 address)
+    def _wait_for_quiet(self, timeout):
+        if not self._monitor.alive:
+            raise RuntimeError('Lost the connection to the console')
+        self._monitor.wait_for_quiet(timeout)
 
-    :param int_ip_high: The largest IP to assign to an internal NIC
-    :type int_ip_high: String (IPv4 address)
 
-    :param ext_ip_low: The smallest IP to assign to an external/public NIC
-    :type ext_ip_low: String (IPv4 address)
+class ScanCodeConsole(vSphereConsole):
+    """Types on the console of a VM with the vSphere ``PutUsbScanCodes`` API
 
-    :param ext_ip_high: The largest IP to assign to an external/public NIC
-    :type ext_ip_high: String (IPv4 address)
+    Uses the vCenter session that already found the VM (see ``vmware.OneFSNode``),
+    so there's no browser, no console session, and no need for the readonly user.
+    Every call to ``send_keys`` (or every chunk of type-ahead input) is a single
+    API call.
 
-    :param gateway: The IP address for the default gateway
-    :type gateway: String (IPv4 address)
+    The API can't see the screen, so every input waits a fixed ``KEY_PAUSE``, and
+    ``wait_for_prompt`` watches screenshots of the console (see
+    ``vmware.wait_until_ready``). Without screenshots, it waits the full ``timeout``.
 
-    :param dns_servers: A common separated list of IPs of the DNS servers to use
-    :type dns_servers: String
+    :Raises: RuntimeError - if vSphere doesn't inject all the keys
 
-    :param encoding: The filesystem encoding to use.
-    :type encoding: String
+    :param the_vm: The OneFS node to type on
+    :type the_vm: vim.VirtualMachine
+    """
+    def __init__(self, the_vm, version=None, type_ahead=None, recognizer=None):
+        self._pool = None
+        self._browser = None
+        self._driver = None
+        self._console = None
+        self._monitor = None
+        self._js_input = False
+        self._vm = the_vm
+        self.keys = Keys
+        # No echo to pace the input by
+        self._init_input(version, 0, type_ahead, recognizer)
 
-    :param sc_zonename: The SmartConnect Zone name to use. Skipped if None.
-    :type sc_zonename: String
+    def close(self):
+        """Nothing to close; the vCenter session belongs to the caller"""
+        _record_pacing(self.version, self.pacing)
 
-    :param smartconnect_ip: The IPv4 address to use as the SIP
-    :type smartconnect_ip: String (IPv4 address)
+    def _send(self, args, auto_enter):
+        """Send input to the console, and give the console time to react"""
+        if auto_enter:
+            args = args + (Keys.ENTER,)
+        events = scancodes.hid_events(*args)
+        sent_at = time.time()
+        if events:
+            injected = self._vm.PutUsbScanCodes(scancodes.scan_code_spec(events))
+            if injected != len(events):
+                error = 'Only typed {} of {} keys on the console of {}'.format(injected, len(events), self._vm.name)
+                raise RuntimeError(error)
+        self._pace(sent_at)
+
+    def wait_for_prompt(self, timeout=30, screen=None):
+        """Wait for the console to stop changing, or to show the next screen of the wizard
 
-    :param compliance_license: The license key to create a compliance mode cluster
-    :type compliance_license: String
+        :Returns: None
 
-    :param logger: A object for logging information/errors
-    :type logger: logging.Logger
-    """
-    logger.info('Setting up Selenium')
-    with vSphereConsole(console_url) as console:
-        logger.info('Waiting for node to fully boot')
-        console.wait_for_prompt() # Wait for the node to finish booting
-        logger.info('Formatting disks')
-        format_disks(console)
-        if compliance_license:
-            logger.info('Rebooting node into compliance mode')
-            enable_compliance_mode(console)
-        logger.info('Accepting EULA')
-        make_new_and_accept_eual(console, compliance_license)
-        logger.info('Setting root and admin passwords')
-        set_passwords(console)
-        logger.info('Skipping ESRS config')
-        set_esrs(console) # 8.0.0.x; ESRS comes before everything else...
-        logger.info("Naming cluster {}".format(cluster_name))
-        set_name(console, cluster_name)
-        logger.info("Settings encoding to {}".format(encoding))
-        set_encoding(console, encoding)
-        # setup int network
-        logger.info('Setting up internal network - Mask: {} Low: {} High: {}'.format(int_netmask, int_ip_low, int_ip_high))
-        # many_enters is the ONE difference between 7.2 and 8.0...
-        config_network(console, netmask=int_netmask, ip_low=int_ip_low, ip_high=int_ip_high, many_enters=False)
-        # setup ext network
-        logger.info('Settings up external network - Mask: {} Low: {} High: {}'.format(ext_netmask, ext_ip_low, ext_ip_high))
-        config_network(console, netmask=ext_netmask, ip_low=ext_ip_low, ip_high=ext_ip_high, ext_network=True)
-        logger.info('Setting up default gateway for ext network to {}'.format(gateway))
-        set_default_gateway(console, gateway)
-        logger.info('Configuring SmartConnect - Zone: {} IP: {}'.format(sc_zonename, smartconnect_ip))
-        set_smartconnect(console, sc_zonename, smartconnect_ip)
-        logger.info('Setting DNS servers to {}'.format(dns_servers))
-        set_dns(console, dns_servers)
-        logger.info('Skipping timezone config')
-        set_timezone(console)
-        logger.info('Skipping join mode config')
-        set_join_mode(console)
-        logger.info('Committing changes and waiting for the cluster to form')
-        commit_config(console)
-        console.wait_for_prompt(timeout=60) # isi firmware status --save is slow
-        set_sysctls(console, compliance_mode=bool(compliance_license))
-
-
-
-def configure_new_8_0_cluster(console_url, cluster_name, int_netmask, int_ip_low, int_ip_high,
-                              ext_netmask, ext_ip_low, ext_ip_high, gateway, dns_servers,
-                              encoding, sc_zonename, smartconnect_ip, compliance_license, logger):
-    """Walk through the config Wizard to create a functional one-node cluster
+        :param timeout: How long the console has to stop changing
+        :type timeout: Integer
 
-    :Returns: None
+        :param screen: The wizard screen to wait for
+        :type screen: String
+        """
+        self.flush()
+        if not vmware.wait_until_ready(self._vm, screen=screen, quiet=timeout, recognizer=self._recognizer):
+            self._wait_for_quiet(timeout)
 
-    :param console_url: The URL to the vSphere HTML console for the OneFS node
-    :type console_url: String
+    def _fingerprint(self):
+        """The screen can't be seen"""
+        return None
 
-    :param cluster_name: The name to give the new cluster
-    :type cluster_name: String
+    def _wait_for_quiet(self, timeout):
+        time.sleep(timeout)
 
-    :param int_netmask: The subnet mask for the internal OneFS network
-    :type int_netmask: String
 
-    :param int_ip_low: The smallest IP to assign to an internal NIC
-    :type int_ip_low: String (IPv4 address)
+def open_console(url, version=None):
+    """Open the console of a VM with the backend set by ``VLAB_ONEFS_CONSOLE_BACKEND``
 
-    :param int_ip_high: The largest IP to assign to an internal NIC
-    :type int_ip_high: String (IPv4 address)
+    The ``webmks`` backend needs a WebMKS ticket URL; with the URL of the vSphere
+    UI, the browser is used. The ``scancodes`` backend needs the VM itself,
+    instead of a URL.
 
-    :param ext_ip_low: The smallest IP to assign to an external/public NIC
-    :type ext_ip_low: String (IPv4 address)
+    :Returns: vSphereConsole
 
-    :param ext_ip_high: The largest IP to assign to an external/public NIC
-    :type ext_ip_high: String (IPv4 address)
+    :param url: The URL of the console, or the VM for the ``scancodes`` backend
+    :type url: String, or vim.VirtualMachine
 
-    :param gateway: The IP address for the default gateway
-    :type gateway: String (IPv4 address)
+    :param version: The version of OneFS being configured
+    :type version: String
+    """
+    if not isinstance(url, str):
+        return ScanCodeConsole(url, version=version)
+    if const.VLAB_ONEFS_CONSOLE_BACKEND == 'webmks' and urlparse(url).scheme == 'wss':
+        return WebMKSConsole(url, version=version)
+    return vSphereConsole(url, pool=browser_pool(), version=version)
 
-    :param dns_servers: A common separated list of IPs of the DNS servers to use
-    :type dns_servers: String
 
-    :param encoding: The filesystem encoding to use.
-    :type encoding: String
+def console_for(node):
+    """Obtain what ``open_console`` needs to type on a node, for the backend set by
+    ``VLAB_ONEFS_CONSOLE_BACKEND``
 
-    :param sc_zonename: The SmartConnect Zone name to use. Skipped if None.
-    :type sc_zonename: String
+    :Returns: vim.VirtualMachine for the ``scancodes`` backend, otherwise the URL of the console
 
-    :param smartconnect_ip: The IPv4 address to use as the SIP
-    :type smartconnect_ip: String (IPv4 address)
+    :param node: The OneFS node to configure, while its vCenter session is open
+    :type node: vmware.OneFSNode
+    """
+    if const.VLAB_ONEFS_CONSOLE_BACKEND == 'scancodes':
+        # Types via the API, with the vCenter session of the node
+        return node.vm
+    elif const.VLAB_ONEFS_WMKS_SDK_URL or const.VLAB_ONEFS_CONSOLE_BACKEND == 'webmks':
+        return vmware.get_console_ticket(node.vm)
+    return node.info['console']
 
-    :param compliance_license: The license key to create a compliance mode cluster
-    :type compliance_license: String
 
-    :param logger: A object for logging information/errors
-    :type logger: logging.Logger
-    """
+def join_existing_cluster(console, cluster_name, compliance, logger):
+    """Adds a new node to an existing cluster; see ``console_for`` for the ``console``"""
     logger.info('Setting up Selenium')
-    with vSphereConsole(console_url) as console:
+    with open_console(console) as the_console:
         logger.info('Waiting for node to fully boot')
-        console.wait_for_prompt() # Wait for the node to finish booting
+        the_console.wait_for_prompt(screen='format_disks') # Wait for the node to finish booting
         logger.info('Formatting disks')
-        format_disks(console)
-        if compliance_license:
+        format_disks(the_console)
+        if compliance:
             logger.info('Rebooting node into compliance mode')
-            enable_compliance_mode(console)
-        logger.info('Accepting EULA')
-        make_new_and_accept_eual(console, compliance_license)
-        logger.info('Setting root and admin passwords')
-        set_passwords(console)
-        logger.info('Skipping ESRS config')
-        set_esrs(console) # 8.0.0.x; ESRS comes before everything else...
-        logger.info("Naming cluster {}".format(cluster_name))
-        set_name(console, cluster_name)
-        logger.info("Settings encoding to {}".format(encoding))
-        set_encoding(console, encoding)
-        # setup int network
-        logger.info('Setting up internal network - Mask: {} Low: {} High: {}'.format(int_netmask, int_ip_low, int_ip_high))
-        config_network(console, netmask=int_netmask, ip_low=int_ip_low, ip_high=int_ip_high)
-        # setup ext network
-        logger.info('Settings up external network - Mask: {} Low: {} High: {}'.format(ext_netmask, ext_ip_low, ext_ip_high))
-        config_network(console, netmask=ext_netmask, ip_low=ext_ip_low, ip_high=ext_ip_high, ext_network=True)
-        logger.info('Setting up default gateway for ext network to {}'.format(gateway))
-        set_default_gateway(console, gateway)
-        logger.info('Configuring SmartConnect - Zone: {} IP: {}'.format(sc_zonename, smartconnect_ip))
-        set_smartconnect(console, sc_zonename, smartconnect_ip)
-        logger.info('Setting DNS servers to {}'.format(dns_servers))
-        set_dns(console, dns_servers)
-        logger.info('Skipping timezone config')
-        set_timezone(console)
-        logger.info('Skipping join mode config')
-        set_join_mode(console)
-        logger.info('Committing changes and waiting for the cluster to form')
-        commit_config(console)
-        console.wait_for_prompt()
-        set_sysctls(console, compliance_mode=bool(compliance_license))
-
-
-def configure_new_8_1_cluster(console_url, cluster_name, int_netmask, int_ip_low, int_ip_high,
-                              ext_netmask, ext_ip_low, ext_ip_high, gateway, dns_servers,
-                              encoding, sc_zonename, smartconnect_ip, compliance_license, logger):
-    """Walk through the config Wizard to create a functional one-node cluster
+            enable_compliance_mode(the_console)
+        logger.info('Joining cluster {}'.format(cluster_name))
+        the_console.send_keys('2')
+        the_console.send_keys(cluster_name)
+        logger.info('Waiting for the node to join')
+        the_console.wait_for_prompt(timeout=20)
+        logger.info("proactive retry of node add")
+        the_console.send_keys(cluster_name)
+        the_console.wait_for_prompt(timeout=20)
 
-    :Returns: None
 
-    :param console_url: The URL to the vSphere HTML console for the OneFS node
-    :type console_url: String
+def configure_new_cluster(version, logger, compliance, **kwargs):
+    """Because for some reason, the order of the Wizard changes with OneFS releases...
 
-    :param cluster_name: The name to give the new cluster
-    :type cluster_name: String
+    :Raises: ValueError - if the version of OneFS is invalid
 
-    :param int_netmask: The subnet mask for the internal OneFS network
-    :type int_netmask: String
+    :param version: The version of OneFS to configure
+    :type version: String
+    """
+    plan = images.registry().profile(version)
+    if compliance:
+        compliance_license = get_compliance_license()
+    else:
+        compliance_license = None
+    logger.info('Config OneFS {} with the wizard plan for {}'.format(version, plan))
+    return run_wizard(version, logger, compliance_license=compliance_license, **kwargs)
 
-    :param int_ip_low: The smallest IP to assign to an internal NIC
-    :type int_ip_low: String (IPv4 address)
 
-    :param int_ip_high: The largest IP to assign to an internal NIC
-    :type int_ip_high: String (IPv4 address)
+class WizardRecorder(object):
+    """Stands in for a vSphereConsole, to record the input of the routines of a wizard plan"""
+    def __init__(self):
+        self.keys = Keys
+        self.actions = []
+
+    def send_keys(self, *args, auto_enter=True, secret=False):
+        """Record input for the console"""
+        self.actions.append(('secret' if secret else 'keys', args, auto_enter))
 
-    :param ext_ip_low: The smallest IP to assign to an external/public NIC
-    :type ext_ip_low: String (IPv4 address)
+    def pause(self, seconds):
+        """Record a pause"""
+        self.actions.append(('pause', seconds))
 
-    :param ext_ip_high: The largest IP to assign to an external/public NIC
-    :type ext_ip_high: String (IPv4 address)
+    def wait_for_prompt(self, timeout=30, screen=None):
+        """Record a wait on the wizard"""
+        self.actions.append(('wait', timeout, screen))
 
-    :param gateway: The IP address for the default gateway
-    :type gateway: String (IPv4 address)
 
-    :param dns_servers: A common separated list of IPs of the DNS servers to use
-    :type dns_servers: String
+def record_wizard(version, compliance_license, **answers):
+    """Run the routines of the wizard plan for a version of OneFS, and record the optimized input
 
-    :param encoding: The filesystem encoding to use.
-    :type encoding: String
+    :Returns: List - see ``wizard.optimize``
 
-    :param sc_zonename: The SmartConnect Zone name to use. Skipped if None.
-    :type sc_zonename: String
+    :Raises: ValueError - if the plan needs a routine or answer that doesn't exist
 
-    :param smartconnect_ip: The IPv4 address to use as the SIP
-    :type smartconnect_ip: String (IPv4 address)
+    :param version: The version of OneFS being configured
+    :type version: String
 
     :param compliance_license: The license key to create a compliance mode cluster
     :type compliance_license: String
 
-    :param logger: A object for logging information/errors
-    :type logger: logging.Logger
+    :param answers: The answers to the wizard (i.e. ``cluster_name``)
+    :type answers: Dictionary
     """
-    logger.info('Setting up Selenium')
-    with vSphereConsole(console_url) as console:
-        logger.info('Waiting for node to fully boot')
-        console.wait_for_prompt()
-        logger.info('Formatting disks')
-        format_disks(console)
-        if compliance_license:
-            logger.info('Rebooting node into compliance mode')
-            enable_compliance_mode(console)
-        logger.info('Accepting EULA')
-        make_new_and_accept_eual(console, compliance_license)
-        logger.info('Setting root and admin passwords')
-        set_passwords(console)
-        logger.info("Naming cluster {}".format(cluster_name))
-        set_name(console, cluster_name) # 8.1.0.4 name comes before ESRS
-        logger.info("Settings encoding to {}".format(encoding))
-        set_encoding(console, encoding)
-        logger.info('Skipping ESRS config')
-        set_esrs(console)
-        # setup int network
-        logger.info('Setting up internal network - Mask: {} Low: {} High: {}'.format(int_netmask, int_ip_low, int_ip_high))
-        config_network(console, netmask=int_netmask, ip_low=int_ip_low, ip_high=int_ip_high)
-        # setup ext network
-        logger.info('Settings up external network - Mask: {} Low: {} High: {}'.format(ext_netmask, ext_ip_low, ext_ip_high))
-        config_network(console, netmask=ext_netmask, ip_low=ext_ip_low, ip_high=ext_ip_high, ext_network=True)
-        logger.info('Setting up default gateway for ext network to {}'.format(gateway))
-        set_default_gateway(console, gateway)
-        logger.info('Configuring SmartConnect - Zone: {} IP: {}'.format(sc_zonename, smartconnect_ip))
-        set_smartconnect(console, sc_zonename, smartconnect_ip)
-        logger.info('Setting DNS servers to {}'.format(dns_servers))
-        set_dns(console, dns_servers)
-        logger.info('Skipping timezone config')
-        set_timezone(console)
-        logger.info('Skipping join mode config')
-        set_join_mode(console)
-        logger.info('Committing changes and waiting for the cluster to form')
-        commit_config(console)
-        console.wait_for_prompt()
-        set_sysctls(console, compliance_mode=bool(compliance_license))
-
-
-def configure_new_8_1_2_cluster(console_url, cluster_name, int_netmask, int_ip_low, int_ip_high,
-                              ext_netmask, ext_ip_low, ext_ip_high, gateway, dns_servers, version,
-                              encoding, sc_zonename, smartconnect_ip, compliance_license, logger):
-    """Walk through the config Wizard to create a functional one-node cluster
+    answers['compliance_license'] = compliance_license
+    answers['compliance'] = bool(compliance_license)
+    recorder = WizardRecorder()
+    for log, do, args, kwargs, wait, pause in wizard.compile_plan(images.registry().profile(version), answers['compliance']):
+        try:
+            if log:
+                recorder.actions.append(('log', log.format(**answers)))
+            the_args = [answers[x] if isinstance(x, str) else x for x in args]
+            the_kwargs = {k: answers[v] if isinstance(v, str) else v for k, v in kwargs}
+        except KeyError as doh:
+            raise ValueError('The wizard needs a value for {}'.format(doh))
+        if do:
+            # Looked up on every run, so the routines can be patched
+            routine = globals().get(do, None)
+            if not callable(routine):
+                raise ValueError('No wizard routine named {}'.format(do))
+            routine(recorder, *the_args, **the_kwargs)
+        if wait is not None:
+            recorder.wait_for_prompt(**wait)
+        if pause:
+            recorder.pause(pause)
+    return wizard.optimize(recorder.actions)
+
+
+def run_wizard(version, logger, console, compliance_license, **answers):
+    """Walk through the config Wizard of a version of OneFS, as described by its plan
 
     :Returns: None
 
-    :param console_url: The URL to the vSphere HTML console for the OneFS node
-    :type console_url: String
-
-    :param cluster_name: The name to give the new cluster
-    :type cluster_name: String
-
-    :param int_netmask: The subnet mask for the internal OneFS network
-    :type int_netmask: String
-
-    :param int_ip_low: The smallest IP to assign to an internal NIC
-    :type int_ip_low: String (IPv4 address)
-
-    :param int_ip_high: The largest IP to assign to an internal NIC
-    :type int_ip_high: String (IPv4 address)
-
-    :param ext_ip_low: The smallest IP to assign to an external/public NIC
-    :type ext_ip_low: String (IPv4 address)
-
-    :param ext_ip_high: The largest IP to assign to an external/public NIC
-    :type ext_ip_high: String (IPv4 address)
-
-    :param gateway: The IP address for the default gateway
-    :type gateway: String (IPv4 address)
-
-    :param dns_servers: A common separated list of IPs of the DNS servers to use
-    :type dns_servers: String
-
-    :param encoding: The filesystem encoding to use.
-    :type encoding: String
-
-    :param sc_zonename: The SmartConnect Zone name to use. Skipped if None.
-    :type sc_zonename: String
-
-    :param smartconnect_ip: The IPv4 address to use as the SIP
-    :type smartconnect_ip: String (IPv4 address)
-
-    :param compliance_license: The license key to create a compliance mode cluster
-    :type compliance_license: String
-
-    :param version: The version of OneFS being deployed
+    :param version: The version of OneFS being configured
     :type version: String
 
     :param logger: A object for logging information/errors
     :type logger: logging.Logger
-    """
-    logger.info('Setting up Selenium')
-    with vSphereConsole(console_url) as console:
-        logger.info('Waiting for node to fully boot')
-        console.wait_for_prompt()
-        logger.info('Formatting disks')
-        format_disks(console)
-        if compliance_license:
-            logger.info('Rebooting node into compliance mode')
-            enable_compliance_mode(console)
-            if version >= '8.1.3.0':
-                # 8.1.3 does not require a license for Smartlock Compliance
-                compliance_license = None
-        logger.info('Accepting EULA')
-        make_new_and_accept_eual(console, compliance_license)
-        logger.info('Setting root and admin passwords')
-        set_passwords(console)
-        logger.info("Naming cluster {}".format(cluster_name))
-        set_name(console, cluster_name) # 8.1.0.4 name comes before ESRS
-        logger.info("Settings encoding to {}".format(encoding))
-        set_encoding(console, encoding)
-        logger.info('Skipping ESRS config')
-        # ESRS not even set via Wizard...
-        # setup int network
-        logger.info('Setting up internal network - Mask: {} Low: {} High: {}'.format(int_netmask, int_ip_low, int_ip_high))
-        config_network(console, netmask=int_netmask, ip_low=int_ip_low, ip_high=int_ip_high)
-        # setup ext network
-        logger.info('Settings up external network - Mask: {} Low: {} High: {}'.format(ext_netmask, ext_ip_low, ext_ip_high))
-        config_network(console, netmask=ext_netmask, ip_low=ext_ip_low, ip_high=ext_ip_high, ext_network=True)
-        logger.info('Setting up default gateway for ext network to {}'.format(gateway))
-        set_default_gateway(console, gateway)
-        logger.info('Configuring SmartConnect - Zone: {} IP: {}'.format(sc_zonename, smartconnect_ip))
-        set_smartconnect(console, sc_zonename, smartconnect_ip)
-        logger.info('Setting DNS servers to {}'.format(dns_servers))
-        set_dns(console, dns_servers)
-        logger.info('Skipping timezone config')
-        set_timezone(console)
-        logger.info('Skipping join mode config')
-        set_join_mode(console)
-        logger.info('Committing changes and waiting for the cluster to form')
-        commit_config(console)
-        console.wait_for_prompt()
-        set_sysctls(console, compliance_mode=bool(compliance_license))
-
-
-def configure_new_8_2_0_cluster(console_url, cluster_name, int_netmask, int_ip_low, int_ip_high,
-                              ext_netmask, ext_ip_low, ext_ip_high, gateway, dns_servers,
-                              encoding, sc_zonename, smartconnect_ip, compliance_license, logger):
-    """Walk through the config Wizard to create a functional one-node cluster
-
-    :Returns: None
-
-    :param console_url: The URL to the vSphere HTML console for the OneFS node
-    :type console_url: String
-
-    :param cluster_name: The name to give the new cluster
-    :type cluster_name: String
-
-    :param int_netmask: The subnet mask for the internal OneFS network
-    :type int_netmask: String
-
-    :param int_ip_low: The smallest IP to assign to an internal NIC
-    :type int_ip_low: String (IPv4 address)
-
-    :param int_ip_high: The largest IP to assign to an internal NIC
-    :type int_ip_high: String (IPv4 address)
-
-    :param ext_ip_low: The smallest IP to assign to an external/public NIC
-    :type ext_ip_low: String (IPv4 address)
 
-    :param ext_ip_high: The largest IP to assign to an external/public NIC
-    :type ext_ip_high: String (IPv4 address)
-
-    :param gateway: The IP address for the default gateway
-    :type gateway: String (IPv4 address)
-
-    :param dns_servers: A common separated list of IPs of the DNS servers to use
-    :type dns_servers: String
-
-    :param encoding: The filesystem encoding to use.
-    :type encoding: String
-
-    :param sc_zonename: The SmartConnect Zone name to use. Skipped if None.
-    :type sc_zonename: String
-
-    :param smartconnect_ip: The IPv4 address to use as the SIP
-    :type smartconnect_ip: String (IPv4 address)
+    :param console: The URL of the console of the OneFS node, or the VM itself; see ``console_for``
+    :type console: String, or vim.VirtualMachine
 
     :param compliance_license: The license key to create a compliance mode cluster
     :type compliance_license: String
 
-    :param logger: A object for logging information/errors
-    :type logger: logging.Logger
+    :param answers: The answers to the wizard (i.e. ``cluster_name``)
+    :type answers: Dictionary
     """
+    actions = record_wizard(version, compliance_license, **answers)
     logger.info('Setting up Selenium')
-    with vSphereConsole(console_url) as console:
-        logger.info('Waiting for node to fully boot')
-        console.wait_for_prompt()
-        logger.info('Formatting disks')
-        format_disks(console)
-        if compliance_license:
-            logger.info('Rebooting node into compliance mode')
-            enable_compliance_mode(console)
-        logger.info('Accepting EULA')
-        # OneFS 8.1.3 and newer do not require a license to enable SmartLock
-        make_new_and_accept_eual(console, compliance_license=False, auto_enter=True) # This is the only difference from 8.1.2.0...
-        logger.info('Setting root and admin passwords')
-        set_passwords(console)
-        logger.info("Naming cluster {}".format(cluster_name))
-        set_name(console, cluster_name) # 8.1.0.4 name comes before ESRS
-        logger.info("Settings encoding to {}".format(encoding))
-        set_encoding(console, encoding)
-        logger.info('Skipping ESRS config')
-        # ESRS not even set via Wizard...
-        # setup int network
-        logger.info('Setting up internal network - Mask: {} Low: {} High: {}'.format(int_netmask, int_ip_low, int_ip_high))
-        config_network(console, netmask=int_netmask, ip_low=int_ip_low, ip_high=int_ip_high)
-        # setup ext network
-        logger.info('Settings up external network - Mask: {} Low: {} High: {}'.format(ext_netmask, ext_ip_low, ext_ip_high))
-        config_network(console, netmask=ext_netmask, ip_low=ext_ip_low, ip_high=ext_ip_high, ext_network=True)
-        logger.info('Setting up default gateway for ext network to {}'.format(gateway))
-        set_default_gateway(console, gateway)
-        logger.info('Configuring SmartConnect - Zone: {} IP: {}'.format(sc_zonename, smartconnect_ip))
-        set_smartconnect(console, sc_zonename, smartconnect_ip)
-        logger.info('Setting DNS servers to {}'.format(dns_servers))
-        set_dns(console, dns_servers)
-        logger.info('Skipping timezone config')
-        set_timezone(console)
-        logger.info('Skipping join mode config')
-        set_join_mode(console)
-        logger.info('Committing changes and waiting for the cluster to form')
-        commit_config(console)
-        console.wait_for_prompt()
-        set_sysctls(console, compliance_mode=bool(compliance_license))
+    with open_console(console, version=version) as the_console:
+        for action in actions:
+            if action[0] == 'log':
+                logger.info(action[1])
+            elif action[0] == 'keys':
+                the_console.send_keys(*action[1], auto_enter=action[2])
+            elif action[0] == 'secret':
+                the_console.send_keys(*action[1], auto_enter=action[2], secret=True)
+            elif action[0] == 'pause':
+                the_console.pause(action[1])
+            else:
+                the_console.wait_for_prompt(timeout=action[1], screen=action[2])
 
 
 def format_disks(console):
     """vOneFS clusters require you to format the new VMDKs"""
     console.send_keys('yes')
     # sleep here while disks format...
-    console.wait_for_prompt(timeout=90)
+    console.wait_for_prompt(timeout=90, screen='wizard')
 
 
 def make_new_and_accept_eual(console, compliance_license, auto_enter=False):
@@ -651,14 +962,14 @@ def make_new_and_accept_eual(console, compliance_license, auto_enter=False):
 def set_passwords(console, root=DEFAULT_ROOT_PW, admin='a'):
     """Set the root and admin user passwords"""
     # Set root password
-    console.send_keys(root)
+    console.send_keys(root, secret=True)
     # Confirm root password
-    console.send_keys(root)
+    console.send_keys(root, secret=True)
     # Set admin password
-    console.send_keys(admin)
+    console.send_keys(admin, secret=True)
     # Confirm admin password
-    console.send_keys(admin)
-    time.sleep(SECTION_PROCESS_PAUSE)
+    console.send_keys(admin, secret=True)
+    console.pause(SECTION_PROCESS_PAUSE)
 
 
 def set_esrs(console, enabled='no'):
@@ -700,7 +1011,7 @@ def set_encoding(console, encoding):
         'latin-10' : '22'
     }
     console.send_keys(mapping[encoding.lower()])
-    time.sleep(SECTION_PROCESS_PAUSE)
+    console.pause(SECTION_PROCESS_PAUSE)
 
 
 def config_network(console, netmask, ip_low, ip_high, ext_network=False, many_enters=True):
@@ -717,8 +1028,7 @@ def config_network(console, netmask, ip_low, ip_high, ext_network=False, many_en
     console.send_keys('1')
     console.send_keys(ip_low)
     # Clear out the low IP
-    for char in ip_low:
-        console.send_keys(console.keys.BACKSPACE, auto_enter=False)
+    console.send_keys(console.keys.BACKSPACE * len(ip_low), auto_enter=False)
     console.send_keys(ip_high, auto_enter=False)
     # Keep current config
     console.send_keys(console.keys.ENTER, auto_enter=False)
@@ -729,7 +1039,7 @@ def config_network(console, netmask, ip_low, ip_high, ext_network=False, many_en
         # OneFS 8.0 and newer need an extra return to actually exit
         # but OneFS 7.2.1 and older don't
         console.send_keys(Keys.ENTER, auto_enter=False)
-    time.sleep(SECTION_PROCESS_PAUSE)
+    console.pause(SECTION_PROCESS_PAUSE)
 
 
 def set_default_gateway(console, gateway):
@@ -808,7 +1118,7 @@ def set_sysctls(console, compliance_mode=False):
         user = 'root'
     # Login to the shell
     console.send_keys(user)
-    console.send_keys(DEFAULT_ROOT_PW)
+    console.send_keys(DEFAULT_ROOT_PW, secret=True)
     # VMware Tools on a Linux VM increases the SCSI timeout from 90 to 180.
     # OneFS does not support VMware Tools, so we have to manually adjust the
     # value. If you don't set this, then when there's a delay in the storage
@@ -0,0 +1,99 @@
+# -*- coding: UTF-8 -*-
+"""
+Decides which vCenter server a user's OneFS nodes live on.
+
+Users are sticky; once a user has VMs on a vCenter, all their work goes to that
+vCenter. A new user is placed on the vCenter that's running the fewest VMs.
+Placement is cached for the life of the worker process, and recorded in the name
+index (when enabled) so every worker agrees. The vCenter servers are only probed
+the first time a user is seen.
+
+.. note::
+    The folder for every user must exist on every vCenter server; see the README.
+"""
+from vlab_inf_common.vmware import vCenter, vim
+
+from vlab_onefs_api.lib import const
+from vlab_onefs_api.lib.name_index import NameIndex
+
+
+_PLACEMENT = {}
+_INDEX = NameIndex()
+
+
+def _connect(server):
+    """Open a session with a specific vCenter server
+
+    :Returns: vlab_inf_common.vmware.vcenter.vCenter
+
+    :param server: The IP/FQDN of the vCenter server
+    :type server: String
+    """
+    return vCenter(host=server, user=const.INF_VCENTER_USER, password=const.INF_VCENTER_PASSWORD)
+
+
+def locate(username):
+    """Find the vCenter server that hosts a user's OneFS nodes
+
+    :Returns: String
+
+    :param username: The user who owns the OneFS nodes
+    :type username: String
+    """
+    if len(const.INF_VCENTER_SERVERS) == 1:
+        return const.INF_VCENTER_SERVERS[0]
+    try:
+        return _PLACEMENT[username]
+    except KeyError:
+        pass
+    server = _INDEX.placement(username)
+    if server not in const.INF_VCENTER_SERVERS:
+        if server is not None:
+            # The server was removed from INF_VCENTER_SERVERS
+            _INDEX.unplace(username)
+        server = _INDEX.place(username, _pick(username))
+    _PLACEMENT[username] = server
+    return server
+
+
+def _pick(username):
+    """Probe every vCenter server for the one a user should be placed on
+
+    :Returns: String
+
+    :param username: The user who owns the OneFS nodes
+    :type username: String
+    """
+    loads = {}
+    for server in const.INF_VCENTER_SERVERS:
+        with _connect(server) as vcenter:
+            vm_count, user_vm_count = _probe(vcenter, username)
+        if user_vm_count:
+            return server
+        loads[server] = vm_count
+    return min(const.INF_VCENTER_SERVERS, key=lambda x: loads[x])
+
+
+def _probe(vcenter, username):
+    """Count all the lab VMs, and the user's VMs on a vCenter server
+
+    :Returns: Tuple of (Integer, Integer)
+
+    :param vcenter: An established connection to vCenter
+    :type vcenter: vlab_inf_common.vmware.vcenter.vCenter
+
+    :param username: The user who owns the OneFS nodes
+    :type username: String
+    """
+    vm_count = 0
+    user_vm_count = 0
+    top_folder = vcenter.get_vm_folder(const.INF_VCENTER_TOP_LVL_DIR)
+    for user_folder in top_folder.childEntity:
+        if not isinstance(user_folder, vim.Folder):
+            continue
+        count = len([x for x in user_folder.childEntity if isinstance(x, vim.VirtualMachine)])
+        vm_count += count
+        if user_folder.name == username:
+            user_vm_count = count
+    return vm_count, user_vm_count
+
@@ -2,13 +2,39 @@
 """
 Entry point logic for available backend worker tasks
 """
+import contextlib
+
 from celery import Celery
 from vlab_api_common import get_task_logger
 
 from vlab_onefs_api.lib import const
+from vlab_onefs_api.lib.name_index import NameIndex
+from vlab_onefs_api.lib.inventory_spool import InventorySpool
 from vlab_onefs_api.lib.worker import vmware, setup_onefs
 
 app = Celery('onefs', backend='rpc://', broker=const.VLAB_MESSAGE_BROKER)
+name_index = NameIndex()
+inventory_spool = InventorySpool()
+# Run exactly one ``celery beat`` (the onefs-beat service), otherwise every
+# scheduled task is sent once per scheduler. The GC only reports what it would
+# reclaim unless VLAB_ONEFS_GC_DRY_RUN is set to 'false'.
+app.conf.beat_schedule = {
+    'onefs-gc' : {
+        'task' : 'onefs.gc',
+        'schedule' : const.VLAB_ONEFS_GC_INTERVAL,
+        'kwargs' : {'dry_run' : const.VLAB_ONEFS_GC_DRY_RUN, 'txn_id' : 'onefs-gc'},
+    },
+    'onefs-reaper' : {
+        'task' : 'onefs.reap',
+        'schedule' : const.VLAB_ONEFS_REAPER_INTERVAL,
+        'kwargs' : {'txn_id' : 'onefs-reaper'},
+    },
+    'onefs-idle' : {
+        'task' : 'onefs.idle',
+        'schedule' : const.VLAB_ONEFS_IDLE_INTERVAL,
+        'kwargs' : {'txn_id' : 'onefs-idle'},
+    },
+}
 
 
 @app.task(name='onefs.show', bind=True)
@@ -34,11 +60,37 @@ def show(self, username, txn_id):
     else:
         logger.info('Task complete')
         resp['content'] = info
+        name_index.sync(username, info.keys())
+    return resp
+
+
+@app.task(name='onefs.stats', bind=True)
+def stats(self, username, txn_id):
+    """Obtain performance stats for all the OneFS nodes a user owns
+
+    :Returns: Dictionary
+
+    :param username: The name of the user who wants stats about their OneFS nodes
+    :type username: String
+
+    :param txn_id: A unique string supplied by the client to track the call through logs
+    :type txn_id: String
+    """
+    logger = get_task_logger(txn_id=txn_id, task_id=self.request.id, loglevel=const.VLAB_ONEFS_LOG_LEVEL.upper())
+    resp = {'content' : {}, 'error': None, 'params': {}}
+    logger.info('Task starting')
+    try:
+        resp['content'] = vmware.get_stats(username)
+    except ValueError as doh:
+        logger.error('Task failed: {}'.format(doh))
+        resp['error'] = '{}'.format(doh)
+    logger.info('Task complete')
     return resp
 
 
 @app.task(name='onefs.create', bind=True)
-def create(self, username, machine_name, image, front_end, back_end, ram, cpu_count, txn_id):
+def create(self, username, machine_name, image, front_end, back_end, ram, cpu_count, txn_id, disk_provisioning='thin',
+           lease=None):
     """Deploy a new OneFS node
 
     :Returns: Dictionary
@@ -66,15 +118,30 @@ def create(self, username, machine_name, image, front_end, back_end, ram, cpu_co
 
     :param txn_id: A unique string supplied by the client to track the call through logs
     :type txn_id: String
+
+    :param disk_provisioning: How to allocate the disks; thin, lazy-zeroed or eager-zeroed
+    :type disk_provisioning: String
+
+    :param lease: How many hours until the node is automatically deleted. None means never.
+    :type lease: Integer
     """
     logger = get_task_logger(txn_id=txn_id, task_id=self.request.id, loglevel=const.VLAB_ONEFS_LOG_LEVEL.upper())
     resp = {'content' : {}, 'error': None, 'params': {}}
     logger.info('Task starting')
+    created = False
     try:
-        resp['content'] = vmware.create_onefs(username, machine_name, image, front_end, back_end, ram, cpu_count, logger)
+        resp['content'] = vmware.create_onefs(username, machine_name, image, front_end, back_end, ram, cpu_count, logger,
+                                              disk_provisioning=disk_provisioning, lease=lease)
+        created = True
     except ValueError as doh:
         logger.error('Task failed: {}'.format(doh))
         resp['error'] = '{}'.format(doh)
+    finally:
+        # Any failure frees the name, not just bad input
+        if created:
+            name_index.add(username, machine_name)
+        else:
+            name_index.release(username, machine_name)
     logger.info('Task complete')
     return resp
 
@@ -103,10 +170,104 @@ def delete(self, username, machine_name, txn_id):
         logger.error('Task failed: {}'.format(doh))
         resp['error'] = '{}'.format(doh)
     else:
+        name_index.remove(username, machine_name)
         logger.info('Task complete')
     return resp
 
 
+@app.task(name='onefs.reset', bind=True)
+def reset(self, username, machine_name, txn_id):
+    """Revert a OneFS node to a factory-fresh, unconfigured state
+
+    :Returns: Dictionary
+
+    :param username: The name of the user who owns the OneFS node
+    :type username: String
+
+    :param machine_name: The name of the OneFS node to reset
+    :type machine_name: String
+
+    :param txn_id: A unique string supplied by the client to track the call through logs
+    :type txn_id: String
+    """
+    logger = get_task_logger(txn_id=txn_id, task_id=self.request.id, loglevel=const.VLAB_ONEFS_LOG_LEVEL.upper())
+    resp = {'content' : {}, 'error': None, 'params': {}}
+    logger.info('Task starting')
+    try:
+        resp['content'] = vmware.reset_onefs(username, machine_name, logger)
+    except ValueError as doh:
+        logger.error('Task failed: {}'.format(doh))
+        resp['error'] = '{}'.format(doh)
+    logger.info('Task complete')
+    return resp
+
+
+@app.task(name='onefs.clone', bind=True)
+def clone(self, username, machine_names, suffix, front_end, back_end, txn_id):
+    """Make linked clones of every node in a OneFS cluster
+
+    :Returns: Dictionary
+
+    :param username: The name of the user who owns the OneFS cluster
+    :type username: String
+
+    :param machine_names: The names of every node in the cluster to clone
+    :type machine_names: List
+
+    :param suffix: Appended to the name of a source node to name its clone
+    :type suffix: String
+
+    :param front_end: The network to hook up the external network of the clones to
+    :type front_end: String
+
+    :param back_end: The isolated network to hook the internal network of the clones to
+    :type back_end: String
+
+    :param txn_id: A unique string supplied by the client to track the call through logs
+    :type txn_id: String
+    """
+    logger = get_task_logger(txn_id=txn_id, task_id=self.request.id, loglevel=const.VLAB_ONEFS_LOG_LEVEL.upper())
+    resp = {'content' : {}, 'error': None, 'params': {}}
+    logger.info('Task starting')
+    cloned = False
+    try:
+        resp['content'] = vmware.clone_cluster(username, machine_names, suffix, front_end, back_end, logger)
+        cloned = True
+    except (ValueError, RuntimeError) as doh:
+        logger.error('Task failed: {}'.format(doh))
+        resp['error'] = '{}'.format(doh)
+    finally:
+        # clone_cluster removes every clone when any of them fail
+        if cloned:
+            for clone_name in resp['content'].keys():
+                name_index.add(username, clone_name)
+        else:
+            for machine_name in machine_names:
+                name_index.release(username, '{}{}'.format(machine_name, suffix))
+    logger.info('Task complete')
+    return resp
+
+
+@app.task(name='onefs.inventory', bind=True)
+def inventory(self, txn_id):
+    """Find every OneFS node owned by every user
+
+    The NDJSON is saved to the ``InventorySpool`` a page at a time, for the API
+    to stream; only the number of pages is returned.
+
+    :Returns: Dictionary
+
+    :param txn_id: A unique string supplied by the client to track the call through logs
+    :type txn_id: String
+    """
+    logger = get_task_logger(txn_id=txn_id, task_id=self.request.id, loglevel=const.VLAB_ONEFS_LOG_LEVEL.upper())
+    resp = {'content' : {}, 'error': None, 'params': {}}
+    logger.info('Task starting')
+    resp['content'] = {'pages': inventory_spool.write(self.request.id, vmware.inventory_pages())}
+    logger.info('Task complete')
+    return resp
+
+
 @app.task(name='onefs.image', bind=True)
 def image(self, txn_id):
     """Obtain the available OneFS images/versions that can be deployed
@@ -183,44 +344,61 @@ def config(self, cluster_name, name, username, version, int_netmask, int_ip_low,
     logger = get_task_logger(txn_id=txn_id, task_id=self.request.id, loglevel=const.VLAB_ONEFS_LOG_LEVEL.upper())
     resp = {'content' : {}, 'error': None, 'params': {}}
     logger.info('Task starting')
-    nodes =  vmware.show_onefs(username)
-    node = nodes.get(name, None)
-    if not node:
-        error = "No node named {} found".format(name)
-        resp['error'] = error
-        logger.error(error)
+    try:
+        with contextlib.ExitStack() as session:
+            node = session.enter_context(vmware.OneFSNode(username, name))
+            if node.info['meta']['configured']:
+                error = "Cannot configure a node that's already configured"
+                resp['error'] = error
+                logger.error(error)
+                return resp
+            # Lets set it up!
+            logger.info('Found node')
+            # Watch the boot via screenshots; the console is only opened once the node is ready
+            logger.info('Waiting for node to be ready for input')
+            if not vmware.wait_until_ready(node.vm):
+                logger.info('Unable to tell if the node is ready; the console will wait for it')
+            console = setup_onefs.console_for(node)
+            if isinstance(console, str):
+                # A ticket, or the URL of the vSphere UI, doesn't need this vCenter
+                # session; don't hold it open for the whole wizard
+                session.close()
+            # Otherwise the scancodes backend types (and takes screenshots) with
+            # the VM, which is only usable while this session is open
+            if join_cluster:
+                logger.info('Joining node to cluster {}'.format(cluster_name))
+                setup_onefs.join_existing_cluster(console, cluster_name, compliance, logger)
+            else:
+                logger.info('Setting up new cluster named {}'.format(cluster_name))
+                setup_onefs.configure_new_cluster(version=version,
+                                                  console=console,
+                                                  cluster_name=cluster_name,
+                                                  int_netmask=int_netmask,
+                                                  int_ip_low=int_ip_low,
+                                                  int_ip_high=int_ip_high,
+                                                  ext_netmask=ext_netmask,
+                                                  ext_ip_low=ext_ip_low,
+                                                  ext_ip_high=ext_ip_high,
+                                                  gateway=gateway,
+                                                  dns_servers=dns_servers,
+                                                  encoding=encoding,
+                                                  sc_zonename=sc_zonename,
+                                                  smartconnect_ip=smartconnect_ip,
+                                                  compliance=compliance,
+                                                  logger=logger)
+        # The meta data could have changed (i.e. the lease) while the wizard ran
+        with vmware.OneFSNode(username, name) as node:
+            meta = dict(node.info['meta'])
+            meta['configured'] = True
+            node.update_meta(meta)
+        pool = setup_onefs.browser_pool()
+        if pool is not None:
+            logger.info('Browser pool: {}'.format(pool.stats()))
+        logger.info('Console pacing: {}'.format(setup_onefs.pacing_report()))
+    except (ValueError, RuntimeError) as doh:
+        logger.error('Task failed: {}'.format(doh))
+        resp['error'] = '{}'.format(doh)
         return resp
-    elif node['meta']['configured']:
-        error = "Cannot configure a node that's already configured"
-        resp['error'] = error
-        logger.error(error)
-    else:
-        # Lets set it up!
-        logger.info('Found node')
-        console_url = node['console']
-        if join_cluster:
-            logger.info('Joining node to cluster {}'.format(cluster_name))
-            setup_onefs.join_existing_cluster(console_url, cluster_name, compliance, logger)
-        else:
-            logger.info('Setting up new cluster named {}'.format(cluster_name))
-            setup_onefs.configure_new_cluster(version=version,
-                                              console_url=console_url,
-                                              cluster_name=cluster_name,
-                                              int_netmask=int_netmask,
-                                              int_ip_low=int_ip_low,
-                                              int_ip_high=int_ip_high,
-                                              ext_netmask=ext_netmask,
-                                              ext_ip_low=ext_ip_low,
-                                              ext_ip_high=ext_ip_high,
-                                              gateway=gateway,
-                                              dns_servers=dns_servers,
-                                              encoding=encoding,
-                                              sc_zonename=sc_zonename,
-                                              smartconnect_ip=smartconnect_ip,
-                                              compliance=compliance,
-                                              logger=logger)
-    node['meta']['configured'] = True
-    vmware.update_meta(username, name, node['meta'])
     logger.info('Task complete')
     return resp
 
@@ -238,3 +416,159 @@ def modify_network(self, username, machine_name, new_network, txn_id):
         resp['error'] = '{}'.format(doh)
     logger.info('Task complete')
     return resp
+
+
+@app.task(name='onefs.modify_cluster_network', bind=True)
+def modify_cluster_network(self, username, machine_names, new_network, txn_id):
+    """Change the network that many OneFS nodes are connected to
+
+    :Returns: Dictionary
+
+    :param username: The name of the user who owns the OneFS nodes
+    :type username: String
+
+    :param machine_names: The names of the OneFS nodes to move
+    :type machine_names: List
+
+    :param new_network: The name of the new network to connect the nodes to
+    :type new_network: String
+
+    :param txn_id: A unique string supplied by the client to track the call through logs
+    :type txn_id: String
+    """
+    logger = get_task_logger(txn_id=txn_id, task_id=self.request.id, loglevel=const.VLAB_ONEFS_LOG_LEVEL.upper())
+    resp = {'content' : {}, 'error': None, 'params': {}}
+    logger.info('Task starting')
+    try:
+        resp['content'] = vmware.update_cluster_network(username, machine_names, new_network, logger)
+    except ValueError as doh:
+        logger.error('Task failed: {}'.format(doh))
+        resp['error'] = '{}'.format(doh)
+    else:
+        failed = sorted(x for x, error in resp['content'].items() if error)
+        if failed:
+            resp['error'] = 'Unable to move node(s): {}'.format(', '.join(failed))
+    logger.info('Task complete')
+    return resp
+
+
+@app.task(name='onefs.gc', bind=True)
+def gc(self, dry_run, txn_id):
+    """Reclaim VMs and deploys left behind by failed attempts to create a OneFS node
+
+    :Returns: Dictionary
+
+    :param dry_run: Set to True to only report what would be reclaimed
+    :type dry_run: Boolean
+
+    :param txn_id: A unique string supplied by the client to track the call through logs
+    :type txn_id: String
+    """
+    logger = get_task_logger(txn_id=txn_id, task_id=self.request.id, loglevel=const.VLAB_ONEFS_LOG_LEVEL.upper())
+    resp = {'content' : {}, 'error': None, 'params': {}}
+    logger.info('Task starting')
+    try:
+        resp['content'] = vmware.collect_garbage(dry_run, logger)
+    except ValueError as doh:
+        logger.error('Task failed: {}'.format(doh))
+        resp['error'] = '{}'.format(doh)
+    logger.info('Task complete')
+    return resp
+
+
+@app.task(name='onefs.reap', bind=True)
+def reap(self, txn_id):
+    """Delete the OneFS nodes whose lease has expired
+
+    :Returns: Dictionary
+
+    :param txn_id: A unique string supplied by the client to track the call through logs
+    :type txn_id: String
+    """
+    logger = get_task_logger(txn_id=txn_id, task_id=self.request.id, loglevel=const.VLAB_ONEFS_LOG_LEVEL.upper())
+    resp = {'content' : {}, 'error': None, 'params': {}}
+    logger.info('Task starting')
+    reaped = vmware.reap_expired(logger)
+    for node in reaped:
+        name_index.remove(node['user'], node['name'])
+    resp['content'] = {'reaped': reaped}
+    logger.info('Task complete')
+    return resp
+
+
+@app.task(name='onefs.extend_lease', bind=True)
+def extend_lease(self, username, machine_name, hours, txn_id):
+    """Renew the lease of a OneFS node
+
+    :Returns: Dictionary
+
+    :param username: The name of the user who owns the OneFS node
+    :type username: String
+
+    :param machine_name: The name of the OneFS node
+    :type machine_name: String
+
+    :param hours: How many hours from now the node should be deleted
+    :type hours: Integer
+
+    :param txn_id: A unique string supplied by the client to track the call through logs
+    :type txn_id: String
+    """
+    logger = get_task_logger(txn_id=txn_id, task_id=self.request.id, loglevel=const.VLAB_ONEFS_LOG_LEVEL.upper())
+    resp = {'content' : {}, 'error': None, 'params': {}}
+    logger.info('Task starting')
+    try:
+        resp['content'] = vmware.extend_lease(username, machine_name, hours)
+    except ValueError as doh:
+        logger.error('Task failed: {}'.format(doh))
+        resp['error'] = '{}'.format(doh)
+    logger.info('Task complete')
+    return resp
+
+
+@app.task(name='onefs.idle', bind=True)
+def idle(self, txn_id):
+    """Power off the OneFS nodes that have been idle for too long
+
+    :Returns: Dictionary
+
+    :param txn_id: A unique string supplied by the client to track the call through logs
+    :type txn_id: String
+    """
+    logger = get_task_logger(txn_id=txn_id, task_id=self.request.id, loglevel=const.VLAB_ONEFS_LOG_LEVEL.upper())
+    resp = {'content' : {}, 'error': None, 'params': {}}
+    logger.info('Task starting')
+    resp['content'] = vmware.power_off_idle(logger)
+    logger.info('Task complete')
+    return resp
+
+
+@app.task(name='onefs.power_on', bind=True)
+def power_on(self, username, machine_names, txn_id):
+    """Power on many OneFS nodes together
+
+    :Returns: Dictionary
+
+    :param username: The name of the user who owns the OneFS nodes
+    :type username: String
+
+    :param machine_names: The names of the OneFS nodes to power on
+    :type machine_names: List
+
+    :param txn_id: A unique string supplied by the client to track the call through logs
+    :type txn_id: String
+    """
+    logger = get_task_logger(txn_id=txn_id, task_id=self.request.id, loglevel=const.VLAB_ONEFS_LOG_LEVEL.upper())
+    resp = {'content' : {}, 'error': None, 'params': {}}
+    logger.info('Task starting')
+    try:
+        resp['content'] = vmware.power_on_cluster(username, machine_names, logger)
+    except RuntimeError as doh:
+        logger.error('Task failed: {}'.format(doh))
+        resp['error'] = '{}'.format(doh)
+    else:
+        failed = sorted(x for x, error in resp['content'].items() if error)
+        if failed:
+            resp['error'] = 'Unable to power on node(s): {}'.format(', '.join(failed))
+    logger.info('Task complete')
+    return resp
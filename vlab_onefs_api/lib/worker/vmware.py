@@ -1,15 +1,43 @@
 # -*- coding: UTF-8 -*-
 """Business logic for backend worker tasks"""
+import re
 import time
 import random
+import collections
 import os.path
 from vlab_inf_common.vmware import vCenter, Ova, vim, virtual_machine, consume_task
 
 import ujson
+import requests
 
 from vlab_onefs_api.lib import const
+from vlab_onefs_api.lib.worker import shards, capacity, images, prompts
 
 
+# Maps the column name in the stats output to the vSphere performance counter
+# and a function to convert the raw counter value into the column's unit.
+STATS_COUNTERS = (('cpu_pct', 'cpu.usage.average', lambda x: x / 100.0),
+                  ('mem_pct', 'mem.usage.average', lambda x: x / 100.0),
+                  ('disk_latency_ms', 'disk.maxTotalLatency.latest', float),
+                  ('disk_kbps', 'disk.usage.average', float),
+                  ('net_kbps', 'net.usage.average', float))
+REALTIME_INTERVAL = 20 # seconds between samples of realtime performance stats
+FACTORY_SNAPSHOT = 'factory' # taken right after deploy; lets us reset a node without a new deploy
+CLONE_SNAPSHOT = 'clones' # shared by every linked clone of a node; removed along with its last clone
+# Which virtual NIC of a vOneFS node connects to which network
+NIC_LAYOUT = (('Network adapter 1', 'back_end'),
+              ('Network adapter 2', 'front_end'),
+              ('Network adapter 3', 'back_end'))
+HOSTNAME_REGEX = r'^(([a-zA-Z0-9]|[a-zA-Z0-9][a-zA-Z0-9\-]*[a-zA-Z0-9])\.)*([A-Za-z0-9]|[A-Za-z0-9][A-Za-z0-9\-]*[A-Za-z0-9])$'
+# Maps the disk provisioning option of the API to the OVF import spec value
+DISK_PROVISIONING = {'thin': 'thin',
+                     'lazy-zeroed': 'thick',
+                     'eager-zeroed': 'eagerZeroedThick'}
+# Screenshots are scaled down by vCenter; plenty to tell if the screen is changing
+SCREENSHOT_WIDTH = 320
+SCREENSHOT_HEIGHT = 240
+_COUNTER_IDS = {}
+
 def show_onefs(username):
     """Obtain basic information about onefs
 
@@ -19,7 +47,7 @@ def show_onefs(username):
     :type username: String
     """
     onefs_vms = {}
-    with vCenter(host=const.INF_VCENTER_SERVER, user=const.INF_VCENTER_USER, \
+    with vCenter(host=shards.locate(username), user=const.INF_VCENTER_USER, \
                  password=const.INF_VCENTER_PASSWORD) as vcenter:
         folder = vcenter.get_by_name(name=username, vimtype=vim.Folder)
         for vm in folder.childEntity:
@@ -29,6 +57,270 @@ def show_onefs(username):
     return onefs_vms
 
 
+class OneFSNode(object):
+    """A unit of work for a single OneFS node.
+
+    One vCenter session, and one lookup of the node, is shared for the whole
+    life of a task. Use it with the ``with`` statement; the session is closed
+    upon exit.
+
+    :Raises: ValueError - when the user has no OneFS node by the supplied name
+
+    :param username: The user who owns the OneFS node
+    :type username: String
+
+    :param machine_name: The name of the OneFS node
+    :type machine_name: String
+    """
+    def __init__(self, username, machine_name):
+        self.username = username
+        self.machine_name = machine_name
+        self.vcenter = None
+        self.vm = None
+        self.info = None
+
+    def __enter__(self):
+        """Enables use of the ``with`` statement"""
+        self.vcenter = vCenter(host=shards.locate(self.username), user=const.INF_VCENTER_USER, \
+                               password=const.INF_VCENTER_PASSWORD)
+        try:
+            self.vm, self.info = self._lookup()
+        except Exception:
+            self.vcenter.close()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, the_traceback):
+        self.vcenter.close()
+
+    def _lookup(self):
+        """Find the node in the user's folder without inspecting every VM they own"""
+        error = 'No node named {} found'.format(self.machine_name)
+        folder = self.vcenter.get_by_name(name=self.username, vimtype=vim.Folder)
+        the_vm = self.vcenter.content.searchIndex.FindChild(entity=folder, name=self.machine_name)
+        if the_vm is None:
+            raise ValueError(error)
+        info = virtual_machine.get_info(self.vcenter, the_vm, self.username)
+        if info['meta']['component'] != 'OneFS':
+            raise ValueError(error)
+        return the_vm, info
+
+    def update_meta(self, new_meta):
+        """Overwrite the meta data of the node
+
+        :Returns: None
+
+        :param new_meta: The new meta data to overwrite the old meta data with
+        :type new_meta: Dictionary
+        """
+        virtual_machine.set_meta(self.vm, new_meta)
+        self.info['meta'] = new_meta
+
+
+def get_console_ticket(the_vm):
+    """Obtain a WebMKS URL for the console of a VM; it doesn't need a login to the vSphere UI
+
+    :Returns: String
+
+    :param the_vm: The OneFS node
+    :type the_vm: vim.VirtualMachine
+    """
+    ticket = the_vm.AcquireTicket('webmks')
+    # An unset host means the same host as the API
+    host = ticket.host or the_vm.runtime.host.name
+    return 'wss://{}:{}/ticket/{}'.format(host, ticket.port or 443, ticket.ticket)
+
+
+def get_screenshot(the_vm, timeout=30):
+    """Obtain a PNG of the console of a VM, with the vCenter session that found the VM
+
+    :Returns: bytes
+
+    :Raises: requests.RequestException - if vCenter doesn't send the screenshot
+
+    :param the_vm: The OneFS node
+    :type the_vm: vim.VirtualMachine
+
+    :param timeout: How long to wait on vCenter
+    :type timeout: Integer
+    """
+    stub = the_vm._stub
+    # Only the session ID of the cookie; not its path, expiry, etc
+    cookie = stub.cookie.split(';')[0]
+    resp = requests.get('https://{}/screen'.format(stub.host),
+                        params={'id': the_vm._moId, 'w': SCREENSHOT_WIDTH, 'h': SCREENSHOT_HEIGHT},
+                        headers={'Cookie': cookie},
+                        verify=const.INF_VCENTER_VERIFY_CERT,
+                        timeout=timeout)
+    resp.raise_for_status()
+    return resp.content
+
+
+def wait_until_ready(the_vm, screen='format_disks', timeout=const.VLAB_ONEFS_READY_TIMEOUT,
+                     quiet=const.VLAB_ONEFS_READY_QUIET, interval=const.VLAB_ONEFS_READY_INTERVAL,
+                     recognizer=None):
+    """Wait for the console of a node to be ready for input, by watching screenshots of it
+
+    Nothing has to open the console, so a browser (or console session) is only
+    needed once the node is ready. The console is ready once it shows ``screen``,
+    or stops changing for ``quiet`` seconds (like ``vSphereConsole.wait_for_prompt``).
+    Each screenshot is hashed like the console (see ``prompts.fingerprint_frame``),
+    and a hash within ``VLAB_ONEFS_PROMPT_DISTANCE`` bits of the last one is not a
+    change; i.e. a blinking cursor.
+
+    :Returns: Boolean - False if the screenshots can't be read, or the console never settles
+
+    :param the_vm: The OneFS node
+    :type the_vm: vim.VirtualMachine
+
+    :param screen: The screen of the wizard that means the node is ready
+    :type screen: String
+
+    :param timeout: The longest to wait, in seconds
+    :type timeout: Integer
+
+    :param quiet: How long the console has to stop changing, in seconds
+    :type quiet: Integer
+
+    :param interval: How often to take a screenshot, in seconds
+    :type interval: Float
+
+    :param recognizer: Knows what the screens of the wizard look like. Defaults
+                       to the one shared by the worker process.
+    :type recognizer: prompts.PromptRecognizer
+    """
+    recognizer = recognizer if recognizer is not None else prompts.recognizer()
+    begin = time.time()
+    last, changed_at = None, begin
+    while time.time() - begin < timeout:
+        try:
+            fingerprint = prompts.fingerprint_frame(*prompts.decode_png(get_screenshot(the_vm)))
+        except (requests.RequestException, ValueError):
+            return False
+        if screen is not None and recognizer.identify(fingerprint) == screen:
+            return True
+        now = time.time()
+        if fingerprint is None or last is None or bin(fingerprint ^ last).count('1') > recognizer.max_distance:
+            last, changed_at = fingerprint, now
+        elif now - changed_at >= quiet:
+            return True
+        time.sleep(interval)
+    return False
+
+
+def get_stats(username, samples=const.VLAB_ONEFS_STATS_SAMPLES):
+    """Obtain CPU, memory, disk and network stats for all of a user's OneFS nodes.
+
+    Stats for every node are pulled with a single call to the performance
+    manager, and returned in columnar form; the Nth value of every column is
+    for the Nth node. Nodes that are powered off have ``None`` for their stats.
+
+    :Returns: Dictionary
+
+    :param username: The user who owns the OneFS nodes
+    :type username: String
+
+    :param samples: The number of realtime (20 second) samples to average
+    :type samples: Integer
+    """
+    with vCenter(host=shards.locate(username), user=const.INF_VCENTER_USER, \
+                 password=const.INF_VCENTER_PASSWORD) as vcenter:
+        folder = vcenter.get_by_name(name=username, vimtype=vim.Folder)
+        nodes = [x for x in folder.childEntity if _is_onefs(x)]
+        return query_stats(vcenter, nodes, samples)
+
+
+def query_stats(vcenter, vms, samples):
+    """Pull averaged performance stats for many VMs in one QueryPerf call
+
+    :Returns: Dictionary
+
+    :param vcenter: An established connection to vCenter
+    :type vcenter: vlab_inf_common.vmware.vcenter.vCenter
+
+    :param vms: The virtual machines to obtain stats for
+    :type vms: List
+
+    :param samples: The number of realtime (20 second) samples to average
+    :type samples: Integer
+    """
+    stats = {'node': [x.name for x in vms]}
+    for column, _, _ in STATS_COUNTERS:
+        stats[column] = [None for _ in vms]
+    counter_ids = _get_counter_ids(vcenter)
+    columns = {counter_ids[name]: (column, convert) for column, name, convert in STATS_COUNTERS}
+    metrics = [vim.PerformanceManager.MetricId(counterId=x, instance='') for x in columns.keys()]
+    specs = []
+    for vm in vms:
+        if vm.runtime.powerState == vim.VirtualMachinePowerState.poweredOn:
+            specs.append(vim.PerformanceManager.QuerySpec(entity=vm,
+                                                          metricId=metrics,
+                                                          intervalId=REALTIME_INTERVAL,
+                                                          maxSample=samples))
+    if not specs:
+        return stats
+    rows = {vm: idx for idx, vm in enumerate(vms)}
+    for result in vcenter.content.perfManager.QueryPerf(querySpec=specs):
+        row = rows[result.entity]
+        for series in result.value:
+            column, convert = columns[series.id.counterId]
+            if series.value:
+                stats[column][row] = round(convert(sum(series.value) / len(series.value)), 2)
+    return stats
+
+
+def _get_counter_ids(vcenter):
+    """Map the names of the performance counters we care about to their IDs.
+
+    Counter IDs do not change for the life of a vCenter server, so the lookup
+    is cached for the life of the worker.
+
+    :Returns: Dictionary
+
+    :param vcenter: An established connection to vCenter
+    :type vcenter: vlab_inf_common.vmware.vcenter.vCenter
+    """
+    # Counter IDs are only unique within a single vCenter server
+    server_id = vcenter.content.about.instanceUuid
+    if server_id not in _COUNTER_IDS:
+        wanted = {name for _, name, _ in STATS_COUNTERS}
+        counter_ids = {}
+        for counter in vcenter.content.perfManager.perfCounter:
+            name = '{}.{}.{}'.format(counter.groupInfo.key, counter.nameInfo.key, counter.rollupType)
+            if name in wanted:
+                counter_ids[name] = counter.key
+        _COUNTER_IDS[server_id] = counter_ids
+    return _COUNTER_IDS[server_id]
+
+
+def _is_onefs(entity):
+    """Determine if a vCenter entity is a OneFS node, without the overhead of ``get_info``
+
+    :Returns: Boolean
+
+    :param entity: The thing to inspect
+    :type entity: vim.ManagedEntity
+    """
+    if not isinstance(entity, vim.VirtualMachine) or entity.config is None:
+        return False
+    return _parse_meta(entity.config.annotation).get('component') == 'OneFS'
+
+
+def _parse_meta(annotation):
+    """Load the meta data stored in the notes of a VM
+
+    :Returns: Dictionary - empty if the notes are not meta data
+
+    :param annotation: The raw notes/annotation of a VM
+    :type annotation: String
+    """
+    try:
+        meta_data = ujson.loads(annotation)
+    except (ValueError, TypeError):
+        return {}
+    return meta_data if isinstance(meta_data, dict) else {}
+
+
 def delete_onefs(username, machine_name, logger):
     """Unregister and destroy a user's onefs node
 
@@ -43,24 +335,615 @@ def delete_onefs(username, machine_name, logger):
     :param logger: An object for logging messages
     :type logger: logging.LoggerAdapter
     """
-    with vCenter(host=const.INF_VCENTER_SERVER, user=const.INF_VCENTER_USER, \
+    with vCenter(host=shards.locate(username), user=const.INF_VCENTER_USER, \
                  password=const.INF_VCENTER_PASSWORD) as vcenter:
         folder = vcenter.get_by_name(name=username, vimtype=vim.Folder)
         for entity in folder.childEntity:
             if entity.name == machine_name:
                 info = virtual_machine.get_info(vcenter, entity, username)
                 if info['meta']['component'] == 'OneFS':
-                    logger.debug('powering off VM')
-                    virtual_machine.power(entity, state='off')
-                    delete_task = entity.Destroy_Task()
-                    logger.debug('blocking while VM is being destroyed')
-                    consume_task(delete_task)
+                    names = {x.name for x in folder.childEntity}
+                    clones = [x for x in info['meta'].get('clones', []) if x in names]
+                    if clones:
+                        error = 'Node {} has linked clones; delete them first: {}'.format(machine_name, ', '.join(clones))
+                        raise ValueError(error)
+                    _delete_node(entity, logger)
                     break
         else:
             raise ValueError('No OneFS node named {} found'.format(machine_name))
 
 
-def create_onefs(username, machine_name, image, front_end, back_end, ram, cpu_count, logger):
+def _delete_node(the_vm, logger):
+    """Destroy a OneFS node; a linked clone is also dropped from the meta data
+    of the node it was cloned from.
+
+    :Returns: None
+
+    :param the_vm: The OneFS node to destroy
+    :type the_vm: vim.VirtualMachine
+
+    :param logger: An object for logging messages
+    :type logger: logging.LoggerAdapter
+    """
+    name, folder = the_vm.name, the_vm.parent
+    clone_of = _parse_meta(the_vm.config.annotation).get('clone_of', None)
+    _destroy_vm(the_vm, logger)
+    if clone_of:
+        _unlink_clone(folder, name, clone_of, logger)
+
+
+def _unlink_clone(folder, clone_name, source_name, logger):
+    """Forget about a deleted linked clone; once a node has no clones left, the
+    snapshot they shared is removed.
+
+    :Returns: None
+
+    :param folder: The folder that holds the source node
+    :type folder: vim.Folder
+
+    :param clone_name: The name of the deleted clone
+    :type clone_name: String
+
+    :param source_name: The name of the node the clone was made from
+    :type source_name: String
+
+    :param logger: An object for logging messages
+    :type logger: logging.LoggerAdapter
+    """
+    for source in folder.childEntity:
+        if source.name == source_name and _is_onefs(source):
+            break
+    else:
+        # The source was deleted outside of vLab
+        return
+    meta = _parse_meta(source.config.annotation)
+    meta['clones'] = [x for x in meta.get('clones', []) if x != clone_name]
+    virtual_machine.set_meta(source, meta)
+    if not meta['clones']:
+        snapshot = find_snapshot(source, CLONE_SNAPSHOT)
+        if snapshot is not None:
+            logger.debug('Removing the {} snapshot of {}'.format(CLONE_SNAPSHOT, source_name))
+            consume_task(snapshot.RemoveSnapshot_Task(removeChildren=False))
+
+
+def _destroy_vm(the_vm, logger):
+    """Power off, then delete a VM from disk
+
+    :Returns: None
+
+    :param the_vm: The virtual machine to destroy
+    :type the_vm: vim.VirtualMachine
+
+    :param logger: An object for logging messages
+    :type logger: logging.LoggerAdapter
+    """
+    logger.debug('powering off VM')
+    virtual_machine.power(the_vm, state='off')
+    delete_task = the_vm.Destroy_Task()
+    logger.debug('blocking while VM is being destroyed')
+    consume_task(delete_task)
+
+
+def collect_garbage(dry_run, logger, max_age=const.VLAB_ONEFS_GC_MAX_AGE,
+                    batch_size=const.VLAB_ONEFS_GC_BATCH_SIZE,
+                    batch_pause=const.VLAB_ONEFS_GC_BATCH_PAUSE):
+    """Find, and reclaim the VMs and deploys left behind when creating a OneFS
+    node fails partway through.
+
+    :Returns: Dictionary
+
+    :param dry_run: Set to True to only report what would be reclaimed
+    :type dry_run: Boolean
+
+    :param logger: An object for logging messages
+    :type logger: logging.LoggerAdapter
+
+    :param max_age: How many seconds old something must be before it's reclaimed
+    :type max_age: Integer
+
+    :param batch_size: How many things to reclaim before pausing
+    :type batch_size: Integer
+
+    :param batch_pause: How many seconds to wait between batches
+    :type batch_pause: Integer
+    """
+    report = {'orphans': [], 'stale_deploys': [], 'reclaimed': 0, 'dry_run': dry_run}
+    for server in const.INF_VCENTER_SERVERS:
+        with vCenter(host=server, user=const.INF_VCENTER_USER, \
+                     password=const.INF_VCENTER_PASSWORD) as vcenter:
+            orphans = find_orphans(vcenter, max_age)
+            stale_deploys = find_stale_deploys(vcenter, max_age)
+            report['orphans'] += [record for _, record in orphans]
+            report['stale_deploys'] += [record for _, record in stale_deploys]
+            if dry_run:
+                continue
+            work = [(_destroy_vm, vm, record) for vm, record in orphans]
+            work += [(_cancel_deploy, task, record) for task, record in stale_deploys]
+            reclaimed = _reclaim_in_batches(work, logger, batch_size, batch_pause)
+            report['reclaimed'] += len(reclaimed)
+    return report
+
+
+def _reclaim_in_batches(work, logger, batch_size, batch_pause):
+    """Reclaim things a few at a time, so vCenter isn't flooded with tasks
+
+    :Returns: List - the records of what was reclaimed
+
+    :param work: The function to reclaim a thing with, the thing, and a record
+                 with the name, user and reason for reclaiming the thing
+    :type work: List of (Function, Object, Dictionary)
+
+    :param logger: An object for logging messages
+    :type logger: logging.LoggerAdapter
+
+    :param batch_size: How many things to reclaim before pausing
+    :type batch_size: Integer
+
+    :param batch_pause: How many seconds to wait between batches
+    :type batch_pause: Integer
+    """
+    reclaimed = []
+    for idx, (reclaim, thing, record) in enumerate(work):
+        if idx and idx % batch_size == 0:
+            logger.info('Reclaimed {} of {}, pausing {} seconds'.format(idx, len(work), batch_pause))
+            time.sleep(batch_pause)
+        logger.info('Reclaiming {} {} owned by {}'.format(record['reason'], record['name'], record['user']))
+        try:
+            reclaim(thing, logger)
+        except (RuntimeError, vim.fault.VimFault) as doh:
+            logger.error('Unable to reclaim {}: {}'.format(record['name'], doh))
+        else:
+            reclaimed.append(record)
+    return reclaimed
+
+
+def reap_expired(logger, batch_size=const.VLAB_ONEFS_GC_BATCH_SIZE,
+                 batch_pause=const.VLAB_ONEFS_GC_BATCH_PAUSE):
+    """Power off and delete every OneFS node whose lease has expired
+
+    A node that linked clones depend on is skipped until its clones are gone.
+
+    :Returns: List - the user and name of every node that was deleted
+
+    :param logger: An object for logging messages
+    :type logger: logging.LoggerAdapter
+
+    :param batch_size: How many nodes to delete before pausing
+    :type batch_size: Integer
+
+    :param batch_pause: How many seconds to wait between batches
+    :type batch_pause: Integer
+    """
+    reaped = []
+    now = time.time()
+    for server in const.INF_VCENTER_SERVERS:
+        with vCenter(host=server, user=const.INF_VCENTER_USER, \
+                     password=const.INF_VCENTER_PASSWORD) as vcenter:
+            top_folder = vcenter.get_vm_folder(const.INF_VCENTER_TOP_LVL_DIR)
+            owners = {}
+            for page in _retrieve_pages(vcenter, top_folder, vim.Folder, ['name'], const.VLAB_ONEFS_INVENTORY_PAGE_SIZE):
+                owners.update({x['obj']: x['name'] for x in page})
+            work = []
+            path_set = ['name', 'parent', 'config.annotation']
+            for page in _retrieve_pages(vcenter, top_folder, vim.VirtualMachine, path_set, const.VLAB_ONEFS_INVENTORY_PAGE_SIZE):
+                for props in page:
+                    expires = _lease_expires(props.get('config.annotation', ''))
+                    if expires is None or expires > now:
+                        continue
+                    elif _parse_meta(props.get('config.annotation', '')).get('clones'):
+                        logger.info('Not reaping {}; it has linked clones'.format(props['name']))
+                        continue
+                    record = {'user': owners.get(props.get('parent'), None),
+                              'name': props['name'],
+                              'reason': 'expired lease'}
+                    work.append((_delete_node, props['obj'], record))
+            reclaimed = _reclaim_in_batches(work, logger, batch_size, batch_pause)
+            reaped += [{'user': x['user'], 'name': x['name']} for x in reclaimed]
+    return reaped
+
+
+def power_off_idle(logger, window=const.VLAB_ONEFS_IDLE_WINDOW, interval=const.VLAB_ONEFS_IDLE_INTERVAL,
+                   cpu_pct=const.VLAB_ONEFS_IDLE_CPU_PCT, io_kbps=const.VLAB_ONEFS_IDLE_IO_KBPS):
+    """Power off the OneFS nodes that have been idle for too long.
+
+    Every check averages the stats since the last check. The first time a node
+    is found idle, ``idle_since`` is set in its meta data, and it's cleared as
+    soon as the node is found busy. Nodes idle for longer than the window are
+    powered off, and flagged with ``idle_off`` in their meta data.
+
+    :Returns: Dictionary
+
+    :param logger: An object for logging messages
+    :type logger: logging.LoggerAdapter
+
+    :param window: How many seconds a node must be idle before it's powered off
+    :type window: Integer
+
+    :param interval: How many seconds between checks
+    :type interval: Integer
+
+    :param cpu_pct: A node using less CPU than this is idle
+    :type cpu_pct: Float
+
+    :param io_kbps: A node doing less disk, and less network IO than this is idle
+    :type io_kbps: Float
+    """
+    report = {'idle': [], 'powered_off': []}
+    now = time.time()
+    # Realtime stats are only kept for an hour
+    samples = max(1, min(interval // REALTIME_INTERVAL, 180))
+    for server in const.INF_VCENTER_SERVERS:
+        with vCenter(host=server, user=const.INF_VCENTER_USER, \
+                     password=const.INF_VCENTER_PASSWORD) as vcenter:
+            top_folder = vcenter.get_vm_folder(const.INF_VCENTER_TOP_LVL_DIR)
+            owners = {}
+            for page in _retrieve_pages(vcenter, top_folder, vim.Folder, ['name'], const.VLAB_ONEFS_INVENTORY_PAGE_SIZE):
+                owners.update({x['obj']: x['name'] for x in page})
+            path_set = ['name', 'parent', 'config.annotation', 'runtime.powerState']
+            for page in _retrieve_pages(vcenter, top_folder, vim.VirtualMachine, path_set, const.VLAB_ONEFS_INVENTORY_PAGE_SIZE):
+                nodes = []
+                for props in page:
+                    if props.get('runtime.powerState') != vim.VirtualMachinePowerState.poweredOn:
+                        continue
+                    try:
+                        meta = ujson.loads(props.get('config.annotation', ''))
+                    except (ValueError, TypeError):
+                        continue
+                    if isinstance(meta, dict) and meta.get('component') == 'OneFS':
+                        nodes.append((props, meta))
+                if not nodes:
+                    continue
+                stats = query_stats(vcenter, [props['obj'] for props, _ in nodes], samples)
+                for row, (props, meta) in enumerate(nodes):
+                    record = {'user': owners.get(props.get('parent'), None), 'name': props['name']}
+                    busy = _is_busy(stats, row, cpu_pct, io_kbps)
+                    if busy is None:
+                        # no stats yet, i.e. just powered on
+                        continue
+                    elif busy:
+                        if 'idle_since' in meta:
+                            meta.pop('idle_since')
+                            virtual_machine.set_meta(props['obj'], meta)
+                    elif 'idle_since' not in meta:
+                        meta['idle_since'] = now
+                        virtual_machine.set_meta(props['obj'], meta)
+                        report['idle'].append(record)
+                    elif now - meta['idle_since'] >= window:
+                        logger.info('Powering off idle node {} owned by {}'.format(record['name'], record['user']))
+                        virtual_machine.power(props['obj'], state='off')
+                        meta.pop('idle_since')
+                        meta['idle_off'] = now
+                        virtual_machine.set_meta(props['obj'], meta)
+                        report['powered_off'].append(record)
+                    else:
+                        report['idle'].append(record)
+    return report
+
+
+def _is_busy(stats, row, cpu_pct, io_kbps):
+    """Determine if a node was doing any real work
+
+    :Returns: Boolean, or None if there are no stats for the node
+
+    :param stats: The output from ``query_stats``
+    :type stats: Dictionary
+
+    :param row: Which node in the stats to look at
+    :type row: Integer
+
+    :param cpu_pct: A node using less CPU than this is idle
+    :type cpu_pct: Float
+
+    :param io_kbps: A node doing less disk, and less network IO than this is idle
+    :type io_kbps: Float
+    """
+    cpu = stats['cpu_pct'][row]
+    if cpu is None:
+        return None
+    disk = stats['disk_kbps'][row] or 0
+    net = stats['net_kbps'][row] or 0
+    return cpu >= cpu_pct or disk >= io_kbps or net >= io_kbps
+
+
+def power_on_cluster(username, machine_names, logger):
+    """Power on many OneFS nodes together, so the cluster can form quorum
+
+    :Returns: Dictionary - maps the name of each node to None, or an error message
+
+    :param username: The user who owns the OneFS nodes
+    :type username: String
+
+    :param machine_names: The names of the nodes to power on
+    :type machine_names: List
+
+    :param logger: An object for logging messages
+    :type logger: logging.LoggerAdapter
+    """
+    results = {}
+    with vCenter(host=shards.locate(username), user=const.INF_VCENTER_USER, \
+                 password=const.INF_VCENTER_PASSWORD) as vcenter:
+        folder = vcenter.get_by_name(name=username, vimtype=vim.Folder)
+        nodes = []
+        for name in machine_names:
+            the_vm = vcenter.content.searchIndex.FindChild(entity=folder, name=name)
+            if the_vm is None or not _is_onefs(the_vm):
+                results[name] = 'No node named {} found'.format(name)
+            else:
+                nodes.append(the_vm)
+        if not nodes:
+            return results
+        datacenter = folder
+        while not isinstance(datacenter, vim.Datacenter):
+            datacenter = datacenter.parent
+        logger.info('Powering on {} nodes'.format(len(nodes)))
+        outcome = consume_task(datacenter.PowerOnMultiVM_Task(vm=nodes))
+        for failure in outcome.notAttempted:
+            results[failure.vm.name] = failure.fault.localizedMessage
+        for attempt in outcome.attempted:
+            try:
+                if attempt.task is not None:
+                    consume_task(attempt.task)
+            except (RuntimeError, vim.fault.VimFault) as doh:
+                results[attempt.vm.name] = '{}'.format(doh)
+            else:
+                results[attempt.vm.name] = None
+                meta = ujson.loads(attempt.vm.config.annotation)
+                if meta.pop('idle_off', None) is not None:
+                    virtual_machine.set_meta(attempt.vm, meta)
+    return results
+
+
+def _lease_expires(annotation):
+    """Find when the lease of a OneFS node ends
+
+    :Returns: Float, or None if the VM is not a OneFS node with a lease
+
+    :param annotation: The meta data of a VM
+    :type annotation: String
+    """
+    try:
+        meta = ujson.loads(annotation)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(meta, dict) or meta.get('component') != 'OneFS':
+        return None
+    return meta.get('expires', None)
+
+
+def extend_lease(username, machine_name, hours):
+    """Renew the lease of a OneFS node so it expires some hours from now
+
+    :Returns: Dictionary
+
+    :Raises: ValueError
+
+    :param username: The user who owns the OneFS node
+    :type username: String
+
+    :param machine_name: The name of the OneFS node
+    :type machine_name: String
+
+    :param hours: How many hours from now the node should be deleted
+    :type hours: Integer
+    """
+    with OneFSNode(username, machine_name) as node:
+        meta = dict(node.info['meta'])
+        meta['expires'] = time.time() + (hours * 3600)
+        node.update_meta(meta)
+        return {machine_name: node.info}
+
+
+def inventory_pages(page_size=const.VLAB_ONEFS_INVENTORY_PAGE_SIZE):
+    """Find every OneFS node owned by every user, on every vCenter server.
+
+    The VMs are pulled in pages with a single recursive ContainerView and the
+    PropertyCollector, instead of inspecting each VM. Every page is turned into
+    NDJSON (one JSON object per line) before the next page is pulled, so none
+    of the vCenter objects outlive their page.
+
+    :Returns: Generator of String
+
+    :param page_size: The max number of VMs to pull from vCenter at once
+    :type page_size: Integer
+    """
+    for server in const.INF_VCENTER_SERVERS:
+        with vCenter(host=server, user=const.INF_VCENTER_USER, \
+                     password=const.INF_VCENTER_PASSWORD) as vcenter:
+            top_folder = vcenter.get_vm_folder(const.INF_VCENTER_TOP_LVL_DIR)
+            owners = {}
+            for page in _retrieve_pages(vcenter, top_folder, vim.Folder, ['name'], page_size):
+                owners.update({x['obj']: x['name'] for x in page})
+            path_set = ['name', 'parent', 'config.annotation', 'runtime.powerState']
+            for page in _retrieve_pages(vcenter, top_folder, vim.VirtualMachine, path_set, page_size):
+                records = [_inventory_record(x, owners) for x in page]
+                lines = [ujson.dumps(x) for x in records if x is not None]
+                if lines:
+                    yield '\n'.join(lines) + '\n'
+
+
+def _inventory_record(props, owners):
+    """Convert the properties of a VM into a line of the inventory
+
+    :Returns: Dictionary, or None if the VM is not a OneFS node
+
+    :param props: The properties of the VM, pulled by the PropertyCollector
+    :type props: Dictionary
+
+    :param owners: Maps a user's folder to the name of the user
+    :type owners: Dictionary
+    """
+    try:
+        meta = ujson.loads(props.get('config.annotation', ''))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(meta, dict) or meta.get('component') != 'OneFS':
+        return None
+    return {'user': owners.get(props.get('parent'), None),
+            'name': props['name'],
+            'version': meta.get('version', None),
+            'power': props.get('runtime.powerState', None),
+            'configured': meta.get('configured', False)}
+
+
+def _retrieve_pages(vcenter, root, vimtype, path_set, page_size):
+    """Pull properties of every object of a type under a folder, a page at a time
+
+    :Returns: Generator of List
+
+    :param vcenter: An established connection to vCenter
+    :type vcenter: vlab_inf_common.vmware.vcenter.vCenter
+
+    :param root: Where in the vCenter inventory to start looking
+    :type root: vim.Folder
+
+    :param vimtype: The type of object to pull properties of
+    :type vimtype: vim.ManagedEntity
+
+    :param path_set: The properties to pull
+    :type path_set: List
+
+    :param page_size: The max number of objects to pull at once
+    :type page_size: Integer
+    """
+    view = vcenter.content.viewManager.CreateContainerView(root, [vimtype], True)
+    try:
+        traversal = vim.PropertyCollector.TraversalSpec(name='traverseView', path='view',
+                                                        skip=False, type=vim.view.ContainerView)
+        obj_spec = vim.PropertyCollector.ObjectSpec(obj=view, skip=True, selectSet=[traversal])
+        prop_spec = vim.PropertyCollector.PropertySpec(type=vimtype, pathSet=path_set)
+        filter_spec = vim.PropertyCollector.FilterSpec(objectSet=[obj_spec], propSet=[prop_spec])
+        options = vim.PropertyCollector.RetrieveOptions(maxObjects=page_size)
+        collector = vcenter.content.propertyCollector
+        result = collector.RetrieveContentsEx([filter_spec], options)
+        while result is not None:
+            page = []
+            for obj_content in result.objects:
+                props = {x.name: x.val for x in obj_content.propSet}
+                props['obj'] = obj_content.obj
+                page.append(props)
+            yield page
+            if not result.token:
+                break
+            result = collector.ContinueRetrievePropertiesEx(token=result.token)
+    finally:
+        view.Destroy()
+
+
+def find_orphans(vcenter, max_age):
+    """Locate OneFS nodes in user folders whose meta data is incomplete; i.e. the
+    deploy finished, but creating the node failed before it was fully set up.
+
+    VMs without the OneFS marker in their notes are never returned; they belong
+    to some other component (or a human).
+
+    :Returns: List of (vim.VirtualMachine, Dictionary)
+
+    :param vcenter: An established connection to vCenter
+    :type vcenter: vlab_inf_common.vmware.vcenter.vCenter
+
+    :param max_age: How many seconds old a VM must be to be considered orphaned
+    :type max_age: Integer
+    """
+    orphans = []
+    now = time.time()
+    top_folder = vcenter.get_vm_folder(const.INF_VCENTER_TOP_LVL_DIR)
+    for user_folder in top_folder.childEntity:
+        if not isinstance(user_folder, vim.Folder):
+            continue
+        for vm in user_folder.childEntity:
+            if not isinstance(vm, vim.VirtualMachine) or vm.config is None:
+                # No config means the VM is still being deployed
+                continue
+            reason = _meta_problem(vm.config.annotation)
+            if reason is None or vm.config.createDate is None:
+                continue
+            elif _parse_meta(vm.config.annotation).get('clones'):
+                # Linked clones depend on the disks of this VM
+                continue
+            age = now - vm.config.createDate.timestamp()
+            if age > max_age:
+                record = {'user': user_folder.name, 'name': vm.name,
+                          'reason': reason, 'age': int(age)}
+                orphans.append((vm, record))
+    return orphans
+
+
+def _meta_problem(annotation):
+    """Determine why the meta data of a OneFS node is unusable
+
+    :Returns: String or None when the meta data is fine, or the VM is not a OneFS node
+
+    :param annotation: The raw notes/annotation of a VM
+    :type annotation: String
+    """
+    required = {'component', 'created', 'version', 'generation', 'configured'}
+    try:
+        meta_data = ujson.loads(annotation)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(meta_data, dict) or meta_data.get('component') != 'OneFS':
+        return None
+    elif not required.issubset(meta_data.keys()):
+        return 'incomplete metadata'
+    return None
+
+
+def find_stale_deploys(vcenter, max_age):
+    """Locate OneFS deploys that have been running for longer than ``max_age``
+
+    ``deploy_node`` writes the OneFS marker to the notes of the VM being
+    imported, so a deploy is only considered when the task's entity (or an
+    entity the task holds a lock on) is a OneFS node. The deploys of other
+    components are never touched.
+
+    :Returns: List of (vim.Task, Dictionary)
+
+    :param vcenter: An established connection to vCenter
+    :type vcenter: vlab_inf_common.vmware.vcenter.vCenter
+
+    :param max_age: How many seconds a deploy can run before it's considered stale
+    :type max_age: Integer
+    """
+    stale = []
+    now = time.time()
+    for task in vcenter.content.taskManager.recentTask:
+        info = task.info
+        if 'ImportVApp' not in info.descriptionId:
+            continue
+        elif info.state not in (vim.TaskInfo.State.queued, vim.TaskInfo.State.running):
+            continue
+        age = now - info.queueTime.timestamp()
+        if age < max_age:
+            continue
+        nodes = [x for x in [info.entity] + list(info.locked or []) if _is_onefs(x)]
+        if nodes:
+            record = {'user': getattr(info.reason, 'userName', 'Unknown'), 'name': nodes[0].name,
+                      'reason': 'stale deploy', 'age': int(age)}
+            stale.append((task, record))
+    return stale
+
+
+def _cancel_deploy(task, logger):
+    """Abort an OVA deploy; vCenter removes the partially deployed VM
+
+    :Returns: None
+
+    :param task: The deploy task to cancel
+    :type task: vim.Task
+
+    :param logger: An object for logging messages
+    :type logger: logging.LoggerAdapter
+    """
+    logger.debug('canceling deploy task {}'.format(task.info.key))
+    try:
+        task.CancelTask()
+    except vim.fault.InvalidState:
+        # The deploy finished/failed between finding it and canceling it
+        pass
+
+
+def create_onefs(username, machine_name, image, front_end, back_end, ram, cpu_count, logger, disk_provisioning='thin',
+                 lease=None):
     """Deploy a OneFS node
 
     :Returns: Dictionary
@@ -88,89 +971,473 @@ def create_onefs(username, machine_name, image, front_end, back_end, ram, cpu_co
 
     :param logger: An object for logging messages
     :type logger: logging.LoggerAdapter
+
+    :param disk_provisioning: How to allocate the disks; thin, lazy-zeroed or eager-zeroed
+    :type disk_provisioning: String
+
+    :param lease: How many hours until the node is automatically deleted. None means never.
+    :type lease: Integer
     """
-    with vCenter(host=const.INF_VCENTER_SERVER, user=const.INF_VCENTER_USER, \
+    the_image = images.registry().get(image)
+    if the_image is None:
+        error = 'Invalid version of OneFS: {}'.format(image)
+        raise ValueError(error)
+    ova_path = the_image.path
+    server = shards.locate(username)
+    with vCenter(host=server, user=const.INF_VCENTER_USER, \
                  password=const.INF_VCENTER_PASSWORD) as vcenter:
-        ova_name = convert_name(image)
         try:
-            ova = Ova(os.path.join(const.VLAB_ONEFS_IMAGES_DIR, ova_name))
+            ova = Ova(ova_path)
         except FileNotFoundError:
             error = 'Invalid version of OneFS: {}'.format(image)
             raise ValueError(error)
         try:
+            if disk_provisioning == 'thin':
+                disk_gb = None
+            else:
+                disk_gb = capacity.provisioned_gb(ova.ovf)
+            placement = capacity.preflight(vcenter, server, ova_path, ram, cpu_count, disk_gb=disk_gb)
+            logger.debug('Capacity headroom after node: {}'.format(placement['headroom']))
+            datastore = capacity.find_datastore(vcenter, placement['datastore'])
+            host = vcenter.host_systems[placement['host']]
             network_map = make_network_map(vcenter.networks, front_end, back_end)
-            the_vm = virtual_machine.deploy_from_ova(vcenter=vcenter,
-                                                     ova=ova,
-                                                     network_map=network_map,
-                                                     username=username,
-                                                     machine_name=machine_name,
-                                                     logger=logger,
-                                                     power_on=False)
+            # Just enough meta data for the garbage collector to know the VM is
+            # a OneFS node, should creating the node fail from here on out
+            marker = {'component': 'OneFS', 'created': time.time(), 'version': image}
+            the_vm = deploy_node(vcenter=vcenter,
+                                 ova=ova,
+                                 network_map=network_map,
+                                 username=username,
+                                 machine_name=machine_name,
+                                 logger=logger,
+                                 power_on=False,
+                                 disk_provisioning=disk_provisioning,
+                                 meta=marker,
+                                 datastore=datastore,
+                                 host=host)
         finally:
             ova.close()
         # ram is supplied in GB
         mb_of_ram = ram * 1024
         virtual_machine.adjust_ram(the_vm, mb_of_ram=mb_of_ram)
         virtual_machine.adjust_cpu(the_vm, cpu_count)
+        logger.debug('Taking factory snapshot')
+        take_snapshot(the_vm, FACTORY_SNAPSHOT)
         virtual_machine.power(the_vm, state='on')
         meta_data = {'component': 'OneFS',
                      'created': time.time(),
                      'version': image,
                      'configured': False,
                      'generation': 1} # Versioning of the VM itself
+        if lease:
+            meta_data['expires'] = meta_data['created'] + (lease * 3600)
         virtual_machine.set_meta(the_vm, meta_data)
         info = virtual_machine.get_info(vcenter, the_vm, username)
         return {the_vm.name: info}
 
 
-def update_meta(username, vm_name, new_meta):
-    """Connect to vSphere and update the VM meta data
+class _DeployTarget(object):
+    """Stands in for a vCenter, so ``virtual_machine.deploy_from_ova`` creates
+    the VM on a specific datastore and host, with the supplied type of disk
+    provisioning and notes. Everything else is the real vCenter.
 
-    :Returns: None
+    :param vcenter: The vCenter object
+    :type vcenter: vlab_inf_common.vmware.vcenter.vCenter
+
+    :param datastore: Where to put the disks of the VM
+    :type datastore: vim.Datastore
+
+    :param host: The ESXi host to deploy to
+    :type host: vim.HostSystem
+
+    :param provisioning: The OVF import spec value for the disk provisioning
+    :type provisioning: String
+
+    :param meta: Written to the notes of the VM as it's created
+    :type meta: Dictionary
+    """
+    def __init__(self, vcenter, datastore, host, provisioning, meta):
+        self._vcenter = vcenter
+        self._provisioning = provisioning
+        self._meta = meta
+        # deploy_from_ova picks a datastore and host at random; give it only one choice
+        self.datastores = collections.defaultdict(lambda: datastore)
+        self.host_systems = {host.name: host}
+        self.ovf_manager = self
+
+    def __getattr__(self, name):
+        return getattr(self._vcenter, name)
+
+    def CreateImportSpec(self, ovfDescriptor, resourcePool, datastore, cisp):
+        """Build the import spec with the real OvfManager, after adjusting the provisioning and notes"""
+        cisp.diskProvisioning = self._provisioning
+        spec = self._vcenter.ovf_manager.CreateImportSpec(ovfDescriptor=ovfDescriptor,
+                                                          resourcePool=resourcePool,
+                                                          datastore=datastore,
+                                                          cisp=cisp)
+        if self._meta:
+            spec.importSpec.configSpec.annotation = ujson.dumps(self._meta)
+        return spec
+
+
+def deploy_node(vcenter, ova, network_map, username, machine_name, logger, power_on=True, disk_provisioning='thin',
+                meta=None, datastore=None, host=None):
+    """Upload an OVA to create a new VM, with the supplied type of disk provisioning.
+
+    This wraps ``virtual_machine.deploy_from_ova``, which always thin provisions
+    the disks and picks the datastore and host at random.
+
+    :Returns: vim.VirtualMachine
+
+    :Raises: ValueError, RuntimeError
+
+    :param vcenter: The vCenter object
+    :type vcenter: vlab_inf_common.vmware.vcenter.vCenter
+
+    :param ova: The Ova object
+    :type ova: vlab_inf_common.vmware.ova.Ova
+
+    :param network_map: The mapping of networks defined in the OVA with what's
+                        available in vCenter.
+    :type network_map: List of vim.OvfManager.NetworkMapping
+
+    :param username: The name of the user deploying a new VM
+    :type username: String
+
+    :param machine_name: The unique name to give the new VM
+    :type machine_name: String
+
+    :param logger: An object for logging messages
+    :type logger: logging.LoggerAdapter
+
+    :param power_on: Set to True to have the VM powered on after deployment. Default True
+    :type power_on: Boolean
+
+    :param disk_provisioning: How to allocate the disks; thin, lazy-zeroed or eager-zeroed
+    :type disk_provisioning: String
+
+    :param meta: Written to the notes of the VM as it's created. Default None
+    :type meta: Dictionary
+
+    :param datastore: Where to put the disks of the VM. Default None picks one at random
+    :type datastore: vim.Datastore
+
+    :param host: The ESXi host to deploy to. Default None picks one at random
+    :type host: vim.HostSystem
+    """
+    try:
+        provisioning = DISK_PROVISIONING[disk_provisioning]
+    except KeyError:
+        error = 'Invalid disk provisioning: {}'.format(disk_provisioning)
+        raise ValueError(error)
+    if not re.match(HOSTNAME_REGEX, machine_name):
+        error = 'Invalid machine name. Names can only contain characters a-z, A-Z, 0-9, periods (".") and dashes ("-"). Supplied: {}'.format(machine_name)
+        raise ValueError(error)
+    if datastore is None:
+        datastore = vcenter.datastores[random.choice(const.INF_VCENTER_DATASTORE.split(',')).strip()]
+        if isinstance(datastore, vim.StoragePod):
+            datastore = random.choice(datastore.childEntity)
+    if host is None:
+        all_hosts = [x for x in vcenter.host_systems.values() if not x.runtime.inMaintenanceMode]
+        host = random.choice(all_hosts)
+    logger.debug('Deploying {} with {} disks'.format(machine_name, disk_provisioning))
+    target = _DeployTarget(vcenter, datastore, host, provisioning, meta)
+    return virtual_machine.deploy_from_ova(target, ova, network_map, username, machine_name, logger,
+                                           power_on=power_on)
+
+
+def reset_onefs(username, machine_name, logger):
+    """Revert a OneFS node to the state it was in right after being deployed
+
+    :Returns: Dictionary
+
+    :Raises: ValueError
 
     :param username: The user who owns the OneFS node
     :type username: String
 
-    :param vm_name: The name of the VM to update the meta data on
-    :type vm_name: String
+    :param machine_name: The name of the OneFS node to reset
+    :type machine_name: String
+
+    :param logger: An object for logging messages
+    :type logger: logging.LoggerAdapter
+    """
+    with OneFSNode(username, machine_name) as node:
+        snapshot = find_snapshot(node.vm, FACTORY_SNAPSHOT)
+        if snapshot is None:
+            error = 'Node {} has no {} snapshot; it must be deleted and created again'.format(machine_name, FACTORY_SNAPSHOT)
+            raise ValueError(error)
+        logger.debug('Reverting to factory snapshot')
+        consume_task(snapshot.RevertToSnapshot_Task())
+        virtual_machine.power(node.vm, state='on')
+        # The snapshot predates the meta data, so always (re)write it
+        meta = dict(node.info['meta'])
+        meta['configured'] = False
+        node.update_meta(meta)
+        return {machine_name: node.info}
+
+
+def take_snapshot(the_vm, name):
+    """Create a snapshot of the VM's disks; does not include memory
+
+    :Returns: None
+
+    :param the_vm: The virtual machine to snapshot
+    :type the_vm: vim.VirtualMachine
+
+    :param name: The name to give the snapshot
+    :type name: String
+    """
+    task = the_vm.CreateSnapshot_Task(name=name, description='Created by vLab', memory=False, quiesce=False)
+    consume_task(task)
+
+
+def find_snapshot(the_vm, name):
+    """Locate a snapshot of a VM by name
+
+    :Returns: vim.vm.Snapshot or None if no snapshot has the supplied name
+
+    :param the_vm: The virtual machine that owns the snapshot
+    :type the_vm: vim.VirtualMachine
+
+    :param name: The name of the snapshot
+    :type name: String
+    """
+    if the_vm.snapshot is None:
+        return None
+    tree = list(the_vm.snapshot.rootSnapshotList)
+    while tree:
+        node = tree.pop()
+        if node.name == name:
+            return node.snapshot
+        tree.extend(node.childSnapshotList)
+    return None
+
+
+def clone_cluster(username, machine_names, suffix, front_end, back_end, logger):
+    """Make linked clones of every node in a cluster.
+
+    The clones share the disks of the source nodes, so cloning a configured
+    cluster is quick. The name of each clone is the name of the source node plus
+    the suffix.
+
+    Every clone of a node is made from the same snapshot, named ``CLONE_SNAPSHOT``.
+    It's taken by the first clone and reused until the last clone is deleted, so
+    while a node has clones, new clones start from the state the node was in when
+    its first clone was made. The names of the clones are recorded in the meta
+    data of the source node, and the source can't be deleted or reaped while they
+    exist. If any node fails to clone, the clones and snapshots made so far are
+    removed.
+
+    :Returns: Dictionary
+
+    :Raises: ValueError, RuntimeError
+
+    :param username: The user who owns the OneFS cluster
+    :type username: String
+
+    :param machine_names: The names of every node in the cluster to clone
+    :type machine_names: List
+
+    :param suffix: Appended to the name of a source node to name its clone
+    :type suffix: String
+
+    :param front_end: The network to hook up the external network of the clones to
+    :type front_end: String
+
+    :param back_end: The network to hook the internal network of the clones to.
+                     It must not have any other VMs connected to it.
+    :type back_end: String
 
-    :param new_meta: The new meta data to overwrite the old meta data with
-    :type new_meta: Dictionary
+    :param logger: An object for logging messages
+    :type logger: logging.LoggerAdapter
     """
-    with vCenter(host=const.INF_VCENTER_SERVER, user=const.INF_VCENTER_USER, \
+    clone_names = ['{}{}'.format(x, suffix) for x in machine_names]
+    for clone_name in clone_names:
+        if not re.match(HOSTNAME_REGEX, clone_name):
+            error = 'Invalid suffix. Names can only contain characters a-z, A-Z, 0-9, periods (".") and dashes ("-"). Supplied: {}'.format(clone_name)
+            raise ValueError(error)
+    with vCenter(host=shards.locate(username), user=const.INF_VCENTER_USER, \
                  password=const.INF_VCENTER_PASSWORD) as vcenter:
         folder = vcenter.get_by_name(name=username, vimtype=vim.Folder)
-        for vm in folder.childEntity:
-            if vm.name == vm_name:
-                virtual_machine.set_meta(vm, new_meta)
+        search = vcenter.content.searchIndex
+        sources = []
+        for name, clone_name in zip(machine_names, clone_names):
+            the_vm = search.FindChild(entity=folder, name=name)
+            if the_vm is None or not _is_onefs(the_vm):
+                raise ValueError('No node named {} found'.format(name))
+            elif search.FindChild(entity=folder, name=clone_name) is not None:
+                raise ValueError('A VM named {} already exists'.format(clone_name))
+            sources.append(the_vm)
+        try:
+            networks = {'front_end': vcenter.networks[front_end],
+                        'back_end': vcenter.networks[back_end]}
+        except KeyError as doh:
+            raise ValueError('No network named {}'.format(doh.args[0]))
+        if networks['back_end'].vm:
+            error = 'Network {} is in use; clones need an isolated backend'.format(back_end)
+            raise ValueError(error)
+        pool = vcenter.resource_pools[const.INF_VCENTER_RESORUCE_POOL]
+        tasks, new_snapshots = [], []
+        try:
+            snapshots = [find_snapshot(x, CLONE_SNAPSHOT) for x in sources]
+            missing = [idx for idx, snapshot in enumerate(snapshots) if snapshot is None]
+            logger.info('Snapshotting {} nodes'.format(len(missing)))
+            snap_tasks = [sources[idx].CreateSnapshot_Task(name=CLONE_SNAPSHOT, description='Source of linked clones',
+                                                           memory=False, quiesce=False) for idx in missing]
+            tasks += snap_tasks
+            results, errors = _consume_all(snap_tasks)
+            new_snapshots += [x for x in results if x is not None]
+            if errors:
+                raise RuntimeError('Unable to snapshot nodes: {}'.format('; '.join(errors)))
+            for idx, snapshot in zip(missing, results):
+                snapshots[idx] = snapshot
+            clone_tasks = []
+            for source, snapshot, clone_name in zip(sources, snapshots, clone_names):
+                meta = _parse_meta(source.config.annotation)
+                meta.pop('clones', None)
+                # A clone is a new node; it's not idle, and gets a whole lease of its own
+                meta.pop('idle_since', None)
+                meta.pop('idle_off', None)
+                lease = meta.pop('expires', None)
+                if lease is not None and 'created' in meta:
+                    lease -= meta['created']
+                meta['created'] = time.time()
+                if lease is not None and lease > 0:
+                    meta['expires'] = meta['created'] + lease
+                meta['clone_of'] = source.name
+                spec = _clone_spec(source, snapshot, pool, networks, meta)
+                logger.info('Cloning {} to {}'.format(source.name, clone_name))
+                clone_tasks.append(source.CloneVM_Task(folder=folder, name=clone_name, spec=spec))
+                tasks.append(clone_tasks[-1])
+            clones, errors = _consume_all(clone_tasks)
+            if errors:
+                raise RuntimeError('Unable to clone nodes: {}'.format('; '.join(errors)))
+            for source, clone_name in zip(sources, clone_names):
+                meta = _parse_meta(source.config.annotation)
+                meta['clones'] = sorted(set(meta.get('clones', [])) | {clone_name})
+                virtual_machine.set_meta(source, meta)
+        except Exception:
+            _rollback_clones(folder, sources, clone_names, tasks, new_snapshots, logger)
+            raise
+        for power_task in [x.PowerOnVM_Task() for x in clones]:
+            consume_task(power_task)
+        return {x.name: virtual_machine.get_info(vcenter, x, username) for x in clones}
 
 
-def list_images():
-    """Obtain a list of available version of OneFS nodes that can be created
+def _consume_all(tasks):
+    """Wait for every task to finish, even when some of them fail
 
-    :Returns: List
+    :Returns: Tuple - the result of every task (None if it failed), and a list of the errors
+
+    :param tasks: The tasks to wait on
+    :type tasks: List of vim.Task
     """
-    images = os.listdir(const.VLAB_ONEFS_IMAGES_DIR)
-    images = [convert_name(x, to_version=True) for x in images]
-    return images
+    results, errors = [], []
+    for task in tasks:
+        try:
+            results.append(consume_task(task))
+        except (RuntimeError, vim.fault.VimFault) as doh:
+            results.append(None)
+            errors.append('{}'.format(doh))
+    return results, errors
 
 
-def convert_name(name, to_version=False):
-    """This function centralizes converting between the name of the OVA, and the
-    version of software it contains.
+def _rollback_clones(folder, sources, clone_names, tasks, snapshots, logger):
+    """Remove the clones and snapshots made by a ``clone_cluster`` that failed
 
-    OneFS OVAs follow the naming convention of <VERSION>.ova
+    :Returns: None
 
-    :param name: The thing to covert
-    :type name: String
+    :param folder: The folder that holds the source nodes and their clones
+    :type folder: vim.Folder
+
+    :param sources: The nodes that were being cloned
+    :type sources: List of vim.VirtualMachine
 
-    :param to_version: Set to True to covert the name of an OVA to the version
-    :type to_version: Boolean
+    :param clone_names: The names of the clones
+    :type clone_names: List
+
+    :param tasks: Every snapshot and clone task that was started
+    :type tasks: List of vim.Task
+
+    :param snapshots: The snapshots taken for the clones; existing snapshots are kept
+    :type snapshots: List of vim.vm.Snapshot
+
+    :param logger: An object for logging messages
+    :type logger: logging.LoggerAdapter
     """
-    if to_version:
-        return name.rstrip('.ova')
-    else:
-        return '{}.ova'.format(name)
+    logger.error('Cloning failed; removing the clones and snapshots made so far')
+    # Otherwise a clone could appear after it was cleaned up
+    _consume_all(tasks)
+    for entity in list(folder.childEntity):
+        if isinstance(entity, vim.VirtualMachine) and entity.name in clone_names:
+            _destroy_vm(entity, logger)
+    for source in sources:
+        meta = _parse_meta(source.config.annotation)
+        if set(meta.get('clones', [])) & set(clone_names):
+            meta['clones'] = [x for x in meta['clones'] if x not in clone_names]
+            virtual_machine.set_meta(source, meta)
+    for snapshot in snapshots:
+        consume_task(snapshot.RemoveSnapshot_Task(removeChildren=False))
+
+
+def _clone_spec(source, snapshot, pool, networks, meta):
+    """Define a linked clone of a OneFS node, with its NICs on new networks
+
+    :Returns: vim.vm.CloneSpec
+
+    :param source: The node being cloned
+    :type source: vim.VirtualMachine
+
+    :param snapshot: The snapshot of the source node to clone
+    :type snapshot: vim.vm.Snapshot
+
+    :param pool: The resource pool for the clone
+    :type pool: vim.ResourcePool
+
+    :param networks: Maps 'front_end' and 'back_end' to the networks for the clone
+    :type networks: Dictionary
+
+    :param meta: The meta data of the clone
+    :type meta: Dictionary
+    """
+    nics = {x.deviceInfo.label: x for x in source.config.hardware.device}
+    device_changes = [_nic_spec(nics[label], networks[side]) for label, side in NIC_LAYOUT if label in nics]
+    config = vim.vm.ConfigSpec(annotation=ujson.dumps(meta), deviceChange=device_changes)
+    location = vim.vm.RelocateSpec(pool=pool, diskMoveType='createNewChildDiskBacking')
+    return vim.vm.CloneSpec(location=location, snapshot=snapshot, config=config,
+                            powerOn=False, template=False)
+
+
+def _nic_spec(device, network):
+    """Define a change to the network a virtual NIC is connected to
+
+    :Returns: vim.vm.device.VirtualDeviceSpec
+
+    :param device: The virtual NIC to change
+    :type device: vim.vm.device.VirtualEthernetCard
+
+    :param network: The (distributed port group) network to connect the NIC to
+    :type network: vim.dvs.DistributedVirtualPortgroup
+    """
+    nicspec = vim.vm.device.VirtualDeviceSpec()
+    nicspec.operation = vim.vm.device.VirtualDeviceSpec.Operation.edit
+    nicspec.device = device
+    port = vim.dvs.PortConnection(portgroupKey=network.key,
+                                  switchUuid=network.config.distributedVirtualSwitch.uuid)
+    nicspec.device.backing = vim.vm.device.VirtualEthernetCard.DistributedVirtualPortBackingInfo(port=port)
+    nicspec.device.connectable = vim.vm.device.VirtualDevice.ConnectInfo(startConnected=True,
+                                                                        allowGuestControl=True,
+                                                                        connected=True)
+    return nicspec
+
+
+def list_images():
+    """Obtain a list of available version of OneFS nodes that can be created
+
+    :Returns: List - oldest version first
+    """
+    return images.registry().versions()
 
 
 def make_network_map(vcenter_networks, front_end, back_end):
@@ -215,7 +1482,7 @@ def update_network(username, machine_name, new_network):
     :param new_network: The name of the new network to connect the VM to
     :type new_network: String
     """
-    with vCenter(host=const.INF_VCENTER_SERVER, user=const.INF_VCENTER_USER, \
+    with vCenter(host=shards.locate(username), user=const.INF_VCENTER_USER, \
                  password=const.INF_VCENTER_PASSWORD) as vcenter:
         folder = vcenter.get_by_name(name=username, vimtype=vim.Folder)
         for entity in folder.childEntity:
@@ -236,3 +1503,59 @@ def update_network(username, machine_name, new_network):
         else:
             # the front-end NIC in vOneFS is the 2nd NIC, for whatever reason...
             virtual_machine.change_network(the_vm, network, adapter_label='Network adapter 2')
+
+
+def update_cluster_network(username, machine_names, new_network, logger):
+    """Move the front-end NIC of many OneFS nodes to a new network at once.
+
+    All the nodes are reconfigured concurrently, and a problem with one node
+    does not stop the others from being moved.
+
+    :Returns: Dictionary - maps the name of each node to None, or an error message
+
+    :Raises: ValueError - when the new network does not exist
+
+    :param username: The name of the user who owns the OneFS nodes
+    :type username: String
+
+    :param machine_names: The names of the OneFS nodes to move
+    :type machine_names: List
+
+    :param new_network: The name of the new network to connect the nodes to
+    :type new_network: String
+
+    :param logger: An object for logging messages
+    :type logger: logging.LoggerAdapter
+    """
+    results = {}
+    with vCenter(host=shards.locate(username), user=const.INF_VCENTER_USER, \
+                 password=const.INF_VCENTER_PASSWORD) as vcenter:
+        try:
+            network = vcenter.networks[new_network]
+        except KeyError:
+            error = 'No network named {}'.format(new_network)
+            raise ValueError(error)
+        folder = vcenter.get_by_name(name=username, vimtype=vim.Folder)
+        tasks = {}
+        for name in machine_names:
+            the_vm = vcenter.content.searchIndex.FindChild(entity=folder, name=name)
+            if the_vm is None or not _is_onefs(the_vm):
+                results[name] = 'No node named {} found'.format(name)
+                continue
+            nics = {x.deviceInfo.label: x for x in the_vm.config.hardware.device}
+            # the front-end NIC in vOneFS is the 2nd NIC
+            if 'Network adapter 2' not in nics:
+                results[name] = 'Node {} has no front-end NIC'.format(name)
+                continue
+            nicspec = _nic_spec(nics['Network adapter 2'], network)
+            logger.info('Moving {} to network {}'.format(name, new_network))
+            tasks[name] = the_vm.ReconfigVM_Task(vim.vm.ConfigSpec(deviceChange=[nicspec]))
+        for name, task in tasks.items():
+            try:
+                consume_task(task)
+            except (RuntimeError, vim.fault.VimFault) as doh:
+                logger.error('Unable to move {}: {}'.format(name, doh))
+                results[name] = '{}'.format(doh)
+            else:
+                results[name] = None
+    return results
@@ -0,0 +1,276 @@
+# -*- coding: UTF-8 -*-
+"""
+Speaks the protocol of the WebMKS console of a VM directly, without a browser.
+
+A WebMKS ticket (see ``vmware.get_console_ticket``) is a WebSocket that carries
+a plain VNC (RFB 3.8) session; the ticket itself is the authentication. Key
+presses are sent as RFB key events of X11 keysyms, and the framebuffer updates
+the console pushes back are used to tell when it's echoed input, when it's gone
+quiet at a prompt, and which screen of the wizard it's showing.
+
+Only the *raw*, *copy rect* and *desktop size* encodings are requested, so
+keeping a copy of the framebuffer needs no decoding beyond copying bytes.
+"""
+import ssl
+import struct
+import threading
+
+import websocket
+from selenium.webdriver.common.keys import Keys
+
+from vlab_onefs_api.lib import const
+from vlab_onefs_api.lib.worker import prompts
+from vlab_onefs_api.lib.worker.devtools import FrameTracker
+
+
+SUBPROTOCOLS = ['binary']
+RFB_VERSION = b'RFB 003.008\n'
+SECURITY_NONE = 1
+
+# Client to server message types
+SET_PIXEL_FORMAT = 0
+SET_ENCODINGS = 2
+FRAMEBUFFER_UPDATE_REQUEST = 3
+KEY_EVENT = 4
+
+# Server to client message types
+FRAMEBUFFER_UPDATE = 0
+SET_COLOUR_MAP_ENTRIES = 1
+BELL = 2
+SERVER_CUT_TEXT = 3
+
+ENCODING_RAW = 0
+ENCODING_COPY_RECT = 1
+ENCODING_DESKTOP_SIZE = -223
+
+# 32 bits per pixel, 24 bit depth, little-endian, true color; a pixel is blue, green, red, padding
+PIXEL_FORMAT = struct.pack('>BBBBHHHBBB3x', 32, 24, 0, 1, 255, 255, 255, 16, 8, 0)
+
+KEYSYMS = {Keys.ENTER: 0xff0d, Keys.RETURN: 0xff0d, '\n': 0xff0d, Keys.BACKSPACE: 0xff08, Keys.TAB: 0xff09,
+           Keys.ESCAPE: 0xff1b, Keys.DELETE: 0xffff, Keys.SPACE: 0x20, Keys.HOME: 0xff50, Keys.LEFT: 0xff51,
+           Keys.UP: 0xff52, Keys.RIGHT: 0xff53, Keys.DOWN: 0xff54, Keys.PAGE_UP: 0xff55,
+           Keys.PAGE_DOWN: 0xff56, Keys.END: 0xff57}
+MODIFIER_KEYSYMS = {Keys.SHIFT: 0xffe1, Keys.CONTROL: 0xffe3, Keys.ALT: 0xffe9}
+
+
+def key_events(*args):
+    """Convert the input of ``send_keys`` into RFB key events
+
+    Like Selenium, a modifier (i.e. SHIFT) stays held down until ``Keys.NULL``,
+    or the end of the input.
+
+    :Returns: List - of (keysym, down) pairs
+
+    :Raises: ValueError - if the input has a key that can't be typed
+
+    :param args: The series of keys to type
+    :type args: List
+    """
+    events = []
+    held = []
+    for key in ''.join(args):
+        if key == Keys.NULL:
+            events.extend((x, False) for x in reversed(held))
+            held = []
+        elif key in MODIFIER_KEYSYMS:
+            events.append((MODIFIER_KEYSYMS[key], True))
+            held.append(MODIFIER_KEYSYMS[key])
+        elif key in KEYSYMS or ' ' <= key <= '~':
+            keysym = KEYSYMS.get(key, ord(key))
+            events.extend([(keysym, True), (keysym, False)])
+        else:
+            raise ValueError('Unable to type {!r} on the console'.format(key))
+    events.extend((x, False) for x in reversed(held))
+    return events
+
+
+class RFBConnection(FrameTracker):
+    """A VNC session with the console of a VM, over a WebMKS ticket
+
+    :Raises: RuntimeError - if the console can't be reached, or refuses the session
+
+    :param url: The WebMKS ticket URL (``wss://<host>:<port>/ticket/<ticket>``)
+    :type url: String
+
+    :param timeout: How long to wait for the console to accept the session
+    :type timeout: Integer
+
+    :param verify: Set to False to accept the self-signed certificate of an ESXi host
+    :type verify: Boolean
+    """
+    def __init__(self, url, timeout=30, verify=const.INF_VCENTER_VERIFY_CERT):
+        super().__init__()
+        self.width = 0
+        self.height = 0
+        self.framebuffer = bytearray()
+        self._received = bytearray()
+        self._send_lock = threading.Lock()
+        sslopt = None if verify else {'cert_reqs': ssl.CERT_NONE}
+        try:
+            self._ws = websocket.create_connection(url, timeout=timeout, subprotocols=SUBPROTOCOLS, sslopt=sslopt)
+        except (websocket.WebSocketException, OSError) as doh:
+            raise RuntimeError('Unable to connect to the console: {}'.format(doh))
+        try:
+            self._handshake()
+        except (websocket.WebSocketException, OSError, struct.error) as doh:
+            self.close()
+            raise RuntimeError('Unable to start a session with the console: {}'.format(doh))
+        except RuntimeError:
+            self.close()
+            raise
+        self._ws.settimeout(None)
+        self._thread = threading.Thread(target=self._listen, daemon=True)
+        self._thread.start()
+        self.request_update(incremental=False)
+
+    @property
+    def alive(self):
+        """Determine if the console is still sending updates"""
+        return self._thread.is_alive()
+
+    def _read(self, size):
+        """Obtain the next ``size`` bytes of the RFB stream; messages can span WebSocket frames"""
+        while len(self._received) < size:
+            data = self._ws.recv()
+            if not data:
+                raise websocket.WebSocketConnectionClosedException('The console closed the connection')
+            if isinstance(data, str):
+                data = data.encode('latin-1')
+            self._received.extend(data)
+        chunk = bytes(self._received[:size])
+        del self._received[:size]
+        return chunk
+
+    def _read_reason(self):
+        """Obtain the reason the server gave for refusing the session"""
+        length = struct.unpack('>I', self._read(4))[0]
+        return self._read(length).decode(errors='replace')
+
+    def _send(self, data):
+        with self._send_lock:
+            self._ws.send_binary(data)
+
+    def _handshake(self):
+        server_version = self._read(12)
+        if not server_version.startswith(b'RFB '):
+            raise RuntimeError('Not a VNC console: {!r}'.format(server_version))
+        self._send(RFB_VERSION)
+        count = self._read(1)[0]
+        if not count:
+            raise RuntimeError('The console refused the session: {}'.format(self._read_reason()))
+        if SECURITY_NONE not in self._read(count):
+            raise RuntimeError('The console requires a password; use a WebMKS ticket URL')
+        self._send(bytes([SECURITY_NONE]))
+        if struct.unpack('>I', self._read(4))[0] != 0:
+            raise RuntimeError('The console refused the ticket: {}'.format(self._read_reason()))
+        self._send(b'\x01') # shared; don't kick anyone else off the console
+        width, height = struct.unpack('>HH', self._read(4))
+        self._read(16) # the pixel format of the server; we pick our own
+        self._read(struct.unpack('>I', self._read(4))[0]) # the name of the desktop
+        self._resize(width, height)
+        self._send(struct.pack('>B3x', SET_PIXEL_FORMAT) + PIXEL_FORMAT)
+        encodings = [ENCODING_RAW, ENCODING_COPY_RECT, ENCODING_DESKTOP_SIZE]
+        self._send(struct.pack('>BxH', SET_ENCODINGS, len(encodings)) + struct.pack('>{}i'.format(len(encodings)), *encodings))
+
+    def _resize(self, width, height):
+        with self._lock:
+            self.width = width
+            self.height = height
+            self.framebuffer = bytearray(width * height * 4)
+
+    def _listen(self):
+        while True:
+            try:
+                message_type = self._read(1)[0]
+                if message_type == FRAMEBUFFER_UPDATE:
+                    self._framebuffer_update()
+                elif message_type == SET_COLOUR_MAP_ENTRIES:
+                    _, count = struct.unpack('>xHH', self._read(5))
+                    self._read(count * 6)
+                elif message_type == SERVER_CUT_TEXT:
+                    self._read(3)
+                    self._read(struct.unpack('>I', self._read(4))[0])
+                elif message_type != BELL:
+                    # There's no knowing how long an unknown message is, so the stream is lost
+                    break
+            except (websocket.WebSocketException, OSError, struct.error, ValueError):
+                break
+
+    def _framebuffer_update(self):
+        self._read(1)
+        count = struct.unpack('>H', self._read(2))[0]
+        for _ in range(count):
+            x, y, width, height, encoding = struct.unpack('>HHHHi', self._read(12))
+            if encoding == ENCODING_RAW:
+                self._paint(x, y, width, height, self._read(width * height * 4))
+            elif encoding == ENCODING_COPY_RECT:
+                src_x, src_y = struct.unpack('>HH', self._read(4))
+                self._copy(src_x, src_y, x, y, width, height)
+            elif encoding == ENCODING_DESKTOP_SIZE:
+                self._resize(width, height)
+            else:
+                raise ValueError('Unrequested encoding: {}'.format(encoding))
+        with self._lock:
+            self._frame_received()
+        self.request_update(incremental=True)
+
+    def _paint(self, x, y, width, height, pixels):
+        row_bytes = width * 4
+        with self._lock:
+            for row in range(height):
+                start = ((y + row) * self.width + x) * 4
+                self.framebuffer[start:start + row_bytes] = pixels[row * row_bytes:(row + 1) * row_bytes]
+
+    def _copy(self, src_x, src_y, x, y, width, height):
+        row_bytes = width * 4
+        with self._lock:
+            rows = []
+            for row in range(height):
+                start = ((src_y + row) * self.width + src_x) * 4
+                rows.append(bytes(self.framebuffer[start:start + row_bytes]))
+        self._paint(x, y, width, height, b''.join(rows))
+
+    def request_update(self, incremental=True):
+        """Ask the console to send the next change to the screen
+
+        :Returns: None
+
+        :param incremental: Set to False to have the whole screen sent
+        :type incremental: Boolean
+        """
+        with self._lock:
+            width, height = self.width, self.height
+        self._send(struct.pack('>BBHHHH', FRAMEBUFFER_UPDATE_REQUEST, int(incremental), 0, 0, width, height))
+
+    def send_key_events(self, events):
+        """Press and release keys; every event is sent in a single WebSocket frame
+
+        :Returns: None
+
+        :param events: The (keysym, down) pairs; see ``key_events``
+        :type events: List
+        """
+        self._send(b''.join(struct.pack('>BBxxI', KEY_EVENT, int(down), keysym) for keysym, down in events))
+
+    def fingerprint(self):
+        """Hash the prompt area of the screen; see ``prompts.fingerprint_frame``
+
+        :Returns: Integer, or None if nothing has been drawn yet
+        """
+        with self._lock:
+            frame = bytes(self.framebuffer)
+            width, height = self.width, self.height
+        return prompts.fingerprint_frame(frame, width, height)
+
+    def close(self):
+        """End the session with the console
+
+        :Returns: None
+        """
+        try:
+            self._ws.send_close()
+        except (websocket.WebSocketException, OSError):
+            pass
+        # Wakes up the listener; waiting on the reply to the close would race it for the socket
+        self._ws.abort()
+        self._ws.shutdown()
@@ -0,0 +1,199 @@
+# -*- coding: UTF-8 -*-
+"""
+The config wizard of every release of OneFS, described as data.
+
+A *step* answers one section of the wizard by calling a routine of
+``setup_onefs`` (``do``), and can then wait on the wizard (``wait``) or pause
+(``pause``). The ``args`` and ``kwargs`` of the routine are names of values of
+the config (i.e. ``cluster_name``); anything that isn't a string is passed
+as-is. ``log`` is formatted with the values of the config, and a step with
+``compliance`` set only runs when making a compliance mode cluster.
+
+A *plan* is the ordered list of steps for the releases of OneFS from its
+version, up to the version of the next plan (see ``images.ImageRegistry.profile``). An entry of a plan is either the
+name of a step, or a dictionary with the ``step`` name and the fields to
+override (i.e. a longer ``wait``).
+
+Plans and steps can be added or tuned without changing any code, with a JSON
+file (``VLAB_ONEFS_WIZARD_PLANS``) of ``{"steps": {...}, "plans": {...}}`` that
+is merged over the defaults.
+"""
+import os
+from functools import lru_cache
+
+import ujson
+from selenium.webdriver.common.keys import Keys
+
+from vlab_onefs_api.lib import const
+
+
+WIZARD_STEPS = {
+    'boot': {'log': 'Waiting for node to fully boot', 'wait': {'screen': 'format_disks'}},
+    'format_disks': {'log': 'Formatting disks', 'do': 'format_disks'},
+    'compliance_mode': {'log': 'Rebooting node into compliance mode', 'do': 'enable_compliance_mode', 'compliance': True},
+    'eula': {'log': 'Accepting EULA', 'do': 'make_new_and_accept_eual', 'args': ['compliance_license']},
+    # OneFS 8.1.3 and newer do not require a license to enable SmartLock
+    'eula_no_license': {'log': 'Accepting EULA', 'do': 'make_new_and_accept_eual', 'args': [None]},
+    # OneFS 8.2.0 needs an ENTER after skipping to the bottom of the EULA
+    'eula_auto_enter': {'log': 'Accepting EULA', 'do': 'make_new_and_accept_eual',
+                        'kwargs': {'compliance_license': False, 'auto_enter': True}},
+    'passwords': {'log': 'Setting root and admin passwords', 'do': 'set_passwords'},
+    'esrs': {'log': 'Skipping ESRS config', 'do': 'set_esrs'},
+    'name': {'log': 'Naming cluster {cluster_name}', 'do': 'set_name', 'args': ['cluster_name']},
+    'encoding': {'log': 'Settings encoding to {encoding}', 'do': 'set_encoding', 'args': ['encoding']},
+    'int_network': {'log': 'Setting up internal network - Mask: {int_netmask} Low: {int_ip_low} High: {int_ip_high}',
+                    'do': 'config_network',
+                    'kwargs': {'netmask': 'int_netmask', 'ip_low': 'int_ip_low', 'ip_high': 'int_ip_high'}},
+    # OneFS 7.2.1 and older exit the internal network config with one less ENTER
+    'int_network_7_2': {'log': 'Setting up internal network - Mask: {int_netmask} Low: {int_ip_low} High: {int_ip_high}',
+                        'do': 'config_network',
+                        'kwargs': {'netmask': 'int_netmask', 'ip_low': 'int_ip_low', 'ip_high': 'int_ip_high',
+                                   'many_enters': False}},
+    'ext_network': {'log': 'Settings up external network - Mask: {ext_netmask} Low: {ext_ip_low} High: {ext_ip_high}',
+                    'do': 'config_network',
+                    'kwargs': {'netmask': 'ext_netmask', 'ip_low': 'ext_ip_low', 'ip_high': 'ext_ip_high',
+                               'ext_network': True}},
+    'gateway': {'log': 'Setting up default gateway for ext network to {gateway}', 'do': 'set_default_gateway',
+                'args': ['gateway']},
+    'smartconnect': {'log': 'Configuring SmartConnect - Zone: {sc_zonename} IP: {smartconnect_ip}',
+                     'do': 'set_smartconnect', 'args': ['sc_zonename', 'smartconnect_ip']},
+    'dns': {'log': 'Setting DNS servers to {dns_servers}', 'do': 'set_dns', 'args': ['dns_servers']},
+    'timezone': {'log': 'Skipping timezone config', 'do': 'set_timezone'},
+    'join_mode': {'log': 'Skipping join mode config', 'do': 'set_join_mode'},
+    'commit': {'log': 'Committing changes and waiting for the cluster to form', 'do': 'commit_config',
+               'wait': {'screen': 'login'}},
+    # root can't log into a compliance mode cluster, so the sysctls are set as
+    # compadmin with sudo; that includes OneFS 8.1.3, even though its EULA has no license
+    'sysctls': {'log': 'Setting sysctls', 'do': 'set_sysctls', 'kwargs': {'compliance_mode': 'compliance'}},
+}
+
+_NETWORK_STEPS = ['int_network', 'ext_network', 'gateway', 'smartconnect', 'dns', 'timezone', 'join_mode']
+
+WIZARD_PLANS = {
+    '7.2.0.0': ['boot', 'format_disks', 'compliance_mode', 'eula', 'passwords', 'esrs', 'name', 'encoding',
+                'int_network_7_2'] + _NETWORK_STEPS[1:] + [{'step': 'commit', 'wait': {'timeout': 60, 'screen': 'login'}},
+                'sysctls'],
+    '8.0.0.0': ['boot', 'format_disks', 'compliance_mode', 'eula', 'passwords', 'esrs', 'name', 'encoding'] +
+               _NETWORK_STEPS + ['commit', 'sysctls'],
+    # 8.1.0 names the cluster before ESRS
+    '8.1.0.0': ['boot', 'format_disks', 'compliance_mode', 'eula', 'passwords', 'name', 'encoding', 'esrs'] +
+               _NETWORK_STEPS + ['commit', 'sysctls'],
+    # ESRS is not even set via the wizard anymore
+    '8.1.2.0': ['boot', 'format_disks', 'compliance_mode', 'eula', 'passwords', 'name', 'encoding'] +
+               _NETWORK_STEPS + ['commit', 'sysctls'],
+    '8.1.3.0': ['boot', 'format_disks', 'compliance_mode', 'eula_no_license', 'passwords', 'name', 'encoding'] +
+               _NETWORK_STEPS + ['commit', 'sysctls'],
+    '8.2.0.0': ['boot', 'format_disks', 'compliance_mode', 'eula_auto_enter', 'passwords', 'name', 'encoding'] +
+               _NETWORK_STEPS + ['commit', 'sysctls'],
+}
+
+# Keys that stay held down until the end of a send_keys call
+MODIFIERS = (Keys.SHIFT, Keys.LEFT_SHIFT, Keys.CONTROL, Keys.LEFT_CONTROL, Keys.ALT, Keys.LEFT_ALT)
+
+
+@lru_cache(maxsize=None)
+def load(path=const.VLAB_ONEFS_WIZARD_PLANS):
+    """Obtain the steps and plans, with the ones from the ``VLAB_ONEFS_WIZARD_PLANS`` file
+
+    :Returns: Tuple - (steps, plans)
+
+    :param path: The JSON file of steps and plans to add to the defaults
+    :type path: String
+    """
+    steps = dict(WIZARD_STEPS)
+    plans = dict(WIZARD_PLANS)
+    if path and os.path.exists(path):
+        with open(path) as the_file:
+            overrides = ujson.load(the_file)
+        steps.update(overrides.get('steps', {}))
+        plans.update(overrides.get('plans', {}))
+    return steps, plans
+
+
+@lru_cache(maxsize=None)
+def compile_plan(plan, compliance):
+    """Resolve the steps of a plan into the list of steps to run for a cluster
+
+    Steps that don't apply (i.e. compliance mode, for a normal cluster) are
+    dropped, and the overrides of the plan are applied, only once per plan.
+
+    :Returns: Tuple - of (log, do, args, kwargs, wait, pause)
+
+    :Raises: ValueError - if the plan, or one of its steps, is not defined
+
+    :param plan: The name of the plan (i.e. ``8.2.0.0``)
+    :type plan: String
+
+    :param compliance: Set to True when configuring a compliance mode cluster
+    :type compliance: Boolean
+    """
+    steps, plans = load()
+    if plan not in plans:
+        raise ValueError('No wizard plan named {}'.format(plan))
+    compiled = []
+    for entry in plans[plan]:
+        if isinstance(entry, dict):
+            overrides = dict(entry)
+            name = overrides.pop('step', None)
+        else:
+            overrides = {}
+            name = entry
+        if name not in steps:
+            raise ValueError('Wizard plan {} has an undefined step: {}'.format(plan, name))
+        step = dict(steps[name], **overrides)
+        if step.get('compliance', False) and not compliance:
+            continue
+        compiled.append((step.get('log', None),
+                         step.get('do', None),
+                         tuple(step.get('args', ())),
+                         tuple(sorted(step.get('kwargs', {}).items())),
+                         step.get('wait', None),
+                         step.get('pause', 0)))
+    return tuple(compiled)
+
+
+def optimize(actions):
+    """Merge keystrokes, and drop the pauses that don't help
+
+    * Input that doesn't end with ENTER is still answering the same prompt, so
+      it's sent along with the next input. Input with a modifier (i.e. SHIFT)
+      is never merged, because the modifier is held down for the whole send.
+    * Passwords (``('secret', keys, auto_enter)``) are never merged with any
+      other input.
+    * Back-to-back pauses are just the longest one.
+    * A pause next to a wait is dropped; the wait already lets the wizard catch up.
+
+    :Returns: List
+
+    :param actions: The recorded ``('keys', keys, auto_enter)``, ``('pause', seconds)``,
+                    ``('wait', timeout, screen)`` and ``('log', message)`` actions
+    :type actions: List
+    """
+    merged = []
+    for action in actions:
+        previous = merged[-1] if merged else None
+        # Logging doesn't take any time; look past it for pauses and waits
+        timed = [i for i, x in enumerate(merged) if x[0] != 'log']
+        last = timed[-1] if timed else None
+        if action[0] == 'keys' and previous is not None and _mergeable(previous):
+            merged[-1] = ('keys', previous[1] + action[1], action[2])
+        elif action[0] == 'pause' and last is not None and merged[last][0] == 'pause':
+            merged[last] = ('pause', max(merged[last][1], action[1]))
+        elif action[0] == 'pause' and last is not None and merged[last][0] == 'wait':
+            continue
+        elif action[0] == 'wait' and last is not None and merged[last][0] == 'pause':
+            del merged[last]
+            merged.append(action)
+        else:
+            merged.append(action)
+    return merged
+
+
+def _mergeable(action):
+    """Determine if the next input can be sent along with this one"""
+    if action[0] != 'keys' or action[2]:
+        return False
+    keys = action[1]
+    if any(x in MODIFIERS for key in keys for x in key):
+        return False
+    return not (keys and keys[-1] and keys[-1][-1] in (Keys.ENTER, Keys.RETURN))